@@ -1,7 +1,7 @@
 import json
 import yaml
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import argparse
 
 # Import our modules
@@ -9,32 +9,54 @@ from src.data_loader import load_power_data
 from src.delta_power import compute_delta_power
 from src.event_detector import detect_events
 from src.event_table import create_event_table
-from src.clustering import cluster_events
+from src.clustering import cluster_events, cluster_summaries, summarize_clusters
+from src.meters import (cluster_events_by_meter, cluster_summaries_by_meter,
+                        detect_events_by_meter, event_tables_by_meter, meter_dirname)
+from src.profiling import StageProfiler
+from src.sketches import save_summaries
 
 def run_clustering_pipeline(input_file: str, 
                           threshold: float = 30.0,  
                           eps: float = 30.0,
-                          min_samples: int = 3) -> None:
+                          min_samples: int = 3,
+                          profile: bool = False,
+                          profile_output: str = 'data/profile.json',
+                          cprofile_dir: Optional[str] = None) -> None:
     """Run the clustering pipeline end-to-end."""
+    profiler = StageProfiler(enabled=profile, cprofile_dir=cprofile_dir)
+    
     # 1. Load and preprocess data
     print("Loading data...")
-    df = load_power_data(input_file)
+    with profiler.stage('load') as stage:
+        df = load_power_data(input_file)
+        stage['rows'] = len(df)
+    if 'device_id' in df.columns and df['device_id'].nunique() > 1:
+        print(f"Warning: {df['device_id'].nunique()} meters are interleaved in one series; "
+              "use --by-meter to compute events per meter")
     
     # 2. Compute power changes
     print("Computing power changes...")
-    delta_p = compute_delta_power(df['power'].tolist())
+    with profiler.stage('delta') as stage:
+        delta_p = compute_delta_power(df['power'].tolist())
+        stage['rows'] = len(delta_p)
     
     # 3. Detect events
     print("Detecting events...")
-    events = detect_events(df['timestamp'].tolist(), delta_p, threshold)
+    with profiler.stage('detect') as stage:
+        events = detect_events(df['timestamp'].tolist(), delta_p, threshold)
+        stage['rows'] = len(events)
     
     # 4. Create event table
     print("Creating event table...")
-    event_table = create_event_table(events)
+    with profiler.stage('table') as stage:
+        event_table = create_event_table(events)
+        stage['rows'] = len(event_table)
     
     # 5. Cluster events
     print("Clustering events...")
-    labels = cluster_events(event_table, eps=eps, min_samples=min_samples)
+    with profiler.stage('cluster') as stage:
+        labels = cluster_events(event_table, eps=eps, min_samples=min_samples)
+        stage['rows'] = len(labels)
     
     # Add cluster IDs to events
     for event, label in zip(event_table, labels):
@@ -48,45 +70,99 @@ def run_clustering_pipeline(input_file: str,
     with open(output_dir / 'clustered_events.json', 'w') as f:
         json.dump(event_table, f, default=str)
     
-    # Generate cluster statistics
-    cluster_stats = {}
-    for event in event_table:
-        cluster_id = event['cluster_id']
-        if cluster_id not in cluster_stats:
-            cluster_stats[cluster_id] = {
-                'count': 0,
-                'avg_power_change': 0.0,
-                'min_power_change': float('inf'),
-                'max_power_change': -float('inf')
-            }
-        
-        stats = cluster_stats[cluster_id]
-        power = event['abs_delta_p']
-        
-        stats['count'] += 1
-        stats['avg_power_change'] = (stats['avg_power_change'] * (stats['count'] - 1) + power) / stats['count']
-        stats['min_power_change'] = min(stats['min_power_change'], power)
-        stats['max_power_change'] = max(stats['max_power_change'], power)
+    with profiler.stage('stats') as stage:
+        # Streaming summaries per cluster; the sketches merge with other runs' (sketches.merge_summaries)
+        summaries = cluster_summaries(labels, [event['abs_delta_p'] for event in event_table])
+        cluster_stats = summarize_clusters(summaries)
+        stage['rows'] = len(cluster_stats)
     
     # Save cluster statistics
     with open(output_dir / 'cluster_stats.json', 'w') as f:
         json.dump(cluster_stats, f, indent=2)
+    save_summaries(summaries, str(output_dir / 'cluster_sketches.json'))
     
     print("\nClustering complete!")
     print(f"Found {len(cluster_stats)} clusters")
     print("\nCluster statistics:")
-    for cluster_id, stats in sorted(cluster_stats.items()):
+    for cluster_id, stats in sorted(cluster_stats.items(), key=lambda item: int(item[0])):
         print(f"\nCluster {cluster_id}:")
         print(f"  Number of events: {stats['count']}")
-        print(f"  Avg power change: {stats['avg_power_change']:.2f}W")
+        print(f"  Avg power change: {stats['avg_power_change']:.2f}W (std {stats['std_power_change']:.2f}W)")
         print(f"  Min power change: {stats['min_power_change']:.2f}W")
         print(f"  Max power change: {stats['max_power_change']:.2f}W")
+        print(f"  p50/p95/p99:      {stats['p50_power_change']:.2f}W / {stats['p95_power_change']:.2f}W / "
+              f"{stats['p99_power_change']:.2f}W")
+    
+    if profile:
+        print("\nStage profile:")
+        print(profiler.summary())
+        profiler.save(profile_output)
+        print(f"Profile written to {profile_output}")
     
     print("\nNext steps:")
     print("1. Check the cluster statistics above")
     print("2. Edit data/cluster_labels.yaml to assign meaningful names to each cluster")
     print("3. Run the training script to train the KNN classifier")
 
+def run_meter_pipeline(input_file: str,
+                       threshold: float = 30.0,
+                       eps: float = 30.0,
+                       min_samples: int = 3,
+                       n_jobs: Optional[int] = None,
+                       output_dir: str = 'data/meters',
+                       profile: bool = False,
+                       profile_output: str = 'data/profile.json',
+                       cprofile_dir: Optional[str] = None) -> None:
+    """Run the clustering pipeline separately for every meter (device_id) in the input."""
+    profiler = StageProfiler(enabled=profile, cprofile_dir=cprofile_dir)
+
+    print("Loading data...")
+    with profiler.stage('load') as stage:
+        df = load_power_data(input_file)
+        stage['rows'] = len(df)
+
+    print("Detecting events per meter...")
+    with profiler.stage('detect') as stage:
+        events = detect_events_by_meter(df, threshold)
+        stage['rows'] = len(events)
+
+    print("Clustering events per meter...")
+    with profiler.stage('cluster') as stage:
+        events['cluster_id'] = cluster_events_by_meter(events, eps=eps, min_samples=min_samples, n_jobs=n_jobs)
+        stage['rows'] = len(events)
+
+    with profiler.stage('stats') as stage:
+        summaries = cluster_summaries_by_meter(events)
+        cluster_stats = {device_id: summarize_clusters(clusters) for device_id, clusters in summaries.items()}
+        event_tables = event_tables_by_meter(events)
+        stage['rows'] = sum(len(clusters) for clusters in cluster_stats.values())
+
+    # One directory per meter, laid out like data/ so run_live.py can point at it
+    for device_id, event_table in event_tables.items():
+        meter_dir = Path(output_dir) / meter_dirname(device_id)
+        meter_dir.mkdir(parents=True, exist_ok=True)
+        with open(meter_dir / 'clustered_events.json', 'w') as f:
+            json.dump(event_table, f, default=str)
+        with open(meter_dir / 'cluster_stats.json', 'w') as f:
+            json.dump(cluster_stats[device_id], f, indent=2)
+        save_summaries(summaries[device_id], str(meter_dir / 'cluster_sketches.json'))
+
+    meters = df['device_id'].nunique()
+    print(f"\nClustering complete for {meters} meters ({len(events)} events)")
+    for device_id, clusters in sorted(cluster_stats.items()):
+        noise = clusters.get('-1', {}).get('count', 0)
+        print(f"  {device_id}: {len(clusters) - ('-1' in clusters)} clusters, "
+              f"{sum(c['count'] for c in clusters.values())} events ({noise} noise)")
+    print(f"Per-meter event tables, cluster stats and sketches written to {output_dir}/<device_id>/ "
+          "(ids percent-encoded)")
+
+    if profile:
+        print("\nStage profile:")
+        print(profiler.summary())
+        profiler.save(profile_output)
+        print(f"Profile written to {profile_output}")
+
+
 if __name__ == "__main__":
     # Example usage
     parser = argparse.ArgumentParser(description='Run NILM clustering pipeline')
@@ -94,12 +170,34 @@ if __name__ == "__main__":
     parser.add_argument('--threshold', type=float, default=30.0, help='Minimum power change to consider as event')
     parser.add_argument('--eps', type=float, default=30.0, help='DBSCAN eps parameter')
     parser.add_argument('--min-samples', type=int, default=3, help='DBSCAN min_samples parameter')
+    parser.add_argument('--profile', action='store_true', help='Record wall/CPU time, peak memory and row counts per stage')
+    parser.add_argument('--profile-output', default='data/profile.json', help='Where to write the stage profile JSON')
+    parser.add_argument('--cprofile-dir', default=None, help='Also dump a cProfile .prof file per stage into this directory')
+    parser.add_argument('--by-meter', action='store_true', help='Detect and cluster events separately for each device_id')
+    parser.add_argument('--jobs', type=int, default=None, help='Worker processes for --by-meter clustering (default: all cores)')
+    parser.add_argument('--output-dir', default='data/meters', help='Where --by-meter writes one directory per meter')
     
     args = parser.parse_args()
     
-    run_clustering_pipeline(
-        input_file=args.input,
-        threshold=args.threshold,
-        eps=args.eps,
-        min_samples=args.min_samples
-    )
\ No newline at end of file
+    if args.by_meter:
+        run_meter_pipeline(
+            input_file=args.input,
+            threshold=args.threshold,
+            eps=args.eps,
+            min_samples=args.min_samples,
+            n_jobs=args.jobs,
+            output_dir=args.output_dir,
+            profile=args.profile,
+            profile_output=args.profile_output,
+            cprofile_dir=args.cprofile_dir
+        )
+    else:
+        run_clustering_pipeline(
+            input_file=args.input,
+            threshold=args.threshold,
+            eps=args.eps,
+            min_samples=args.min_samples,
+            profile=args.profile,
+            profile_output=args.profile_output,
+            cprofile_dir=args.cprofile_dir
+        )
\ No newline at end of file
@@ -0,0 +1,129 @@
+import argparse
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+# Import our modules
+from src.data_loader import load_power_data
+from src.disaggregator import UNKNOWN, CombinationTable, load_appliances
+from src.energy_calc import DeviceMetrics, EnergyCalculator
+from src.state_tracker import StateTracker
+
+
+def run_disaggregation(input_file: str,
+                       stats_file: str = 'data/cluster_stats.json',
+                       labels_file: str = 'data/cluster_labels.yaml',
+                       include_unlabeled: bool = False,
+                       max_active: int = 4,
+                       max_combinations: int = 1_000_000,
+                       tolerance: float = 30.0,
+                       base_load: Optional[float] = 0.0,
+                       output_file: str = 'data/disaggregated.csv') -> None:
+    """Decode every aggregate reading into the combination of appliances that are on."""
+    appliances = load_appliances(stats_file, labels_file, include_unlabeled)
+    if not appliances:
+        print(f"No labeled clusters in {labels_file} - label them (cluster_<id>: name) "
+              "or pass --include-unlabeled")
+        return
+
+    print("Loading data...")
+    df = load_power_data(input_file)
+    if 'device_id' not in df.columns:
+        df['device_id'] = 'meter'
+    df = df.sort_values(['device_id', 'timestamp'], kind='stable').reset_index(drop=True)
+    power = df['power'].to_numpy(dtype=np.float64)
+
+    # None: each meter's lowest reading is its always-on load
+    if base_load is None:
+        base = df.groupby('device_id', observed=True)['power'].transform('min').to_numpy(dtype=np.float64)
+    else:
+        base = np.full(len(df), base_load)
+
+    print("Building combination table...")
+    start = time.perf_counter()
+    table = CombinationTable(appliances, max_power=float((power - base).max()) + tolerance,
+                             max_active=max_active, max_combinations=max_combinations)
+    build_s = time.perf_counter() - start
+    print(f"  {len(table)} combinations of {len(appliances)} appliances ({build_s * 1000:.1f} ms)")
+    if table.truncated:
+        print(f"  Capped at {max_combinations} combinations (fewest appliances on kept)")
+
+    print("Decoding readings...")
+    start = time.perf_counter()
+    combos, residual = table.decode(power, base_load=base, tolerance=tolerance)
+    decode_s = time.perf_counter() - start
+    labels = table.labels(combos)
+
+    output = Path(output_file)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    pd.DataFrame({
+        'timestamp': df['timestamp'],
+        'device_id': df['device_id'],
+        'power': power,
+        'appliances': labels,
+        'residual': np.round(residual, 3),
+    }).to_csv(output, index=False)
+
+    # Usage per appliance from the changes of decoded combination; undecodable readings keep the last one
+    metrics: Dict[str, DeviceMetrics] = {}
+    calculator = EnergyCalculator(table.ratings())
+    for device_id, rows in df.groupby('device_id', observed=True, sort=False).indices.items():
+        rows = rows[combos[rows] >= 0]
+        if len(rows) == 0:
+            continue
+        changes = rows[np.r_[True, combos[rows][1:] != combos[rows][:-1]]]
+        tracker = StateTracker()
+        on = table.states(combos[changes])
+        for row, appliances_on in zip(changes, on):
+            tracker.update_combination([table.names[a] for a in np.flatnonzero(appliances_on)],
+                                       df['timestamp'].iloc[row])
+        tracker.update_combination([], df['timestamp'].iloc[rows[-1]])
+        for name, meter_metrics in calculator.calculate_metrics(tracker.get_usage_stats()).items():
+            metrics.setdefault(name, DeviceMetrics()).merge(meter_metrics)
+
+    decoded = combos >= 0
+    print("\nDisaggregation complete!")
+    print(f"Decoded {decoded.sum()}/{len(combos)} readings ({decoded.mean() * 100:.1f}%) "
+          f"from {df['device_id'].nunique()} meter(s) in {decode_s * 1000:.1f} ms "
+          f"({len(combos) / max(decode_s, 1e-9) / 1e6:.1f}M readings/s)")
+    if decoded.any():
+        print(f"Mean |residual|: {np.abs(residual[decoded]).mean():.1f}W")
+    overlapping = table.states(combos).sum(axis=1) > 1
+    print(f"Readings with overlapping appliances: {overlapping.sum()} ({overlapping.mean() * 100:.1f}%)")
+    print("\nAppliance usage:")
+    for name, m in sorted(metrics.items()):
+        runs = (f"  run p50/p95 {m.durations.percentile(50) / 60:>6.1f}/{m.durations.percentile(95) / 60:.1f} min"
+                if m.usage_count else "")
+        print(f"  {name:<20} {m.usage_count:>5} runs  {m.total_duration / 3600:>8.2f} h  {m.total_energy:>10.1f} Wh{runs}")
+    print(f"\nPer-reading combinations written to {output_file} ({UNKNOWN} = no combination within "
+          f"{tolerance:g}W)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Decode aggregate power into overlapping appliances')
+    parser.add_argument('--input', default='data/spectrawatt.energy_data.csv', help='Input data file')
+    parser.add_argument('--stats', default='data/cluster_stats.json', help='Cluster statistics from run_clustering.py')
+    parser.add_argument('--labels', default='data/cluster_labels.yaml', help='Cluster label mapping')
+    parser.add_argument('--include-unlabeled', action='store_true', help='Also use unlabeled clusters (cluster_<id>)')
+    parser.add_argument('--max-active', type=int, default=4, help='Most appliances on at the same time')
+    parser.add_argument('--max-combinations', type=int, default=1_000_000, help='Cap on the combination table size')
+    parser.add_argument('--tolerance', type=float, default=30.0, help='Largest accepted residual power (W)')
+    parser.add_argument('--base-load', default='0', help="Always-on power (W), or 'auto' for each meter's minimum")
+    parser.add_argument('--output', default='data/disaggregated.csv', help='Where to write per-reading combinations')
+
+    args = parser.parse_args()
+
+    run_disaggregation(
+        input_file=args.input,
+        stats_file=args.stats,
+        labels_file=args.labels,
+        include_unlabeled=args.include_unlabeled,
+        max_active=args.max_active,
+        max_combinations=args.max_combinations,
+        tolerance=args.tolerance,
+        base_load=None if args.base_load == 'auto' else float(args.base_load),
+        output_file=args.output
+    )
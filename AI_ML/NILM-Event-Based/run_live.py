@@ -0,0 +1,139 @@
+import json
+import os
+import sys
+import time
+import argparse
+import urllib.request
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# Import our modules
+from src.data_loader import ML_SRC_DIR
+from src.delta_power import compute_delta_power
+from src.event_detector import detect_events
+from src.knn_model import KNNTrainer
+from src.live_classifier import LiveClassifier
+from src.state_tracker import StateTracker
+
+sys.path.append(str(ML_SRC_DIR))
+from prediction_trace import record_prediction
+
+
+def load_classifier(events_file: str, labels_file: str) -> Optional[LiveClassifier]:
+    """Train the live KNN classifier from clustered events, or None if nothing is labeled yet."""
+    if not (os.path.exists(events_file) and os.path.exists(labels_file)):
+        return None
+    with open(events_file, 'r') as f:
+        event_table = json.load(f)
+    trainer = KNNTrainer()
+    try:
+        trainer.train(event_table, labels_file)
+    except ValueError as e:
+        print(f"Classifier disabled: {e}")
+        return None
+    return LiveClassifier(trainer)
+
+
+def fetch_readings(api_url: str) -> Dict[str, List[dict]]:
+    """Fetch /api/data and return readings per device in ascending time order."""
+    with urllib.request.urlopen(api_url, timeout=5) as response:
+        api_data = json.load(response)
+    return {
+        entry['device_id']: sorted(entry.get('data', []), key=lambda r: r['timestamp'])
+        for entry in api_data
+    }
+
+
+def poll_once(api_url: str,
+              classifier: Optional[LiveClassifier],
+              tracker: StateTracker,
+              last_seen: Dict[str, str],
+              last_power: Dict[str, float],
+              threshold: float = 30.0) -> int:
+    """
+    Fetch /api/data once and classify power-change events in the readings not seen before.
+
+    Args:
+        api_url: Readings endpoint to poll
+        classifier: Trained live classifier, or None to label every event "Unknown"
+        tracker: Appliance state tracker updated with each event
+        last_seen: Newest timestamp handled per device (updated in place)
+        last_power: Last power reading per device (updated in place)
+        threshold: Minimum power change to consider as event (in watts)
+
+    Returns:
+        Number of events detected
+    """
+    readings_by_device = fetch_readings(api_url)
+    n_events = 0
+    for device_id, readings in readings_by_device.items():
+        new = [r for r in readings if r['timestamp'] > last_seen.get(device_id, '')]
+        if not new:
+            continue
+
+        timestamps = [datetime.fromisoformat(r['timestamp'].replace('Z', '+00:00')) for r in new]
+        power = [float(r['apparent_power']) for r in new]
+
+        # Prepend the previous reading so the first delta spans the poll boundary
+        if device_id in last_power:
+            delta_p = compute_delta_power([last_power[device_id]] + power)[1:]
+        else:
+            delta_p = compute_delta_power(power)
+
+        for timestamp, dp in detect_events(timestamps, delta_p, threshold):
+            label = classifier.classify_event(dp) if classifier else "Unknown"
+            tracker.update_state(label, dp, timestamp)
+            record_prediction('nilm', timestamp, label, readings=len(new))
+            print(f"[{device_id}] {timestamp.isoformat()} ΔP={dp:+.1f}W → {label}")
+            n_events += 1
+
+        last_seen[device_id] = new[-1]['timestamp']
+        last_power[device_id] = power[-1]
+    return n_events
+
+
+def run_live_pipeline(api_url: str,
+                      threshold: float = 30.0,
+                      events_file: str = 'data/clustered_events.json',
+                      labels_file: str = 'data/cluster_labels.yaml',
+                      interval: float = 2.0) -> None:
+    """Poll the API and classify power-change events as readings arrive."""
+    classifier = load_classifier(events_file, labels_file)
+    # Nothing reads the usage history here; keeping it would grow memory for as long as it runs
+    tracker = StateTracker(keep_events=False)
+    last_seen: Dict[str, str] = {}
+    last_power: Dict[str, float] = {}
+
+    print(f"Monitoring {api_url} for power-change events (threshold {threshold}W)...")
+    while True:
+        try:
+            poll_once(api_url, classifier, tracker, last_seen, last_power, threshold)
+        except (OSError, ValueError) as e:
+            print(f"API error: {e} - retrying in 5 seconds")
+            time.sleep(5)
+            continue
+
+        time.sleep(interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Run NILM event classification against the live API')
+    parser.add_argument('--api-url', default=os.environ.get('SPECTRAWATT_API_URL', 'https://api.spectrawatt.upayan.dev') + '/api/data',
+                        help='Readings endpoint to poll')
+    parser.add_argument('--threshold', type=float, default=30.0, help='Minimum power change to consider as event')
+    parser.add_argument('--events', default='data/clustered_events.json', help='Clustered events from run_clustering.py')
+    parser.add_argument('--labels', default='data/cluster_labels.yaml', help='Cluster label mapping')
+    parser.add_argument('--interval', type=float, default=float(os.environ.get('POLL_INTERVAL', 2)), help='Poll interval in seconds')
+
+    args = parser.parse_args()
+
+    try:
+        run_live_pipeline(
+            api_url=args.api_url,
+            threshold=args.threshold,
+            events_file=args.events,
+            labels_file=args.labels,
+            interval=args.interval
+        )
+    except KeyboardInterrupt:
+        print("\nMonitoring stopped")
\ No newline at end of file
@@ -1,23 +1,133 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Sequence
 import numpy as np
-from sklearn.cluster import DBSCAN
+
+from src.sketches import PERCENTILES, StreamSummary
+
+
+def dbscan_1d(values: np.ndarray, eps: float, min_samples: int) -> np.ndarray:
+    """
+    DBSCAN of one-dimensional values, with the labels sklearn's DBSCAN assigns.
+
+    In one dimension every eps-neighbourhood is a contiguous run of the sorted
+    values, so neighbour counts come from two binary searches instead of
+    per-point neighbour lists. sklearn keeps those lists, which take
+    O(n * neighbours) memory (gigabytes for tens of thousands of similar ΔP
+    events); this takes O(n).
+
+    Args:
+        values: 1-D array of values to cluster
+        eps: Maximum distance between two samples for them to be in the same cluster
+        min_samples: Number of samples in a neighborhood (itself included) for a point to be a core point
+
+    Returns:
+        Array of cluster labels (-1 for noise), numbered like sklearn: in order of each cluster's first core point
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    labels = np.full(n, -1, dtype=np.int64)
+    if n == 0:
+        return labels
+
+    order = np.argsort(values, kind='stable')
+    x = values[order]
+    counts = np.searchsorted(x, x + eps, side='right') - np.searchsorted(x, x - eps, side='left')
+    core = np.flatnonzero(counts >= min_samples)
+    if len(core) == 0:
+        return labels
+
+    # Sorted core points closer than eps are directly connected; each gap > eps starts a new cluster
+    component = np.cumsum(np.r_[True, np.diff(x[core]) > eps]) - 1
+    first_core = np.full(component[-1] + 1, n)
+    np.minimum.at(first_core, component, order[core])
+    cluster = np.empty_like(first_core)
+    cluster[np.argsort(first_core)] = np.arange(len(first_core))
+
+    sorted_labels = np.full(n, -1, dtype=np.int64)
+    sorted_labels[core] = cluster[component]
+
+    # A border point joins the lowest-numbered cluster with a core point within eps,
+    # which is the nearer core on its left or on its right
+    is_core = sorted_labels >= 0
+    positions = np.arange(n)
+    left = np.maximum.accumulate(np.where(is_core, positions, -1))
+    right = np.minimum.accumulate(np.where(is_core, positions, n)[::-1])[::-1]
+    border = np.flatnonzero(~is_core)
+    candidates = np.full((len(border), 2), np.iinfo(np.int64).max)
+    for side, nearest in enumerate((left[border], right[border])):
+        valid = (nearest >= 0) & (nearest < n)
+        close = np.zeros(len(border), dtype=bool)
+        close[valid] = np.abs(x[nearest[valid]] - x[border[valid]]) <= eps
+        candidates[close, side] = sorted_labels[nearest[close]]
+    best = candidates.min(axis=1)
+    sorted_labels[border] = np.where(best == np.iinfo(np.int64).max, -1, best)
+
+    labels[order] = sorted_labels
+    return labels
+
 
 def cluster_events(event_table: List[Dict[str, Any]], eps: float = 30.0, min_samples: int = 3) -> List[int]:
     """
     Cluster events based on their absolute power changes.
-    
+
     Args:
         event_table: List of event dictionaries from create_event_table()
         eps: Maximum distance between two samples for them to be in the same cluster
         min_samples: Number of samples in a neighborhood for a point to be a core point
-        
+
     Returns:
         List of cluster labels (-1 for noise)
     """
     # Extract features for clustering (just abs_delta_p in this simple case)
-    X = np.array([[event['abs_delta_p']] for event in event_table])
-    
-    # Use DBSCAN for clustering
-    clustering = DBSCAN(eps=eps, min_samples=min_samples).fit(X)
-    
-    return clustering.labels_.tolist()
\ No newline at end of file
+    X = np.array([event['abs_delta_p'] for event in event_table], dtype=np.float64)
+
+    # DBSCAN on one feature, without sklearn's per-point neighbour lists
+    return dbscan_1d(X, eps=eps, min_samples=min_samples).tolist()
+
+
+def cluster_summaries(cluster_ids: Sequence[int], abs_delta_p: Sequence[float]) -> Dict[str, StreamSummary]:
+    """
+    Streaming summary of the |ΔP| step sizes of every cluster.
+
+    Events are grouped with one argsort and each group is added as a batch.
+    The summaries can be saved (sketches.save_summaries) and merged with
+    those of other shards or time partitions.
+
+    Args:
+        cluster_ids: Cluster label of each event (-1 for noise)
+        abs_delta_p: Absolute power change of each event
+
+    Returns:
+        Dictionary mapping str(cluster_id) to the summary of its events
+    """
+    cluster_ids = np.asarray(cluster_ids, dtype=np.int64)
+    abs_delta_p = np.asarray(abs_delta_p, dtype=np.float64)
+    order = np.argsort(cluster_ids, kind='stable')
+    ids, starts = np.unique(cluster_ids[order], return_index=True)
+    summaries = {}
+    for cluster_id, group in zip(ids.tolist(), np.split(order, starts[1:])):
+        summaries[str(cluster_id)] = StreamSummary()
+        summaries[str(cluster_id)].update_many(abs_delta_p[group])
+    return summaries
+
+
+def summarize_clusters(summaries: Dict[str, StreamSummary]) -> Dict[str, Dict[str, Any]]:
+    """
+    Cluster summaries in the cluster_stats.json format.
+
+    Args:
+        summaries: Dictionary from cluster_summaries() (or merged ones)
+
+    Returns:
+        Dictionary mapping cluster_id to count, avg/min/max/std and p50/p95/p99 power change
+    """
+    stats = {}
+    for cluster_id, summary in summaries.items():
+        stats[cluster_id] = {
+            'count': summary.count,
+            'avg_power_change': summary.mean,
+            'min_power_change': summary.min,
+            'max_power_change': summary.max,
+            'std_power_change': summary.std,
+            **{f'p{p}_power_change': summary.percentile(p) for p in PERCENTILES},
+        }
+    return stats
@@ -1,34 +1,55 @@
+import sys
 import pandas as pd
+from pathlib import Path
 from typing import List, Dict, Any
 
+# Typed ingestion and the binary reading log format are owned by the ML service (ml/src)
+ML_SRC_DIR = Path(__file__).resolve().parents[3] / "ml" / "src"
+
+
+def _ingest():
+    if str(ML_SRC_DIR) not in sys.path:
+        sys.path.append(str(ML_SRC_DIR))
+    import ingest
+    return ingest
+
+
 def load_power_data(file_path: str) -> pd.DataFrame:
     """
     Load and clean power data from a file.
-    
+
+    Parsing uses the shared ingestion schema (ml/src/ingest.py): float32
+    power, categorical device_id and fixed-format timestamps, with unused
+    columns such as _id never materialised. Parse time and memory are kept in
+    df.attrs['ingest'].
+
     Args:
-        file_path: Path to input file (CSV or JSON)
-        
+        file_path: Path to input file (CSV, JSON or binary reading log)
+
     Returns:
-        DataFrame with columns: timestamp, power
+        DataFrame with columns: timestamp, power (and device_id when the input has it)
     """
-    # Read file
-    if file_path.endswith('.csv'):
-        df = pd.read_csv(file_path)
-    elif file_path.endswith('.json'):
-        df = pd.read_json(file_path)
-    else:
-        raise ValueError("File must be .csv or .json")
-    
+    if not file_path.endswith(('.csv', '.json', '.log')):
+        raise ValueError("File must be .csv, .json or .log")
+    df = _ingest().read_readings(file_path)
+    if 'power' not in df.columns and 'apparent_power' in df.columns:
+        df = df.rename(columns={'apparent_power': 'power'})
+
     # Ensure required columns exist
     if not {'timestamp', 'power'}.issubset(df.columns):
         raise ValueError("Input must contain 'timestamp' and 'power' columns")
-    
-    # Convert timestamp to datetime and sort
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
-    df = df.sort_values('timestamp')
-    
+
+    # Epoch milliseconds back to (UTC) datetimes for the event pipeline, in time order
+    report = df.attrs.get('ingest')
+    df = df.sort_values('timestamp', kind='stable')
+    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms', utc=True)
+
     # Handle missing values
     df = df.dropna(subset=['power'])
-    df['power'] = pd.to_numeric(df['power'])
-    
-    return df[['timestamp', 'power']]
\ No newline at end of file
+
+    columns = ['timestamp', 'power']
+    if 'device_id' in df.columns:
+        columns.append('device_id')
+    df = df[columns]
+    df.attrs['ingest'] = report
+    return df
@@ -0,0 +1,174 @@
+import json
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.knn_model import KNNTrainer
+
+UNKNOWN = "Unknown"
+
+
+def load_appliances(stats_file: str, labels_file: str, include_unlabeled: bool = False) -> Dict[str, List[float]]:
+    """
+    Appliance power levels from the clustering outputs.
+
+    Every labeled cluster is one power level of its appliance (its average
+    |ΔP|, which is the power the appliance draws when on). Several clusters
+    with the same label are alternative levels of one appliance, e.g. the
+    modes of a heater. The noise cluster (-1) is skipped.
+
+    Args:
+        stats_file: cluster_stats.json from run_clustering.py
+        labels_file: cluster_labels.yaml mapping cluster_<id> to an appliance name
+        include_unlabeled: Also use clusters without a label, named cluster_<id>
+
+    Returns:
+        Dictionary mapping appliance names to their power levels (W)
+    """
+    with open(stats_file, 'r') as f:
+        stats = json.load(f)
+    labels = KNNTrainer().load_labels(labels_file)
+
+    appliances: Dict[str, List[float]] = {}
+    for cluster_id, cluster in sorted(stats.items(), key=lambda item: int(item[0])):
+        cluster_id = int(cluster_id)
+        if cluster_id == -1:
+            continue
+        name = labels.get(cluster_id)
+        if name is None:
+            if not include_unlabeled:
+                continue
+            name = f"cluster_{cluster_id}"
+        appliances.setdefault(name, []).append(float(cluster['avg_power_change']))
+    return appliances
+
+
+class CombinationTable:
+    def __init__(self,
+                 appliances: Dict[str, Sequence[float]],
+                 max_power: Optional[float] = None,
+                 max_active: int = 4,
+                 max_combinations: int = 1_000_000):
+        """
+        Precompute every feasible on/off combination of the appliances, sorted by total power.
+
+        Combinations are grown one appliance at a time and pruned as soon as
+        their power exceeds max_power or they have max_active appliances on, so
+        the table never holds the full 2^n product. If more than
+        max_combinations remain, those with the fewest appliances on are kept
+        (a few overlapping loads are far more likely than many).
+
+        Args:
+            appliances: Appliance name -> power levels (W), e.g. from load_appliances()
+            max_power: Largest total power worth decoding (W); None = no limit
+            max_active: Most appliances on at the same time
+            max_combinations: Cap on the table size
+        """
+        if not appliances:
+            raise ValueError("No appliances to combine")
+        self.names = list(appliances)
+        self.levels = [np.asarray(appliances[name], dtype=np.float64) for name in self.names]
+        if any(len(levels) == 0 or len(levels) > 127 for levels in self.levels):
+            raise ValueError("Each appliance needs between 1 and 127 power levels")
+        self.max_power = np.inf if max_power is None else float(max_power)
+        self.max_active = max_active
+        self.max_combinations = max_combinations
+        self.truncated = False
+
+        n = len(self.names)
+        sums = np.zeros(1)
+        active = np.zeros(1, dtype=np.int16)
+        # Level index of each appliance in each combination, -1 when it is off
+        state = np.full((1, n), -1, dtype=np.int8)
+        for a, levels in enumerate(self.levels):
+            parts_sums, parts_active, parts_state = [sums], [active], [state]
+            room = active < max_active
+            for level, power in enumerate(levels):
+                keep = room & (sums + power <= self.max_power)
+                grown = state[keep]
+                grown[:, a] = level
+                parts_sums.append(sums[keep] + power)
+                parts_active.append(active[keep] + 1)
+                parts_state.append(grown)
+            sums = np.concatenate(parts_sums)
+            active = np.concatenate(parts_active)
+            state = np.concatenate(parts_state)
+            if len(sums) > max_combinations:
+                keep = np.lexsort((sums, active))[:max_combinations]
+                sums, active, state = sums[keep], active[keep], state[keep]
+                self.truncated = True
+
+        # Sorted by power; equal sums keep the combination with the fewest appliances first
+        order = np.lexsort((active, sums))
+        self.sums = sums[order]
+        self.active = active[order]
+        self.state = state[order]
+        self._labels: Dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return len(self.sums)
+
+    def decode(self,
+               power: Iterable[float],
+               base_load: float = 0.0,
+               tolerance: float = 30.0) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the combination whose total power is closest to each aggregate reading.
+
+        One binary search per reading over the sorted table, vectorized over
+        the whole series. When several combinations have the same total, the
+        one with the fewest appliances on wins.
+
+        Args:
+            power: Aggregate power readings (W)
+            base_load: Always-on power subtracted from every reading (W)
+            tolerance: Largest |reading - combination| accepted; readings further from every combination decode to -1
+
+        Returns:
+            Tuple of (combination index per reading, -1 when undecodable; residual power in W)
+        """
+        residual = np.asarray(power, dtype=np.float64) - base_load
+        idx = np.searchsorted(self.sums, residual)
+        below = np.clip(idx - 1, 0, len(self.sums) - 1)
+        above = np.clip(idx, 0, len(self.sums) - 1)
+        nearest = np.where(np.abs(self.sums[above] - residual) < np.abs(self.sums[below] - residual), above, below)
+        # First (fewest appliances) of any run of equal sums
+        nearest = np.searchsorted(self.sums, self.sums[nearest], side='left')
+        error = residual - self.sums[nearest]
+        combos = np.where(np.abs(error) <= tolerance, nearest, -1)
+        return combos, error
+
+    def label(self, combo: int) -> str:
+        """Appliances on in a combination, sorted and joined with '+' ('' when all are off)."""
+        if combo < 0:
+            return UNKNOWN
+        if combo not in self._labels:
+            self._labels[combo] = "+".join(sorted(self.names[a] for a in np.flatnonzero(self.state[combo] >= 0)))
+        return self._labels[combo]
+
+    def labels(self, combos: np.ndarray) -> np.ndarray:
+        """Label of every decoded reading (UNKNOWN for -1)."""
+        unique, inverse = np.unique(combos, return_inverse=True)
+        return np.array([self.label(int(c)) for c in unique], dtype=object)[inverse.ravel()]
+
+    def states(self, combos: np.ndarray) -> np.ndarray:
+        """(readings, appliances) on/off matrix; undecodable readings are all off."""
+        combos = np.asarray(combos)
+        on = self.state[np.maximum(combos, 0)] >= 0
+        on[combos < 0] = False
+        return on
+
+    def appliance_power(self, combos: np.ndarray) -> np.ndarray:
+        """(readings, appliances) power drawn by each appliance at each decoded reading (W)."""
+        combos = np.asarray(combos)
+        table = np.zeros((len(self.sums), len(self.names)))
+        for a, levels in enumerate(self.levels):
+            on = self.state[:, a] >= 0
+            table[on, a] = levels[self.state[on, a]]
+        power = table[np.maximum(combos, 0)]
+        power[combos < 0] = 0.0
+        return power
+
+    def ratings(self) -> Dict[str, float]:
+        """Mean power level of each appliance, e.g. for EnergyCalculator."""
+        return {name: float(levels.mean()) for name, levels in zip(self.names, self.levels)}
@@ -1,6 +1,10 @@
 from typing import Dict, List, Tuple
 from datetime import datetime, timedelta
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from src.sketches import StreamSummary
 
 @dataclass
 class DeviceMetrics:
@@ -10,6 +14,42 @@ class DeviceMetrics:
     usage_count: int = 0
     avg_duration: float = 0.0    # in seconds
     avg_energy: float = 0.0      # in watt-hours
+    # Distribution of usage durations (seconds): mean/std/min/max and p50/p95/p99 in constant memory
+    durations: StreamSummary = field(default_factory=StreamSummary)
+
+    def add(self, duration: float, power: float) -> None:
+        """Count one usage of duration seconds at power watts."""
+        self.total_duration += duration
+        self.total_energy += power * duration / 3600  # W x hours = Wh
+        self.usage_count += 1
+        self.durations.update(duration)
+        self._update_averages()
+
+    def add_many(self, durations: np.ndarray, power: float) -> None:
+        """Count a batch of usages (durations in seconds) at power watts."""
+        durations = np.asarray(durations, dtype=np.float64)
+        if len(durations) == 0:
+            return
+        total = float(durations.sum())
+        self.total_duration += total
+        self.total_energy += power * total / 3600
+        self.usage_count += len(durations)
+        self.durations.update_many(durations)
+        self._update_averages()
+
+    def merge(self, other: 'DeviceMetrics') -> 'DeviceMetrics':
+        """Add another meter's, shard's or period's metrics into these (in place); returns self."""
+        self.total_duration += other.total_duration
+        self.total_energy += other.total_energy
+        self.usage_count += other.usage_count
+        self.durations.merge(other.durations)
+        self._update_averages()
+        return self
+
+    def _update_averages(self) -> None:
+        if self.usage_count > 0:
+            self.avg_duration = self.total_duration / self.usage_count
+            self.avg_energy = self.total_energy / self.usage_count
 
 class EnergyCalculator:
     def __init__(self, device_power_ratings: Dict[str, float]):
@@ -20,6 +60,7 @@ class EnergyCalculator:
             device_power_ratings: Dictionary mapping device names to their power ratings
         """
         self.device_power_ratings = device_power_ratings
+        self.totals: Dict[str, DeviceMetrics] = {}
         
     def calculate_metrics(self, 
                          usage_stats: Dict[str, List[Tuple[datetime, datetime, float]]]
@@ -41,23 +82,25 @@ class EnergyCalculator:
                 
             device_metrics = DeviceMetrics()
             power = self.device_power_ratings[device]
-            
-            for start, end, duration in events:
-                # Convert duration from seconds to hours for energy calculation
-                hours = duration / 3600
-                energy = power * hours
-                
-                device_metrics.total_duration += duration
-                device_metrics.total_energy += energy
-                device_metrics.usage_count += 1
-            
-            # Calculate averages
-            if device_metrics.usage_count > 0:
-                device_metrics.avg_duration = (device_metrics.total_duration / 
-                                             device_metrics.usage_count)
-                device_metrics.avg_energy = (device_metrics.total_energy / 
-                                           device_metrics.usage_count)
+            device_metrics.add_many([duration for _, _, duration in events], power)
             
             metrics[device] = device_metrics
             
-        return metrics
\ No newline at end of file
+        return metrics
+
+    def record(self, device: str, start: datetime, end: datetime, duration: float) -> None:
+        """
+        Add one finished usage to the running per-device metrics in self.totals.
+
+        Memory stays constant however long it runs, so it can be passed as
+        StateTracker(on_usage=calculator.record, keep_events=False) instead of
+        calculating metrics from ever-growing usage lists.
+
+        Args:
+            device: Appliance name (usages of devices without a power rating are ignored)
+            start: When the appliance switched on
+            end: When it switched off
+            duration: Usage duration in seconds
+        """
+        if device in self.device_power_ratings:
+            self.totals.setdefault(device, DeviceMetrics()).add(duration, self.device_power_ratings[device])
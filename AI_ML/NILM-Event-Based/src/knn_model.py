@@ -1,4 +1,4 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Sequence, Tuple
 import numpy as np
 from sklearn.neighbors import KNeighborsClassifier
 import yaml
@@ -15,6 +15,9 @@ class KNNTrainer:
         self.model = KNeighborsClassifier(n_neighbors=n_neighbors)
         self.label_map = {}
         self.inverse_label_map = {}
+        self.n_neighbors = n_neighbors
+        self._sorted_values = np.empty(0)
+        self._sorted_labels = np.empty(0, dtype=int)
         
     def load_labels(self, labels_file: str) -> Dict[int, str]:
         """Load label mapping from YAML file."""
@@ -49,6 +52,67 @@ class KNNTrainer:
             
         # Train the model
         self.model.fit(X, y)
+        self._index_neighbors(X, y)
+
+    def fit_levels(self, levels: Sequence[float], labels: Sequence[str]) -> None:
+        """
+        Train directly on steady power levels labeled with appliance names.
+
+        On a meter that sees a single appliance, the change from off to on
+        equals its steady level, so this yields the same 1-D model as train()
+        without clustering and hand-labeling events first.
+
+        Args:
+            levels: Steady power levels (W)
+            labels: Appliance name for each level
+        """
+        names = sorted(set(labels))
+        self.label_map = dict(enumerate(names))
+        self.inverse_label_map = {v: k for k, v in self.label_map.items()}
+        y = [self.inverse_label_map[label] for label in labels]
+        X = np.abs(np.asarray(levels, dtype=float)).reshape(-1, 1)
+        self.model.fit(X, y)
+        self._index_neighbors(X, y)
+
+    def _index_neighbors(self, X: Any, y: Sequence[int]) -> None:
+        """Keep the 1-D training values sorted so neighbor_votes() can use a binary search."""
+        values = np.asarray(X, dtype=float).ravel()
+        order = np.argsort(values, kind='stable')
+        self._sorted_values = values[order]
+        self._sorted_labels = np.asarray(y)[order]
+
+    def neighbor_votes(self, values: Sequence[float]) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """
+        Predict appliances along with how sure the neighbor vote is.
+
+        Args:
+            values: Power changes (or levels); signs are ignored
+
+        Returns:
+            Tuple of (appliance names, share of the k neighbors voting for
+            the winner, distance to the farthest of the k neighbors)
+        """
+        if not self.label_map:
+            raise ValueError("Model not trained. Call train() first")
+
+        # In 1-D the k nearest neighbors sit within k positions of the insertion point
+        query = np.abs(np.asarray(values, dtype=float)).ravel()
+        k = min(self.n_neighbors, len(self._sorted_values))
+        pos = np.searchsorted(self._sorted_values, query)
+        candidates = pos[:, None] + np.arange(-k, k)
+        in_range = (candidates >= 0) & (candidates < len(self._sorted_values))
+        candidates = np.clip(candidates, 0, len(self._sorted_values) - 1)
+        candidate_distances = np.where(in_range, np.abs(self._sorted_values[candidates] - query[:, None]), np.inf)
+        nearest = np.argsort(candidate_distances, axis=1, kind='stable')[:, :k]
+        distances = np.take_along_axis(candidate_distances, nearest, axis=1)
+        neighbor_labels = self._sorted_labels[np.take_along_axis(candidates, nearest, axis=1)]
+
+        # Majority label; ties go to the label of the nearer neighbor
+        votes = (neighbor_labels[:, :, None] == neighbor_labels[:, None, :]).sum(axis=2)
+        winners = neighbor_labels[np.arange(len(query)), votes.argmax(axis=1)]
+        shares = votes.max(axis=1) / k
+        names = [self.label_map.get(cluster_id, "Unknown") for cluster_id in winners.tolist()]
+        return names, shares, distances.max(axis=1)
         
     def predict(self, delta_p: float) -> str:
         """
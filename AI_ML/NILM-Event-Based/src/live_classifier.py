@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Optional, Tuple
 from .knn_model import KNNTrainer
 
 class LiveClassifier:
@@ -25,4 +25,22 @@ class LiveClassifier:
             return self.knn.predict(delta_p)
         except Exception as e:
             print(f"Classification error: {e}")
-            return "Unknown"
\ No newline at end of file
+            return "Unknown"
+
+    def classify_with_confidence(self, delta_p: float) -> Tuple[str, float, float]:
+        """
+        Classify a power change and report how decisive the neighbor vote was.
+
+        Args:
+            delta_p: The power change value (can be positive or negative)
+
+        Returns:
+            Tuple of (device name, neighbor vote share, farthest neighbor distance);
+            ("Unknown", 0.0, inf) if classification fails
+        """
+        try:
+            names, shares, distances = self.knn.neighbor_votes([delta_p])
+            return names[0], float(shares[0]), float(distances[0])
+        except Exception as e:
+            print(f"Classification error: {e}")
+            return "Unknown", 0.0, float('inf')
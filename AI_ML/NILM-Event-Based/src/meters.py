@@ -0,0 +1,151 @@
+import os
+from urllib.parse import quote
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.clustering import cluster_events, cluster_summaries, summarize_clusters
+from src.sketches import StreamSummary
+
+
+def detect_events_by_meter(df: pd.DataFrame, threshold: float) -> pd.DataFrame:
+    """
+    Compute power deltas and detect events for every meter in one vectorized pass.
+
+    Readings are ordered by (device_id, timestamp) and differenced as one array;
+    the first reading of each meter gets ΔP = 0, as in compute_delta_power, so
+    deltas never span two meters.
+
+    Args:
+        df: DataFrame with device_id, timestamp and power columns (from load_power_data)
+        threshold: Minimum absolute power change to consider as an event (in watts)
+
+    Returns:
+        DataFrame of events with columns device_id, timestamp, delta_p, abs_delta_p, sign
+    """
+    if 'device_id' not in df.columns:
+        raise ValueError("Input must contain a 'device_id' column to run per meter")
+
+    df = df.sort_values(['device_id', 'timestamp'], kind='stable')
+    codes, meters = pd.factorize(df['device_id'], sort=True)
+    power = df['power'].to_numpy(dtype=np.float64)
+
+    delta_p = np.zeros(len(power))
+    delta_p[1:] = np.diff(power)
+    delta_p[1:][codes[1:] != codes[:-1]] = 0.0
+
+    hit = np.abs(delta_p) > threshold
+    return pd.DataFrame({
+        'device_id': pd.Categorical.from_codes(codes[hit], categories=meters.astype(str)),
+        'timestamp': df['timestamp'].to_numpy()[hit],
+        'delta_p': delta_p[hit],
+        'abs_delta_p': np.abs(delta_p[hit]),
+        'sign': np.where(delta_p[hit] > 0, 1, -1),
+    })
+
+
+def _cluster_batch(values: List[np.ndarray], eps: float, min_samples: int) -> List[List[int]]:
+    return [cluster_events([{'abs_delta_p': v} for v in meter], eps, min_samples) for meter in values]
+
+
+def cluster_events_by_meter(events: pd.DataFrame,
+                            eps: float = 30.0,
+                            min_samples: int = 3,
+                            n_jobs: Optional[int] = None) -> np.ndarray:
+    """
+    Cluster each meter's events separately, spreading meters over worker processes.
+
+    Args:
+        events: Event DataFrame from detect_events_by_meter()
+        eps: DBSCAN eps parameter
+        min_samples: DBSCAN min_samples parameter
+        n_jobs: Worker processes (None = all cores, 1 = run in this process)
+
+    Returns:
+        Cluster labels aligned with the rows of events (-1 for noise); ids are per meter
+    """
+    labels = np.full(len(events), -1, dtype=np.int64)
+    if events.empty:
+        return labels
+
+    groups = events.groupby('device_id', observed=True, sort=False).indices
+    rows = list(groups.values())
+    values = [events['abs_delta_p'].to_numpy()[idx] for idx in rows]
+
+    n_jobs = n_jobs or os.cpu_count() or 1
+    if n_jobs == 1 or len(rows) == 1:
+        results = _cluster_batch(values, eps, min_samples)
+    else:
+        # Several meters per task so small meters do not pay one round trip each
+        batches = np.array_split(np.arange(len(rows)), min(len(rows), n_jobs * 4))
+        with ProcessPoolExecutor(n_jobs) as pool:
+            futures = [pool.submit(_cluster_batch, [values[i] for i in b], eps, min_samples) for b in batches]
+            results = [r for f in futures for r in f.result()]
+
+    for idx, meter_labels in zip(rows, results):
+        labels[idx] = meter_labels
+    return labels
+
+
+def cluster_summaries_by_meter(events: pd.DataFrame) -> Dict[str, Dict[str, StreamSummary]]:
+    """
+    Streaming |ΔP| summaries of every cluster, per meter.
+
+    Args:
+        events: Event DataFrame with a cluster_id column
+
+    Returns:
+        Dictionary mapping device_id to {cluster_id: StreamSummary}
+    """
+    return {
+        str(device_id): cluster_summaries(group['cluster_id'].to_numpy(), group['abs_delta_p'].to_numpy())
+        for device_id, group in events.groupby('device_id', observed=True)
+    }
+
+
+def cluster_stats_by_meter(events: pd.DataFrame) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """
+    Summarize clusters per meter in the cluster_stats.json format.
+
+    Args:
+        events: Event DataFrame with a cluster_id column
+
+    Returns:
+        Dictionary mapping device_id to {cluster_id: count/avg/min/max/std/percentile power change}
+    """
+    return {device_id: summarize_clusters(summaries) for device_id, summaries in cluster_summaries_by_meter(events).items()}
+
+
+def event_tables_by_meter(events: pd.DataFrame) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Split events into per-meter event tables in the create_event_table() format.
+
+    Args:
+        events: Event DataFrame with a cluster_id column
+
+    Returns:
+        Dictionary mapping device_id to a list of event dictionaries
+    """
+    columns = ['timestamp', 'abs_delta_p', 'sign', 'cluster_id']
+    return {
+        str(device_id): group[columns].to_dict('records')
+        for device_id, group in events.groupby('device_id', observed=True)
+    }
+
+
+def meter_dirname(device_id: str) -> str:
+    """
+    A directory name for a meter that cannot leave the output directory.
+
+    The id is percent-encoded, so '/', '\\' and '%' never appear raw and
+    distinct ids keep distinct names; ordinary ids are unchanged. An id made
+    only of dots ('.', '..') has its dots encoded too. An empty id is rejected.
+    """
+    name = quote(str(device_id), safe='')
+    if not name:
+        raise ValueError("Empty device_id cannot name a meter directory")
+    if name.strip('.') == '':
+        name = name.replace('.', '%2E')
+    return name
@@ -0,0 +1,116 @@
+import cProfile
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+
+class StageProfiler:
+    def __init__(self, enabled: bool = False, cprofile_dir: Optional[str] = None):
+        """
+        Record wall time, CPU time, peak traced memory and row counts per pipeline stage.
+
+        Args:
+            enabled: When False, stage() only yields a scratch record and measures nothing
+            cprofile_dir: If set, dump a cProfile .prof file per stage into this directory
+        """
+        self.enabled = enabled
+        self.cprofile_dir = Path(cprofile_dir) if cprofile_dir else None
+        self.stages: List[Dict[str, Any]] = []
+        self._records: Dict[str, Dict[str, Any]] = {}
+        self._profiles: Dict[str, cProfile.Profile] = {}
+        self._running: List[Dict[str, Any]] = []
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[Dict[str, Any]]:
+        """
+        Profile the enclosed block as one stage.
+
+        The yielded dict is this call's record; set record['rows'] to the
+        number of rows it produced. Calls of the same stage accumulate into one
+        entry of self.stages (calls, rows, wall and CPU time summed, the largest
+        peak) and one .prof file. A stage entered inside another is its child:
+        the parent's times and peak include it, its function calls are only in
+        its own profile.
+        """
+        call: Dict[str, Any] = {'stage': name, 'rows': None}
+        if not self.enabled:
+            yield call
+            return
+
+        record = self._records.get(name)
+        if record is None:
+            record = {'stage': name, 'depth': len(self._running), 'calls': 0, 'rows': None,
+                      'wall_s': 0.0, 'cpu_s': 0.0, 'peak_mem_bytes': 0}
+            self._records[name] = record
+            self.stages.append(record)
+
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        parent = self._running[-1] if self._running else None
+        if parent is not None:
+            # Keep the parent's peak so far; the reset below starts this stage's
+            parent['peak'] = max(parent['peak'], tracemalloc.get_traced_memory()[1])
+            if parent['profiler']:
+                parent['profiler'].disable()
+        tracemalloc.reset_peak()
+        # One profiler per stage name, so repeated calls add up in one profile
+        profiler = self._profiles.setdefault(name, cProfile.Profile()) if self.cprofile_dir else None
+        running = {'peak': 0, 'profiler': profiler}
+        self._running.append(running)
+
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        if profiler:
+            profiler.enable()
+        try:
+            yield call
+        finally:
+            if profiler:
+                profiler.disable()
+            record['calls'] += 1
+            record['wall_s'] += time.perf_counter() - wall_start
+            record['cpu_s'] += time.process_time() - cpu_start
+            peak = max(running['peak'], tracemalloc.get_traced_memory()[1])
+            record['peak_mem_bytes'] = max(record['peak_mem_bytes'], peak)
+            if call['rows'] is not None:
+                record['rows'] = (record['rows'] or 0) + call['rows']
+            self._running.pop()
+            if started_tracing:
+                tracemalloc.stop()
+            if profiler:
+                self.cprofile_dir.mkdir(parents=True, exist_ok=True)
+                dump_path = self.cprofile_dir / f"{self.stages.index(record) + 1:02d}_{name}.prof"
+                profiler.dump_stats(str(dump_path))
+                record['cprofile'] = str(dump_path)
+            if parent is not None and parent['profiler']:
+                parent['profiler'].enable()
+
+    def summary(self) -> str:
+        """Format recorded stages as a text table, children indented under their parent stage."""
+        top_level = [s for s in self.stages if s['depth'] == 0]
+        total_wall = sum(s['wall_s'] for s in top_level) or 1.0
+        lines = [
+            f"{'Stage':<12} {'Calls':>6} {'Rows':>10} {'Wall s':>10} {'CPU s':>10} {'Peak MiB':>10} {'% wall':>8}",
+            '-' * 72,
+        ]
+        for s in self.stages:
+            rows = s['rows'] if s['rows'] is not None else '-'
+            lines.append(
+                f"{'  ' * s['depth'] + s['stage']:<12} {s['calls']:>6} {rows:>10} {s['wall_s']:>10.4f} "
+                f"{s['cpu_s']:>10.4f} {s['peak_mem_bytes'] / 2**20:>10.2f} {100 * s['wall_s'] / total_wall:>7.1f}%"
+            )
+        lines.append('-' * 72)
+        lines.append(
+            f"{'total':<12} {'':>6} {'':>10} {sum(s['wall_s'] for s in top_level):>10.4f} "
+            f"{sum(s['cpu_s'] for s in top_level):>10.4f}"
+        )
+        return "\n".join(lines)
+
+    def save(self, output_file: str) -> None:
+        """Write recorded stages as JSON."""
+        with open(output_file, 'w') as f:
+            json.dump({'stages': self.stages}, f, indent=2)
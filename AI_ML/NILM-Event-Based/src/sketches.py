@@ -0,0 +1,269 @@
+import json
+import math
+from typing import Any, Dict, Iterable, Optional
+
+import numpy as np
+
+PERCENTILES = (50, 95, 99)
+
+
+class QuantileSketch:
+    def __init__(self, relative_accuracy: float = 0.01, max_bins: int = 2048):
+        """
+        Mergeable quantile sketch with logarithmic buckets (DDSketch).
+
+        A value x > 0 is counted in bucket ceil(log_gamma(x)) with
+        gamma = (1 + a) / (1 - a), so every quantile is returned within a
+        relative error a of the true value. Memory is bounded by max_bins per
+        sign: when a store grows past it, its smallest-magnitude buckets are
+        folded together, which only costs accuracy at the low end. Two sketches
+        with the same relative_accuracy merge exactly by adding bucket counts.
+
+        Args:
+            relative_accuracy: Relative error bound a of the quantiles (0 < a < 1)
+            max_bins: Most buckets kept for positive and for negative values
+        """
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.positive: Dict[int, int] = {}
+        self.negative: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def _index(self, magnitude: float) -> int:
+        return math.ceil(math.log(magnitude) / self._log_gamma)
+
+    def _value(self, index: int) -> float:
+        # Midpoint (in relative terms) of the bucket (gamma^(i-1), gamma^i]
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def _collapse(self, store: Dict[int, int]) -> None:
+        if len(store) <= self.max_bins:
+            return
+        indexes = sorted(store)
+        cut = indexes[-self.max_bins]
+        store[cut] += sum(store.pop(i) for i in indexes[:-self.max_bins])
+
+    def update(self, value: float) -> None:
+        """Add one value."""
+        if not math.isfinite(value):
+            raise ValueError("Cannot add NaN or infinite values to a sketch")
+        self.count += 1
+        if value == 0:
+            self.zero_count += 1
+            return
+        store = self.positive if value > 0 else self.negative
+        index = self._index(abs(value))
+        store[index] = store.get(index, 0) + 1
+        self._collapse(store)
+
+    def update_many(self, values: Iterable[float]) -> None:
+        """Add a batch of values, bucketing them in one vectorized pass."""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if not np.isfinite(values).all():
+            raise ValueError("Cannot add NaN or infinite values to a sketch")
+        self.count += len(values)
+        self.zero_count += int((values == 0).sum())
+        for store, magnitudes in ((self.positive, values[values > 0]), (self.negative, -values[values < 0])):
+            if len(magnitudes) == 0:
+                continue
+            indexes, counts = np.unique(np.ceil(np.log(magnitudes) / self._log_gamma).astype(np.int64),
+                                        return_counts=True)
+            for index, n in zip(indexes.tolist(), counts.tolist()):
+                store[index] = store.get(index, 0) + n
+            self._collapse(store)
+
+    def merge(self, other: 'QuantileSketch') -> 'QuantileSketch':
+        """Add another sketch's values into this one (in place); returns self."""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Only sketches with the same relative_accuracy can be merged")
+        for store, other_store in ((self.positive, other.positive), (self.negative, other.negative)):
+            for index, n in other_store.items():
+                store[index] = store.get(index, 0) + n
+            self._collapse(store)
+        self.zero_count += other.zero_count
+        self.count += other.count
+        return self
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Value at quantile q (0 <= q <= 1), or None for an empty sketch."""
+        if not 0 <= q <= 1:
+            raise ValueError("q must be between 0 and 1")
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        # Most negative first: larger negative indexes are larger magnitudes
+        for index in sorted(self.negative, reverse=True):
+            seen += self.negative[index]
+            if seen > rank:
+                return -self._value(index)
+        seen += self.zero_count
+        if seen > rank:
+            return 0.0
+        for index in sorted(self.positive):
+            seen += self.positive[index]
+            if seen > rank:
+                return self._value(index)
+        return self._value(max(self.positive)) if self.positive else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serializable state; each store is an offset and dense bucket counts."""
+        def dense(store: Dict[int, int]) -> Dict[str, Any]:
+            if not store:
+                return {'offset': 0, 'counts': []}
+            low, high = min(store), max(store)
+            return {'offset': low, 'counts': [store.get(i, 0) for i in range(low, high + 1)]}
+
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'max_bins': self.max_bins,
+            'zero_count': self.zero_count,
+            'positive': dense(self.positive),
+            'negative': dense(self.negative),
+        }
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> 'QuantileSketch':
+        sketch = cls(state['relative_accuracy'], state['max_bins'])
+        for store, dense in ((sketch.positive, state['positive']), (sketch.negative, state['negative'])):
+            store.update({dense['offset'] + i: n for i, n in enumerate(dense['counts']) if n})
+        sketch.zero_count = state['zero_count']
+        sketch.count = sketch.zero_count + sum(sketch.positive.values()) + sum(sketch.negative.values())
+        return sketch
+
+
+class StreamSummary:
+    def __init__(self, relative_accuracy: float = 0.01):
+        """
+        Constant-memory summary of a stream of values: count, mean and variance
+        (Welford), min, max and a QuantileSketch.
+
+        Summaries of shards or time partitions merge into the summary of the
+        whole stream (Chan et al. for the moments), so parallel workers can each
+        summarize their part and a long-running job never keeps the values.
+
+        Args:
+            relative_accuracy: Relative error bound of the quantiles
+        """
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0  # Sum of squared deviations from the mean
+        self.min = math.inf
+        self.max = -math.inf
+        self.quantiles = QuantileSketch(relative_accuracy)
+
+    def update(self, value: float) -> None:
+        """Add one value."""
+        value = float(value)
+        self.quantiles.update(value)
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def update_many(self, values: Iterable[float]) -> None:
+        """Add a batch of values: their moments are computed with numpy and merged in."""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if len(values) == 0:
+            return
+        self.quantiles.update_many(values)
+        mean = float(values.mean())
+        self._merge_moments(len(values), mean, float(((values - mean) ** 2).sum()),
+                            float(values.min()), float(values.max()))
+
+    def _merge_moments(self, count: int, mean: float, m2: float, low: float, high: float) -> None:
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+        self.min = min(self.min, low)
+        self.max = max(self.max, high)
+
+    def merge(self, other: 'StreamSummary') -> 'StreamSummary':
+        """Add another summary into this one (in place); returns self."""
+        if other.count:
+            self.quantiles.merge(other.quantiles)
+            self._merge_moments(other.count, other.mean, other.m2, other.min, other.max)
+        return self
+
+    @property
+    def variance(self) -> float:
+        """Population variance (0 for fewer than two values)."""
+        return self.m2 / self.count if self.count > 1 else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Estimated p-th percentile, clamped to the exact min and max."""
+        value = self.quantiles.quantile(p / 100)
+        return None if value is None else min(max(value, self.min), self.max)
+
+    def summary(self) -> Dict[str, Any]:
+        """count, mean, std, min, max and p50/p95/p99 (None when empty)."""
+        empty = self.count == 0
+        stats = {
+            'count': self.count,
+            'mean': None if empty else self.mean,
+            'std': None if empty else self.std,
+            'min': None if empty else self.min,
+            'max': None if empty else self.max,
+        }
+        stats.update({f'p{p}': self.percentile(p) for p in PERCENTILES})
+        return stats
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serializable state (from_dict restores it exactly)."""
+        empty = self.count == 0
+        return {
+            'count': self.count,
+            'mean': self.mean,
+            'm2': self.m2,
+            'min': None if empty else self.min,
+            'max': None if empty else self.max,
+            'quantiles': self.quantiles.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> 'StreamSummary':
+        summary = cls()
+        summary.quantiles = QuantileSketch.from_dict(state['quantiles'])
+        if state['count']:
+            summary.count = state['count']
+            summary.mean = state['mean']
+            summary.m2 = state['m2']
+            summary.min = state['min']
+            summary.max = state['max']
+        return summary
+
+
+def merge_summaries(groups: Iterable[Dict[str, StreamSummary]]) -> Dict[str, StreamSummary]:
+    """
+    Merge several {key: StreamSummary} maps, e.g. from shards or days, key by key.
+
+    The inputs are left unchanged.
+    """
+    merged: Dict[str, StreamSummary] = {}
+    for group in groups:
+        for key, summary in group.items():
+            merged.setdefault(key, StreamSummary(summary.quantiles.relative_accuracy)).merge(summary)
+    return merged
+
+
+def save_summaries(summaries: Dict[str, StreamSummary], path: str) -> None:
+    with open(path, 'w') as f:
+        json.dump({str(key): summary.to_dict() for key, summary in summaries.items()}, f)
+
+
+def load_summaries(path: str) -> Dict[str, StreamSummary]:
+    with open(path, 'r') as f:
+        return {key: StreamSummary.from_dict(state) for key, state in json.load(f).items()}
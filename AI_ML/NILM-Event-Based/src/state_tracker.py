@@ -1,4 +1,4 @@
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 from datetime import datetime
 
 class ApplianceState:
@@ -9,8 +9,21 @@ class ApplianceState:
         self.usage_events: List[Tuple[datetime, datetime, float]] = [] # (start, end, duration_seconds)
 
 class StateTracker:
-    def __init__(self):
+    def __init__(self,
+                 on_usage: Optional[Callable[[str, datetime, datetime, float], None]] = None,
+                 keep_events: bool = True):
+        """
+        Track which appliances are on and the usages they complete.
+
+        Args:
+            on_usage: Called with (name, start, end, duration_seconds) as each usage ends,
+                e.g. EnergyCalculator.record
+            keep_events: Keep every usage for get_usage_stats(); turn off for long-running
+                trackers that only feed on_usage, so memory does not grow with time
+        """
         self.appliances: Dict[str, ApplianceState] = {}
+        self.on_usage = on_usage
+        self.keep_events = keep_events
         
     def update_state(self, device_name: str, delta_p: float, timestamp: datetime) -> None:
         """
@@ -34,9 +47,30 @@ class StateTracker:
             state.is_on = False
             if state.last_on_time:
                 duration = (timestamp - state.last_on_time).total_seconds()
-                state.usage_events.append((state.last_on_time, timestamp, duration))
+                if self.keep_events:
+                    state.usage_events.append((state.last_on_time, timestamp, duration))
+                if self.on_usage:
+                    self.on_usage(device_name, state.last_on_time, timestamp, duration)
                 state.last_on_time = None
                 
+    def update_combination(self, active: Iterable[str], timestamp: datetime) -> None:
+        """
+        Update every appliance from the set running together, e.g. a decoded combination.
+
+        Appliances in active that are off are switched on; tracked appliances
+        that are on but not in active are switched off.
+
+        Args:
+            active: Names of the appliances that are on
+            timestamp: When the combination was observed
+        """
+        active = set(active)
+        for name in active:
+            self.update_state(name, 1.0, timestamp)
+        for name, state in list(self.appliances.items()):
+            if state.is_on and name not in active:
+                self.update_state(name, -1.0, timestamp)
+
     def get_usage_stats(self) -> Dict[str, List[Tuple[datetime, datetime, float]]]:
         """
         Get usage statistics for all appliances.
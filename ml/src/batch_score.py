@@ -0,0 +1,202 @@
+"""
+Out-of-core batch scoring for historical exports.
+
+Streams an energy_data CSV export or a binary reading log in chunks and
+labels every reading with the model's prediction for the window of readings
+before it on the same meter (device_id), matching EnergyDataset where window
+X[i:i+w] predicts reading i+w. The last window_size readings of each meter are
+carried into the next chunk, so results do not depend on the chunk size.
+
+Chunks are scored on a process pool (one Predictor per worker, single-threaded
+torch) with a bounded number of chunks in flight, and written as one Parquet
+row group per chunk. Memory stays at roughly (workers + 2) chunks regardless
+of the input size.
+
+Usage:
+    python src/batch_score.py data/readings.log -o predictions.parquet --workers 4
+"""
+import argparse
+import os
+import resource
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import ingest
+from inference import FEATURES, WINDOW_SIZE
+from reading_log import ReadingLog, is_reading_log
+
+_worker_predictor = None
+
+
+def _init_worker(arch, compiled, threads):
+    global _worker_predictor
+    import torch
+    from inference import load_predictor
+
+    torch.set_num_threads(threads)
+    _worker_predictor = load_predictor(arch=arch, compiled=compiled)
+
+
+def _classes():
+    """The worker predictor's class list, which names the probability columns."""
+    return list(_worker_predictor.classes)
+
+
+def _score(windows, batch_size):
+    """Class probabilities (float32) for a chunk's windows, in batches."""
+    probs = [
+        _worker_predictor.predict_many(windows[i:i + batch_size])[2]
+        for i in range(0, len(windows), batch_size)
+    ]
+    if not probs:
+        return np.empty((0, len(_worker_predictor.classes)), dtype=np.float32)
+    return np.concatenate(probs).astype(np.float32)
+
+
+def read_chunks(path, chunk_rows):
+    """Yield DataFrames of device_id, timestamp and features from a CSV or reading log."""
+    if is_reading_log(path):
+        records = ReadingLog(path).records()
+        for start in range(0, len(records), chunk_rows):
+            yield ingest.read_log(path, records[start:start + chunk_rows])
+    else:
+        yield from ingest.read_csv(path, chunksize=chunk_rows)
+
+
+class WindowBuilder:
+    """Per-meter sliding windows that continue across chunk boundaries."""
+
+    def __init__(self, window_size=WINDOW_SIZE):
+        self.window_size = window_size
+        self.tails = {}
+
+    def build(self, device_ids, X):
+        """
+        Windows for every reading of the chunk that has window_size earlier readings on its meter.
+
+        Returns (windows, rows): windows[k] scores chunk row rows[k].
+        """
+        w = self.window_size
+        codes, devices = pd.factorize(device_ids)
+        order = np.argsort(codes, kind="stable")
+        bounds = np.cumsum(np.bincount(codes, minlength=len(devices)))[:-1]
+
+        windows, rows = [], []
+        for device, idx in zip(devices, np.split(order, bounds)):
+            tail = self.tails.get(device, np.empty((0, X.shape[1]), dtype=X.dtype))
+            series = np.concatenate([tail, X[idx]])
+            # Reading at series position p is scored by series[p-w:p]
+            first = max(w, len(tail))
+            if len(series) > first:
+                view = np.lib.stride_tricks.sliding_window_view(series, w, axis=0).transpose(0, 2, 1)
+                windows.append(view[first - w:len(series) - w])
+                rows.append(idx[first - len(tail):])
+            self.tails[device] = series[-w:]
+
+        if not windows:
+            return np.empty((0, w, X.shape[1]), dtype=X.dtype), np.empty(0, dtype=np.int64)
+        return np.concatenate(windows), np.concatenate(rows)
+
+
+def _table(chunk, rows, probs, classes, offset):
+    import pyarrow as pa
+
+    n = len(chunk)
+    full = np.zeros((n, len(classes)), dtype=np.float32)
+    full[rows] = probs
+    has_prediction = np.zeros(n, dtype=bool)
+    has_prediction[rows] = True
+    predicted = full.argmax(axis=1).astype(np.int32)
+
+    columns = {
+        "row": pa.array(np.arange(offset, offset + n, dtype=np.int64)),
+        "device_id": pa.array(chunk["device_id"].astype(str).to_numpy()).dictionary_encode(),
+        "timestamp": pa.array(chunk["timestamp"].to_numpy(), type=pa.timestamp("ms", tz="UTC")),
+        "predicted": pa.DictionaryArray.from_arrays(
+            pa.array(predicted, mask=~has_prediction), pa.array([str(c) for c in classes])
+        ),
+        "confidence": pa.array(full.max(axis=1), mask=~has_prediction),
+    }
+    for i, name in enumerate(classes):
+        columns[f"prob_{name}"] = pa.array(full[:, i], mask=~has_prediction)
+    return pa.table(columns)
+
+
+def score(path, output, workers=None, chunk_rows=100_000, batch_size=4096,
+          arch=None, compiled=None, threads=1, window_size=WINDOW_SIZE):
+    """Score every reading of ``path`` and write predictions to the Parquet file ``output``."""
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise SystemExit("Batch scoring writes Parquet and needs pyarrow (pip install pyarrow)") from e
+
+    arch = arch or os.environ.get("MODEL_ARCH", "lstm")
+    compiled = compiled if compiled is not None else os.environ.get("MODEL_COMPILED", "0") == "1"
+    workers = workers or os.cpu_count() or 1
+
+    builder = WindowBuilder(window_size)
+    pool = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(arch, compiled, threads))
+    pending = deque()
+    writer = None
+    stats = {"rows": 0, "windows": 0, "chunks": 0}
+    start = time.perf_counter()
+
+    def drain(limit):
+        nonlocal writer
+        while len(pending) > limit:
+            chunk, rows, offset, future = pending.popleft()
+            table = _table(chunk, rows, future.result(), classes, offset)
+            if writer is None:
+                writer = pq.ParquetWriter(output, table.schema)
+            writer.write_table(table)
+
+    try:
+        # From the loaded model: the rolling classifier keeps its own classes, not label_encoder.pkl's
+        classes = pool.submit(_classes).result()
+        offset = 0
+        for chunk in read_chunks(path, chunk_rows):
+            chunk = chunk.reset_index(drop=True)
+            X = chunk[FEATURES].to_numpy(dtype=np.float32)
+            windows, rows = builder.build(chunk["device_id"].astype(str).to_numpy(), X)
+            # Copy the strided view so only this chunk's windows are pickled to the worker
+            future = pool.submit(_score, np.ascontiguousarray(windows), batch_size)
+            pending.append((chunk, rows, offset, future))
+            stats["rows"] += len(chunk)
+            stats["windows"] += len(rows)
+            stats["chunks"] += 1
+            offset += len(chunk)
+            drain(workers)
+        drain(0)
+    finally:
+        pool.shutdown(cancel_futures=True)
+        if writer is not None:
+            writer.close()
+
+    stats["seconds"] = time.perf_counter() - start
+    stats["rows_per_s"] = stats["rows"] / stats["seconds"] if stats["seconds"] else 0.0
+    stats["peak_rss_mib"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Label a CSV export or reading log with device predictions")
+    parser.add_argument("source", help="energy_data CSV export or binary reading log (.log)")
+    parser.add_argument("-o", "--output", required=True, help="Parquet file to write")
+    parser.add_argument("--workers", type=int, default=None, help="Scoring processes (default: CPU count)")
+    parser.add_argument("--chunk-rows", type=int, default=100_000, help="Readings read per chunk")
+    parser.add_argument("--batch-size", type=int, default=4096, help="Windows per forward pass")
+    parser.add_argument("--threads", type=int, default=1, help="torch threads per worker")
+    parser.add_argument("--arch", default=None, help="lstm, tcn, gru or rolling (default: MODEL_ARCH or lstm)")
+    parser.add_argument("--compiled", action="store_true", help="Use the TorchScript artifact")
+    args = parser.parse_args()
+
+    stats = score(args.source, args.output, args.workers, args.chunk_rows, args.batch_size,
+                  args.arch, args.compiled or None, args.threads)
+    print(f"✅ Scored {stats['windows']}/{stats['rows']} readings in {stats['chunks']} chunks "
+          f"-> {args.output}")
+    print(f"   {stats['seconds']:.2f}s | {stats['rows_per_s']:.0f} readings/s | "
+          f"peak RSS {stats['peak_rss_mib']:.0f} MiB (main process)")
@@ -0,0 +1,240 @@
+"""
+Confidence-gated cascade: the NILM 1-D KNN answers first, the LSTM only when it is unsure.
+
+A window goes to the cheap tier's KNN (AI_ML/NILM-Event-Based) on its median
+apparent power. The KNN's answer is kept when the window is steady, the
+neighbour vote is (near) unanimous and the farthest neighbour is within
+max_distance watts; otherwise the shared LSTM predictor classifies it. A
+sampled fraction of KNN answers can be audited against the LSTM to measure
+how well the two agree.
+
+Usage:
+    CASCADE=1 python src/predict_live.py
+    python src/cascade.py evaluate --max-distance 15
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+import metrics
+from inference import FEATURES, WINDOW_SIZE, get_predictor, sliding_windows
+
+# The 1-D KNN lives in the NILM pipeline; its modules import each other as src.*
+NILM_DIR = Path(__file__).resolve().parents[2] / "AI_ML" / "NILM-Event-Based"
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+data_path = os.path.join(project_root, "data", "spectrawatt.energy_data.csv")
+
+POWER = FEATURES.index("apparent_power")
+
+
+def _nilm_classifier():
+    if str(NILM_DIR) not in sys.path:
+        sys.path.append(str(NILM_DIR))
+    from src.knn_model import KNNTrainer
+    from src.live_classifier import LiveClassifier
+    return KNNTrainer, LiveClassifier
+
+
+def build_classifier(data=data_path, window_size=WINDOW_SIZE, n_neighbors=3):
+    """
+    Train the cheap tier.
+
+    The KNN is fitted on the rolling-median apparent power of the training
+    readings (the quantity predict_many queries it with), labelled with the
+    same device names the LSTM predicts. The NILM pipeline's own KNN is not
+    usable here: it is trained on ΔP step sizes and answers in cluster names.
+    """
+    from utils import load_training_frame
+
+    KNNTrainer, LiveClassifier = _nilm_classifier()
+    trainer = KNNTrainer(n_neighbors=n_neighbors)
+    df = load_training_frame(data)
+    levels = df.groupby("device_id", observed=True)["apparent_power"].transform(
+        lambda s: s.rolling(window_size).median()
+    )
+    mask = levels.notna().to_numpy()
+    trainer.fit_levels(levels.to_numpy()[mask], df["device_id"].astype(str).to_numpy()[mask])
+    return LiveClassifier(trainer)
+
+
+class CascadePredictor:
+    def __init__(self, classifier, predictor=None, min_votes=1.0, max_distance=15.0,
+                 max_spread=0.1, audit_rate=0.0, seed=0):
+        """
+        Args:
+            classifier: NILM LiveClassifier with a trained KNN
+            predictor: inference.Predictor; loaded lazily the first time the LSTM is needed
+            min_votes: Share of the k neighbours that must agree (1.0 = unanimous)
+            max_distance: Farthest allowed neighbour, in watts of apparent power
+            max_spread: Largest allowed std/median of the window's apparent power
+            audit_rate: Fraction of KNN answers also run through the LSTM to measure agreement
+        """
+        self.classifier = classifier
+        self._predictor = predictor
+        self.min_votes = min_votes
+        self.max_distance = max_distance
+        self.max_spread = max_spread
+        self.audit_rate = audit_rate
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+        self.counts = dict.fromkeys(
+            ("windows", "knn", "lstm", "unsteady", "far", "split", "audited", "audit_agree", "fallback_agree"), 0
+        )
+
+    @property
+    def predictor(self):
+        if self._predictor is None:
+            self._predictor = get_predictor()
+        return self._predictor
+
+    def predict_many(self, windows):
+        """
+        Classify raw (n, window, 4) windows.
+
+        Returns (labels, confidences, tiers); confidence is the neighbour vote
+        share for KNN answers and the softmax probability for LSTM answers.
+        """
+        windows = np.asarray(windows, dtype=np.float64)
+        power = windows[:, :, POWER]
+        level = np.median(power, axis=1)
+        spread = power.std(axis=1) / np.maximum(level, 1.0)
+
+        with metrics.timed("knn"):
+            names, shares, distances = self.classifier.knn.neighbor_votes(level)
+        labels = np.array(names, dtype=object)
+        confidences = shares.astype(np.float64)
+
+        steady = spread <= self.max_spread
+        near = distances <= self.max_distance
+        decisive = shares >= self.min_votes
+        confident = steady & near & decisive & (labels != "Unknown")
+        audit = confident & (self._rng.random(len(windows)) < self.audit_rate)
+        run_lstm = ~confident | audit
+
+        agree = np.zeros(0, dtype=bool)
+        fallback = np.zeros(0, dtype=bool)
+        if run_lstm.any():
+            idx = np.flatnonzero(run_lstm)
+            lstm_labels, lstm_confidences, _ = self.predictor.predict_many(windows[idx])
+            agree = lstm_labels == labels[idx]
+            fallback = ~confident[idx]
+            labels[idx[fallback]] = lstm_labels[fallback]
+            confidences[idx[fallback]] = lstm_confidences[fallback]
+
+        tiers = np.where(confident, "knn", "lstm")
+        n_knn, n_lstm = int(confident.sum()), int((~confident).sum())
+        metrics.inc("cascade_knn", n_knn)
+        metrics.inc("cascade_lstm", n_lstm)
+        with self._lock:
+            self.counts["windows"] += len(windows)
+            self.counts["knn"] += n_knn
+            self.counts["lstm"] += n_lstm
+            self.counts["unsteady"] += int((~steady).sum())
+            self.counts["far"] += int((~near).sum())
+            self.counts["split"] += int((~decisive).sum())
+            self.counts["audited"] += int(audit.sum())
+            self.counts["audit_agree"] += int(agree[~fallback].sum())
+            self.counts["fallback_agree"] += int(agree[fallback].sum())
+        return labels, confidences, tiers
+
+    def predict(self, window):
+        """Classify one raw window; returns (label, confidence, tier)."""
+        labels, confidences, tiers = self.predict_many(np.asarray(window)[None])
+        return labels[0], float(confidences[0]), str(tiers[0])
+
+    def stats(self):
+        """
+        Tier usage and agreement so far.
+
+        audit_agreement is measured on sampled KNN answers; fallback_agreement
+        is how often the KNN's (rejected) guess matched the LSTM when the LSTM
+        was needed - high values suggest the thresholds are too strict.
+        """
+        with self._lock:
+            c = dict(self.counts)
+        c["knn_rate"] = c["knn"] / c["windows"] if c["windows"] else 0.0
+        c["audit_agreement"] = c["audit_agree"] / c["audited"] if c["audited"] else None
+        c["fallback_agreement"] = c["fallback_agree"] / c["lstm"] if c["lstm"] else None
+        return c
+
+
+def from_env():
+    """A CascadePredictor configured from CASCADE_* environment variables, or None if CASCADE is not 1."""
+    if os.environ.get("CASCADE", "0") != "1":
+        return None
+    return CascadePredictor(
+        build_classifier(data=os.environ.get("CASCADE_DATA", data_path)),
+        min_votes=float(os.environ.get("CASCADE_MIN_VOTES", 1.0)),
+        max_distance=float(os.environ.get("CASCADE_MAX_DISTANCE", 15.0)),
+        max_spread=float(os.environ.get("CASCADE_MAX_SPREAD", 0.1)),
+        audit_rate=float(os.environ.get("CASCADE_AUDIT_RATE", 0.0)),
+    )
+
+
+def print_stats(stats):
+    print(f"Windows: {stats['windows']} | KNN: {stats['knn']} ({stats['knn_rate']*100:.1f}%) | LSTM: {stats['lstm']}")
+    print(f"  LSTM reasons - unsteady: {stats['unsteady']}, far: {stats['far']}, split vote: {stats['split']}")
+    if stats["audit_agreement"] is not None:
+        print(f"  Audited KNN answers: {stats['audited']} ({stats['audit_agreement']*100:.1f}% agree with LSTM)")
+    if stats["fallback_agreement"] is not None:
+        print(f"  KNN guess matched LSTM on fallback: {stats['fallback_agreement']*100:.1f}%")
+
+
+def evaluate(data, cascade):
+    """Run the cascade and the LSTM alone over every window of a labelled export."""
+    from utils import load_training_frame
+
+    df = load_training_frame(data)
+    windows = sliding_windows(df[FEATURES].to_numpy(dtype=np.float64), cascade.predictor.window_size)
+    actual = df["device_id"].astype(str).to_numpy()[cascade.predictor.window_size:]
+
+    start = time.perf_counter()
+    for window in windows:
+        cascade.predictor.predict(window)
+    lstm_s = time.perf_counter() - start
+    lstm_labels, _, _ = cascade.predictor.predict_many(windows)
+
+    start = time.perf_counter()
+    for window in windows:
+        cascade.predict(window)
+    cascade_s = time.perf_counter() - start
+    labels, _, tiers = cascade.predict_many(windows)
+
+    print(f"\n{'='*64}")
+    print(f"CASCADE EVALUATION ({len(windows)} windows)")
+    print(f"{'='*64}")
+    knn = tiers == "knn"
+    print(f"LSTM only:  accuracy {(lstm_labels == actual).mean()*100:5.1f}% | {lstm_s*1000/len(windows):.3f} ms/window")
+    print(f"Cascade:    accuracy {(labels == actual).mean()*100:5.1f}% | {cascade_s*1000/len(windows):.3f} ms/window")
+    if knn.any():
+        print(f"  KNN tier accuracy:  {(labels[knn] == actual[knn]).mean()*100:5.1f}% on {knn.sum()} windows")
+    if (~knn).any():
+        print(f"  LSTM tier accuracy: {(labels[~knn] == actual[~knn]).mean()*100:5.1f}% on {(~knn).sum()} windows")
+    print(f"Agreement with LSTM only: {(labels == lstm_labels).mean()*100:.1f}%")
+    print(f"{'='*64}\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Confidence-gated KNN -> LSTM cascade")
+    sub = parser.add_subparsers(dest="command", required=True)
+    eval_parser = sub.add_parser("evaluate", help="Compare the cascade with the LSTM alone on a labelled export")
+    eval_parser.add_argument("--data", default=data_path)
+    eval_parser.add_argument("--min-votes", type=float, default=1.0)
+    eval_parser.add_argument("--max-distance", type=float, default=15.0)
+    eval_parser.add_argument("--max-spread", type=float, default=0.1)
+    eval_parser.add_argument("--audit-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    cascade = CascadePredictor(
+        build_classifier(args.data),
+        min_votes=args.min_votes, max_distance=args.max_distance,
+        max_spread=args.max_spread, audit_rate=args.audit_rate,
+    )
+    evaluate(args.data, cascade)
+    print_stats(cascade.stats())
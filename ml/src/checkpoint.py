@@ -0,0 +1,236 @@
+"""
+Background, atomic checkpointing for train.py.
+
+The training loop only snapshots tensors (a memory copy of the weights and the
+optimizer state) and hands them to a CheckpointWriter. A writer thread
+serializes them and saves each file atomically: it writes <file>.tmp, fsyncs
+it and os.replace()s it over the target. A predictor that loads
+energy_model.pt mid-training (or has it memory-mapped) sees either the
+previous or the new weights, never a partial file.
+
+If training produces snapshots faster than the disk takes them, the writer
+keeps only the newest pending periodic snapshot and the newest pending best
+one. Checkpointing every epoch therefore never blocks the loop.
+
+    models/energy_model.pt                     best weights (what the predictors load)
+    models/checkpoints/<arch>/best.pt          best weights + optimizer state
+    models/checkpoints/<arch>/epoch_0042.pt    the last K periodic checkpoints
+
+Usage:
+    python src/train.py --checkpoint-every 5 --keep-checkpoints 3
+    python src/train.py --resume            # continue from the newest checkpoint
+    python src/checkpoint.py info
+"""
+import argparse
+import glob
+import io
+import os
+import re
+import threading
+import time
+
+import torch
+
+from model import MODEL_ARCHS, MODEL_FILES
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+models_dir = os.path.join(project_root, "models")
+
+BEST_FILE = "best.pt"
+EPOCH_PATTERN = re.compile(r"epoch_(\d+)\.pt$")
+
+
+def checkpoint_dir(models_dir, arch="lstm"):
+    return os.path.join(models_dir, "checkpoints", arch)
+
+
+def snapshot(obj):
+    """Copy every tensor in a (nested) state dict, so later training steps cannot change it."""
+    if isinstance(obj, torch.Tensor):
+        return obj.detach().clone()
+    if isinstance(obj, dict):
+        return {k: snapshot(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(snapshot(v) for v in obj)
+    return obj
+
+
+def serialize(obj):
+    buffer = io.BytesIO()
+    torch.save(obj, buffer)
+    return buffer.getvalue()
+
+
+def atomic_write(data, path):
+    """Write bytes to path.tmp, fsync, then rename over path: readers see the old or the new file."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def atomic_save(obj, path):
+    atomic_write(serialize(obj), path)
+
+
+def epoch_checkpoints(models_dir, arch="lstm"):
+    """Periodic checkpoint paths, oldest first."""
+    paths = glob.glob(os.path.join(checkpoint_dir(models_dir, arch), "epoch_*.pt"))
+    return sorted(paths, key=lambda p: int(EPOCH_PATTERN.search(p).group(1)))
+
+
+def latest(models_dir, arch="lstm"):
+    """The newest checkpoint (periodic or best, by epoch) to resume from, or None."""
+    candidates = epoch_checkpoints(models_dir, arch)
+    best_path = os.path.join(checkpoint_dir(models_dir, arch), BEST_FILE)
+    if os.path.exists(best_path):
+        candidates.append(best_path)
+    loaded = [torch.load(path, weights_only=False) for path in candidates]
+    return max(loaded, key=lambda c: c["epoch"], default=None)
+
+
+def load_best(models_dir, arch="lstm"):
+    path = os.path.join(checkpoint_dir(models_dir, arch), BEST_FILE)
+    return torch.load(path, weights_only=False) if os.path.exists(path) else None
+
+
+class CheckpointWriter:
+    """
+    Writes checkpoints on a background thread.
+
+    submit() snapshots the model and optimizer state and returns at once.
+    close() waits for every pending write and re-raises a writer error.
+    """
+
+    def __init__(self, models_dir, arch="lstm", keep=3, publish=True):
+        self.models_dir = models_dir
+        self.arch = arch
+        self.keep = keep
+        # False keeps new best weights in best.pt only, e.g. until a matching label encoder is written
+        self.publish = publish
+        self.dir = checkpoint_dir(models_dir, arch)
+        self.model_path = os.path.join(models_dir, MODEL_FILES[arch])
+        os.makedirs(self.dir, exist_ok=True)
+        self._cond = threading.Condition()
+        self._periodic = None
+        self._best = None
+        self._busy = False
+        self._closed = False
+        self._error = None
+        self.written = 0
+        self.skipped = 0
+        self.write_seconds = 0.0
+        self._thread = threading.Thread(target=self._run, name="checkpoint-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, epoch, model, optimizer, loss, best_loss, periodic=True, best=False, **extra):
+        """
+        Queue a checkpoint after `epoch` (1-based) epochs.
+
+        periodic keeps it as epoch_<n>.pt (the last `keep` are kept); best also
+        makes it best.pt and (if publishing) the weights file the predictors load.
+        """
+        if not (periodic or best):
+            return
+        self._raise_error()
+        state = {
+            "arch": self.arch,
+            "epoch": epoch,
+            "loss": loss,
+            "best_loss": best_loss,
+            "model": snapshot(model.state_dict()),
+            "optimizer": snapshot(optimizer.state_dict()),
+            **extra,
+        }
+        with self._cond:
+            # An unwritten snapshot of the same kind is superseded by this newer one
+            if periodic:
+                self.skipped += self._periodic is not None
+                self._periodic = state
+            if best:
+                self.skipped += self._best is not None
+                self._best = state
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._periodic is None and self._best is None and not self._closed:
+                    self._cond.wait()
+                if self._periodic is None and self._best is None:
+                    return
+                periodic, best = self._periodic, self._best
+                self._periodic = self._best = None
+                self._busy = True
+            try:
+                start = time.perf_counter()
+                data = None
+                if best is not None:
+                    if self.publish:
+                        atomic_save(best["model"], self.model_path)
+                    data = serialize(best)
+                    atomic_write(data, os.path.join(self.dir, BEST_FILE))
+                    self.written += 1
+                if periodic is not None:
+                    # A new best that is also due periodically is serialized once
+                    if periodic is not best:
+                        data = serialize(periodic)
+                        self.written += 1
+                    atomic_write(data, os.path.join(self.dir, f"epoch_{periodic['epoch']:04d}.pt"))
+                    for old in epoch_checkpoints(self.models_dir, self.arch)[:-self.keep or None]:
+                        os.remove(old)
+                self.write_seconds += time.perf_counter() - start
+            except Exception as e:
+                self._error = e
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+    def flush(self):
+        """Block until everything submitted so far is on disk."""
+        with self._cond:
+            while self._periodic is not None or self._best is not None or self._busy:
+                self._cond.wait()
+        self._raise_error()
+
+    def close(self):
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        self._raise_error()
+
+    def _raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise RuntimeError(f"Checkpoint write failed: {error}") from error
+
+
+def info(models_dir, arch):
+    paths = epoch_checkpoints(models_dir, arch)
+    best_path = os.path.join(checkpoint_dir(models_dir, arch), BEST_FILE)
+    if os.path.exists(best_path):
+        paths.append(best_path)
+    if not paths:
+        print(f"No checkpoints in {checkpoint_dir(models_dir, arch)}")
+        return
+    print(f"{'File':<18} {'Epoch':>6} {'Loss':>9} {'Best loss':>10} {'Size KB':>8}")
+    for path in paths:
+        c = torch.load(path, weights_only=False)
+        print(f"{os.path.basename(path):<18} {c['epoch']:>6} {c['loss']:>9.4f} {c['best_loss']:>10.4f} "
+              f"{os.path.getsize(path) / 1024:>8.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Training checkpoints")
+    sub = parser.add_subparsers(dest="command", required=True)
+    info_parser = sub.add_parser("info", help="List the checkpoints of an architecture")
+    info_parser.add_argument("--models-dir", default=models_dir)
+    info_parser.add_argument("--arch", choices=list(MODEL_ARCHS), default="lstm")
+    args = parser.parse_args()
+
+    info(args.models_dir, args.arch)
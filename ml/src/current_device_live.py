@@ -1,133 +1,170 @@
-import torch
-import joblib
 import numpy as np
 import os
 import requests
-from model import EnergyFingerprintNet
+from inference import FEATURES, get_predictor
+import cascade
+import gate as change_gate
+import metrics
+from reading_log import ReadingLog
+from prediction_trace import record_prediction
+import timeline as prediction_timeline
 from datetime import datetime
 import time
 import sys
 
-# Set paths relative to project root
-project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-models_dir = os.path.join(project_root, "models")
+api_base_url = os.environ.get("SPECTRAWATT_API_URL", "https://api.spectrawatt.upayan.dev")
+poll_interval = float(os.environ.get("POLL_INTERVAL", 5))
 
-scaler = joblib.load(os.path.join(models_dir, "scaler.pkl"))
-label_encoder = joblib.load(os.path.join(models_dir, "label_encoder.pkl"))
-irms_weight = joblib.load(os.path.join(models_dir, "irms_weight.pkl"))
+# Optional append-only log of every reading seen while polling
+reading_log_path = os.environ.get("READING_LOG_PATH")
+reading_log = ReadingLog(reading_log_path) if reading_log_path else None
 
-model = EnergyFingerprintNet(num_classes=len(label_encoder.classes_))
-model.load_state_dict(torch.load(os.path.join(models_dir, "energy_model.pt")))
-model.eval()
+# CASCADE=1 lets the NILM KNN answer steady, well-separated windows before the LSTM
+cascade_predictor = cascade.from_env()
 
-def predict_device(window):
-    window = window.copy()
-    window[:, 1] = window[:, 1] * irms_weight
-    window = scaler.transform(window)
-    window = torch.tensor(window, dtype=torch.float32).unsqueeze(0)
+# GATE=1 reuses the last answer until the meter's load changes (or GATE_MAX_AGE passes)
+gate = change_gate.from_env(cascade_predictor)
 
-    with torch.no_grad():
-        logits = model(window)
-        probs = torch.softmax(logits, dim=1)
-        confidence, pred = torch.max(probs, dim=1)
 
-    return label_encoder.inverse_transform([pred.item()])[0], confidence.item()
+def poll_once(iteration, current_utc, timeline=None):
+    """One poll cycle: fetch /api/data, classify each meter's last 10 readings from the past 5 minutes and print a status line."""
+    with metrics.timed("fetch"):
+        response = requests.get(f'{api_base_url}/api/data', timeout=5)
 
-# Continuous monitoring
-try:
-    print("\n" + "="*90)
-    print("LIVE DEVICE MONITORING (Updates every 5 seconds)")
-    print("Press Ctrl+C to stop")
-    print("="*90 + "\n")
+    with metrics.timed("parse"):
+        api_data = response.json()
     
-    iteration = 0
-    while True:
-        iteration += 1
-        
-        # Get current UTC time
-        current_utc = datetime.utcnow()
+        all_readings = []
+        for device_entry in api_data:
+            device_id = device_entry.get("device_id")
+            readings = device_entry.get("data", [])
         
-        try:
-            response = requests.get('https://api.spectrawatt.upayan.dev/api/data', timeout=5)
-            api_data = response.json()
-            
-            all_readings = []
-            for device_entry in api_data:
-                device_id = device_entry.get("device_id")
-                readings = device_entry.get("data", [])
-                
-                for reading in readings:
-                    reading["device_id"] = device_id
-                    all_readings.append(reading)
-            
-            # Check if API data is stale (latest reading older than 2 minutes)
-            is_stale = False
-            stale_message = ""
-            
-            if all_readings:
-                # Find the MOST RECENT reading by comparing all timestamps
-                most_recent_reading = None
-                most_recent_time = None
-                
-                for reading in all_readings:
-                    timestamp_str = reading.get('timestamp', '')
-                    try:
-                        # Parse ISO format timestamp
-                        reading_time = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
-                        if most_recent_time is None or reading_time > most_recent_time:
-                            most_recent_time = reading_time
-                            most_recent_reading = reading
-                    except:
-                        pass
-                
-                if most_recent_time:
-                    staleness = (current_utc - most_recent_time.replace(tzinfo=None)).total_seconds()
-                    
-                    if staleness > 120:  # More than 2 minutes old
-                        is_stale = True
-                        stale_message = f" (Data is {int(staleness)}s old)"
-            
-            # Filter readings to only those from the last 5 minutes
-            recent_readings = []
+            for reading in readings:
+                reading["device_id"] = device_id
+                all_readings.append(reading)
+    metrics.inc("polls")
+    metrics.inc("readings", len(all_readings))
+
+    if reading_log is not None:
+        with metrics.timed("reading_log"):
+            reading_log.append_readings(all_readings)
+
+    with metrics.timed("filter"):
+        # Check if API data is stale (latest reading older than 2 minutes)
+        is_stale = False
+        stale_message = ""
+
+        if all_readings:
+            # Find the MOST RECENT reading by comparing all timestamps
+            most_recent_reading = None
+            most_recent_time = None
+    
             for reading in all_readings:
                 timestamp_str = reading.get('timestamp', '')
                 try:
+                    # Parse ISO format timestamp
                     reading_time = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
-                    time_diff = (current_utc - reading_time.replace(tzinfo=None)).total_seconds()
-                    
-                    # Keep readings from last 5 minutes
-                    if 0 <= time_diff <= 300:
-                        recent_readings.append(reading)
+                    if most_recent_time is None or reading_time > most_recent_time:
+                        most_recent_time = reading_time
+                        most_recent_reading = reading
                 except:
                     pass
-            
-            # Get last 10 readings from recent set
-            if len(recent_readings) >= 10:
-                recent_readings = recent_readings[-10:]
-                features = ["vrms", "irms", "apparent_power", "wh"]
-                X = np.array([[r[f] for f in features] for r in recent_readings])
-                
-                predicted_device, confidence = predict_device(X)
-                
-                # Get timestamp from latest reading
-                latest_timestamp = recent_readings[-1].get('timestamp', 'N/A')
-                
-                status = "✅" if not is_stale else "⚠️"
-                print(f"\r[{iteration:>4}] {status} 🔌 {predicted_device:<17} | 📊 {confidence*100:>6.2f}% | ⏰ {latest_timestamp} | 🕐 {current_utc.isoformat()}Z", end='', flush=True)
-            else:
-                print(f"\r[{iteration:>4}] ⏳ Waiting for fresh data... ({len(recent_readings)}/10)", end='', flush=True)
+    
+            if most_recent_time:
+                staleness = (current_utc - most_recent_time.replace(tzinfo=None)).total_seconds()
+        
+                if staleness > 120:  # More than 2 minutes old
+                    is_stale = True
+                    stale_message = f" (Data is {int(staleness)}s old)"
+
+        # Keep readings from the last 5 minutes, per meter (/api/data lists each meter's newest first)
+        recent_by_meter = {}
+        for reading in all_readings:
+            timestamp_str = reading.get('timestamp', '')
+            try:
+                reading_time = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
+                time_diff = (current_utc - reading_time.replace(tzinfo=None)).total_seconds()
+        
+                # Keep readings from last 5 minutes
+                if 0 <= time_diff <= 300:
+                    recent_by_meter.setdefault(reading["device_id"], []).append((reading_time, reading))
+            except:
+                pass
+        for readings in recent_by_meter.values():
+            readings.sort(key=lambda item: item[0])
+        devices = sorted(d for d, readings in recent_by_meter.items() if len(readings) >= 10)
+
+    # Get the last 10 readings of each meter: interleaved meters must not share a window (or a gate state)
+    if devices:
+        with metrics.timed("frame"):
+            X = np.array([[[r[f] for f in FEATURES] for _, r in recent_by_meter[d][-10:]] for d in devices])
+    
+        if gate is not None:
+            labels, confidences = gate.predict_many(devices, X)[:2]
+        elif cascade_predictor is not None:
+            labels, confidences, _ = cascade_predictor.predict_many(X)
+        else:
+            labels, confidences = get_predictor().predict_many(X)[:2]
+    
+        # Get timestamp from each meter's latest reading
+        latest = [recent_by_meter[d][-1] for d in devices]
+        latest_timestamps = [reading.get('timestamp', 'N/A') for _, reading in latest]
+        for i, (reading_time, _) in enumerate(latest):
+            record_prediction("current_device_live", reading_time, labels[i], float(confidences[i]), len(all_readings))
+        if timeline is not None:
+            with metrics.timed("timeline"):
+                timeline.extend(devices, latest_timestamps, labels, confidences)
+    
+        status = "✅" if not is_stale else "⚠️"
+        with metrics.timed("output"):
+            meters = " ‖ ".join(f"📟 {d}: 🔌 {labels[i]:<17} | 📊 {confidences[i]*100:>6.2f}% | ⏰ {latest_timestamps[i]}"
+                                for i, d in enumerate(devices))
+            print(f"\r[{iteration:>4}] {status} {meters} | 🕐 {current_utc.isoformat()}Z", end='', flush=True)
+    else:
+        most = max((len(readings) for readings in recent_by_meter.values()), default=0)
+        print(f"\r[{iteration:>4}] ⏳ Waiting for fresh data... ({most}/10)", end='', flush=True)
+
+
+# Continuous monitoring
+if __name__ == "__main__":
+    metrics.init("current_device_live")
+    # Predictions are kept in a downsampled on-disk timeline unless TIMELINE_DIR=""
+    timeline = prediction_timeline.from_env("current_device_live")
+    try:
+        print("\n" + "="*90)
+        print("LIVE DEVICE MONITORING (Updates every 5 seconds)")
+        print("Press Ctrl+C to stop")
+        print("="*90 + "\n")
+    
+        iteration = 0
+        while True:
+            iteration += 1
+        
+            # Get current UTC time
+            current_utc = datetime.utcnow()
+        
+            try:
+                cycle_start = time.perf_counter()
+                poll_once(iteration, current_utc, timeline)
+                metrics.observe("cycle", time.perf_counter() - cycle_start)
         
-        except requests.exceptions.Timeout:
-            print(f"\r[{iteration:>4}] ❌ API timeout - retrying...", end='', flush=True)
-        except requests.exceptions.RequestException as e:
-            print(f"\r[{iteration:>4}] ❌ API error: {str(e)[:30]}", end='', flush=True)
+            except requests.exceptions.Timeout:
+                metrics.inc("api_errors")
+                print(f"\r[{iteration:>4}] ❌ API timeout - retrying...", end='', flush=True)
+            except requests.exceptions.RequestException as e:
+                metrics.inc("api_errors")
+                print(f"\r[{iteration:>4}] ❌ API error: {str(e)[:30]}", end='', flush=True)
         
-        time.sleep(5)
+            time.sleep(poll_interval)
         
-except KeyboardInterrupt:
-    print("\n\n" + "="*90)
-    print("✅ Monitoring stopped")
-    print("="*90 + "\n")
+    except KeyboardInterrupt:
+        print("\n\n" + "="*90)
+        print("✅ Monitoring stopped")
+        if cascade_predictor is not None:
+            cascade.print_stats(cascade_predictor.stats())
+        if gate is not None:
+            change_gate.print_stats(gate.stats())
+        print("="*90 + "\n")
         
-except Exception as e:
-    print(f"\n\n❌ Error: {e}\n")
+    except Exception as e:
+        print(f"\n\n❌ Error: {e}\n")
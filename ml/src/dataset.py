@@ -19,3 +19,70 @@ class EnergyDataset(Dataset):
             torch.tensor(x_window, dtype=torch.float32),
             torch.tensor(label, dtype=torch.long)
         )
+
+
+# Readings further apart than this start a new timeline segment (the meter was off or offline)
+SESSION_GAP_MS = 5 * 60 * 1000
+
+
+class SequenceChunks:
+    """
+    Contiguous per-device timelines for stateful, truncated-BPTT training.
+
+    Each device's readings (the label is the device) are ordered by time and
+    cut into segments at gaps longer than max_gap_ms. Segments are padded to
+    whole chunks and packed into `lanes` parallel streams. Iterating yields one
+    chunk per step for all lanes at once: (x (lanes, chunk, features), y
+    (lanes, chunk), mask of real readings, reset). reset marks lanes whose
+    chunk starts a new segment, so the caller zeroes their carried state.
+    Every reading appears exactly once per pass.
+    """
+
+    def __init__(self, X, y, timestamps, chunk=50, lanes=16, max_gap_ms=SESSION_GAP_MS):
+        self.X = torch.from_numpy(np.array(X, dtype=np.float32))
+        self.y = torch.from_numpy(np.array(y, dtype=np.int64))
+        self.chunk = chunk
+        self.lanes = lanes
+        y = np.asarray(y)
+        timestamps = np.asarray(timestamps)
+        self.segments = []
+        for label in np.unique(y):
+            rows = np.flatnonzero(y == label)
+            rows = rows[np.argsort(timestamps[rows], kind="stable")]
+            breaks = np.flatnonzero(np.diff(timestamps[rows]) > max_gap_ms) + 1
+            self.segments += [segment for segment in np.split(rows, breaks) if len(segment)]
+        self.timesteps = sum(len(segment) for segment in self.segments)
+        self.shuffle(None)
+
+    def shuffle(self, seed):
+        """Re-pack the segments into lanes (in a seeded random order; None keeps longest first)."""
+        order = sorted(range(len(self.segments)), key=lambda i: -len(self.segments[i]))
+        if seed is not None:
+            order = list(np.random.default_rng(seed).permutation(len(self.segments)))
+        lanes = [[] for _ in range(min(self.lanes, len(self.segments)) or 1)]
+        blocks = [0] * len(lanes)
+        for i in order:
+            lane = int(np.argmin(blocks))
+            lanes[lane].append(self.segments[i])
+            blocks[lane] += -(-len(self.segments[i]) // self.chunk)
+
+        steps = max(blocks)
+        self.rows = np.full((len(lanes), steps * self.chunk), -1, dtype=np.int64)
+        # Lanes that run out of segments stay reset (all padding) until the end
+        self.resets = np.ones((len(lanes), steps), dtype=bool)
+        for lane, segments in enumerate(lanes):
+            block = 0
+            for segment in segments:
+                self.rows[lane, block * self.chunk:block * self.chunk + len(segment)] = segment
+                self.resets[lane, block + 1:block + 1 + (len(segment) - 1) // self.chunk] = False
+                block += -(-len(segment) // self.chunk)
+
+    def __len__(self):
+        return self.resets.shape[1]
+
+    def __iter__(self):
+        for step in range(len(self)):
+            rows = torch.as_tensor(self.rows[:, step * self.chunk:(step + 1) * self.chunk])
+            mask = rows >= 0
+            safe = rows.clamp(min=0)
+            yield self.X[safe], self.y[safe], mask, torch.as_tensor(self.resets[:, step])
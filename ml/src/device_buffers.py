@@ -0,0 +1,183 @@
+"""
+Per-device buffers for readings pushed to the ML service.
+
+POST /api/data on the ML service takes the same payload as the Go API's
+PostDataHandler: one reading object or a batch array of up to 1000. Readings
+are validated the same way, appended to a ring of each device's last
+window_size readings, and every device that received readings hands back its
+newest window so it can be classified straight away instead of on the next
+/api/data poll.
+"""
+import json
+import math
+import re
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from inference import FEATURES, WINDOW_SIZE
+from reading_log import to_epoch_ms
+
+# time.RFC3339 as Go parses it: date, 'T', time, optional fraction, then 'Z' or a ±hh:mm offset
+RFC3339 = re.compile(r"(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})(?:\.(\d+))?(Z|[+-]\d{2}:\d{2})")
+MAX_PAYLOAD_BYTES = 1 << 20
+MAX_BATCH_ITEMS = 1000
+PAYLOAD_FIELDS = {"device_id", "timestamp", "vrms", "irms", "apparent_power", "wh"}
+
+
+class PayloadError(ValueError):
+    """A rejected payload; message and status match the Go API's responses."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _number(item, field, required):
+    raw = item.get(field)
+    if raw is None or raw == "":
+        if required:
+            raise PayloadError(f"{field} is required")
+        return 0.0
+    if isinstance(raw, bool):
+        raise PayloadError(f"Invalid type for {field}")
+    try:
+        value = float(raw)
+    except (TypeError, ValueError):
+        raise PayloadError(f"invalid {field}: {raw!r}") from None
+    if not math.isfinite(value):
+        raise PayloadError(f"{field} must be a finite number")
+    return value
+
+
+def parse_rfc3339(timestamp):
+    """Epoch ms of a strict RFC 3339 timestamp; raises ValueError for anything else."""
+    match = RFC3339.fullmatch(timestamp)
+    if match is None:
+        raise ValueError(f"{timestamp!r} is not RFC 3339")
+    base, fraction, offset = match.groups()
+    fraction = f".{(fraction or '0')[:6]}"
+    return to_epoch_ms(datetime.fromisoformat(base + fraction + ("+00:00" if offset == "Z" else offset)))
+
+
+def build_reading(item):
+    """Validate one payload object; returns (device_id, epoch ms, [vrms, irms, apparent_power, wh])."""
+    if not isinstance(item, dict):
+        raise PayloadError("Invalid JSON")
+    unknown = set(item) - PAYLOAD_FIELDS
+    if unknown:
+        raise PayloadError(f"Invalid JSON: unknown field {sorted(unknown)[0]!r}")
+
+    device_id = item.get("device_id")
+    if device_id is not None and not isinstance(device_id, str):
+        raise PayloadError("Invalid type for device_id")
+    if not device_id or not device_id.strip():
+        raise PayloadError("device_id is required")
+
+    vrms = _number(item, "vrms", required=True)
+    irms = _number(item, "irms", required=True)
+    apparent_power = _number(item, "apparent_power", required=False)
+    wh = _number(item, "wh", required=False)
+    if apparent_power == 0:
+        apparent_power = vrms * irms
+
+    timestamp = item.get("timestamp")
+    if timestamp is not None and not isinstance(timestamp, str):
+        raise PayloadError("Invalid type for timestamp")
+    if timestamp is None or not timestamp.strip():
+        ts = int(time.time() * 1000)
+    else:
+        try:
+            ts = parse_rfc3339(timestamp)
+        except ValueError as e:
+            raise PayloadError(f"invalid timestamp: {e}") from None
+
+    values = dict(zip(("vrms", "irms", "apparent_power", "wh"), (vrms, irms, apparent_power, wh)))
+    return device_id.strip(), ts, [values[f] for f in FEATURES]
+
+
+def parse_payload(body):
+    """Parse a single reading or a batch; returns a list of build_reading() tuples."""
+    if len(body) > MAX_PAYLOAD_BYTES:
+        raise PayloadError("Payload too large", status=413)
+    body = body.strip()
+    if not body:
+        raise PayloadError("Request body is empty")
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise PayloadError("Malformed JSON") from None
+
+    if not isinstance(payload, list):
+        return [build_reading(payload)]
+    if not payload:
+        raise PayloadError("Batch is empty")
+    if len(payload) > MAX_BATCH_ITEMS:
+        raise PayloadError(f"Batch too large (max {MAX_BATCH_ITEMS})")
+    readings = []
+    for idx, item in enumerate(payload):
+        try:
+            readings.append(build_reading(item))
+        except PayloadError as e:
+            raise PayloadError(f"item {idx}: {e}", e.status) from None
+    return readings
+
+
+class DeviceBuffers:
+    """Thread-safe ring of the last window_size readings per device."""
+
+    def __init__(self, window_size=WINDOW_SIZE):
+        self.window_size = window_size
+        self._lock = threading.Lock()
+        self._rings = {}
+        self._counts = {}
+        self._last_ts = {}
+
+    def push(self, readings):
+        """
+        Append readings and return the devices whose buffers are full.
+
+        Returns {device_id: (window, newest timestamp ms, readings seen)};
+        window is a (window_size, 4) copy in arrival order. A device's readings
+        within one push are ordered by timestamp first.
+        """
+        by_device = {}
+        for device_id, ts, values in readings:
+            by_device.setdefault(device_id, []).append((ts, values))
+
+        w = self.window_size
+        ready = {}
+        with self._lock:
+            for device_id, items in by_device.items():
+                items.sort(key=lambda item: item[0])
+                ring = self._rings.get(device_id)
+                if ring is None:
+                    ring = self._rings[device_id] = np.zeros((w, len(FEATURES)))
+                # Only the newest w readings of a large batch can survive in the ring
+                skipped = max(0, len(items) - w)
+                count = self._counts.get(device_id, 0) + skipped
+                for ts, values in items[skipped:]:
+                    ring[count % w] = values
+                    count += 1
+                self._counts[device_id] = count
+                self._last_ts[device_id] = items[-1][0]
+                if count >= w:
+                    start = count % w
+                    ready[device_id] = (np.concatenate([ring[start:], ring[:start]]), items[-1][0], count)
+        return ready
+
+    def window(self, device_id):
+        """The device's newest full window, or None if it has fewer than window_size readings."""
+        with self._lock:
+            count = self._counts.get(device_id, 0)
+            if count < self.window_size:
+                return None
+            ring, start = self._rings[device_id], count % self.window_size
+            return np.concatenate([ring[start:], ring[:start]])
+
+    def devices(self):
+        """{device_id: {"readings": n, "last_timestamp": ms}} for every device seen."""
+        with self._lock:
+            return {d: {"readings": self._counts[d], "last_timestamp": self._last_ts[d]} for d in self._counts}
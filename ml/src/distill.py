@@ -0,0 +1,81 @@
+"""
+Knowledge distillation helpers for training small student models from the
+EnergyFingerprintNet teacher, and a report comparing the two.
+"""
+import time
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+
+def distillation_loss(student_logits, teacher_logits, targets, criterion, temperature=4.0, alpha=0.7):
+    """
+    Blend softened teacher targets with the usual hard-label loss.
+
+    The KL term is scaled by T^2 so its gradients stay comparable to the
+    cross-entropy term as the temperature changes.
+    """
+    soft = F.kl_div(
+        F.log_softmax(student_logits / temperature, dim=1),
+        F.softmax(teacher_logits / temperature, dim=1),
+        reduction="batchmean",
+    ) * temperature ** 2
+    hard = criterion(student_logits, targets)
+    return alpha * soft + (1 - alpha) * hard
+
+
+def _windows(X, window_size):
+    # All windows at once: (n_windows, window_size, features)
+    idx = np.arange(len(X) - window_size)[:, None] + np.arange(window_size)
+    return torch.tensor(X[idx], dtype=torch.float32)
+
+
+def _single_window_latency_ms(model, window, repeats):
+    with torch.no_grad():
+        for _ in range(10):
+            model(window)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            model(window)
+    return (time.perf_counter() - start) * 1000 / repeats
+
+
+def compare_models(teacher, student, X, y, window_size=10, repeats=200):
+    """
+    Compare a student against the teacher on the same windows.
+
+    Returns accuracy for both models, the fraction of windows where they
+    agree, parameter counts and single-window CPU latency.
+    """
+    teacher.eval()
+    student.eval()
+    windows = _windows(X, window_size)
+    labels = np.asarray(y[window_size:])
+
+    with torch.no_grad():
+        teacher_pred = teacher(windows).argmax(dim=1).numpy()
+        student_pred = student(windows).argmax(dim=1).numpy()
+
+    single = windows[:1]
+    report = {"windows": int(len(windows)), "agreement": float((teacher_pred == student_pred).mean())}
+    for name, model, pred in (("teacher", teacher, teacher_pred), ("student", student, student_pred)):
+        report[name] = {
+            "params": sum(p.numel() for p in model.parameters()),
+            "accuracy": float((pred == labels).mean()),
+            "latency_ms": _single_window_latency_ms(model, single, repeats),
+        }
+    report["speedup"] = report["teacher"]["latency_ms"] / report["student"]["latency_ms"]
+    return report
+
+
+def print_report(report, student_arch):
+    print(f"\n{'='*64}")
+    print(f"DISTILLATION REPORT (lstm teacher vs {student_arch} student, {report['windows']} windows)")
+    print(f"{'='*64}")
+    print(f"{'Model':<10} {'Params':>10} {'Accuracy':>10} {'Latency ms':>12}")
+    for name in ("teacher", "student"):
+        r = report[name]
+        print(f"{name:<10} {r['params']:>10} {r['accuracy']*100:>9.1f}% {r['latency_ms']:>12.3f}")
+    print(f"\nAgreement: {report['agreement']*100:.1f}% | Speedup: {report['speedup']:.1f}x")
+    print(f"{'='*64}\n")
@@ -0,0 +1,154 @@
+"""
+Data-parallel training on CPU processes with the gloo backend.
+
+train.py runs as one process by default. Started by torchrun (or with
+--workers N, which re-launches it through torchrun on this host) each process
+trains a DistributedDataParallel replica on its own shard of the windows;
+gradients are averaged every step, the epoch loss is averaged over all
+workers, rank 0 alone writes checkpoints and all ranks stop early together.
+
+Usage:
+    python src/train.py --workers 4
+    # Two hosts, 4 workers each (run on both, same endpoint)
+    torchrun --nnodes 2 --nproc-per-node 4 --rdzv-backend c10d --rdzv-endpoint host0:29500 src/train.py
+    # Strong-scaling efficiency from 1 to N local workers
+    python src/distributed.py scaling --workers 1 2 4 --epochs 3
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import torch
+import torch.distributed as dist
+
+TRAIN_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "train.py")
+
+
+def world_size():
+    return int(os.environ.get("WORLD_SIZE", 1))
+
+
+def rank():
+    return int(os.environ.get("RANK", 0))
+
+
+def is_main():
+    return rank() == 0
+
+
+def init(threads=None):
+    """
+    Join the process group when started by torchrun; returns (rank, world size).
+
+    Each worker gets an equal share of the host's cores for intra-op threads
+    (threads overrides it), so N local workers don't oversubscribe the CPU.
+    """
+    local_workers = int(os.environ.get("LOCAL_WORLD_SIZE", 1))
+    if threads or local_workers > 1:
+        torch.set_num_threads(threads or max(1, (os.cpu_count() or 1) // local_workers))
+    if world_size() > 1 and not dist.is_initialized():
+        dist.init_process_group("gloo")
+    return rank(), world_size()
+
+
+def shutdown():
+    if dist.is_initialized():
+        dist.destroy_process_group()
+
+
+def barrier():
+    if dist.is_initialized():
+        dist.barrier()
+
+
+def main_first(fn):
+    """Run fn on rank 0, then on the other ranks (e.g. so only rank 0 builds a shared cache)."""
+    if is_main():
+        result = fn()
+        barrier()
+    else:
+        barrier()
+        result = fn()
+    return result
+
+
+def all_mean(total, count):
+    """Mean of a quantity summed over count items on each worker, across all workers."""
+    if not dist.is_initialized():
+        return total / count
+    t = torch.tensor([float(total), float(count)], dtype=torch.float64)
+    dist.all_reduce(t)
+    return (t[0] / t[1]).item()
+
+
+def agree(flag):
+    """Rank 0's decision, on every rank (keeps early stopping in lockstep)."""
+    if not dist.is_initialized():
+        return bool(flag)
+    t = torch.tensor([int(bool(flag))])
+    dist.broadcast(t, src=0)
+    return bool(t.item())
+
+
+def launch(workers, argv, script=TRAIN_SCRIPT):
+    """Re-run script with argv as `workers` local gloo processes; returns the exit code."""
+    cmd = [sys.executable, "-m", "torch.distributed.run", "--standalone", f"--nproc-per-node={workers}",
+           script, *argv]
+    return subprocess.call(cmd)
+
+
+def scaling(worker_counts, epochs, data=None, extra=()):
+    """
+    Train for a fixed number of epochs with each worker count and report
+    strong-scaling efficiency, T1 / (N * TN) on the median epoch time, relative
+    to the first worker count. Extra arguments are passed on to train.py.
+    """
+    results = []
+    with tempfile.TemporaryDirectory(prefix="scaling-") as tmp:
+        for workers in worker_counts:
+            report_path = os.path.join(tmp, f"report_{workers}.json")
+            argv = ["--workers", str(workers), "--epochs", str(epochs), "--patience", str(epochs + 1),
+                    "--models-dir", os.path.join(tmp, f"models_{workers}"), "--report", report_path, *extra]
+            if data:
+                argv += ["--data", data]
+            print(f"▶ Training with {workers} worker(s)...", flush=True)
+            code = subprocess.call([sys.executable, TRAIN_SCRIPT, *argv], stdout=subprocess.DEVNULL)
+            if code != 0:
+                raise SystemExit(f"train.py failed with {workers} worker(s) (exit {code})")
+            with open(report_path) as f:
+                results.append(json.load(f))
+
+    base = results[0]
+    print(f"\n{'='*78}")
+    print(f"{'Workers':>8} {'Epoch s':>9} {'Windows/s':>11} {'Speedup':>9} {'Efficiency':>11} {'Final loss':>11}")
+    print(f"{'='*78}")
+    for r in results:
+        speedup = base["epoch_s"] / r["epoch_s"]
+        r["speedup"] = speedup
+        r["efficiency"] = speedup * base["workers"] / r["workers"]
+        print(f"{r['workers']:>8} {r['epoch_s']:>9.2f} {r['windows_per_s']:>11.0f} {speedup:>8.2f}x "
+              f"{r['efficiency']*100:>10.1f}% {r['losses'][-1]:>11.4f}")
+    print(f"{'='*78}")
+    if max(worker_counts) > (os.cpu_count() or 1):
+        print(f"⚠️  More workers than this host's {os.cpu_count()} CPU core(s); they share cores")
+    print()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Distributed (gloo) training utilities")
+    sub = parser.add_subparsers(dest="command", required=True)
+    scale_parser = sub.add_parser("scaling", help="Scaling efficiency of train.py from 1 to N local workers")
+    scale_parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    scale_parser.add_argument("--epochs", type=int, default=3)
+    scale_parser.add_argument("--data", default=None)
+    scale_parser.add_argument("--output", default=None, help="Write the results as JSON")
+    args, extra = parser.parse_known_args()
+
+    results = scaling(args.workers, args.epochs, args.data, extra)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
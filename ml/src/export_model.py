@@ -0,0 +1,171 @@
+"""
+Export trained models as frozen TorchScript artifacts and benchmark them.
+
+Each artifact is traced for a fixed window size, frozen (weights become
+constants, dropout is folded away) and passed through
+torch.jit.optimize_for_inference. Prediction scripts load it with
+MODEL_COMPILED=1.
+
+Usage:
+    python src/export_model.py export --arch lstm --window-sizes 10
+    python src/export_model.py benchmark --arch lstm --window-size 10
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+models_dir = os.path.join(project_root, "models")
+
+
+def export(arch="lstm", window_sizes=(10,), num_features=4):
+    import joblib
+    import torch
+    from model import compiled_model_path, load_model
+
+    label_encoder = joblib.load(os.path.join(models_dir, "label_encoder.pkl"))
+    model = load_model(models_dir, num_classes=len(label_encoder.classes_), arch=arch)
+
+    paths = []
+    for window_size in window_sizes:
+        example = torch.randn(1, window_size, num_features)
+        with torch.no_grad():
+            traced = torch.jit.trace(model, example)
+            frozen = torch.jit.optimize_for_inference(torch.jit.freeze(traced))
+            expected = model(example)
+            actual = frozen(example)
+        if not torch.allclose(expected, actual, atol=1e-5):
+            raise RuntimeError(f"TorchScript output diverges from eager model for window {window_size}")
+
+        path = compiled_model_path(models_dir, arch, window_size)
+        torch.jit.save(frozen, path)
+        paths.append(path)
+    return paths
+
+
+def _cold_start(mode, arch, window_size, num_features=4):
+    """Measure one process's cold path: import, load (incl. warm-up), first call. Prints JSON."""
+    t0 = time.perf_counter()
+    import joblib
+    import torch
+    from model import load_model
+    t_import = time.perf_counter()
+
+    label_encoder = joblib.load(os.path.join(models_dir, "label_encoder.pkl"))
+    model = load_model(models_dir, num_classes=len(label_encoder.classes_), arch=arch,
+                       compiled=(mode == "compiled"), window_size=window_size)
+    t_load = time.perf_counter()
+
+    window = torch.randn(1, window_size, num_features)
+    with torch.no_grad():
+        model(window)
+    t_first = time.perf_counter()
+
+    print(json.dumps({
+        "import_s": t_import - t0,
+        "load_s": t_load - t_import,
+        "first_call_ms": (t_first - t_load) * 1000,
+        "cold_start_s": t_first - t0,
+    }))
+
+
+def _steady_state(model, window, seconds=2.0):
+    import torch
+
+    with torch.no_grad():
+        for _ in range(50):
+            model(window)
+        calls = 0
+        start = time.perf_counter()
+        while time.perf_counter() - start < seconds:
+            model(window)
+            calls += 1
+    elapsed = time.perf_counter() - start
+    return {"calls_per_s": calls / elapsed, "mean_ms": elapsed * 1000 / calls}
+
+
+def benchmark(arch="lstm", window_size=10, batch_sizes=(1, 32), seconds=2.0):
+    """Compare eager vs compiled on cold start, first-call latency and steady-state throughput."""
+    import joblib
+    import torch
+    from model import load_model
+
+    results = {}
+    for mode in ("eager", "compiled"):
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "_cold", mode, "--arch", arch, "--window-size", str(window_size)],
+            capture_output=True, text=True, check=True,
+        )
+        results[mode] = json.loads(out.stdout.strip().splitlines()[-1])
+
+    label_encoder = joblib.load(os.path.join(models_dir, "label_encoder.pkl"))
+    num_classes = len(label_encoder.classes_)
+    models = {
+        "eager": load_model(models_dir, num_classes, arch=arch),
+        "compiled": load_model(models_dir, num_classes, arch=arch, compiled=True, window_size=window_size),
+    }
+    for mode, model in models.items():
+        for batch_size in batch_sizes:
+            window = torch.randn(batch_size, window_size, 4)
+            results[mode][f"batch_{batch_size}"] = _steady_state(model, window, seconds)
+    return results
+
+
+def print_benchmark(results, arch, window_size, batch_sizes):
+    eager, compiled = results["eager"], results["compiled"]
+    print(f"\n{'='*64}")
+    print(f"EAGER vs TORCHSCRIPT ({arch}, window {window_size}, {os.cpu_count()} CPUs)")
+    print(f"{'='*64}")
+    print(f"{'Metric':<28} {'Eager':>10} {'Compiled':>10} {'Speedup':>8}")
+    # (name, eager, compiled, lower_is_better)
+    rows = [
+        ("Cold start (s)", eager["cold_start_s"], compiled["cold_start_s"], True),
+        ("  model load (s)", eager["load_s"], compiled["load_s"], True),
+        ("First call (ms)", eager["first_call_ms"], compiled["first_call_ms"], True),
+    ]
+    for batch_size in batch_sizes:
+        key = f"batch_{batch_size}"
+        rows.append((f"Steady mean, batch {batch_size} (ms)", eager[key]["mean_ms"], compiled[key]["mean_ms"], True))
+        rows.append((f"Throughput, batch {batch_size} (/s)", eager[key]["calls_per_s"], compiled[key]["calls_per_s"], False))
+    for name, e, c, lower_is_better in rows:
+        speedup = e / c if lower_is_better else c / e
+        print(f"{name:<28} {e:>10.3f} {c:>10.3f} {speedup:>7.2f}x")
+    print(f"{'='*64}\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export and benchmark TorchScript model artifacts")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = sub.add_parser("export", help="Write frozen TorchScript artifacts")
+    export_parser.add_argument("--arch", default="lstm", help="Model architecture (lstm, tcn, gru)")
+    export_parser.add_argument("--window-sizes", type=int, nargs="+", default=[10])
+
+    bench_parser = sub.add_parser("benchmark", help="Compare eager vs compiled inference")
+    bench_parser.add_argument("--arch", default="lstm")
+    bench_parser.add_argument("--window-size", type=int, default=10)
+    bench_parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 32])
+    bench_parser.add_argument("--seconds", type=float, default=2.0, help="Duration of each steady-state run")
+    bench_parser.add_argument("--json", default=None, help="Write results as JSON to this path")
+
+    cold_parser = sub.add_parser("_cold")
+    cold_parser.add_argument("mode", choices=["eager", "compiled"])
+    cold_parser.add_argument("--arch", default="lstm")
+    cold_parser.add_argument("--window-size", type=int, default=10)
+
+    args = parser.parse_args()
+
+    if args.command == "export":
+        for path in export(args.arch, args.window_sizes):
+            print(f"✅ Exported {path}")
+    elif args.command == "benchmark":
+        results = benchmark(args.arch, args.window_size, args.batch_sizes, args.seconds)
+        print_benchmark(results, args.arch, args.window_size, args.batch_sizes)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(results, f, indent=2)
+    else:
+        _cold_start(args.mode, args.arch, args.window_size)
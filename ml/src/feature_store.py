@@ -0,0 +1,315 @@
+"""
+Cached, memory-mapped training features.
+
+Preprocessing the readings (parse, drop untrained devices, weight irms,
+standardise, encode labels) is done once per source file and stored as raw
+arrays that open with ``numpy.memmap``:
+
+    <store>/<config key>/<source key>/
+        X.f32        float32 (rows, 4) standardised features
+        y.i4         int32 label codes into meta["classes"]
+        ts.i8        int64 epoch-ms timestamps
+        scaler.pkl   the StandardScaler used for X
+        meta.json    config, classes, row count and the source content hash
+
+The config key hashes the preprocessing config (features, excluded devices,
+irms weight and, if one is supplied, a fixed scaler), so changing any of them
+builds a new entry. The source's content hash decides between a hit, an
+append-only extension (only the new tail is parsed and transformed with the
+entry's scaler) and a rebuild.
+
+Usage:
+    python src/feature_store.py build data/spectrawatt.energy_data.csv
+    python src/feature_store.py info
+"""
+import argparse
+import glob
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+
+import joblib
+import numpy as np
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+import ingest
+from reading_log import RECORD_DTYPE, ReadingLog, is_reading_log
+from utils import EXCLUDED_DEVICES, FEATURES, IRMS_WEIGHT, load_training_frame, timestamps_ms
+
+STORE_VERSION = 2
+HASH_CHUNK = 1 << 20
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_STORE_DIR = os.path.join(project_root, "data", "feature_store")
+
+
+def preprocess_config(scaler=None):
+    config = {
+        "version": STORE_VERSION,
+        "features": FEATURES,
+        "excluded_devices": EXCLUDED_DEVICES,
+        "irms_weight": IRMS_WEIGHT,
+        "dtype": "float32",
+    }
+    if scaler is not None:
+        config["scaler"] = {"mean": scaler.mean_.tolist(), "scale": scaler.scale_.tolist()}
+    return config
+
+
+def _key(obj):
+    return hashlib.sha256(json.dumps(obj, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def _hash_bytes(f, digest, length):
+    """Feed the next ``length`` bytes of f into digest."""
+    while length > 0:
+        chunk = f.read(min(HASH_CHUNK, length))
+        if not chunk:
+            break
+        digest.update(chunk)
+        length -= len(chunk)
+    return digest
+
+
+class Features:
+    """Preprocessed arrays of one store entry (X, y and timestamps are read-only memory maps)."""
+
+    def __init__(self, path, meta, status):
+        self.path = path
+        self.meta = meta
+        self.status = status
+        self.classes = np.array(meta["classes"], dtype=object)
+        self.scaler = joblib.load(os.path.join(path, "scaler.pkl"))
+        rows = meta["rows"]
+        self.X = _open_array(os.path.join(path, "X.f32"), np.float32, (rows, len(FEATURES)))
+        self.y = _open_array(os.path.join(path, "y.i4"), np.int32, (rows,))
+        self.timestamps = _open_array(os.path.join(path, "ts.i8"), np.int64, (rows,))
+
+    def __len__(self):
+        return len(self.y)
+
+    def raw(self):
+        """Readings in their original units (undo the scaler and the irms weight)."""
+        X = self.scaler.inverse_transform(np.asarray(self.X, dtype=np.float64))
+        X[:, 1] /= IRMS_WEIGHT
+        return X
+
+    def label_encoder(self):
+        label_encoder = LabelEncoder()
+        label_encoder.classes_ = self.classes
+        return label_encoder
+
+    def save_preprocessors(self, models_dir):
+        """Write the scaler, label encoder and irms weight pickles the prediction scripts load."""
+        os.makedirs(models_dir, exist_ok=True)
+        joblib.dump(self.scaler, os.path.join(models_dir, "scaler.pkl"))
+        joblib.dump(self.label_encoder(), os.path.join(models_dir, "label_encoder.pkl"))
+        joblib.dump(IRMS_WEIGHT, os.path.join(models_dir, "irms_weight.pkl"))
+
+
+def _open_array(path, dtype, shape):
+    if shape[0] == 0:
+        return np.empty(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=shape)
+
+
+def _transform(df, scaler, classes):
+    """Standardise df's features and encode its labels against a (possibly grown) sorted class list."""
+    X = df[FEATURES].to_numpy(dtype=np.float64, copy=True)
+    X[:, 1] = X[:, 1] * IRMS_WEIGHT
+    if scaler is None:
+        scaler = StandardScaler().fit(X)
+    X = scaler.transform(X).astype(np.float32)
+
+    device_ids = df["device_id"].astype(str).to_numpy()
+    classes = np.array(sorted(set(classes) | set(device_ids)), dtype=object)
+    y = np.searchsorted(classes, device_ids).astype(np.int32)
+    return X, y, timestamps_ms(df), classes, scaler
+
+
+class FeatureStore:
+    def __init__(self, root=DEFAULT_STORE_DIR):
+        self.root = root
+
+    def load(self, source, scaler=None, rebuild=False):
+        """
+        Return the preprocessed Features for a CSV export or reading log.
+
+        With ``scaler`` the features are transformed with that fitted scaler
+        (e.g. the one saved with a trained model) instead of fitting a new one.
+        ``rebuild`` discards any cached entry for this source and config.
+        """
+        config = preprocess_config(scaler)
+        config_dir = os.path.join(self.root, _key(config))
+        size = os.path.getsize(source)
+
+        with open(source, "rb") as f:
+            for meta_path in sorted(glob.glob(os.path.join(config_dir, "*", "meta.json"))):
+                with open(meta_path) as mf:
+                    meta = json.load(mf)
+                entry = os.path.dirname(meta_path)
+                if meta["source_bytes"] > size:
+                    continue
+                f.seek(0)
+                digest = _hash_bytes(f, hashlib.blake2b(digest_size=16), meta["source_bytes"])
+                if digest.hexdigest() != meta["content_hash"]:
+                    continue
+                if rebuild:
+                    shutil.rmtree(entry)
+                    break
+                if meta["source_bytes"] == size:
+                    return Features(entry, meta, "hit")
+                if meta["appendable"]:
+                    _hash_bytes(f, digest, size - meta["source_bytes"])
+                    return self._extend(entry, meta, source, size, digest.hexdigest())
+                # The cached prefix ended mid-line, so the tail cannot be parsed on its own
+                shutil.rmtree(entry)
+                break
+
+        return self._build(config, config_dir, source, scaler)
+
+    def _build(self, config, config_dir, source, scaler):
+        df = load_training_frame(source)
+        X, y, ts, classes, scaler = _transform(df, scaler, [])
+        size, content_hash, appendable = _source_state(source)
+
+        # Entries for an earlier, rewritten version of this file can never match again
+        for stale, meta in self.entries(config_dir):
+            if meta["source"] == os.path.abspath(source):
+                shutil.rmtree(stale)
+
+        os.makedirs(config_dir, exist_ok=True)
+        entry = os.path.join(config_dir, content_hash)
+        tmp = tempfile.mkdtemp(dir=config_dir, prefix=".build-")
+        X.tofile(os.path.join(tmp, "X.f32"))
+        y.tofile(os.path.join(tmp, "y.i4"))
+        ts.tofile(os.path.join(tmp, "ts.i8"))
+        joblib.dump(scaler, os.path.join(tmp, "scaler.pkl"))
+        now = datetime.now(timezone.utc).isoformat()
+        meta = {
+            "version": STORE_VERSION,
+            "config": config,
+            "source": os.path.abspath(source),
+            "source_bytes": size,
+            "content_hash": content_hash,
+            "appendable": appendable,
+            "rows": int(len(y)),
+            "classes": classes.tolist(),
+            "created": now,
+            "updated": now,
+            "extensions": 0,
+        }
+        _write_meta(tmp, meta)
+        if os.path.exists(entry):
+            shutil.rmtree(entry)
+        os.replace(tmp, entry)
+        return Features(entry, meta, "built")
+
+    def _extend(self, entry, meta, source, size, content_hash):
+        df = _load_tail(source, meta["source_bytes"], size)
+        scaler = joblib.load(os.path.join(entry, "scaler.pkl"))
+        X, y, ts, classes, _ = _transform(df, scaler, meta["classes"])
+        rows = meta["rows"]
+
+        paths = {name: os.path.join(entry, name) for name in ("X.f32", "y.i4", "ts.i8")}
+        itemsizes = {"X.f32": 4 * len(FEATURES), "y.i4": 4, "ts.i8": 8}
+        for name, path in paths.items():
+            # Drop rows written by an extension that died before its meta was saved
+            with open(path, "ab") as f:
+                f.truncate(rows * itemsizes[name])
+
+        if len(classes) != len(meta["classes"]):
+            # Sorted insertion shifts codes; remap the cached labels in place
+            remap = np.searchsorted(classes, np.array(meta["classes"], dtype=object)).astype(np.int32)
+            if rows:
+                cached = np.memmap(paths["y.i4"], dtype=np.int32, mode="r+", shape=(rows,))
+                cached[:] = remap[cached]
+                cached.flush()
+                del cached
+
+        for name, array in (("X.f32", X), ("y.i4", y), ("ts.i8", ts)):
+            with open(paths[name], "ab") as f:
+                array.tofile(f)
+
+        meta.update({
+            "source_bytes": size,
+            "content_hash": content_hash,
+            "appendable": is_reading_log(source) or _ends_with_newline(source, size),
+            "rows": rows + int(len(y)),
+            "classes": classes.tolist(),
+            "updated": datetime.now(timezone.utc).isoformat(),
+            "extensions": meta["extensions"] + 1,
+        })
+        _write_meta(entry, meta)
+        return Features(entry, meta, "extended")
+
+    def entries(self, config_dir=None):
+        pattern = os.path.join(config_dir or os.path.join(self.root, "*"), "*", "meta.json")
+        for meta_path in sorted(glob.glob(pattern)):
+            with open(meta_path) as f:
+                yield os.path.dirname(meta_path), json.load(f)
+
+
+def _source_state(source):
+    size = os.path.getsize(source)
+    with open(source, "rb") as f:
+        content_hash = _hash_bytes(f, hashlib.blake2b(digest_size=16), size).hexdigest()
+    return size, content_hash, is_reading_log(source) or _ends_with_newline(source, size)
+
+
+def _ends_with_newline(source, size):
+    if size == 0:
+        return True
+    with open(source, "rb") as f:
+        f.seek(size - 1)
+        return f.read(1) == b"\n"
+
+
+def _load_tail(source, offset, size):
+    """Parse only the bytes appended to the source since ``offset``."""
+    if is_reading_log(source):
+        records = ReadingLog(source).records()
+        df = ingest.read_log(source, records[offset // RECORD_DTYPE.itemsize:size // RECORD_DTYPE.itemsize])
+    else:
+        with open(source, "rb") as f:
+            header = f.readline()
+            f.seek(offset)
+            tail = f.read(size - offset)
+        df = ingest.read_csv(io.BytesIO(header + tail))
+    return df[~df["device_id"].isin(EXCLUDED_DEVICES)].reset_index(drop=True)
+
+
+def _write_meta(entry, meta):
+    tmp_path = os.path.join(entry, "meta.json.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, os.path.join(entry, "meta.json"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the preprocessed feature store")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = sub.add_parser("build", help="Build or extend the cached features for a source")
+    build_parser.add_argument("source", help="energy_data CSV export or binary reading log (.log)")
+    build_parser.add_argument("--store", default=DEFAULT_STORE_DIR)
+    build_parser.add_argument("--rebuild", action="store_true", help="Ignore any cached entry")
+
+    info_parser = sub.add_parser("info", help="List cached entries")
+    info_parser.add_argument("--store", default=DEFAULT_STORE_DIR)
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        features = FeatureStore(args.store).load(args.source, rebuild=args.rebuild)
+        print(f"✅ {features.status}: {len(features)} rows, {len(features.classes)} classes -> {features.path}")
+    else:
+        for entry, meta in FeatureStore(args.store).entries():
+            print(f"{entry}")
+            print(f"  Source:  {meta['source']} ({meta['source_bytes']} bytes, {meta['extensions']} extensions)")
+            print(f"  Rows:    {meta['rows']} | Classes: {', '.join(meta['classes'])}")
+            print(f"  Updated: {meta['updated']}")
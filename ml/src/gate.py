@@ -0,0 +1,243 @@
+"""
+Change-point gate: rerun the classifier only when a meter's load changes.
+
+Between switching events a meter's load is steady and its predicted device
+does not change, yet every poll would run the LSTM again. The gate keeps,
+per meter, the window level (median apparent power and irms) and the answer
+of the last inference. A new window reuses that answer unless
+
+  - its newest readings moved more than the change threshold away from that level,
+  - the last inferred window was not settled yet (it straddled a change point), or
+  - the answer is older than max_age seconds.
+
+The change threshold is the larger of a fixed floor (threshold watts, as in
+the NILM detect_events delta threshold, and irms_threshold amps) and
+sensitivity times the meter's reading-to-reading noise. The noise is a robust
+(MAD) estimate from the deltas of the last inferred window, so noisy loads
+are not re-run on every poll. Inference cost then follows switching activity
+rather than poll frequency.
+
+Usage:
+    GATE=1 python src/predict_live.py
+    python src/gate.py evaluate --threshold 30 --max-age 60
+"""
+import argparse
+import os
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+import metrics
+from inference import FEATURES, WINDOW_SIZE, get_predictor, sliding_windows
+
+POWER = FEATURES.index("apparent_power")
+IRMS = FEATURES.index("irms")
+NOMINAL_VOLTS = 230.0
+RECENT = 3  # readings whose median gives the level at either end of a window
+MAD_TO_SIGMA = 1.4826
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+data_path = os.path.join(project_root, "data", "spectrawatt.energy_data.csv")
+
+_GateState = namedtuple("_GateState", "time power irms power_noise irms_noise settled label confidence detail")
+
+
+def _noise(series):
+    """Robust per-reading noise sigma from the deltas of one window (a single step doesn't inflate it)."""
+    deltas = np.diff(series)
+    return MAD_TO_SIGMA * np.median(np.abs(deltas - np.median(deltas))) / np.sqrt(2)
+
+
+class ChangeGate:
+    def __init__(self, predictor=None, threshold=30.0, irms_threshold=None, sensitivity=4.0,
+                 max_age=60.0, clock=time.monotonic):
+        """
+        Args:
+            predictor: Anything with predict_many(windows) -> (labels, confidences, details), e.g. a
+                CascadePredictor; defaults to the shared LSTM predictor, loaded on first use
+            threshold: Smallest apparent power change (W) that counts as a change point
+            irms_threshold: Smallest irms change (A); defaults to threshold / 230 V
+            sensitivity: Noise sigmas a change must exceed on noisy loads (lower re-runs more often)
+            max_age: Seconds after which an answer is recomputed even without a change
+            clock: Time source for max_age, in seconds
+        """
+        self._predictor = predictor
+        self.threshold = threshold
+        self.irms_threshold = irms_threshold if irms_threshold is not None else threshold / NOMINAL_VOLTS
+        self.sensitivity = sensitivity
+        self.max_age = max_age
+        self.clock = clock
+        self._state = {}
+        self._lock = threading.Lock()
+        self.counts = dict.fromkeys(("windows", "executed", "gated", "new", "changed", "settling", "expired"), 0)
+
+    @property
+    def predictor(self):
+        if self._predictor is None:
+            self._predictor = get_predictor()
+        return self._predictor
+
+    def _limits(self, power_noise, irms_noise):
+        return (max(self.threshold, self.sensitivity * power_noise),
+                max(self.irms_threshold, self.sensitivity * irms_noise))
+
+    def _reason(self, state, window, now):
+        """Why the window needs a fresh inference, or None if the last answer still holds."""
+        if state is None:
+            return "new"
+        if now - state.time >= self.max_age:
+            return "expired"
+        if not state.settled:
+            return "settling"
+        power_limit, irms_limit = self._limits(state.power_noise, state.irms_noise)
+        if (abs(np.median(window[-RECENT:, POWER]) - state.power) > power_limit
+                or abs(np.median(window[-RECENT:, IRMS]) - state.irms) > irms_limit):
+            return "changed"
+        return None
+
+    def _reference(self, window, now, label, confidence, detail):
+        power, irms = window[:, POWER], window[:, IRMS]
+        power_noise, irms_noise = _noise(power), _noise(irms)
+        power_limit, irms_limit = self._limits(power_noise, irms_noise)
+        # A window is settled once its oldest and newest readings sit at the same level (no change point inside)
+        settled = (abs(np.median(power[:RECENT]) - np.median(power[-RECENT:])) <= power_limit
+                   and abs(np.median(irms[:RECENT]) - np.median(irms[-RECENT:])) <= irms_limit)
+        return _GateState(now, float(np.median(power[-RECENT:])), float(np.median(irms[-RECENT:])),
+                          power_noise, irms_noise, settled, label, confidence, detail)
+
+    def predict_many(self, keys, windows, now=None):
+        """
+        Classify raw (n, window, 4) windows, one per meter key.
+
+        Returns (labels, confidences, details, executed): the wrapped
+        predictor's outputs, reused for windows whose meter hasn't changed,
+        and a mask of the windows that were actually classified.
+        """
+        windows = np.asarray(windows, dtype=np.float64)
+        now = self.clock() if now is None else now
+        n = len(windows)
+        with self._lock:
+            reasons = [self._reason(self._state.get(key), window, now) for key, window in zip(keys, windows)]
+        executed = np.array([reason is not None for reason in reasons], dtype=bool)
+
+        labels = np.empty(n, dtype=object)
+        confidences = np.empty(n, dtype=np.float64)
+        details = [None] * n
+        if executed.any():
+            idx = np.flatnonzero(executed)
+            run_labels, run_confidences, run_details = self.predictor.predict_many(windows[idx])
+            for j, i in enumerate(idx):
+                labels[i], confidences[i], details[i] = run_labels[j], run_confidences[j], run_details[j]
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                if executed[i]:
+                    self._state[key] = self._reference(windows[i], now, labels[i], confidences[i], details[i])
+                else:
+                    state = self._state[key]
+                    labels[i], confidences[i], details[i] = state.label, state.confidence, state.detail
+            self.counts["windows"] += n
+            self.counts["executed"] += int(executed.sum())
+            self.counts["gated"] += int((~executed).sum())
+            for reason in reasons:
+                if reason is not None:
+                    self.counts[reason] += 1
+        metrics.inc("gate_executed", int(executed.sum()))
+        metrics.inc("gate_gated", int((~executed).sum()))
+        return labels, confidences, np.array(details), executed
+
+    def predict(self, key, window, now=None):
+        """Classify one meter's raw window; returns (label, confidence, detail, executed)."""
+        labels, confidences, details, executed = self.predict_many([key], np.asarray(window)[None], now)
+        return labels[0], float(confidences[0]), details[0], bool(executed[0])
+
+    def forget(self, key):
+        """Drop a meter's state so its next window is classified."""
+        with self._lock:
+            self._state.pop(key, None)
+
+    def stats(self):
+        """Gated vs executed windows so far, and why windows were executed."""
+        with self._lock:
+            c = dict(self.counts)
+        c["gated_rate"] = c["gated"] / c["windows"] if c["windows"] else 0.0
+        return c
+
+
+def from_env(predictor=None):
+    """A ChangeGate in front of predictor configured from GATE_* environment variables, or None if GATE is not 1."""
+    if os.environ.get("GATE", "0") != "1":
+        return None
+    irms_threshold = os.environ.get("GATE_IRMS_THRESHOLD")
+    return ChangeGate(
+        predictor,
+        threshold=float(os.environ.get("GATE_THRESHOLD", 30.0)),
+        irms_threshold=float(irms_threshold) if irms_threshold else None,
+        sensitivity=float(os.environ.get("GATE_SENSITIVITY", 4.0)),
+        max_age=float(os.environ.get("GATE_MAX_AGE", 60.0)),
+    )
+
+
+def print_stats(stats):
+    print(f"Windows: {stats['windows']} | Gated: {stats['gated']} ({stats['gated_rate']*100:.1f}%) | "
+          f"Executed: {stats['executed']}")
+    print(f"  Executed because - new meter: {stats['new']}, changed: {stats['changed']}, "
+          f"settling: {stats['settling']}, max age: {stats['expired']}")
+
+
+def evaluate(data, gate):
+    """Replay every meter of an export through the gate, in reading time, against the ungated predictor."""
+    from utils import load_training_frame, timestamps_ms
+
+    df = load_training_frame(data)
+    df = df.assign(ms=timestamps_ms(df)).sort_values("ms", kind="stable")
+    window_size = WINDOW_SIZE
+    ungated_s = gated_s = 0.0
+    agree = total = 0
+    for device_id, readings in df.groupby("device_id", observed=True, sort=False):
+        windows = sliding_windows(readings[FEATURES].to_numpy(dtype=np.float64), window_size)
+        if len(windows) == 0:
+            continue
+        # Each window is the newest at the reading after it, as in the live scripts
+        seconds = readings["ms"].to_numpy()[window_size:] / 1000.0
+
+        start = time.perf_counter()
+        expected, _, _ = gate.predictor.predict_many(windows)
+        for window in windows:
+            gate.predictor.predict_many(window[None])
+        ungated_s += time.perf_counter() - start
+
+        start = time.perf_counter()
+        labels = [gate.predict(device_id, window, now)[0] for window, now in zip(windows, seconds)]
+        gated_s += time.perf_counter() - start
+        agree += int((np.array(labels, dtype=object) == np.asarray(expected, dtype=object)).sum())
+        total += len(windows)
+
+    stats = gate.stats()
+    print(f"\n{'='*64}")
+    print(f"CHANGE-POINT GATE EVALUATION ({total} windows)")
+    print(f"{'='*64}")
+    print(f"Ungated:  {ungated_s*1000/max(total, 1):.3f} ms/window")
+    print(f"Gated:    {gated_s*1000/max(total, 1):.3f} ms/window | "
+          f"{stats['executed']} inferences ({(1 - stats['gated_rate'])*100:.1f}% of windows)")
+    print(f"Agreement with ungated: {agree / max(total, 1) * 100:.1f}%")
+    print(f"{'='*64}\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Change-point gated inference")
+    sub = parser.add_subparsers(dest="command", required=True)
+    eval_parser = sub.add_parser("evaluate", help="Compare gated with ungated inference on an export")
+    eval_parser.add_argument("--data", default=data_path)
+    eval_parser.add_argument("--threshold", type=float, default=30.0)
+    eval_parser.add_argument("--irms-threshold", type=float, default=None)
+    eval_parser.add_argument("--sensitivity", type=float, default=4.0)
+    eval_parser.add_argument("--max-age", type=float, default=60.0)
+    args = parser.parse_args()
+
+    gate = ChangeGate(threshold=args.threshold, irms_threshold=args.irms_threshold,
+                      sensitivity=args.sensitivity, max_age=args.max_age)
+    evaluate(args.data, gate)
+    print_stats(gate.stats())
@@ -0,0 +1,127 @@
+"""
+Shared inference core for every prediction entry point.
+
+The model, scaler, label encoder and irms weight are loaded once per process
+by a lazily created, thread-safe Predictor singleton. torch and the sklearn
+pickles are only imported on first use, so importing this module (or a
+script built on it) stays cheap. The eager model's weights are memory-mapped
+from the checkpoint, so processes serving the same models directory share
+them (see serve.py).
+
+Usage:
+    from inference import get_predictor
+
+    predictor = get_predictor()
+    label, confidence, probs = predictor.predict(window)              # (window, 4)
+    labels, confidences, probs = predictor.predict_many(windows)      # (n, window, 4)
+"""
+import os
+import threading
+
+import numpy as np
+
+import metrics
+
+FEATURES = ["vrms", "irms", "apparent_power", "wh"]
+WINDOW_SIZE = 10
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+models_dir = os.path.join(project_root, "models")
+
+
+class Predictor:
+    def __init__(self, models_dir=models_dir, arch=None, compiled=None, window_size=WINDOW_SIZE):
+        import joblib
+        import torch
+        from model import load_model
+
+        self.torch = torch
+        self.arch = arch or os.environ.get("MODEL_ARCH", "lstm")
+        self.compiled = compiled if compiled is not None else os.environ.get("MODEL_COMPILED", "0") == "1"
+        self.window_size = window_size
+
+        scaler = joblib.load(os.path.join(models_dir, "scaler.pkl"))
+        self.label_encoder = joblib.load(os.path.join(models_dir, "label_encoder.pkl"))
+        self.irms_weight = joblib.load(os.path.join(models_dir, "irms_weight.pkl"))
+        self.classes = self.label_encoder.classes_
+
+        # Fold the irms weight into the StandardScaler parameters:
+        # ((x * w) - mean) / scale == (x - mean / w) / (scale / w) for the irms column
+        weight = np.ones(len(FEATURES))
+        weight[1] = self.irms_weight
+        self._mean = (scaler.mean_ / weight).astype(np.float32)
+        self._scale = (scaler.scale_ / weight).astype(np.float32)
+
+        self.model = load_model(models_dir, num_classes=len(self.classes), arch=self.arch,
+                                compiled=self.compiled, window_size=window_size, mmap=True)
+
+    def _forward(self, windows):
+        with metrics.timed("scale"):
+            x = (np.asarray(windows, dtype=np.float32) - self._mean) / self._scale
+            x = self.torch.from_numpy(x)
+        with metrics.timed("forward"), self.torch.no_grad():
+            probs = self.torch.softmax(self.model(x), dim=1)
+        return probs.numpy()
+
+    def predict_many(self, windows):
+        """
+        Classify a batch of raw (unscaled) windows in one forward pass.
+
+        Returns (labels, confidences, probabilities) for the n windows.
+        """
+        windows = np.asarray(windows)
+        if windows.ndim != 3 or windows.shape[2] != len(FEATURES):
+            raise ValueError(f"Expected windows shaped (n, window, {len(FEATURES)}), got {windows.shape}")
+        if len(windows) == 0:
+            return np.array([], dtype=self.classes.dtype), np.array([], dtype=np.float32), np.empty((0, len(self.classes)))
+
+        probs = self._forward(windows)
+        pred = probs.argmax(axis=1)
+        metrics.inc("predictions", len(windows))
+        return self.classes[pred], probs[np.arange(len(pred)), pred], probs
+
+    def predict(self, window):
+        """Classify one raw window; returns (label, confidence, probabilities)."""
+        labels, confidences, probs = self.predict_many(np.asarray(window)[None])
+        return labels[0], float(confidences[0]), probs[0]
+
+
+def load_predictor(arch=None, compiled=None, window_size=WINDOW_SIZE):
+    """A Predictor for a network, or the rolling-feature classifier for arch 'rolling'."""
+    arch = arch or os.environ.get("MODEL_ARCH", "lstm")
+    if arch == "rolling":
+        from rolling import RollingPredictor
+        return RollingPredictor(models_dir, window_size=window_size)
+    return Predictor(arch=arch, compiled=compiled, window_size=window_size)
+
+
+def sliding_windows(X, window_size=WINDOW_SIZE):
+    """
+    All windows X[i:i+window_size] for i in range(len(X) - window_size), as a strided view.
+
+    Matches EnergyDataset, where window i is labelled with y[i + window_size].
+    """
+    X = np.asarray(X)
+    n = len(X) - window_size
+    if n <= 0:
+        return np.empty((0, window_size, X.shape[1]), dtype=X.dtype)
+    return np.lib.stride_tricks.sliding_window_view(X, window_size, axis=0)[:n].transpose(0, 2, 1)
+
+
+_predictor = None
+_lock = threading.Lock()
+
+
+def get_predictor():
+    """Return the process-wide Predictor, loading it on first call."""
+    global _predictor
+    if _predictor is None:
+        with _lock:
+            if _predictor is None:
+                with metrics.timed("model_load"):
+                    _predictor = load_predictor()
+    return _predictor
+
+
+def predict_device(window):
+    return get_predictor().predict(window)
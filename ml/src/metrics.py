@@ -0,0 +1,202 @@
+"""
+Lightweight hot-path instrumentation for the ML entry points.
+
+Counters and latency histograms are rendered in Prometheus text format and,
+when METRICS_PORT is set, served on /metrics (plus /health) from a background
+thread. Recording is off until init() enables it; while disabled, timed()
+hands back a shared no-op context manager and inc() returns immediately, so
+instrumented code pays little more than a function call.
+
+Usage:
+    import metrics
+    metrics.init("predict_live")
+
+    with metrics.timed("fetch"):
+        response = requests.get(api_url)
+    metrics.inc("readings", len(df))
+"""
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds in seconds; covers sub-millisecond forwards up to slow API polls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+enabled = False
+entrypoint = "unknown"
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+_server = None
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        i = bisect_left(self.buckets, value)
+        with _lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+
+class _Timer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+class _NoopTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopTimer()
+
+
+def histogram(stage):
+    hist = _histograms.get(stage)
+    if hist is None:
+        with _lock:
+            hist = _histograms.setdefault(stage, Histogram())
+    return hist
+
+
+def timed(stage):
+    """Context manager recording the duration of a stage."""
+    if not enabled:
+        return _NOOP
+    return _Timer(histogram(stage))
+
+
+def observe(stage, seconds):
+    if enabled:
+        histogram(stage).observe(seconds)
+
+
+def inc(event, amount=1):
+    if not enabled:
+        return
+    with _lock:
+        _counters[event] = _counters.get(event, 0) + amount
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+def render():
+    """Render all metrics in Prometheus text exposition format."""
+    lines = [
+        "# HELP spectrawatt_stage_seconds Time spent in each hot-path stage",
+        "# TYPE spectrawatt_stage_seconds histogram",
+    ]
+    with _lock:
+        histograms = {k: (list(h.counts), h.sum, h.count, h.buckets) for k, h in _histograms.items()}
+        counters = dict(_counters)
+
+    base = f'entrypoint="{entrypoint}"'
+    for stage, (counts, total, count, buckets) in sorted(histograms.items()):
+        labels = f'{base},stage="{stage}"'
+        cumulative = 0
+        for bound, n in zip(buckets, counts):
+            cumulative += n
+            lines.append(f'spectrawatt_stage_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'spectrawatt_stage_seconds_bucket{{{labels},le="+Inf"}} {count}')
+        lines.append(f"spectrawatt_stage_seconds_sum{{{labels}}} {total}")
+        lines.append(f"spectrawatt_stage_seconds_count{{{labels}}} {count}")
+
+    lines.append("# HELP spectrawatt_events_total Count of events seen on the hot path")
+    lines.append("# TYPE spectrawatt_events_total counter")
+    for event, value in sorted(counters.items()):
+        lines.append(f'spectrawatt_events_total{{{base},event="{event}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+
+def summary():
+    """Plain-text per-stage summary, for one-shot scripts that exit before a scrape."""
+    with _lock:
+        rows = sorted((k, h.count, h.sum) for k, h in _histograms.items())
+        counters = sorted(_counters.items())
+    lines = [f"{'Stage':<14} {'Count':>8} {'Mean ms':>10} {'Total s':>10}"]
+    for stage, count, total in rows:
+        mean_ms = total * 1000 / count if count else 0.0
+        lines.append(f"{stage:<14} {count:>8} {mean_ms:>10.3f} {total:>10.3f}")
+    lines.extend(f"{event:<14} {value:>8}" for event, value in counters)
+    return "\n".join(lines)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.startswith("/metrics"):
+            body, content_type = render(), "text/plain; version=0.0.4; charset=utf-8"
+        elif self.path.startswith("/health"):
+            body, content_type = json.dumps({"status": "healthy", "entrypoint": entrypoint}), "application/json"
+        else:
+            self.send_error(404)
+            return
+        payload = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port, host="0.0.0.0"):
+    """Serve /metrics and /health from a daemon thread."""
+    global _server
+    if _server is None:
+        _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, daemon=True).start()
+    return _server
+
+
+def init(name, port=None, enable=False, endpoint=True):
+    """
+    Label metrics with the entry point name and enable recording.
+
+    Recording is enabled when METRICS_PORT (or ``port``) is set, when
+    METRICS_ENABLED=1, or with enable=True; the HTTP endpoint is only started
+    when a port is given. Servers that expose render() themselves pass
+    endpoint=False: METRICS_PORT is then ignored, since it may well be the
+    server's own port.
+    """
+    global enabled, entrypoint
+    entrypoint = name
+    port = (port or os.environ.get("METRICS_PORT")) if endpoint else None
+    enabled = enable or bool(port) or os.environ.get("METRICS_ENABLED", "0") == "1"
+    if port:
+        try:
+            serve(int(port))
+        except OSError as e:
+            print(f"⚠️  Metrics endpoint unavailable on port {port}: {e}")
+    return enabled
@@ -1,3 +1,4 @@
+import os
 import torch.nn as nn
 import torch
 
@@ -21,3 +22,167 @@ class EnergyFingerprintNet(nn.Module):
         h = self.dropout(self.fc1(h))
         return self.fc2(h)
 
+
+
+class EnergyFingerprintTCN(nn.Module):
+    """Small dilated 1-D conv student for low-latency CPU inference."""
+
+    def __init__(self, input_size=4, channels=32, num_classes=3, kernel_size=3, dilations=(1, 2, 4)):
+        super().__init__()
+        layers = []
+        in_channels = input_size
+        for dilation in dilations:
+            layers += [
+                nn.Conv1d(in_channels, channels, kernel_size,
+                          dilation=dilation, padding=dilation * (kernel_size - 1) // 2),
+                nn.ReLU(),
+            ]
+            in_channels = channels
+        self.conv = nn.Sequential(*layers)
+        self.fc = nn.Linear(channels, num_classes)
+
+    def forward(self, x):
+        # (batch, time, features) -> (batch, features, time) for Conv1d
+        h = self.conv(x.transpose(1, 2))
+        return self.fc(h.mean(dim=2))
+
+
+class EnergyFingerprintGRU(nn.Module):
+    """Single-direction GRU student."""
+
+    def __init__(self, input_size=4, hidden_size=32, num_classes=3):
+        super().__init__()
+        self.gru = nn.GRU(input_size, hidden_size, batch_first=True)
+        self.fc = nn.Linear(hidden_size, num_classes)
+
+    def forward(self, x):
+        _, h_n = self.gru(x)
+        return self.fc(h_n[-1])
+
+
+class EnergyFingerprintSeqLSTM(nn.Module):
+    """
+    Single-direction LSTM trained statefully (truncated BPTT) on whole device
+    timelines. The bidirectional teacher cannot carry state forward, since its
+    backward pass reads the future. Windows are classified from the last
+    step's state, like the other models.
+    """
+
+    def __init__(self, input_size=4, hidden_size=128, num_classes=3):
+        super().__init__()
+        self.lstm = nn.LSTM(input_size, hidden_size, batch_first=True)
+        self.fc1 = nn.Linear(hidden_size, 64)
+        self.dropout = nn.Dropout(0.3)
+        self.fc2 = nn.Linear(64, num_classes)
+
+    def head(self, h):
+        return self.fc2(self.dropout(self.fc1(h)))
+
+    def forward(self, x):
+        _, (h_n, _) = self.lstm(x)
+        return self.head(h_n[-1])
+
+    def forward_sequence(self, x, state=None):
+        """Logits at every timestep of x, and the (h, c) state to carry into the next chunk."""
+        out, state = self.lstm(x, state)
+        return self.head(out), state
+
+
+MODEL_ARCHS = {
+    "lstm": EnergyFingerprintNet,
+    "tcn": EnergyFingerprintTCN,
+    "gru": EnergyFingerprintGRU,
+    "lstm-seq": EnergyFingerprintSeqLSTM,
+}
+
+MODEL_FILES = {
+    "lstm": "energy_model.pt",
+    "tcn": "energy_model_tcn.pt",
+    "gru": "energy_model_gru.pt",
+    "lstm-seq": "energy_model_seq.pt",
+}
+
+
+def build_model(arch="lstm", input_size=4, num_classes=3):
+    if arch not in MODEL_ARCHS:
+        raise ValueError(f"Unknown model architecture '{arch}' (choose from {', '.join(MODEL_ARCHS)})")
+    return MODEL_ARCHS[arch](input_size=input_size, num_classes=num_classes)
+
+
+def compiled_model_path(models_dir, arch="lstm", window_size=10):
+    """TorchScript artifacts are traced for one window size, which is part of the file name."""
+    return os.path.join(models_dir, MODEL_FILES[arch].replace(".pt", f"_w{window_size}.ts"))
+
+
+def load_model(models_dir, num_classes, arch="lstm", compiled=False, window_size=10, mmap=False):
+    """
+    Load trained weights for inference.
+
+    With ``compiled=True`` the frozen TorchScript artifact written by
+    export_model.py is loaded instead of building the eager module.
+
+    With ``mmap=True`` the eager module's parameters are memory-mapped from
+    the checkpoint instead of copied onto the heap, so every process serving
+    the same file shares one copy of the weights in the page cache.
+    """
+    if compiled:
+        path = compiled_model_path(models_dir, arch, window_size)
+        if not os.path.exists(path):
+            print(f"⚠️  {os.path.basename(path)} not found (run src/export_model.py export) - using eager model")
+            return load_model(models_dir, num_classes, arch, mmap=mmap)
+        model = torch.jit.load(path)
+        # The profiling executor specializes the graph on the first calls; pay that at load time
+        with torch.no_grad():
+            for _ in range(2):
+                model(torch.zeros(1, window_size, 4))
+        return model
+    model = build_model(arch, num_classes=num_classes)
+    path = os.path.join(models_dir, MODEL_FILES[arch])
+    if mmap:
+        # assign=True keeps the mapped tensors as the parameters rather than copying into fresh ones
+        model.load_state_dict(torch.load(path, mmap=True, weights_only=True), assign=True)
+    else:
+        model.load_state_dict(torch.load(path))
+    model.eval()
+    return model
+
+
+def training_state_path(models_dir, arch="lstm"):
+    """Optimizer state, classes and data watermark saved next to the weights for incremental runs."""
+    return os.path.join(models_dir, MODEL_FILES[arch].replace(".pt", ".state.pt"))
+
+
+def output_layer(model):
+    """The final nn.Linear producing class logits."""
+    return [m for m in model.modules() if isinstance(m, nn.Linear)][-1]
+
+
+def grow_output_layer(model, index_map, num_classes, optimizer_state=None):
+    """
+    Resize the output layer for a grown label set.
+
+    Row i of the old layer moves to row ``index_map[i]``; rows for new classes
+    keep a fresh initialisation. If an optimizer state dict for the old model
+    is given, its per-parameter state (e.g. Adam moments) for the output layer
+    is remapped the same way, with zeros for the new rows.
+    """
+    layer = output_layer(model)
+    params = list(model.parameters())
+    positions = [i for i, p in enumerate(params) if p is layer.weight or p is layer.bias]
+
+    grown = nn.Linear(layer.in_features, num_classes)
+    with torch.no_grad():
+        grown.weight[index_map] = layer.weight
+        grown.bias[index_map] = layer.bias
+    layer.weight, layer.bias = grown.weight, grown.bias
+    layer.out_features = num_classes
+
+    if optimizer_state is not None:
+        for position in positions:
+            state = optimizer_state["state"].get(position, {})
+            for key, value in state.items():
+                if torch.is_tensor(value) and value.dim() > 0:
+                    resized = value.new_zeros((num_classes,) + value.shape[1:])
+                    resized[index_map] = value
+                    state[key] = resized
+    return model
@@ -1,83 +1,241 @@
-import torch
-import joblib
-import numpy as np
+"""
+REST API for the ML service, plus a one-shot check against the readings API.
+
+    uvicorn src.predict_api:app --host 0.0.0.0 --port 8000
+
+POST /api/data takes readings pushed in the Go API's PostDataHandler format
+(one object or a batch of up to 1000), buffers them per device and classifies
+each device's newest window in the same request. Running this file directly
+fetches /api/data once and scores every window instead.
+"""
 import os
+import sys
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Optional
+
+# uvicorn imports this module as src.predict_api; the flat src modules import each other by name
+_src_dir = os.path.dirname(os.path.abspath(__file__))
+if _src_dir not in sys.path:
+    sys.path.insert(0, _src_dir)
+
+import numpy as np
 import requests
 import pandas as pd
-from model import EnergyFingerprintNet
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
 
-# Set paths relative to project root
-project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-models_dir = os.path.join(project_root, "models")
+import cascade
+import gate as change_gate
+import metrics
+from device_buffers import MAX_PAYLOAD_BYTES, DeviceBuffers, PayloadError, parse_payload
+from inference import FEATURES, WINDOW_SIZE, get_predictor, sliding_windows
+from prediction_trace import record_prediction
+import timeline as prediction_timeline
 
-scaler = joblib.load(os.path.join(models_dir, "scaler.pkl"))
-label_encoder = joblib.load(os.path.join(models_dir, "label_encoder.pkl"))
-irms_weight = joblib.load(os.path.join(models_dir, "irms_weight.pkl"))
+api_base_url = os.environ.get("SPECTRAWATT_API_URL", "https://api.spectrawatt.upayan.dev")
 
-model = EnergyFingerprintNet(num_classes=len(label_encoder.classes_))
-model.load_state_dict(torch.load(os.path.join(models_dir, "energy_model.pt")))
-model.eval()
+buffers = DeviceBuffers(WINDOW_SIZE)
+recent_predictions = deque(maxlen=100)
+cascade_predictor = None
+gate = None
+timeline = None
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global cascade_predictor, gate, timeline
+    # /metrics is served by this app; a side server on METRICS_PORT would take the app's port in the image
+    metrics.init("predict_api", enable=True, endpoint=False)
+    cascade_predictor = cascade.from_env()
+    gate = change_gate.from_env(cascade_predictor)
+    timeline = prediction_timeline.from_env("predict_api")
+    # Load the model now rather than inside the first push
+    await run_in_threadpool(get_predictor)
+    yield
 
-def predict_device(window):
-    # Apply irms weight to match training preprocessing
-    window = window.copy()
-    window[:, 1] = window[:, 1] * irms_weight
-    
-    window = scaler.transform(window)
-    window = torch.tensor(window, dtype=torch.float32).unsqueeze(0)
 
-    with torch.no_grad():
-        logits = model(window)
-        probs = torch.softmax(logits, dim=1)
-        confidence, pred = torch.max(probs, dim=1)
+app = FastAPI(title="Spectrawatt ML", lifespan=lifespan)
+
+
+def classify(windows, devices):
+    """Classify stacked raw windows, one per device; returns (labels, confidences, tiers or None, executed or None)."""
+    if gate is not None:
+        labels, confidences, details, executed = gate.predict_many(devices, windows)
+        return labels, confidences, details if cascade_predictor is not None else None, executed
+    if cascade_predictor is not None:
+        return (*cascade_predictor.predict_many(windows), None)
+    labels, confidences, _ = get_predictor().predict_many(windows)
+    return labels, confidences, None, None
+
+
+def ingest_readings(readings):
+    """Buffer parsed readings and classify every device whose window is full."""
+    received = time.perf_counter()
+    with metrics.timed("push"):
+        ready = buffers.push(readings)
+        predictions = []
+        if ready:
+            devices = sorted(ready)
+            labels, confidences, tiers, executed = classify(np.stack([ready[d][0] for d in devices]), devices)
+            for i, device_id in enumerate(devices):
+                _, ts, count = ready[device_id]
+                prediction = {
+                    "device_id": device_id,
+                    "timestamp": pd.Timestamp(ts, unit="ms", tz="UTC").isoformat(),
+                    "predicted": str(labels[i]),
+                    "confidence": float(confidences[i]),
+                    "readings": count,
+                }
+                if tiers is not None:
+                    prediction["tier"] = str(tiers[i])
+                if executed is not None:
+                    prediction["gated"] = bool(not executed[i])
+                predictions.append(prediction)
+                recent_predictions.append(prediction)
+                record_prediction("push", ts, labels[i], float(confidences[i]), count)
+            if timeline is not None:
+                timeline.extend(devices, [ready[d][1] for d in devices], labels, confidences)
+    metrics.inc("pushed_readings", len(readings))
+    return {
+        "status": "success",
+        "message": f"Received {len(readings)} readings",
+        "received": len(readings),
+        "devices": sorted({device_id for device_id, _, _ in readings}),
+        "predictions": predictions,
+        "latency_ms": (time.perf_counter() - received) * 1000,
+    }
+
+
+def handle_push(body):
+    """Return (status code, response) for a raw POST /api/data body."""
+    try:
+        readings = parse_payload(body)
+    except PayloadError as e:
+        return e.status, str(e)
+    return 200, ingest_readings(readings)
+
+
+@app.post("/api/data")
+async def push_data(request: Request):
+    if int(request.headers.get("content-length") or 0) > MAX_PAYLOAD_BYTES:
+        return PlainTextResponse("Payload too large\n", status_code=413)
+    status, response = await run_in_threadpool(handle_push, await request.body())
+    if status != 200:
+        return PlainTextResponse(response + "\n", status_code=status)
+    return response
+
+
+@app.post("/predict")
+def predict(payload: dict):
+    """Classify the last window_size of a list of raw readings."""
+    readings = payload.get("readings") or []
+    if len(readings) < WINDOW_SIZE:
+        raise HTTPException(400, f"Need at least {WINDOW_SIZE} readings, got {len(readings)}")
+    try:
+        window = np.array([[float(r[f]) for f in FEATURES] for r in readings[-WINDOW_SIZE:]])
+    except (KeyError, TypeError, ValueError) as e:
+        raise HTTPException(400, f"Invalid reading: {e}") from None
+    predictor = get_predictor()
+    label, confidence, probs = predictor.predict(window)
+    return {
+        "predicted": str(label),
+        "confidence": confidence,
+        "probabilities": {str(c): float(p) for c, p in zip(predictor.classes, probs)},
+    }
+
+
+@app.get("/predictions")
+def predictions(device_id: Optional[str] = None, limit: int = 100):
+    """Most recent push predictions, oldest first."""
+    items = [p for p in list(recent_predictions) if device_id is None or p["device_id"] == device_id]
+    return items[-limit:]
+
+
+@app.get("/timeline")
+def prediction_timeline_range(device_id: Optional[str] = None, start: Optional[str] = None,
+                              end: Optional[str] = None, resolution: str = "auto",
+                              max_points: int = prediction_timeline.MAX_POINTS):
+    """Downsampled push predictions between two ISO timestamps, one entry per device and bucket."""
+    if timeline is None:
+        raise HTTPException(404, "Prediction timeline is disabled (TIMELINE_DIR is empty)")
+    try:
+        df = timeline.query(device_id, start, end, resolution, max_points)
+    except ValueError as e:
+        raise HTTPException(400, str(e)) from None
+    return [
+        {
+            "device_id": str(row.device_id),
+            "timestamp": row.timestamp.isoformat(),
+            "label": str(row.label),
+            "share": float(row.share),
+            "confidence": float(row.confidence),
+            "count": int(row.count),
+        }
+        for row in df.itertuples(index=False)
+    ]
+
+
+@app.get("/health")
+def health():
+    return {"status": "healthy", "entrypoint": metrics.entrypoint, "devices": len(buffers.devices())}
+
+
+@app.get("/metrics")
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
-    return label_encoder.inverse_transform([pred.item()])[0], confidence.item(), probs.cpu().numpy()[0]
 
 
 # Fetch data from API
 if __name__ == "__main__":
-    api_url = "https://api.spectrawatt.upayan.dev/api/data"
+    api_url = f"{api_base_url}/api/data"
+    metrics.init("predict_api")
     
     print("Fetching data from API...")
     try:
-        response = requests.get(api_url)
-        response.raise_for_status()
-        api_data = response.json()
+        with metrics.timed("fetch"):
+            response = requests.get(api_url)
+            response.raise_for_status()
         
-        # Parse the nested structure
-        all_readings = []
-        for device_entry in api_data:
-            device_id = device_entry.get("device_id")
-            readings = device_entry.get("data", [])
+        with metrics.timed("parse"):
+            api_data = response.json()
             
-            for reading in readings:
-                reading["device_id"] = device_id
-                all_readings.append(reading)
+            # Parse the nested structure
+            all_readings = []
+            for device_entry in api_data:
+                device_id = device_entry.get("device_id")
+                readings = device_entry.get("data", [])
+                
+                for reading in readings:
+                    reading["device_id"] = device_id
+                    all_readings.append(reading)
+        metrics.inc("readings", len(all_readings))
         
-        df = pd.DataFrame(all_readings)
+        with metrics.timed("frame"):
+            df = pd.DataFrame(all_readings)
         
         print(f"Received {len(df)} total readings from {len(api_data)} devices\n")
         print("Data columns:", df.columns.tolist())
         print("\nFirst few rows:")
         print(df.head())
         
-        # Get required features
-        features = ["vrms", "irms", "apparent_power", "wh"]
-        
         # Check if all features are present
-        missing_features = [f for f in features if f not in df.columns]
+        missing_features = [f for f in FEATURES if f not in df.columns]
         if missing_features:
             print(f"\nWarning: Missing features: {missing_features}")
             print("Available columns:", df.columns.tolist())
         else:
             # Make predictions on windows of 10 samples
-            window_size = 10
-            X = df[features].values
+            predictor = get_predictor()
+            window_size = predictor.window_size
+            X = df[FEATURES].values
             actual_devices = df["device_id"].values
             
             # Filter to only the 3 trained devices
-            trained_devices = ['Bulb-100w', 'Bulb-60w', 'Soldering-Iron']
-            mask = df["device_id"].isin(trained_devices)
+            mask = df["device_id"].isin(predictor.classes)
             X = X[mask]
             actual_devices = actual_devices[mask]
             
@@ -86,17 +244,15 @@ if __name__ == "__main__":
             print(f"{'Window':<10} {'Status':<8} {'Actual Device':<20} {'Predicted':<20} {'Confidence':<12}")
             print("="*80)
             
-            import sys
+            # Every window in one batched forward pass
+            predicted, confidences, _ = predictor.predict_many(sliding_windows(X, window_size))
+            
             correct_count = 0
             total = 0
             
-            for i in range(len(X) - window_size):
-                # Get window of 10 samples
-                test_window = X[i:i+window_size]
+            for i, (predicted_device, confidence) in enumerate(zip(predicted, confidences)):
                 actual_device = actual_devices[i+window_size]
                 
-                predicted_device, confidence, probs = predict_device(test_window)
-                
                 is_correct = predicted_device == actual_device
                 if is_correct:
                     correct_count += 1
@@ -105,8 +261,9 @@ if __name__ == "__main__":
                 status = "✓ PASS" if is_correct else "✗ FAIL"
                 
                 # Live output
-                print(f"{i+1:<10} {status:<8} {actual_device:<20} {predicted_device:<20} {confidence:>10.4f}")
-                sys.stdout.flush()
+                with metrics.timed("output"):
+                    print(f"{i+1:<10} {status:<8} {actual_device:<20} {predicted_device:<20} {confidence:>10.4f}")
+                    sys.stdout.flush()
             
             print("="*80)
             if total > 0:
@@ -115,6 +272,9 @@ if __name__ == "__main__":
                 print(f"✓ Correct: {correct_count} | ✗ Incorrect: {total - correct_count}")
             print("="*80)
             
+            if metrics.enabled:
+                print(metrics.summary())
+            
     except requests.exceptions.RequestException as e:
         print(f"Error fetching data from API: {e}")
     except Exception as e:
@@ -1,129 +1,163 @@
-import torch
-import joblib
-import numpy as np
 import os
 import requests
+import numpy as np
 import pandas as pd
-from model import EnergyFingerprintNet
+from inference import FEATURES, WINDOW_SIZE, get_predictor
+import cascade
+import gate as change_gate
+import metrics
+from reading_log import ReadingLog
+from prediction_trace import record_prediction
+import timeline as prediction_timeline
 import time
 import sys
 
-# Set paths relative to project root
-project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-models_dir = os.path.join(project_root, "models")
+api_base_url = os.environ.get("SPECTRAWATT_API_URL", "https://api.spectrawatt.upayan.dev")
+poll_interval = float(os.environ.get("POLL_INTERVAL", 2))
 
-scaler = joblib.load(os.path.join(models_dir, "scaler.pkl"))
-label_encoder = joblib.load(os.path.join(models_dir, "label_encoder.pkl"))
-irms_weight = joblib.load(os.path.join(models_dir, "irms_weight.pkl"))
+# Optional append-only log of every reading seen while polling
+reading_log_path = os.environ.get("READING_LOG_PATH")
+reading_log = ReadingLog(reading_log_path) if reading_log_path else None
 
-model = EnergyFingerprintNet(num_classes=len(label_encoder.classes_))
-model.load_state_dict(torch.load(os.path.join(models_dir, "energy_model.pt")))
-model.eval()
+# CASCADE=1 lets the NILM KNN answer steady, well-separated windows before the LSTM
+cascade_predictor = cascade.from_env()
 
-def predict_device(window):
-    # Apply irms weight to match training preprocessing
-    window = window.copy()
-    window[:, 1] = window[:, 1] * irms_weight
-    
-    window = scaler.transform(window)
-    window = torch.tensor(window, dtype=torch.float32).unsqueeze(0)
+# GATE=1 reuses the last answer until the meter's load changes (or GATE_MAX_AGE passes)
+gate = change_gate.from_env(cascade_predictor)
+
+
+def poll_once(api_url, timeline=None, window_size=WINDOW_SIZE):
+    """One poll cycle: fetch /api/data, predict on each meter's newest window and print them.
+
+    Returns False while no meter has window_size readings.
+    """
+    with metrics.timed("fetch"):
+        response = requests.get(api_url)
+        response.raise_for_status()
+
+    with metrics.timed("parse"):
+        api_data = response.json()
+
+        # Parse the nested structure
+        all_readings = []
+        for device_entry in api_data:
+            device_id = device_entry.get("device_id")
+            readings = device_entry.get("data", [])
+
+            for reading in readings:
+                reading["device_id"] = device_id
+                all_readings.append(reading)
+    metrics.inc("polls")
+    metrics.inc("readings", len(all_readings))
+
+    if reading_log is not None:
+        with metrics.timed("reading_log"):
+            reading_log.append_readings(all_readings)
+
+    with metrics.timed("frame"):
+        df = pd.DataFrame(all_readings)
+        if len(df):
+            # /api/data lists each meter's readings newest first; windows run oldest to newest
+            df["time"] = pd.to_datetime(df["timestamp"], utc=True, format="ISO8601")
+            df = df.sort_values("time", kind="stable")
+        # One window per meter: interleaved meters must not share a window (or a gate state)
+        meters = dict(tuple(df.groupby("device_id", sort=True))) if len(df) else {}
+        devices = [d for d, readings in meters.items() if len(readings) >= window_size]
+
+    if not devices:
+        most = max((len(readings) for readings in meters.values()), default=0)
+        print(f"Waiting for more data... ({most}/{window_size} readings)")
+        return False
+
+    # Make a prediction on the last window of each meter
+    windows = np.stack([meters[d][FEATURES].values[-window_size:] for d in devices])
+    timestamps = [meters[d]["timestamp"].iloc[-1] for d in devices]
+    executed = None
+    if gate is not None:
+        labels, confidences, details, executed = gate.predict_many(devices, windows)
+        probs, tiers = (None, details) if cascade_predictor is not None else (details, None)
+    elif cascade_predictor is not None:
+        labels, confidences, tiers = cascade_predictor.predict_many(windows)
+        probs = None
+    else:
+        labels, confidences, probs = get_predictor().predict_many(windows)
+    for i, device_id in enumerate(devices):
+        record_prediction("predict_live", timestamps[i], labels[i], float(confidences[i]), len(meters[device_id]))
+
+    with metrics.timed("output"):
+        print(f"\n{'='*80}")
+        print(f"CURRENT PREDICTION (Last {window_size} readings per meter)")
+        print(f"{'='*80}")
+        for i, device_id in enumerate(devices):
+            print(f"\n📟 Meter: {device_id}")
+            print(f"🔌 Device Detected: {labels[i]}")
+            print(f"📊 Confidence: {confidences[i]*100:.2f}%")
+            if executed is not None and not executed[i]:
+                print(f"♻️  Reused: no load change since the last inference")
+            if probs is None:
+                print(f"🧭 Answered by: {tiers[i].upper()} tier")
+            else:
+                # Get all class probabilities
+                print(f"\nClass Probabilities:")
+                for j, class_name in enumerate(get_predictor().classes):
+                    bar_length = int(probs[i][j] * 40)
+                    bar = "█" * bar_length + "░" * (40 - bar_length)
+                    print(f"  {class_name:<20} {bar} {probs[i][j]*100:>6.2f}%")
 
-    with torch.no_grad():
-        logits = model(window)
-        probs = torch.softmax(logits, dim=1)
-        confidence, pred = torch.max(probs, dim=1)
+        print(f"\nTotal readings in API: {len(df)}")
+        print(f"Data updated at: {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')}")
 
-    return label_encoder.inverse_transform([pred.item()])[0], confidence.item(), probs.cpu().numpy()[0]
+        if timeline is not None:
+            # Store predictions
+            with metrics.timed("timeline"):
+                timeline.extend(devices, timestamps, labels, confidences)
+
+            # Show recent history
+            recent = timeline.recent(5)
+            if len(recent) > 1:
+                print(f"\nRecent Predictions (Last 5):")
+                for i, pred in enumerate(recent.itertuples(), 1):
+                    print(f"  {i}. {pred.label} ({pred.confidence*100:.1f}%)")
+
+        print(f"{'='*80}\n")
+    return True
 
 
 # Live prediction from API
 if __name__ == "__main__":
-    api_url = "https://api.spectrawatt.upayan.dev/api/data"
+    api_url = f"{api_base_url}/api/data"
+    metrics.init("predict_live")
     
     print("\n" + "="*80)
     print("LIVE ENERGY DEVICE FINGERPRINTING")
     print("="*80)
     print("\nMonitoring API for real-time predictions...\n")
     
-    last_timestamp = None
-    window_size = 10
-    device_history = []
+    # Predictions are kept in a downsampled on-disk timeline unless TIMELINE_DIR=""
+    timeline = prediction_timeline.from_env("predict_live")
+    if timeline is not None:
+        print(f"Recording predictions to {timeline.path}\n")
+    session_start = len(timeline) if timeline is not None else 0
     
     try:
         while True:
             try:
-                response = requests.get(api_url)
-                response.raise_for_status()
-                api_data = response.json()
-                
-                # Parse the nested structure
-                all_readings = []
-                for device_entry in api_data:
-                    device_id = device_entry.get("device_id")
-                    readings = device_entry.get("data", [])
-                    
-                    for reading in readings:
-                        reading["device_id"] = device_id
-                        all_readings.append(reading)
-                
-                df = pd.DataFrame(all_readings)
-                
-                if len(df) < window_size:
-                    print(f"Waiting for more data... ({len(df)}/{window_size} readings)")
+                cycle_start = time.perf_counter()
+                if not poll_once(api_url, timeline):
                     time.sleep(1)
                     continue
-                
-                # Get required features
-                features = ["vrms", "irms", "apparent_power", "wh"]
-                X = df[features].values
-                
-                # Make prediction on the last window
-                test_window = X[-window_size:]
-                predicted_device, confidence, probs = predict_device(test_window)
-                
-                # Get all class probabilities
-                print(f"\n{'='*80}")
-                print(f"CURRENT PREDICTION (Last {window_size} readings)")
-                print(f"{'='*80}")
-                print(f"\n🔌 Device Detected: {predicted_device}")
-                print(f"📊 Confidence: {confidence*100:.2f}%")
-                print(f"\nClass Probabilities:")
-                for i, class_name in enumerate(label_encoder.classes_):
-                    bar_length = int(probs[i] * 40)
-                    bar = "█" * bar_length + "░" * (40 - bar_length)
-                    print(f"  {class_name:<20} {bar} {probs[i]*100:>6.2f}%")
-                
-                print(f"\nTotal readings in API: {len(df)}")
-                print(f"Data updated at: {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')}")
-                
-                # Store prediction
-                device_history.append({
-                    'timestamp': pd.Timestamp.now(),
-                    'device': predicted_device,
-                    'confidence': confidence
-                })
-                
-                # Keep only last 100 predictions
-                if len(device_history) > 100:
-                    device_history.pop(0)
-                
-                # Show recent history
-                if len(device_history) > 1:
-                    recent = device_history[-5:]
-                    print(f"\nRecent Predictions (Last 5):")
-                    for i, pred in enumerate(recent, 1):
-                        print(f"  {i}. {pred['device']} ({pred['confidence']*100:.1f}%)")
-                
-                print(f"{'='*80}\n")
+                metrics.observe("cycle", time.perf_counter() - cycle_start)
                 
                 # Poll every 2 seconds
-                time.sleep(2)
+                time.sleep(poll_interval)
                 
             except requests.exceptions.RequestException as e:
+                metrics.inc("api_errors")
                 print(f"⚠️  API Error: {e}")
                 print("Retrying in 5 seconds...\n")
                 time.sleep(5)
             except Exception as e:
+                metrics.inc("errors")
                 print(f"⚠️  Error: {e}")
                 print("Retrying in 5 seconds...\n")
                 time.sleep(5)
@@ -131,10 +165,16 @@ if __name__ == "__main__":
     except KeyboardInterrupt:
         print("\n\n" + "="*80)
         print("Monitoring stopped by user")
-        if device_history:
+        if timeline is not None and len(timeline) > session_start:
+            session = timeline.recent(len(timeline) - session_start)
             print(f"\nSession Summary:")
-            print(f"  Total predictions: {len(device_history)}")
-            df_history = pd.DataFrame(device_history)
-            print(f"  Most common device: {df_history['device'].mode()[0] if len(df_history) > 0 else 'N/A'}")
-            print(f"  Average confidence: {df_history['confidence'].mean()*100:.2f}%")
+            print(f"  Total predictions: {len(timeline) - session_start}")
+            print(f"  Most common device: {session['label'].mode()[0]}")
+            print(f"  Average confidence: {session['confidence'].mean()*100:.2f}%")
+        if cascade_predictor is not None:
+            print(f"\nCascade:")
+            cascade.print_stats(cascade_predictor.stats())
+        if gate is not None:
+            print(f"\nChange-point gate:")
+            change_gate.print_stats(gate.stats())
         print("="*80 + "\n")
@@ -0,0 +1,32 @@
+"""
+Optional JSON-lines trace of live predictions.
+
+When PREDICTION_TRACE is set, every prediction appends one line with the
+timestamp of the newest reading it saw and the wall-clock time it was made.
+The replay harness reads these back to measure reading-to-prediction latency.
+"""
+import json
+import os
+import time
+
+from reading_log import to_epoch_ms
+
+trace_path = os.environ.get("PREDICTION_TRACE")
+_trace_file = None
+
+
+def record_prediction(target, reading_timestamp, label, confidence=None, readings=0):
+    global _trace_file
+    if not trace_path:
+        return
+    if _trace_file is None:
+        _trace_file = open(trace_path, "a", buffering=1)
+
+    _trace_file.write(json.dumps({
+        "target": target,
+        "reading_ts": to_epoch_ms(reading_timestamp) / 1000.0,
+        "predicted_at": time.time(),
+        "label": str(label),
+        "confidence": confidence,
+        "readings": readings,
+    }) + "\n")
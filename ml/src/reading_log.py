@@ -0,0 +1,349 @@
+"""
+Append-only binary reading log.
+
+Readings are stored as fixed-width little-endian records so the whole log can
+be opened with ``numpy.memmap`` and sliced without any parsing. A small JSON
+sidecar (``<log>.idx.json``) keeps the device-name table and a per-block
+index of timestamp ranges and device counts, which lets device/time queries
+skip blocks that cannot match.
+
+Usage:
+    python src/reading_log.py import data/spectrawatt.energy_data.csv
+    python src/reading_log.py info data/readings.log
+"""
+import argparse
+import json
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+
+FEATURES = ["vrms", "irms", "apparent_power", "wh"]
+
+RECORD_DTYPE = np.dtype([
+    ("device", "<i4"),
+    ("timestamp", "<i8"),   # epoch milliseconds, UTC
+    ("vrms", "<f4"),
+    ("irms", "<f4"),
+    ("apparent_power", "<f4"),
+    ("wh", "<f4"),
+])
+
+LOG_SUFFIX = ".log"
+INDEX_VERSION = 1
+DEFAULT_BLOCK_SIZE = 4096
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_LOG_PATH = os.path.join(project_root, "data", "readings.log")
+
+
+def to_epoch_ms(timestamp):
+    """Convert an ISO string, datetime or epoch-ms number to epoch milliseconds."""
+    if isinstance(timestamp, (int, np.integer)):
+        return int(timestamp)
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return int(round(timestamp.timestamp() * 1000))
+
+
+def is_reading_log(path):
+    return str(path).endswith(LOG_SUFFIX)
+
+
+class ReadingLog:
+    def __init__(self, path=DEFAULT_LOG_PATH, block_size=DEFAULT_BLOCK_SIZE):
+        self.path = str(path)
+        self.index_path = self.path + ".idx.json"
+        self.block_size = block_size
+        self.devices = []
+        self.blocks = []
+        self.last_timestamp = {}
+        self._codes = {}
+
+        if os.path.exists(self.index_path):
+            self._load_index()
+        self._recover()
+
+    # ------------------------------------------------------------------
+    # Index handling
+    # ------------------------------------------------------------------
+    def _load_index(self):
+        with open(self.index_path, "r") as f:
+            index = json.load(f)
+        if index.get("version") != INDEX_VERSION or index.get("record_size") != RECORD_DTYPE.itemsize:
+            raise ValueError(f"Unsupported reading log index: {self.index_path}")
+        self.block_size = index["block_size"]
+        self.devices = index["devices"]
+        self.blocks = index["blocks"]
+        self.last_timestamp = index["last_timestamp"]
+        self._codes = {name: code for code, name in enumerate(self.devices)}
+
+    def _save_index(self):
+        index = {
+            "version": INDEX_VERSION,
+            "record_size": RECORD_DTYPE.itemsize,
+            "block_size": self.block_size,
+            "devices": self.devices,
+            "blocks": self.blocks,
+            "last_timestamp": self.last_timestamp,
+        }
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self.index_path)
+
+    def _indexed_count(self):
+        if not self.blocks:
+            return 0
+        return self.blocks[-1]["start"] + self.blocks[-1]["count"]
+
+    def _recover(self):
+        """Drop a torn trailing record and index records written after the last index save."""
+        if not os.path.exists(self.path):
+            return
+        size = os.path.getsize(self.path)
+        if size % RECORD_DTYPE.itemsize:
+            with open(self.path, "r+b") as f:
+                f.truncate(size - size % RECORD_DTYPE.itemsize)
+        indexed = self._indexed_count()
+        if len(self) > indexed:
+            self._index_records(self.records()[indexed:], indexed)
+            self._save_index()
+
+    def _index_records(self, records, start):
+        """Fold newly written records into the block index."""
+        pos = 0
+        while pos < len(records):
+            if self.blocks and self.blocks[-1]["count"] < self.block_size:
+                block = self.blocks[-1]
+            else:
+                block = {"start": start + pos, "count": 0, "ts_min": None, "ts_max": None, "devices": {}}
+                self.blocks.append(block)
+
+            take = min(self.block_size - block["count"], len(records) - pos)
+            chunk = records[pos:pos + take]
+            ts_min, ts_max = int(chunk["timestamp"].min()), int(chunk["timestamp"].max())
+            block["ts_min"] = ts_min if block["ts_min"] is None else min(block["ts_min"], ts_min)
+            block["ts_max"] = ts_max if block["ts_max"] is None else max(block["ts_max"], ts_max)
+            codes, counts = np.unique(chunk["device"], return_counts=True)
+            for code, count in zip(codes.tolist(), counts.tolist()):
+                block["devices"][str(code)] = block["devices"].get(str(code), 0) + count
+                name = self.devices[code]
+                last = int(chunk["timestamp"][chunk["device"] == code].max())
+                self.last_timestamp[name] = max(self.last_timestamp.get(name, last), last)
+            block["count"] += take
+            pos += take
+
+    def device_code(self, device_id, create=False):
+        code = self._codes.get(device_id)
+        if code is None and create:
+            code = len(self.devices)
+            self.devices.append(device_id)
+            self._codes[device_id] = code
+        return code
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+    def extend(self, device_ids, timestamps, vrms, irms, apparent_power, wh):
+        """Append a batch of readings given as parallel sequences."""
+        n = len(device_ids)
+        if n == 0:
+            return 0
+
+        known = len(self.devices)
+        records = np.empty(n, dtype=RECORD_DTYPE)
+        names, inverse = np.unique(np.asarray(device_ids, dtype=object), return_inverse=True)
+        codes = np.array([self.device_code(name, create=True) for name in names], dtype=np.int32)
+        records["device"] = codes[inverse]
+        timestamps = np.asarray(timestamps)
+        if timestamps.dtype.kind in "iu":
+            records["timestamp"] = timestamps
+        else:
+            records["timestamp"] = [to_epoch_ms(ts) for ts in timestamps]
+        records["vrms"] = vrms
+        records["irms"] = irms
+        records["apparent_power"] = apparent_power
+        records["wh"] = wh
+
+        # Persist new device names before any record refers to them
+        if len(self.devices) > known:
+            self._save_index()
+
+        start = len(self)
+        with open(self.path, "ab") as f:
+            f.write(records.tobytes())
+        self._index_records(records, start)
+        self._save_index()
+        return n
+
+    def append(self, device_id, timestamp, vrms, irms, apparent_power, wh):
+        return self.extend([device_id], [timestamp], [vrms], [irms], [apparent_power], [wh])
+
+    def append_readings(self, readings):
+        """
+        Append API-shaped reading dicts, skipping any already logged.
+
+        A reading is considered new when its timestamp is later than the last
+        logged timestamp for its device, so the full ``/api/data`` response can
+        be passed in on every poll.
+        """
+        fresh = []
+        for reading in readings:
+            device_id = reading.get("device_id")
+            try:
+                ts = to_epoch_ms(reading["timestamp"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if ts > self.last_timestamp.get(device_id, -1):
+                fresh.append((ts, device_id, reading))
+        if not fresh:
+            return 0
+
+        fresh.sort(key=lambda item: item[0])
+        return self.extend(
+            [device_id for _, device_id, _ in fresh],
+            [ts for ts, _, _ in fresh],
+            *[[r.get(f, 0.0) for _, _, r in fresh] for f in FEATURES],
+        )
+
+    def append_frame(self, df):
+        """Append every row of a DataFrame with the energy_data CSV columns."""
+        import pandas as pd
+
+        if len(df) == 0:
+            return 0
+        power_col = "apparent_power" if "apparent_power" in df.columns else "power"
+        timestamps = pd.to_datetime(df["timestamp"], utc=True).dt.as_unit("ms").astype("int64")
+        return self.extend(
+            df["device_id"].astype(str).tolist(),
+            timestamps.tolist(),
+            df["vrms"].to_numpy(),
+            df["irms"].to_numpy(),
+            df[power_col].to_numpy(),
+            df["wh"].to_numpy(),
+        )
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+    def __len__(self):
+        if not os.path.exists(self.path):
+            return 0
+        return os.path.getsize(self.path) // RECORD_DTYPE.itemsize
+
+    def records(self):
+        """Read-only memory map over every record in the log."""
+        n = len(self)
+        if n == 0:
+            return np.empty(0, dtype=RECORD_DTYPE)
+        return np.memmap(self.path, dtype=RECORD_DTYPE, mode="r", shape=(n,))
+
+    def query(self, device_id=None, start=None, end=None):
+        """
+        Return records for a device and/or ``[start, end]`` time range.
+
+        With no filters this is the memory map itself; otherwise only blocks
+        whose index entry can match are touched.
+        """
+        records = self.records()
+        if device_id is None and start is None and end is None:
+            return records
+
+        code = None
+        if device_id is not None:
+            code = self.device_code(device_id)
+            if code is None:
+                return np.empty(0, dtype=RECORD_DTYPE)
+        start_ms = None if start is None else to_epoch_ms(start)
+        end_ms = None if end is None else to_epoch_ms(end)
+
+        parts = []
+        for block in self.blocks:
+            if code is not None and str(code) not in block["devices"]:
+                continue
+            if start_ms is not None and block["ts_max"] < start_ms:
+                continue
+            if end_ms is not None and block["ts_min"] > end_ms:
+                continue
+            chunk = records[block["start"]:block["start"] + block["count"]]
+            mask = np.ones(len(chunk), dtype=bool)
+            if code is not None:
+                mask &= chunk["device"] == code
+            if start_ms is not None:
+                mask &= chunk["timestamp"] >= start_ms
+            if end_ms is not None:
+                mask &= chunk["timestamp"] <= end_ms
+            parts.append(chunk[mask])
+
+        if not parts:
+            return np.empty(0, dtype=RECORD_DTYPE)
+        return np.concatenate(parts)
+
+    def to_frame(self, records=None, epoch_ms=False):
+        """
+        Build a DataFrame (energy_data CSV columns) straight from record columns.
+
+        Timestamps are UTC datetimes, or int64 epoch milliseconds (the ingest
+        schema) with epoch_ms=True.
+        """
+        import pandas as pd
+
+        if records is None:
+            records = self.records()
+        timestamps = np.asarray(records["timestamp"])
+        return pd.DataFrame({
+            "device_id": pd.Categorical.from_codes(np.asarray(records["device"]), categories=self.devices)
+            if self.devices else pd.Categorical([]),
+            "timestamp": timestamps if epoch_ms else pd.to_datetime(timestamps, unit="ms", utc=True),
+            "vrms": np.asarray(records["vrms"]),
+            "irms": np.asarray(records["irms"]),
+            "apparent_power": np.asarray(records["apparent_power"]),
+            "wh": np.asarray(records["wh"]),
+        })
+
+
+def load_frame(path, **query):
+    """Load a reading log as a DataFrame, optionally filtered by device/time."""
+    log = ReadingLog(path)
+    return log.to_frame(log.query(**query))
+
+
+def import_csv(csv_path, log_path=DEFAULT_LOG_PATH, chunksize=100_000):
+    """Append an energy_data CSV export to a reading log."""
+    import pandas as pd
+
+    log = ReadingLog(log_path)
+    total = 0
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+        total += log.append_frame(chunk)
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the binary reading log")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = sub.add_parser("import", help="Append a CSV export to the log")
+    import_parser.add_argument("csv", help="energy_data CSV export")
+    import_parser.add_argument("--log", default=DEFAULT_LOG_PATH, help="Reading log path")
+
+    info_parser = sub.add_parser("info", help="Summarise a reading log")
+    info_parser.add_argument("log", nargs="?", default=DEFAULT_LOG_PATH, help="Reading log path")
+
+    args = parser.parse_args()
+
+    if args.command == "import":
+        count = import_csv(args.csv, args.log)
+        print(f"✅ Appended {count} readings to {args.log}")
+    else:
+        log = ReadingLog(args.log)
+        print(f"Reading log: {log.path}")
+        print(f"  Records: {len(log)} ({len(log) * RECORD_DTYPE.itemsize} bytes)")
+        print(f"  Blocks:  {len(log.blocks)} x {log.block_size}")
+        for device in log.devices:
+            last = log.last_timestamp.get(device)
+            last_str = datetime.fromtimestamp(last / 1000, tz=timezone.utc).isoformat() if last else "N/A"
+            print(f"  {device:<20} last reading {last_str}")
@@ -0,0 +1,163 @@
+"""
+Offline load-test harness for the live predictors.
+
+Starts a local replay stand-in (replay_server.py) and runs each live target
+against it as a subprocess with SPECTRAWATT_API_URL pointed at the stand-in.
+Targets record every prediction through prediction_trace.py, from which the
+harness reports reading-to-prediction latency, throughput and CPU per reading.
+
+Usage:
+    python src/replay_harness.py --speed 20 --duration 60 --poll-interval 0.5
+    python src/replay_harness.py --targets predict_live nilm --json replay_report.json
+"""
+import argparse
+import json
+import os
+import resource
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from replay_server import DEFAULT_DATA_PATH, ReplayFeed, ReplayServer
+from utils import load_readings
+
+src_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(src_dir)
+nilm_dir = os.path.join(os.path.dirname(project_root), "AI_ML", "NILM-Event-Based")
+
+TARGETS = {
+    "predict_live": ([sys.executable, os.path.join(src_dir, "predict_live.py")], project_root),
+    "current_device_live": ([sys.executable, os.path.join(src_dir, "current_device_live.py")], project_root),
+    "nilm": ([sys.executable, "run_live.py"], nilm_dir),
+}
+
+
+def _cpu_seconds(usage):
+    return usage.ru_utime + usage.ru_stime
+
+
+def _read_trace(trace_path):
+    if not os.path.exists(trace_path):
+        return []
+    with open(trace_path, "r") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def run_target(name, feed, server, duration, poll_interval, trace_dir):
+    """Replay the feed from the start against one target and summarise its trace."""
+    cmd, cwd = TARGETS[name]
+    trace_path = os.path.join(trace_dir, f"{name}.jsonl")
+    if os.path.exists(trace_path):
+        os.remove(trace_path)
+
+    env = os.environ.copy()
+    env.update({
+        "SPECTRAWATT_API_URL": server.url,
+        "PREDICTION_TRACE": trace_path,
+        "TIMELINE_DIR": os.path.join(trace_dir, f"{name}.timeline"),
+        "POLL_INTERVAL": str(poll_interval),
+        "PYTHONUNBUFFERED": "1",
+    })
+
+    usage_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    with open(os.path.join(trace_dir, f"{name}.log"), "w") as log_file:
+        started = time.time()
+        feed.start(started)
+        proc = subprocess.Popen(cmd, cwd=cwd, env=env, stdout=log_file, stderr=subprocess.STDOUT)
+
+        deadline = started + duration
+        while time.time() < deadline and proc.poll() is None and not feed.exhausted():
+            time.sleep(0.1)
+        # Give the target a couple of polls to pick up the final readings
+        if proc.poll() is None and feed.exhausted():
+            time.sleep(min(2 * poll_interval, max(0.0, deadline - time.time())))
+
+        released = feed.cursor()
+        stopped = time.time()
+        if proc.poll() is None:
+            proc.send_signal(signal.SIGINT)
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+    usage_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    trace = _read_trace(trace_path)
+    latencies = np.array([t["predicted_at"] - t["reading_ts"] for t in trace]) * 1000
+    wall = stopped - started
+    cpu = _cpu_seconds(usage_after) - _cpu_seconds(usage_before)
+
+    return {
+        "target": name,
+        "exit_code": proc.returncode,
+        "wall_s": wall,
+        "readings_replayed": released,
+        "predictions": len(trace),
+        "first_prediction_s": trace[0]["predicted_at"] - started if trace else None,
+        "readings_per_s": released / wall if wall > 0 else 0.0,
+        "predictions_per_s": len(trace) / wall if wall > 0 else 0.0,
+        "cpu_s": cpu,
+        "cpu_ms_per_reading": cpu * 1000 / released if released else None,
+        "latency_ms": {
+            "p50": float(np.percentile(latencies, 50)),
+            "p95": float(np.percentile(latencies, 95)),
+            "p99": float(np.percentile(latencies, 99)),
+            "max": float(latencies.max()),
+        } if len(latencies) else None,
+    }
+
+
+def print_report(results):
+    print(f"\n{'='*110}")
+    print(f"{'Target':<22} {'Readings':>9} {'Preds':>7} {'Rd/s':>8} {'CPU ms/rd':>10} "
+          f"{'1st pred s':>11} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    print(f"{'='*110}")
+    for r in results:
+        lat = r["latency_ms"] or {}
+        fmt = lambda v, spec: format(v, spec) if v is not None else "N/A"
+        print(f"{r['target']:<22} {r['readings_replayed']:>9} {r['predictions']:>7} "
+              f"{r['readings_per_s']:>8.1f} {fmt(r['cpu_ms_per_reading'], '>10.2f')} "
+              f"{fmt(r['first_prediction_s'], '>11.2f')} {fmt(lat.get('p50'), '>9.1f')} "
+              f"{fmt(lat.get('p95'), '>9.1f')} {fmt(lat.get('p99'), '>9.1f')} {fmt(lat.get('max'), '>9.1f')}")
+    print(f"{'='*110}\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test live predictors against a local replay of the API")
+    parser.add_argument("--data", default=DEFAULT_DATA_PATH, help="energy_data CSV export or binary reading log (.log)")
+    parser.add_argument("--speed", type=float, default=10.0, help="Replay speed multiplier (1 = real time)")
+    parser.add_argument("--duration", type=float, default=60.0, help="Maximum seconds to run each target")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="POLL_INTERVAL passed to each target")
+    parser.add_argument("--targets", nargs="+", choices=sorted(TARGETS), default=list(TARGETS))
+    parser.add_argument("--port", type=int, default=0, help="Stand-in port (0 = pick a free port)")
+    parser.add_argument("--trace-dir", default=None, help="Where to keep traces and target logs")
+    parser.add_argument("--json", default=None, help="Write the report as JSON to this path")
+    args = parser.parse_args()
+
+    trace_dir = args.trace_dir or tempfile.mkdtemp(prefix="spectrawatt-replay-")
+    os.makedirs(trace_dir, exist_ok=True)
+
+    feed = ReplayFeed(load_readings(args.data, keep_ids=True), speed=args.speed)
+    server = ReplayServer(feed, port=args.port)
+    server.start_background()
+    print(f"Replaying {len(feed)} readings at {args.speed:g}x on {server.url} (traces in {trace_dir})")
+
+    results = []
+    try:
+        for name in args.targets:
+            print(f"▶ Running {name}...")
+            results.append(run_target(name, feed, server, args.duration, args.poll_interval, trace_dir))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    print_report(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Report written to {args.json}")
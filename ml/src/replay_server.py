@@ -0,0 +1,196 @@
+"""
+Local stand-in for the SpectraWatt Go API.
+
+Serves readings from a CSV export or binary reading log through the same
+read endpoints as api/main.go, releasing them on a replay clock that runs at
+real time or N x speed:
+
+    GET /api/data                     all released readings grouped by device
+    GET /api/data/latest              most recent released reading
+    GET /api/data/device/{device_id}  latest 100 readings for one device
+    GET /health
+
+By default reading timestamps are rebased onto the wall clock, so scripts
+that filter on "last 5 minutes" behave exactly as they would in production.
+
+Usage:
+    python src/replay_server.py --data data/spectrawatt.energy_data.csv --speed 10
+    SPECTRAWATT_API_URL=http://localhost:8080 python src/predict_live.py
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlparse
+
+import numpy as np
+import pandas as pd
+
+from reading_log import FEATURES
+from utils import load_readings, timestamps_ms
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DATA_PATH = os.path.join(project_root, "data", "spectrawatt.energy_data.csv")
+DEVICE_DATA_LIMIT = 100
+
+
+class ReplayFeed:
+    """Releases readings in timestamp order according to a replay clock."""
+
+    def __init__(self, df, speed=1.0, rebase=True):
+        if speed <= 0:
+            raise ValueError("speed must be positive")
+        df = df.sort_values("timestamp", kind="stable").reset_index(drop=True)
+        self.speed = speed
+        self.rebase = rebase
+        self.device_ids = df["device_id"].astype(str).to_numpy()
+        self.source_ms = timestamps_ms(df)
+        self.values = df[FEATURES].to_numpy()
+        self.ids = df["_id"].astype(str).to_numpy() if "_id" in df.columns else None
+        self.start()
+
+    def __len__(self):
+        return len(self.device_ids)
+
+    def start(self, wall_start=None):
+        """(Re)start the replay clock; the first reading is released immediately."""
+        self.wall_start = time.time() if wall_start is None else wall_start
+        offsets = (self.source_ms - self.source_ms[0]) / self.speed if len(self) else self.source_ms
+        self.release_at = self.wall_start + offsets / 1000.0
+        served_ms = (self.release_at * 1000).astype("int64") if self.rebase else self.source_ms
+        self.served_ms = served_ms
+
+        # Serialize every reading once; requests only join pre-built strings
+        stamps = pd.to_datetime(served_ms, unit="ms", utc=True).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+        self._docs = []
+        self._device_rows = {}
+        for i in range(len(self)):
+            doc = {
+                "id": self.ids[i] if self.ids is not None else f"{i:024x}",
+                "device_id": self.device_ids[i],
+                "timestamp": stamps[i],
+            }
+            # str() of a float32 is its shortest repr, so 347.2225 is served as 347.2225
+            doc.update(zip(FEATURES, [float(str(v)) for v in self.values[i]]))
+            self._docs.append(json.dumps(doc))
+            self._device_rows.setdefault(self.device_ids[i], []).append(i)
+        self._device_rows = {k: np.asarray(v) for k, v in self._device_rows.items()}
+
+    def cursor(self, now=None):
+        """Number of readings released so far."""
+        now = time.time() if now is None else now
+        return int(np.searchsorted(self.release_at, now, side="right"))
+
+    def exhausted(self, now=None):
+        return self.cursor(now) >= len(self)
+
+    def _released_rows(self, device_id, cursor):
+        rows = self._device_rows.get(device_id)
+        if rows is None:
+            return rows
+        return rows[:np.searchsorted(rows, cursor)]
+
+    def all_data(self, now=None):
+        # Mirrors GetDataHandler: grouped by device, newest first, devices sorted
+        cursor = self.cursor(now)
+        groups = []
+        for device_id in sorted(self._device_rows):
+            rows = self._released_rows(device_id, cursor)
+            if len(rows):
+                docs = ",".join(self._docs[i] for i in rows[::-1])
+                groups.append(f'{{"device_id":{json.dumps(device_id)},"data":[{docs}]}}')
+        return "[" + ",".join(groups) + "]"
+
+    def latest(self, now=None):
+        cursor = self.cursor(now)
+        return self._docs[cursor - 1] if cursor else None
+
+    def device_data(self, device_id, now=None):
+        rows = self._released_rows(device_id, self.cursor(now))
+        if rows is None or not len(rows):
+            return None
+        return "[" + ",".join(self._docs[i] for i in rows[::-1][:DEVICE_DATA_LIMIT]) + "]"
+
+
+class ReplayRequestHandler(BaseHTTPRequestHandler):
+    feed = None
+
+    def _send(self, status, body, content_type="application/json"):
+        payload = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        path = urlparse(self.path).path.rstrip("/")
+        feed = self.server.feed
+
+        if path == "/health":
+            self._send(200, json.dumps({
+                "status": "healthy",
+                "released": feed.cursor(),
+                "total": len(feed),
+                "speed": feed.speed,
+            }))
+        elif path == "/api/data":
+            self._send(200, feed.all_data())
+        elif path == "/api/data/latest":
+            body = feed.latest()
+            if body is None:
+                self._send(404, "No data available\n", "text/plain; charset=utf-8")
+            else:
+                self._send(200, body)
+        elif path.startswith("/api/data/device/"):
+            body = feed.device_data(unquote(path[len("/api/data/device/"):]))
+            if body is None:
+                self._send(404, "No data found for device\n", "text/plain; charset=utf-8")
+            else:
+                self._send(200, body)
+        else:
+            self._send(404, "404 page not found\n", "text/plain; charset=utf-8")
+
+    def log_message(self, format, *args):
+        # Request logging would dominate the output at high replay speeds
+        pass
+
+
+class ReplayServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, feed, host="127.0.0.1", port=8080):
+        super().__init__((host, port), ReplayRequestHandler)
+        self.feed = feed
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start_background(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay readings through a local /api/data stand-in")
+    parser.add_argument("--data", default=DEFAULT_DATA_PATH, help="energy_data CSV export or binary reading log (.log)")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed multiplier (1 = real time)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--no-rebase", action="store_true", help="Serve original timestamps instead of wall-clock ones")
+    args = parser.parse_args()
+
+    feed = ReplayFeed(load_readings(args.data, keep_ids=True), speed=args.speed, rebase=not args.no_rebase)
+    server = ReplayServer(feed, args.host, args.port)
+    print(f"Replaying {len(feed)} readings at {args.speed:g}x on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nReplay stopped")
+        server.server_close()
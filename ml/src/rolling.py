@@ -0,0 +1,482 @@
+"""
+Rolling-statistics features and a lightweight classifier on top of them.
+
+For each window length w (default 3, 5 and 10 readings) and each of vrms,
+irms, apparent_power and wh, the feature at reading t covers readings
+t-w+1..t:
+
+    mean, std, min, max     of the window
+    slope                   least-squares trend per reading
+    crest                   max |x| / rms, how peaky the window is
+
+rolling_features() computes them for a whole series in O(n) per window
+length: means, variances and slopes come from cumulative sums, and minima and
+maxima from block prefix/suffix extrema (van Herk / Gil-Werman).
+RollingFeatures keeps running sums and monotonic deques, so each new reading
+costs O(1) whatever the series length. window_features() computes the
+features of the newest reading of each raw window directly. This is how the
+classifier fits behind the same predict_many() interface as the networks.
+
+`train.py --rolling tree|linear` fits a decision tree or a logistic
+regression on the features and saves models/rolling_classifier.pkl. With
+MODEL_ARCH=rolling, every prediction script and batch_score.py use it instead
+of the LSTM.
+
+Usage:
+    python src/train.py --rolling tree
+    MODEL_ARCH=rolling python src/predict_live.py
+    # Accuracy, agreement and cost per window against the LSTM
+    python src/rolling.py evaluate --data data/spectrawatt.energy_data.csv
+"""
+import argparse
+import os
+import time
+from collections import deque
+
+import joblib
+import numpy as np
+
+import metrics
+
+FEATURES = ["vrms", "irms", "apparent_power", "wh"]
+STATS = ["mean", "std", "min", "max", "slope", "crest"]
+WINDOWS = (3, 5, 10)
+CLASSIFIERS = ("tree", "linear")
+MODEL_FILE = "rolling_classifier.pkl"
+# Running and cumulative sums restart this often, so rounding error cannot build up
+RESYNC = 4096
+BLOCK = 4096
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+models_dir = os.path.join(project_root, "models")
+
+
+def feature_names(windows=WINDOWS):
+    return [f"{feature}_{stat}_{w}" for w in windows for stat in STATS for feature in FEATURES]
+
+
+def _stats(mean, var, lo, hi, slope, sq_mean):
+    """Stack one window length's statistics as (n, len(STATS) * channels)."""
+    peak = np.maximum(np.abs(lo), np.abs(hi))
+    rms = np.sqrt(np.maximum(sq_mean, 0.0))
+    crest = np.divide(peak, rms, out=np.zeros_like(peak), where=rms > 0)
+    return np.concatenate([mean, np.sqrt(np.maximum(var, 0.0)), lo, hi, slope, crest], axis=1)
+
+
+def _sliding_extreme(X, w, ufunc):
+    """np.minimum or np.maximum of every window X[t-w+1..t], t >= w-1, in O(n) (van Herk / Gil-Werman)."""
+    n, channels = X.shape
+    blocks = -(-n // w)
+    padded = np.full((blocks * w, channels), np.inf if ufunc is np.minimum else -np.inf)
+    padded[:n] = X
+    padded = padded.reshape(blocks, w, channels)
+    # Running extreme from each block's start (prefix) and towards its end (suffix)
+    prefix = ufunc.accumulate(padded, axis=1).reshape(-1, channels)
+    suffix = ufunc.accumulate(padded[:, ::-1], axis=1)[:, ::-1].reshape(-1, channels)
+    start = np.arange(n - w + 1)
+    return ufunc(suffix[start], prefix[start + w - 1])
+
+
+def _block_features(X, windows):
+    n, channels = X.shape
+    out = np.full((n, len(windows) * len(STATS) * channels), np.nan)
+    # Centring keeps the cumulative sums small, so their differences stay exact enough
+    offset = X.mean(axis=0)
+    Xc = X - offset
+    k = np.arange(n, dtype=np.float64)[:, None]
+    zero = np.zeros((1, channels))
+    s1 = np.concatenate([zero, np.cumsum(Xc, axis=0)])
+    s2 = np.concatenate([zero, np.cumsum(Xc * Xc, axis=0)])
+    sk = np.concatenate([zero, np.cumsum(k * Xc, axis=0)])
+
+    width = len(STATS) * channels
+    for i, w in enumerate(windows):
+        if n < w:
+            continue
+        start = np.arange(n - w + 1)
+        end = start + w
+        total = s1[end] - s1[start]
+        mean_c = total / w
+        var = (s2[end] - s2[start]) / w - mean_c * mean_c
+        # sum_j (j - (w-1)/2) x_j over positions j = 0..w-1 of the window
+        weighted = (sk[end] - sk[start]) - start[:, None] * total
+        slope = (weighted - (w - 1) / 2 * total) / max(w * (w * w - 1) / 12, 1.0)
+        mean = mean_c + offset
+        lo = _sliding_extreme(X, w, np.minimum)
+        hi = _sliding_extreme(X, w, np.maximum)
+        out[w - 1:, i * width:(i + 1) * width] = _stats(mean, var, lo, hi, slope, var + mean * mean)
+    return out
+
+
+def rolling_features(X, windows=WINDOWS):
+    """
+    Features of every reading of a (n, 4) series, in O(n) per window length.
+
+    Row t covers the readings ending at t; rows with fewer than w earlier
+    readings for some window length w are NaN in that length's columns.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    n, channels = X.shape
+    if n <= BLOCK:
+        return _block_features(X, windows)
+    # Cumulative sums restart every BLOCK rows, overlapping by the longest window
+    out = np.empty((n, len(windows) * len(STATS) * channels))
+    overlap = max(windows) - 1
+    for start in range(0, n, BLOCK):
+        begin = max(start - overlap, 0)
+        out[start:start + BLOCK] = _block_features(X[begin:start + BLOCK], windows)[start - begin:]
+    return out
+
+
+def window_features(windows, lengths=WINDOWS):
+    """Features of the newest reading of each raw (n, window, 4) window."""
+    windows = np.asarray(windows, dtype=np.float64)
+    n, size, channels = windows.shape
+    if lengths and max(lengths) > size:
+        raise ValueError(f"Windows of {size} readings are shorter than the {max(lengths)}-reading feature")
+    # Newest reading first, so every length's statistics are prefix sums and extrema of the same array
+    newest = windows[:, ::-1, :]
+    age = np.arange(size, dtype=np.float64)[None, :, None]
+    idx = np.asarray(lengths) - 1
+    total = np.cumsum(newest, axis=1)[:, idx]
+    squares = np.cumsum(newest * newest, axis=1)[:, idx]
+    aged = np.cumsum(age * newest, axis=1)[:, idx]
+    lo = np.minimum.accumulate(newest, axis=1)[:, idx]
+    hi = np.maximum.accumulate(newest, axis=1)[:, idx]
+
+    w = np.asarray(lengths, dtype=np.float64)[None, :, None]
+    mean = total / w
+    # With j = w-1-age the position from the window start: sum_j (j - (w-1)/2) x_j = (w-1)/2 * total - aged
+    slope = ((w - 1) / 2 * total - aged) / np.maximum(w * (w * w - 1) / 12, 1.0)
+    flat = lambda a: a.reshape(-1, channels)
+    stats = _stats(flat(mean), flat(squares / w - mean * mean), flat(lo), flat(hi), flat(slope), flat(squares / w))
+    return stats.reshape(n, -1)
+
+
+class RollingFeatures:
+    """
+    Streaming features of one meter: update() takes a reading and returns its
+    feature row in O(1) (running sums plus monotonic min/max deques).
+    """
+
+    def __init__(self, windows=WINDOWS, channels=len(FEATURES)):
+        self.windows = tuple(windows)
+        self.channels = channels
+        self.capacity = max(self.windows)
+        self.buffer = np.zeros((self.capacity, channels))
+        self.count = 0
+        self.offset = None
+        self._w = np.array(self.windows)
+        self._denominator = np.maximum(self._w * (self._w ** 2 - 1) / 12, 1.0)[:, None]
+        self.sum = np.zeros((len(self.windows), channels))
+        self.sq = np.zeros((len(self.windows), channels))
+        self.weighted = np.zeros((len(self.windows), channels))  # sum_j j * x_j, j = 0 for the oldest
+        self.low = [[deque() for _ in range(channels)] for _ in self.windows]
+        self.high = [[deque() for _ in range(channels)] for _ in self.windows]
+
+    def _resync(self):
+        for i, w in enumerate(self.windows):
+            n = min(w, self.count)
+            rows = self.buffer[np.arange(self.count - n, self.count) % self.capacity]
+            self.sum[i] = rows.sum(axis=0)
+            self.sq[i] = (rows * rows).sum(axis=0)
+            self.weighted[i] = np.arange(n) @ rows
+
+    def update(self, reading):
+        """Add one raw reading (vrms, irms, apparent_power, wh); returns its feature row (NaN until a window fills)."""
+        raw = np.asarray(reading, dtype=np.float64)
+        if self.offset is None:
+            self.offset = raw.copy()
+        x = raw - self.offset
+        t = self.count
+
+        # All window lengths at once: drop each full window's oldest reading, then add this one
+        full = (t >= self._w)[:, None]
+        old = self.buffer[(t - self._w) % self.capacity] * full
+        # Every remaining reading moves one position closer to the start
+        self.weighted -= (self.sum - old) * full
+        self.sum -= old
+        self.sq -= old * old
+        self.weighted += np.minimum(t, self._w - 1)[:, None] * x
+        self.sum += x
+        self.sq += x * x
+        self.buffer[t % self.capacity] = x
+        self.count += 1
+        if self.count % RESYNC == 0:
+            self._resync()
+
+        lo = np.empty((len(self.windows), self.channels))
+        hi = np.empty((len(self.windows), self.channels))
+        values = raw.tolist()
+        for i, w in enumerate(self.windows):
+            expired = t - w
+            for c, value in enumerate(values):
+                low, high = self.low[i][c], self.high[i][c]
+                while low and low[-1][1] >= value:
+                    low.pop()
+                low.append((t, value))
+                if low[0][0] <= expired:
+                    low.popleft()
+                while high and high[-1][1] <= value:
+                    high.pop()
+                high.append((t, value))
+                if high[0][0] <= expired:
+                    high.popleft()
+                lo[i, c] = low[0][1]
+                hi[i, c] = high[0][1]
+
+        w = self._w[:, None]
+        mean_c = self.sum / w
+        var = self.sq / w - mean_c * mean_c
+        slope = (self.weighted - (w - 1) / 2 * self.sum) / self._denominator
+        mean = mean_c + self.offset
+        out = _stats(mean, var, lo, hi, slope, var + mean * mean)
+        out[self._w > self.count] = np.nan
+        return out.ravel()
+
+
+def build_classifier(kind):
+    """Unfitted decision tree or (standardised) logistic regression."""
+    if kind == "tree":
+        from sklearn.tree import DecisionTreeClassifier
+        return DecisionTreeClassifier(max_depth=12, min_samples_leaf=5, class_weight="balanced", random_state=0)
+    if kind == "linear":
+        from sklearn.linear_model import LogisticRegression
+        from sklearn.pipeline import make_pipeline
+        from sklearn.preprocessing import StandardScaler
+        return make_pipeline(StandardScaler(), LogisticRegression(max_iter=2000, class_weight="balanced"))
+    raise ValueError(f"Unknown rolling classifier '{kind}' (choose from {', '.join(CLASSIFIERS)})")
+
+
+def compile_classifier(model, kind):
+    """
+    The fitted classifier as plain numpy arrays, so predicting needs neither
+    sklearn nor its per-call validation (which costs more than the tree itself).
+    """
+    if kind == "tree":
+        tree = model.tree_
+        value = tree.value[:, 0, :]
+        return {
+            "left": tree.children_left.copy(),
+            "right": tree.children_right.copy(),
+            "feature": tree.feature.copy(),
+            "threshold": tree.threshold.copy(),
+            "proba": value / value.sum(axis=1, keepdims=True),
+            "depth": int(tree.max_depth),
+            "codes": np.asarray(model.classes_),
+        }
+    scaler, linear = model[0], model[-1]
+    return {
+        "mean": scaler.mean_.copy(),
+        "scale": scaler.scale_.copy(),
+        "coef": linear.coef_.copy(),
+        "intercept": linear.intercept_.copy(),
+        "codes": np.asarray(linear.classes_),
+    }
+
+
+class CompiledClassifier:
+    """predict_proba() of a compile_classifier() tree or logistic regression."""
+
+    def __init__(self, kind, params):
+        self.kind = kind
+        self.params = params
+        self.codes = params["codes"]
+        if kind == "tree":
+            # Python lists walk a single row faster than numpy indexing
+            self._nodes = [params[k].tolist() for k in ("left", "right", "feature", "threshold")]
+
+    def predict_proba(self, F):
+        p = self.params
+        if self.kind == "tree":
+            # Trees compare float32 features, as sklearn does
+            F = np.asarray(F, dtype=np.float32)
+            if len(F) == 1:
+                left, right, feature, threshold = self._nodes
+                row = F[0].tolist()
+                node = 0
+                while left[node] >= 0:
+                    node = left[node] if row[feature[node]] <= threshold[node] else right[node]
+                return p["proba"][[node]]
+            node = np.zeros(len(F), dtype=np.intp)
+            rows = np.arange(len(F))
+            for _ in range(p["depth"]):
+                inner = p["left"][node] >= 0
+                go_left = F[rows, np.maximum(p["feature"][node], 0)] <= p["threshold"][node]
+                node = np.where(inner, np.where(go_left, p["left"][node], p["right"][node]), node)
+            return p["proba"][node]
+        logits = ((np.asarray(F, dtype=np.float64) - p["mean"]) / p["scale"]) @ p["coef"].T + p["intercept"]
+        if logits.shape[1] == 1:
+            positive = 1 / (1 + np.exp(-logits[:, 0]))
+            return np.stack([1 - positive, positive], axis=1)
+        logits -= logits.max(axis=1, keepdims=True)
+        e = np.exp(logits)
+        return e / e.sum(axis=1, keepdims=True)
+
+
+def training_rows(X, y, windows=WINDOWS, window_size=None):
+    """
+    Features and labels laid out like EnergyDataset: the features of reading
+    t (ending a window_size window) are labelled with reading t + 1.
+    """
+    window_size = window_size or max(windows)
+    F = rolling_features(X, windows)
+    rows = np.arange(window_size - 1, len(X) - 1)
+    return F[rows], np.asarray(y)[rows + 1]
+
+
+def fit(X, y, classes, kind="tree", windows=WINDOWS, holdout=0.2):
+    """
+    Fit a classifier on the rolling features of raw readings X (n, 4) with label codes y.
+
+    The last `holdout` share of rows is scored first, then the classifier is
+    refitted on every row. Returns (artifact, report).
+    """
+    F, labels = training_rows(X, y, windows)
+    split = int(len(F) * (1 - holdout))
+    report = {"classifier": kind, "windows": list(windows), "rows": len(F), "features": F.shape[1]}
+    if 0 < split < len(F):
+        model = build_classifier(kind).fit(F[:split], labels[:split])
+        report["holdout_accuracy"] = float((model.predict(F[split:]) == labels[split:]).mean())
+    model = build_classifier(kind).fit(F, labels)
+    report["train_accuracy"] = float((model.predict(F) == labels).mean())
+    artifact = {"kind": kind, "windows": list(windows), "classes": list(classes),
+                "params": compile_classifier(model, kind)}
+    return artifact, report
+
+
+def save(artifact, models_dir=models_dir):
+    os.makedirs(models_dir, exist_ok=True)
+    path = os.path.join(models_dir, MODEL_FILE)
+    joblib.dump(artifact, path)
+    return path
+
+
+class RollingPredictor:
+    """
+    Drop-in for inference.Predictor backed by the rolling-feature classifier.
+
+    predict_many() classifies raw windows; update() classifies a live stream
+    one reading at a time, keeping O(1) feature state per meter.
+    """
+
+    def __init__(self, models_dir=models_dir, window_size=10):
+        artifact = joblib.load(os.path.join(models_dir, MODEL_FILE))
+        self.kind = artifact["kind"]
+        self.windows = tuple(artifact["windows"])
+        self.model = CompiledClassifier(self.kind, artifact["params"])
+        self.window_size = window_size
+        if max(self.windows) > window_size:
+            raise ValueError(f"{MODEL_FILE} uses {max(self.windows)}-reading features; windows hold {window_size}")
+        # The classifier only knows the codes it saw; map them back onto the full class list
+        self.classes = np.array(artifact["classes"], dtype=object)
+        self._codes = self.model.codes
+        self._streams = {}
+
+    def _classify(self, F):
+        with metrics.timed("forward"):
+            known = self.model.predict_proba(F)
+        probs = np.zeros((len(F), len(self.classes)))
+        probs[:, self._codes] = known
+        pred = probs.argmax(axis=1)
+        metrics.inc("predictions", len(F))
+        return self.classes[pred], probs[np.arange(len(pred)), pred], probs
+
+    def predict_many(self, windows):
+        """Classify a batch of raw (unscaled) windows; returns (labels, confidences, probabilities)."""
+        windows = np.asarray(windows)
+        if windows.ndim != 3 or windows.shape[2] != len(FEATURES):
+            raise ValueError(f"Expected windows shaped (n, window, {len(FEATURES)}), got {windows.shape}")
+        if len(windows) == 0:
+            return np.array([], dtype=object), np.array([], dtype=np.float32), np.empty((0, len(self.classes)))
+        with metrics.timed("scale"):
+            F = window_features(windows, self.windows)
+        return self._classify(F)
+
+    def predict(self, window):
+        labels, confidences, probs = self.predict_many(np.asarray(window)[None])
+        return labels[0], float(confidences[0]), probs[0]
+
+    def update(self, key, reading):
+        """
+        Feed one raw reading of a meter; returns (label, confidence, probabilities),
+        or None until the meter has window_size readings.
+        """
+        stream = self._streams.get(key)
+        if stream is None:
+            stream = self._streams[key] = RollingFeatures(self.windows)
+        F = stream.update(reading)
+        if stream.count < self.window_size:
+            return None
+        labels, confidences, probs = self._classify(F[None])
+        return labels[0], float(confidences[0]), probs[0]
+
+    def forget(self, key):
+        self._streams.pop(key, None)
+
+
+def _per_window_us(fn, windows, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(windows)
+        best = min(best, time.perf_counter() - start)
+    return best / len(windows) * 1e6
+
+
+def evaluate(data, models_dir=models_dir, window_size=10, sample=20_000, seed=0):
+    """Rolling classifier vs the LSTM on the data's windows: accuracy, agreement and cost per window."""
+    from inference import Predictor, sliding_windows
+    from utils import load_training_frame
+
+    df = load_training_frame(data)
+    X = df[FEATURES].to_numpy(dtype=np.float64)
+    actual = df["device_id"].astype(str).to_numpy()[window_size:]
+    windows = sliding_windows(X, window_size)
+    rng = np.random.default_rng(seed)
+    pick = np.sort(rng.choice(len(windows), min(sample, len(windows)), replace=False))
+    windows, actual = windows[pick], actual[pick]
+
+    results = {}
+    for name, predictor in (("rolling", RollingPredictor(models_dir, window_size=window_size)),
+                            ("lstm", Predictor(models_dir, arch="lstm", window_size=window_size))):
+        labels = predictor.predict_many(windows)[0]
+        results[name] = {
+            "labels": labels,
+            "accuracy": float((labels.astype(str) == actual).mean()),
+            "batch_us": _per_window_us(lambda w: predictor.predict_many(w), windows),
+            "single_us": _per_window_us(lambda w: [predictor.predict(x) for x in w], windows[:500], repeat=1),
+        }
+
+    # Streaming cost: one reading at a time through O(1) feature state, then the classifier
+    streamer = RollingPredictor(models_dir, window_size=window_size)
+    readings = X[:5000]
+    start = time.perf_counter()
+    for reading in readings:
+        streamer.update("meter", reading)
+    stream_us = (time.perf_counter() - start) / len(readings) * 1e6
+
+    rolling, lstm = results["rolling"], results["lstm"]
+    print(f"\n{'='*64}")
+    print(f"Rolling {streamer.kind} classifier vs LSTM on {len(windows)} windows of {data}")
+    print(f"{'='*64}")
+    print(f"{'':<22} {'rolling':>12} {'lstm':>12} {'ratio':>10}")
+    print(f"{'Accuracy':<22} {rolling['accuracy']*100:>11.1f}% {lstm['accuracy']*100:>11.1f}%")
+    for key, title in (("batch_us", "Batch µs/window"), ("single_us", "Single µs/window")):
+        print(f"{title:<22} {rolling[key]:>12.2f} {lstm[key]:>12.2f} {lstm[key] / rolling[key]:>9.1f}x")
+    print(f"{'Streaming µs/reading':<22} {stream_us:>12.2f}")
+    print(f"Agreement with LSTM: {(rolling['labels'] == lstm['labels']).mean()*100:.1f}%")
+    print(f"{'='*64}\n")
+    return {name: {k: v for k, v in r.items() if k != "labels"} for name, r in results.items()} | {"stream_us": stream_us}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rolling-statistics classifier utilities")
+    sub = parser.add_subparsers(dest="command", required=True)
+    eval_parser = sub.add_parser("evaluate", help="Compare the rolling classifier with the LSTM")
+    eval_parser.add_argument("--data", default=os.path.join(project_root, "data", "spectrawatt.energy_data.csv"))
+    eval_parser.add_argument("--models-dir", default=models_dir)
+    eval_parser.add_argument("--sample", type=int, default=20_000, help="Windows to score")
+    args = parser.parse_args()
+
+    evaluate(args.data, args.models_dir, sample=args.sample)
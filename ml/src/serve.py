@@ -0,0 +1,245 @@
+"""
+Pre-fork launcher for the REST API: load the model once, fork N uvicorn workers.
+
+`uvicorn --workers N` spawns fresh interpreters. Each one imports torch,
+pandas and sklearn and loads its own model, so resident memory grows by a
+full service per worker. serve.py instead does the following:
+
+- Imports predict_api and loads the Predictor (model, scaler, label encoder,
+  irms weight) in the parent process.
+- Binds the listening socket, then forks the workers. Every worker accepts
+  on that one socket.
+- Forked workers share the parent's pages copy-on-write. The eager model's
+  weights are memory-mapped from the checkpoint and only ever read, so they
+  are never copied. The parent's heap is frozen out of the garbage collector
+  so collections in the workers don't dirty it either.
+- Each worker runs cores // workers intra-op threads, so workers x threads
+  matches the cores available to the container (its cgroup CPU quota, else
+  its CPU affinity). The parent loads the model on one thread and never runs
+  a forward pass, so no thread pool exists when it forks.
+- The parent restarts workers that die and passes SIGTERM/SIGINT on to them.
+
+Device buffers, change gates, recent predictions and metrics are per worker.
+Readings for one device are windowed by whichever worker receives them, so
+push devices over a keep-alive connection (as the Go API does). Each worker
+writes its own timeline under TIMELINE_DIR/worker<i>.
+
+Usage:
+    python src/serve.py --workers 4 --port 8000
+    python src/serve.py --workers 2 --threads 2
+    # Resident memory (PSS, summed over all processes) for 1..N workers
+    python src/serve.py memory --workers 1 2 4
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+import requests
+
+import timeline as prediction_timeline
+
+SERVE_SCRIPT = os.path.abspath(__file__)
+
+
+def available_cores():
+    """Cores this process may use: the cgroup CPU quota when one is set, else the CPU affinity."""
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    try:
+        # cgroup v2: "<quota> <period>" or "max <period>"
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cores = min(cores, max(1, int(quota) // int(period)))
+    except (OSError, ValueError):
+        pass
+    return cores
+
+
+def threads_per_worker(workers, cores=None):
+    return max(1, (cores or available_cores()) // workers)
+
+
+def bind(host, port):
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def preload():
+    """Import the app and load the Predictor in this (parent) process; returns the app."""
+    import torch
+    # One thread while loading: no intra-op pool may exist when the workers are forked
+    torch.set_num_threads(1)
+    import predict_api
+    from inference import get_predictor
+
+    get_predictor()
+    # Everything loaded so far is shared with the workers; keep the collector from touching it
+    gc.collect()
+    gc.freeze()
+    return predict_api.app
+
+
+def run_worker(index, app, sock, threads, log_level):
+    """Body of a forked worker: its own threads and timeline, then uvicorn on the shared socket."""
+    import torch
+    import uvicorn
+
+    torch.set_num_threads(threads)
+    timeline_dir = os.environ.get("TIMELINE_DIR", prediction_timeline.default_timeline_dir("predict_api"))
+    if timeline_dir:
+        os.environ["TIMELINE_DIR"] = os.path.join(timeline_dir, f"worker{index}")
+    os.environ["SERVE_WORKER"] = str(index)
+
+    config = uvicorn.Config(app, log_level=log_level, lifespan="on")
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def serve(host="0.0.0.0", port=8000, workers=1, threads=None, log_level="info"):
+    threads = threads or threads_per_worker(workers)
+    sock = bind(host, port)
+    app = preload()
+    print(f"🚀 Serving on {host}:{port} with {workers} worker(s) x {threads} thread(s) "
+          f"({available_cores()} core(s) available)", flush=True)
+
+    children = {}
+    stopping = False
+
+    def spawn(index):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                signal.signal(signal.SIGINT, signal.SIG_DFL)
+                run_worker(index, app, sock, threads, log_level)
+            except BaseException:
+                import traceback
+                traceback.print_exc()
+                code = 1
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(code)
+        children[pid] = index
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for index in range(workers):
+        spawn(index)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        index = children.pop(pid, None)
+        if index is not None and not stopping:
+            print(f"⚠️  Worker {index} (pid {pid}) exited with status {status}; restarting", flush=True)
+            time.sleep(1)
+            spawn(index)
+    sock.close()
+
+
+def _pss_kb(pid):
+    """Proportional set size: shared pages are split between the processes mapping them."""
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            if line.startswith("Pss:"):
+                return int(line.split()[1])
+    return 0
+
+
+def _process_tree(pid):
+    pids = [pid]
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            pids += [int(child) for child in f.read().split()]
+    except OSError:
+        pass
+    return pids
+
+
+def wait_until_serving(url, workers, pid, timeout=120):
+    """Poll /health until the server answers and all workers are up."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"{url}/health", timeout=2).ok and len(_process_tree(pid)) == workers + 1:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def memory(worker_counts, port=8765):
+    """Start the server with each worker count and report its total PSS."""
+    results = []
+    for workers in worker_counts:
+        env = dict(os.environ, TIMELINE_DIR="")
+        proc = subprocess.Popen([sys.executable, SERVE_SCRIPT, "--workers", str(workers), "--host", "127.0.0.1",
+                                 "--port", str(port), "--log-level", "warning"],
+                                env=env, stdout=subprocess.DEVNULL)
+        try:
+            if not wait_until_serving(f"http://127.0.0.1:{port}", workers, proc.pid):
+                raise SystemExit(f"serve.py did not come up with {workers} worker(s)")
+            # One request per worker's worth of traffic so every worker has run a forward pass
+            payload = {"readings": [{"vrms": 230.0, "irms": 0.3, "apparent_power": 69.0, "wh": 0.0}] * 10}
+            for _ in range(workers * 4):
+                requests.post(f"http://127.0.0.1:{port}/predict", json=payload, timeout=10)
+            pids = _process_tree(proc.pid)
+            results.append({"workers": workers, "pss_mb": sum(_pss_kb(p) for p in pids) / 1024,
+                             "parent_pss_mb": _pss_kb(proc.pid) / 1024})
+        finally:
+            proc.send_signal(signal.SIGTERM)
+            proc.wait(timeout=30)
+
+    base = results[0]
+    print(f"\n{'='*60}")
+    print(f"{'Workers':>8} {'Total PSS MB':>14} {'Per extra worker MB':>21}")
+    print(f"{'='*60}")
+    for r in results:
+        extra = (r["pss_mb"] - base["pss_mb"]) / max(r["workers"] - base["workers"], 1)
+        r["extra_worker_mb"] = extra if r is not base else None
+        print(f"{r['workers']:>8} {r['pss_mb']:>14.1f} {extra if r is not base else 0:>21.1f}")
+    print(f"{'='*60}\n")
+    return results
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "memory":
+        parser = argparse.ArgumentParser(description="Resident memory of serve.py by worker count")
+        parser.add_argument("command")
+        parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+        parser.add_argument("--port", type=int, default=8765)
+        args = parser.parse_args()
+        memory(args.workers, args.port)
+    else:
+        parser = argparse.ArgumentParser(description="Serve the REST API from N forked workers sharing one model")
+        parser.add_argument("--host", default="0.0.0.0")
+        parser.add_argument("--port", type=int, default=8000)
+        parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", 1)),
+                            help="Worker processes (default WEB_CONCURRENCY or 1)")
+        parser.add_argument("--threads", type=int, default=int(os.environ.get("INFERENCE_THREADS", 0)) or None,
+                            help="Intra-op threads per worker (default INFERENCE_THREADS or cores // workers)")
+        parser.add_argument("--log-level", default="info")
+        args = parser.parse_args()
+        serve(args.host, args.port, args.workers, args.threads, args.log_level)
@@ -0,0 +1,352 @@
+"""
+Deterministic synthetic meter readings for scale tests of both pipelines.
+
+Every meter carries a few appliances that switch on and off as independent
+renewal processes (exponential on/off durations), so loads overlap. Readings
+follow the spectrawatt.energy_data.csv schema. Apparent power is the sum of
+the running appliances, each with multiplicative noise and a slow per-unit
+drift, on top of a small standby load. The mains voltage has daily drift and
+noise, irms = apparent_power / vrms, and wh accumulates energy.
+
+Output is generated in fixed time blocks. Each block is seeded from
+(seed, meter, block), so a given seed produces identical readings whether they
+are streamed, written in chunks or generated one meter at a time. Readings
+are in timestamp order across meters. Ground truth is the switching events
+(meter, time, appliance, on/off, ΔP) and the set of appliances running at
+every reading.
+
+Usage:
+    python src/synthetic.py --meters 1000 --appliances 4 --hours 24 -o data/synthetic.csv --truth data/synthetic
+    python src/synthetic.py --meters 5 --hours 1 -o raw_readings.json
+    python src/synthetic.py --meters 50 --hours 2 -o - | head
+    python src/synthetic.py --meters 20 --hours 1 --post http://localhost:8000/api/data
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import urllib.request
+
+import numpy as np
+import pandas as pd
+
+from reading_log import to_epoch_ms
+
+CSV_COLUMNS = ["_id", "device_id", "timestamp", "vrms", "irms", "apparent_power", "wh"]
+DECIMALS = {"vrms": 4, "irms": 6, "apparent_power": 4, "wh": 6}
+
+# name: (apparent power VA, noise fraction, mean on seconds, mean off seconds).
+# Power levels and reading-to-reading noise follow the devices in the bundled export.
+APPLIANCES = {
+    "Bulb-60w": (78.0, 0.015, 1800, 2400),
+    "Bulb-100w": (325.0, 0.015, 2400, 3000),
+    "Soldering-Iron": (160.0, 0.03, 600, 3600),
+    "Sonnet": (290.0, 0.25, 3600, 1800),
+    "Chitrita-PC": (1090.0, 0.07, 5400, 3600),
+}
+MIN_DURATION_S = 30.0
+DAY_S = 86400.0
+# Running appliances are tracked as a bitmask per reading
+MAX_APPLIANCES = 32
+
+
+class SyntheticLoad:
+    def __init__(self, meters=10, appliances=3, duration_s=DAY_S, interval_s=5.0,
+                 start="2026-01-21T00:00:00Z", seed=0, noise=1.0, drift=1.0, dropout=0.0,
+                 block_samples=720):
+        """
+        Args:
+            meters: Number of meters (device_id meter-0000 ...)
+            appliances: Appliances per meter; beyond the catalog, extra loads get random ratings
+            duration_s: Length of the generated period in seconds
+            interval_s: Seconds between a meter's readings
+            start: First reading time (ISO string or epoch ms)
+            seed: Seed for everything; same arguments and seed give identical output
+            noise: Scale of reading noise (0 = noiseless steps)
+            drift: Scale of voltage and appliance power drift (0 = none)
+            dropout: Probability that a reading is lost
+            block_samples: Readings per meter per generated block (part of the seeding)
+        """
+        if not 0 < appliances <= MAX_APPLIANCES:
+            raise ValueError(f"appliances must be between 1 and {MAX_APPLIANCES}")
+        self.meters = meters
+        self.n_appliances = appliances
+        self.duration_s = float(duration_s)
+        self.interval_s = float(interval_s)
+        self.start_ms = to_epoch_ms(start)
+        self.seed = seed
+        self.noise = noise
+        self.drift = drift
+        self.dropout = dropout
+        self.block_samples = block_samples
+        self.samples = int(self.duration_s // self.interval_s)
+        self.n_blocks = -(-self.samples // block_samples)
+        self.device_ids = [f"meter-{m:04d}" for m in range(meters)]
+        self._meters = [self._setup_meter(m) for m in range(meters)]
+
+    def _setup_meter(self, m):
+        rng = np.random.default_rng([self.seed, m])
+        catalog = list(APPLIANCES)
+        picks = rng.permutation(len(catalog))[:self.n_appliances]
+        names = [catalog[i] for i in picks]
+        specs = [APPLIANCES[n] for n in names]
+        for k in range(self.n_appliances - len(names)):
+            names.append(f"Load-{k}")
+            specs.append((float(np.exp(rng.uniform(np.log(20), np.log(2000)))), 0.05, 1800, 3600))
+
+        appliances = []
+        for name, (power, noise, mean_on, mean_off) in zip(names, specs):
+            on = rng.random() < mean_on / (mean_on + mean_off)
+            # Alternating on/off durations until past the end of the period
+            switches, t = [], -rng.exponential(mean_on if on else mean_off)
+            state = on
+            while t < self.duration_s:
+                t += max(MIN_DURATION_S, rng.exponential(mean_off if not state else mean_on))
+                switches.append(t)
+                state = not state
+            appliances.append({
+                "name": name,
+                "power": power * rng.uniform(0.9, 1.1),
+                "noise": noise,
+                "drift_per_day": rng.normal(0, 0.01),
+                "initially_on": on,
+                "switches": np.asarray(switches),
+            })
+        return {
+            "appliances": appliances,
+            # Phase + jitter stay under an interval, so block b holds exactly the
+            # readings in [start + b * block, start + (b + 1) * block)
+            "phase_s": rng.uniform(0, 0.5 * self.interval_s),
+            "standby": rng.uniform(0.5, 5.0),
+            "voltage": rng.normal(230.0, 3.0),
+            "voltage_drift_per_day": rng.normal(0, 1.0),
+        }
+
+    def __len__(self):
+        """Readings generated when dropout is 0."""
+        return self.meters * self.samples
+
+    def _power_at(self, appliance, t_s):
+        return appliance["power"] * (1 + self.drift * appliance["drift_per_day"] * t_s / DAY_S)
+
+    def _meter_block(self, m, b):
+        """Readings of meter m in block b as (t_ms, values (n, 4) with wh as energy increments, active)."""
+        meter = self._meters[m]
+        rng = np.random.default_rng([self.seed, m, b, 1])
+        k = np.arange(b * self.block_samples, min((b + 1) * self.block_samples, self.samples))
+        t = k * self.interval_s + meter["phase_s"] + rng.uniform(0, 0.2 * self.interval_s, len(k))
+
+        power = np.full(len(k), meter["standby"]) + self.noise * rng.normal(0, 0.5, len(k))
+        active = np.zeros(len(k), dtype=np.int64)
+        for j, appliance in enumerate(meter["appliances"]):
+            flips = np.searchsorted(appliance["switches"], t, side="right")
+            on = (flips % 2 == 0) == appliance["initially_on"]
+            level = self._power_at(appliance, t) * (1 + self.noise * appliance["noise"] * rng.standard_normal(len(k)))
+            power += np.where(on, level, 0.0)
+            active |= on.astype(np.int64) << j
+        power = np.maximum(power, 0.0)
+
+        vrms = (meter["voltage"]
+                * (1 + 0.02 * self.drift * np.sin(2 * np.pi * t / DAY_S))
+                + self.drift * meter["voltage_drift_per_day"] * t / DAY_S
+                + self.noise * rng.normal(0, 0.5, len(k)))
+        energy = power * self.interval_s / 3600.0
+
+        keep = rng.random(len(k)) >= self.dropout
+        values = np.column_stack([vrms, power / vrms, power, energy])
+        return (self.start_ms + np.round(t * 1000).astype(np.int64))[keep], values[keep], active[keep], k[keep]
+
+    def _frame(self, m_idx, t_ms, values, wh, active, k):
+        stamps = np.char.add(np.datetime_as_string(t_ms.astype("datetime64[ms]"), unit="ms"), "Z")
+        frame = pd.DataFrame({
+            "_id": _object_ids(m_idx, k),
+            "device_id": np.asarray(self.device_ids, dtype=object)[m_idx],
+            "timestamp": stamps,
+            "vrms": values[:, 0].round(DECIMALS["vrms"]),
+            "irms": values[:, 1].round(DECIMALS["irms"]),
+            "apparent_power": values[:, 2].round(DECIMALS["apparent_power"]),
+            "wh": wh.round(DECIMALS["wh"]),
+        })
+        # One label string per distinct (meter, running set) in the block
+        keys, inverse = np.unique((m_idx.astype(np.int64) << self.n_appliances) | active, return_inverse=True)
+        labels = np.asarray([self._label(key >> self.n_appliances, key & ((1 << self.n_appliances) - 1))
+                             for key in keys.tolist()] + [""], dtype=object)[:-1]
+        return frame, labels[inverse.ravel()]
+
+    def _label(self, m, bits):
+        return "+".join(sorted(a["name"] for j, a in enumerate(self._meters[m]["appliances"]) if bits >> j & 1))
+
+    def blocks(self, meters=None):
+        """
+        Yield (readings, active) per time block, in timestamp order across meters.
+
+        readings has the energy_data CSV columns; active[i] names the appliances
+        running at reading i, joined with '+' ('' when only standby is drawn).
+        """
+        meters = range(self.meters) if meters is None else meters
+        wh = {m: 0.0 for m in meters}
+        for b in range(self.n_blocks):
+            parts = []
+            for m in meters:
+                t_ms, values, active, k = self._meter_block(m, b)
+                cumulative = wh[m] + np.cumsum(values[:, 3])
+                if len(cumulative):
+                    wh[m] = cumulative[-1]
+                parts.append((np.full(len(t_ms), m), t_ms, values, cumulative, active, k))
+            m_idx, t_ms, values, cumulative, active, k = (np.concatenate(p) for p in zip(*parts))
+            order = np.argsort(t_ms, kind="stable")
+            yield self._frame(m_idx[order], t_ms[order], values[order], cumulative[order], active[order], k[order])
+
+    def meter_frame(self, m):
+        """All readings and active labels of one meter."""
+        frames, labels = zip(*self.blocks(meters=[m]))
+        return pd.concat(frames, ignore_index=True), np.concatenate(labels)
+
+    def events(self):
+        """Ground-truth switching events: device_id, timestamp, appliance, state, delta_p."""
+        rows = []
+        for m, meter in enumerate(self._meters):
+            for appliance in meter["appliances"]:
+                switches = appliance["switches"]
+                switches = switches[(switches >= 0) & (switches < self.duration_s)]
+                flips = np.searchsorted(appliance["switches"], switches, side="right")
+                on = (flips % 2 == 0) == appliance["initially_on"]
+                power = self._power_at(appliance, switches)
+                rows.append(pd.DataFrame({
+                    "device_id": self.device_ids[m],
+                    "timestamp": self.start_ms + np.round(switches * 1000).astype(np.int64),
+                    "appliance": appliance["name"],
+                    "state": np.where(on, "on", "off"),
+                    "delta_p": np.where(on, power, -power).round(4),
+                }))
+        events = pd.concat(rows, ignore_index=True) if rows else pd.DataFrame(
+            columns=["device_id", "timestamp", "appliance", "state", "delta_p"])
+        return events.sort_values(["timestamp", "device_id"], kind="stable").reset_index(drop=True)
+
+
+def _object_ids(meter, sample):
+    """24 hex digit ids like the Mongo export's _id: 8 digits of meter, 16 of sample index."""
+    values = np.column_stack([np.asarray(meter, dtype=np.uint64), np.asarray(sample, dtype=np.uint64)])
+    shifts = np.concatenate([np.arange(28, -1, -4), np.arange(60, -1, -4)]).astype(np.uint64)
+    digits = (np.repeat(values, [8, 16], axis=1) >> shifts) & np.uint64(0xF)
+    chars = np.frombuffer(b"0123456789abcdef", dtype=np.uint8)[digits.astype(np.intp)]
+    return np.ascontiguousarray(chars).view("S24").ravel().astype(str)
+
+
+def _iso(ms):
+    return np.char.add(np.datetime_as_string(np.asarray(ms).astype("datetime64[ms]"), unit="ms"), "Z")
+
+
+def write_csv(load, path, labels_path=None):
+    """Write readings in the energy_data CSV format (and per-reading labels) block by block."""
+    rows = 0
+    with open(path, "w", newline="") as f, (open(labels_path, "w") if labels_path else _Null()) as lf:
+        for i, (frame, active) in enumerate(load.blocks()):
+            frame.to_csv(f, header=i == 0, index=False)
+            if labels_path:
+                pd.DataFrame({"device_id": frame["device_id"], "timestamp": frame["timestamp"], "active": active}
+                             ).to_csv(lf, header=i == 0, index=False)
+            rows += len(frame)
+    return rows
+
+
+def write_json(load, path):
+    """Write the /api/data (raw_readings.json) shape: [{"device_id", "data": [readings]}], one meter at a time."""
+    rows = 0
+    with open(path, "w") as f:
+        f.write("[")
+        for m in range(load.meters):
+            frame, _ = load.meter_frame(m)
+            records = frame.rename(columns={"_id": "id"}).to_json(orient="records")
+            f.write(("," if m else "") + json.dumps({"device_id": load.device_ids[m]})[:-1] + ', "data": ' + records + "}")
+            rows += len(frame)
+        f.write("]")
+    return rows
+
+
+def stream_jsonl(load, out=sys.stdout):
+    """Write one JSON reading per line in timestamp order (pipe into replay or push tools)."""
+    rows = 0
+    for frame, _ in load.blocks():
+        out.write(frame.to_json(orient="records", lines=True))
+        if len(frame):
+            out.write("\n")
+        rows += len(frame)
+    return rows
+
+
+def post_readings(load, url, batch_size=1000):
+    """POST readings in timestamp order to a push endpoint (Go API or ML service) in batches."""
+    rows, start = 0, time.perf_counter()
+    for frame, _ in load.blocks():
+        payload = frame.drop(columns="_id")
+        for i in range(0, len(payload), batch_size):
+            body = payload.iloc[i:i + batch_size].to_json(orient="records").encode()
+            request = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+            with urllib.request.urlopen(request, timeout=30) as response:
+                response.read()
+            rows += min(batch_size, len(payload) - i)
+    return rows, time.perf_counter() - start
+
+
+def write_events(load, path):
+    events = load.events()
+    events.assign(timestamp=_iso(events["timestamp"].to_numpy())).to_csv(path, index=False)
+    return len(events)
+
+
+class _Null:
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate deterministic synthetic meter readings")
+    parser.add_argument("--meters", type=int, default=10)
+    parser.add_argument("--appliances", type=int, default=3, help="Appliances per meter")
+    parser.add_argument("--hours", type=float, default=24.0)
+    parser.add_argument("--interval", type=float, default=5.0, help="Seconds between a meter's readings")
+    parser.add_argument("--start", default="2026-01-21T00:00:00Z")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--noise", type=float, default=1.0, help="Noise scale (0 = clean steps)")
+    parser.add_argument("--drift", type=float, default=1.0, help="Voltage/power drift scale (0 = none)")
+    parser.add_argument("--dropout", type=float, default=0.0, help="Probability a reading is lost")
+    parser.add_argument("-o", "--output", default=None,
+                        help="Output .csv, .json (raw_readings shape), .jsonl, or - for JSON lines on stdout")
+    parser.add_argument("--truth", default=None, help="Write <prefix>.events.csv (and <prefix>.labels.csv for CSV output)")
+    parser.add_argument("--post", default=None, help="POST readings to this push endpoint instead of writing a file")
+    args = parser.parse_args()
+
+    load = SyntheticLoad(args.meters, args.appliances, args.hours * 3600, args.interval, args.start,
+                         args.seed, args.noise, args.drift, args.dropout)
+    log = sys.stderr if args.output == "-" else sys.stdout
+    start = time.perf_counter()
+
+    if args.post:
+        rows, seconds = post_readings(load, args.post)
+        print(f"Posted {rows} readings to {args.post} in {seconds:.1f}s ({rows / seconds:.0f}/s)", file=log)
+    elif args.output in (None, "-"):
+        try:
+            rows = stream_jsonl(load)
+        except BrokenPipeError:
+            # Reader went away (e.g. piped into head)
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            sys.exit(0)
+    elif args.output.endswith(".json"):
+        rows = write_json(load, args.output)
+    elif args.output.endswith(".jsonl"):
+        with open(args.output, "w") as f:
+            rows = stream_jsonl(load, f)
+    else:
+        rows = write_csv(load, args.output, f"{args.truth}.labels.csv" if args.truth else None)
+
+    if args.truth:
+        n_events = write_events(load, f"{args.truth}.events.csv")
+        print(f"Ground truth: {n_events} events -> {args.truth}.events.csv", file=log)
+    if not args.post:
+        print(f"Generated {rows} readings for {args.meters} meters x {args.appliances} appliances "
+              f"in {time.perf_counter() - start:.1f}s", file=log)
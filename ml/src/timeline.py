@@ -0,0 +1,450 @@
+"""
+Persistent, downsampled timeline of live predictions.
+
+Every prediction (device, time, label, confidence) lands in a fixed-size ring
+of recent entries and is rolled up into minute, hour and day tiers. A tier row
+is (bucket start, device, label, count, confidence sum), so rolling minutes
+into hours, merging late predictions or combining buckets at query time is
+exact. A bucket's dominant label is the one predicted most often, and its
+confidence is the mean over all of the bucket's predictions.
+
+A timeline directory holds:
+
+    meta.json               device and label tables, how far each tier is rolled up
+    recent.ring             the last RING_CAPACITY raw predictions (numpy.memmap)
+    minute/2026-01-21.seg   one append-only segment per day
+    hour/2026-01.seg        one per month
+    day/2026.seg            one per year
+
+Segments older than a tier's retention are deleted, so months of timelines
+take a few MB, and range queries only open the segments they overlap. Queries
+also cover the newest, not yet rolled-up predictions. One process writes a
+timeline; any number may read it.
+
+Usage:
+    python src/timeline.py info data/timeline/predict_live
+    python src/timeline.py query data/timeline/predict_live --device Bulb-60w --start 2026-01-20 --resolution hour
+"""
+import argparse
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from reading_log import to_epoch_ms
+
+RAW_DTYPE = np.dtype([
+    ("timestamp", "<i8"),   # epoch milliseconds, UTC
+    ("device", "<i4"),
+    ("label", "<i4"),
+    ("confidence", "<f4"),
+])
+ROW_DTYPE = np.dtype([
+    ("bucket", "<i8"),      # bucket start, epoch milliseconds
+    ("device", "<i4"),
+    ("label", "<i4"),
+    ("count", "<i4"),
+    ("confidence_sum", "<f8"),
+])
+
+# Tier widths in ms, finest first, with the partition each segment file covers
+TIERS = {"minute": 60_000, "hour": 3_600_000, "day": 86_400_000}
+PARTITION_UNITS = {"minute": "D", "hour": "M", "day": "Y"}
+RETENTION_DAYS = {"minute": 31, "hour": 400, "day": None}
+RESOLUTIONS = ["raw"] + list(TIERS)
+
+RING_CAPACITY = 65_536
+RING_HEADER = np.dtype([("written", "<i8"), ("capacity", "<i8")])
+SEGMENT_SUFFIX = ".seg"
+TIMELINE_VERSION = 1
+MAX_POINTS = 2000
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_TIMELINE_ROOT = os.path.join(project_root, "data", "timeline")
+
+
+def default_timeline_dir(entrypoint):
+    """Per-entrypoint default, so each timeline has a single writer."""
+    return os.path.join(DEFAULT_TIMELINE_ROOT, entrypoint)
+
+
+def from_env(entrypoint):
+    """Timeline at TIMELINE_DIR (default data/timeline/<entrypoint>), or None when TIMELINE_DIR is empty."""
+    path = os.environ.get("TIMELINE_DIR", default_timeline_dir(entrypoint))
+    return PredictionTimeline(path) if path else None
+
+
+def rollup(rows, width):
+    """Merge rows (ROW_DTYPE) into one row per (bucket of the given width, device, label)."""
+    if len(rows) == 0:
+        return np.empty(0, dtype=ROW_DTYPE)
+    bucket = rows["bucket"] - rows["bucket"] % width
+    order = np.lexsort((rows["label"], rows["device"], bucket))
+    bucket, rows = bucket[order], rows[order]
+    new = np.r_[True, (np.diff(bucket) != 0) | (np.diff(rows["device"]) != 0) | (np.diff(rows["label"]) != 0)]
+    starts = np.flatnonzero(new)
+    out = np.empty(len(starts), dtype=ROW_DTYPE)
+    out["bucket"] = bucket[starts]
+    out["device"] = rows["device"][starts]
+    out["label"] = rows["label"][starts]
+    out["count"] = np.add.reduceat(rows["count"], starts)
+    out["confidence_sum"] = np.add.reduceat(rows["confidence_sum"], starts)
+    return out
+
+
+def _as_rows(entries):
+    rows = np.empty(len(entries), dtype=ROW_DTYPE)
+    rows["bucket"] = entries["timestamp"]
+    rows["device"] = entries["device"]
+    rows["label"] = entries["label"]
+    rows["count"] = 1
+    rows["confidence_sum"] = entries["confidence"]
+    return rows
+
+
+def _partition_bounds(tier, name):
+    """[start, end) ms of the segment file named after its partition (2026-01-21, 2026-01 or 2026)."""
+    unit = PARTITION_UNITS[tier]
+    start = np.datetime64(name, unit)
+    return int(start.astype("datetime64[ms]").astype(np.int64)), int((start + 1).astype("datetime64[ms]").astype(np.int64))
+
+
+class PredictionTimeline:
+    def __init__(self, path=default_timeline_dir("predict_live"), ring_capacity=RING_CAPACITY):
+        self.path = str(path)
+        self.meta_path = os.path.join(self.path, "meta.json")
+        self.ring_path = os.path.join(self.path, "recent.ring")
+        self.devices = []
+        self.labels = []
+        # End (exclusive, ms) of the buckets already written to each tier's segments
+        self.rolled = {tier: None for tier in TIERS}
+        self.latest = None
+        self._codes = {"devices": {}, "labels": {}}
+        self._lock = threading.Lock()
+
+        os.makedirs(self.path, exist_ok=True)
+        if os.path.exists(self.meta_path):
+            self._load_meta()
+        self._open_ring(ring_capacity)
+        # Predictions not rolled into minutes yet; at most about a minute's worth
+        entries = self.recent_entries()
+        if self.rolled["minute"] is not None:
+            entries = entries[entries["timestamp"] >= self.rolled["minute"]]
+        self._pending = entries.copy()
+
+    # ------------------------------------------------------------------
+    # Metadata and storage
+    # ------------------------------------------------------------------
+    def _load_meta(self):
+        with open(self.meta_path, "r") as f:
+            meta = json.load(f)
+        if meta.get("version") != TIMELINE_VERSION:
+            raise ValueError(f"Unsupported timeline: {self.meta_path}")
+        self.devices = meta["devices"]
+        self.labels = meta["labels"]
+        self.rolled = meta["rolled"]
+        self.latest = meta["latest"]
+        self._codes = {
+            "devices": {name: code for code, name in enumerate(self.devices)},
+            "labels": {name: code for code, name in enumerate(self.labels)},
+        }
+
+    def _save_meta(self):
+        meta = {
+            "version": TIMELINE_VERSION,
+            "devices": self.devices,
+            "labels": self.labels,
+            "rolled": self.rolled,
+            "latest": self.latest,
+        }
+        tmp_path = self.meta_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self.meta_path)
+
+    def _open_ring(self, capacity):
+        if not os.path.exists(self.ring_path):
+            with open(self.ring_path, "wb") as f:
+                header = np.zeros(1, dtype=RING_HEADER)
+                header["capacity"] = capacity
+                f.write(header.tobytes())
+                f.truncate(RING_HEADER.itemsize + capacity * RAW_DTYPE.itemsize)
+        self._header = np.memmap(self.ring_path, dtype=RING_HEADER, mode="r+", shape=(1,))
+        self.ring_capacity = int(self._header["capacity"][0])
+        self._ring = np.memmap(self.ring_path, dtype=RAW_DTYPE, mode="r+", offset=RING_HEADER.itemsize,
+                               shape=(self.ring_capacity,))
+
+    def _code(self, table, name):
+        codes = self._codes[table]
+        code = codes.get(name)
+        if code is None:
+            names = getattr(self, table)
+            code = codes[name] = len(names)
+            names.append(name)
+        return code
+
+    def _segment_path(self, tier, partition):
+        return os.path.join(self.path, tier, partition + SEGMENT_SUFFIX)
+
+    def _append_rows(self, tier, rows):
+        if len(rows) == 0:
+            return
+        os.makedirs(os.path.join(self.path, tier), exist_ok=True)
+        partitions = np.datetime_as_string(rows["bucket"].astype("datetime64[ms]"), unit=PARTITION_UNITS[tier])
+        for partition in np.unique(partitions):
+            with open(self._segment_path(tier, str(partition)), "ab") as f:
+                f.write(rows[partitions == partition].tobytes())
+
+    def _segments(self, tier, start_ms=None, end_ms=None):
+        """(start, end, path) of the tier's segments overlapping [start_ms, end_ms], oldest first."""
+        directory = os.path.join(self.path, tier)
+        if not os.path.isdir(directory):
+            return []
+        segments = []
+        for name in os.listdir(directory):
+            if not name.endswith(SEGMENT_SUFFIX):
+                continue
+            lo, hi = _partition_bounds(tier, name[:-len(SEGMENT_SUFFIX)])
+            if (start_ms is None or hi > start_ms) and (end_ms is None or lo <= end_ms):
+                segments.append((lo, hi, os.path.join(directory, name)))
+        return sorted(segments)
+
+    def _prune(self):
+        for tier, days in RETENTION_DAYS.items():
+            if days is None or self.latest is None:
+                continue
+            horizon = self.latest - days * TIERS["day"]
+            for _, hi, path in self._segments(tier, end_ms=horizon):
+                if hi <= horizon:
+                    os.remove(path)
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+    def extend(self, device_ids, timestamps, labels, confidences):
+        """Record a batch of predictions given as parallel sequences."""
+        n = len(device_ids)
+        if n == 0:
+            return 0
+        with self._lock:
+            entries = np.empty(n, dtype=RAW_DTYPE)
+            entries["timestamp"] = [to_epoch_ms(ts) for ts in timestamps]
+            entries["device"] = [self._code("devices", str(d)) for d in device_ids]
+            entries["label"] = [self._code("labels", str(label)) for label in labels]
+            entries["confidence"] = confidences
+            entries = entries[np.argsort(entries["timestamp"], kind="stable")]
+
+            written = int(self._header["written"][0])
+            keep = entries[-self.ring_capacity:]
+            self._ring[(written + n - len(keep) + np.arange(len(keep))) % self.ring_capacity] = keep
+            self._header["written"] = written + n
+            self._ring.flush()
+            self._header.flush()
+
+            # Predictions older than a tier's rolled-up point go straight into that tier
+            rows = _as_rows(entries)
+            for tier, width in TIERS.items():
+                rolled = self.rolled[tier]
+                if rolled is not None:
+                    self._append_rows(tier, rollup(rows[rows["bucket"] < rolled], width))
+            fresh = entries if self.rolled["minute"] is None else entries[entries["timestamp"] >= self.rolled["minute"]]
+            self._pending = np.concatenate([self._pending, fresh])
+
+            newest = int(entries["timestamp"][-1])
+            self.latest = newest if self.latest is None else max(self.latest, newest)
+            self._roll()
+            self._save_meta()
+        return n
+
+    def record(self, device_id, timestamp, label, confidence):
+        """Record one prediction."""
+        return self.extend([device_id], [timestamp], [label], [confidence])
+
+    def _roll(self):
+        """Write out every bucket that ended before the newest prediction, tier by tier."""
+        source = None
+        for tier, width in TIERS.items():
+            complete = self.latest - self.latest % width
+            rolled = self.rolled[tier]
+            if rolled is not None and complete <= rolled:
+                return
+            if tier == "minute":
+                done = self._pending["timestamp"] < complete
+                rows = rollup(_as_rows(self._pending[done]), width)
+                self._pending = self._pending[~done]
+            else:
+                rows = rollup(self._tier_rows(source, rolled, complete - 1), width)
+            self._append_rows(tier, rows)
+            self.rolled[tier] = complete
+            source = tier
+            if tier == "hour":
+                self._prune()
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+    def __len__(self):
+        """Predictions recorded since the timeline was created."""
+        return int(self._header["written"][0])
+
+    def recent_entries(self):
+        """Raw predictions still in the ring, oldest first."""
+        written = int(self._header["written"][0])
+        if written <= self.ring_capacity:
+            return np.array(self._ring[:written])
+        start = written % self.ring_capacity
+        return np.concatenate([self._ring[start:], self._ring[:start]])
+
+    def _tier_rows(self, tier, start_ms, end_ms, device=None):
+        """Rows of a tier with bucket start in [start_ms, end_ms], including buckets not rolled up yet."""
+        parts = []
+        rolled = self.rolled[tier] if tier != "raw" else None
+        if tier != "raw":
+            for _, _, path in self._segments(tier, start_ms, end_ms):
+                parts.append(np.fromfile(path, dtype=ROW_DTYPE))
+            finer = RESOLUTIONS[RESOLUTIONS.index(tier) - 1]
+            source_start = rolled if start_ms is None or (rolled is not None and rolled > start_ms) else start_ms
+            if rolled is None or end_ms is None or end_ms >= rolled:
+                if finer == "raw":
+                    pending = self._pending
+                    if source_start is not None:
+                        pending = pending[pending["timestamp"] >= source_start]
+                    parts.append(_as_rows(pending))
+                else:
+                    parts.append(self._tier_rows(finer, source_start, end_ms))
+        else:
+            parts.append(_as_rows(self.recent_entries()))
+
+        rows = np.concatenate(parts) if parts else np.empty(0, dtype=ROW_DTYPE)
+        rows = rollup(rows, TIERS.get(tier, 1))
+        mask = np.ones(len(rows), dtype=bool)
+        if start_ms is not None:
+            mask &= rows["bucket"] >= (start_ms - start_ms % TIERS.get(tier, 1))
+        if end_ms is not None:
+            mask &= rows["bucket"] <= end_ms
+        if device is not None:
+            mask &= rows["device"] == device
+        return rows[mask]
+
+    def resolution_for(self, start_ms, end_ms, max_points=MAX_POINTS):
+        """Finest resolution that still has the range's data and gives at most max_points buckets per device."""
+        entries = self.recent_entries()
+        end_ms = self.latest if end_ms is None else end_ms
+        if end_ms is None:
+            return "raw"
+        if start_ms is not None and len(entries) and entries["timestamp"][0] <= start_ms and \
+                np.count_nonzero(entries["timestamp"] >= start_ms) <= max_points:
+            return "raw"
+        for tier, width in TIERS.items():
+            days = RETENTION_DAYS[tier]
+            retained = days is None or (start_ms is not None and start_ms >= self.latest - days * TIERS["day"])
+            if retained and start_ms is not None and (end_ms - start_ms) // width < max_points:
+                return tier
+        return "day"
+
+    def query(self, device_id=None, start=None, end=None, resolution="auto", max_points=MAX_POINTS):
+        """
+        Timeline of predictions in [start, end] (ISO strings, datetimes or epoch ms).
+
+        Returns a DataFrame with one row per device and bucket (or raw prediction):
+        device_id, timestamp (bucket start), label (dominant), share (of the bucket's
+        predictions with that label), confidence (mean) and count. resolution is
+        raw, minute, hour, day or auto (the finest giving at most max_points buckets).
+        """
+        start_ms = None if start is None else to_epoch_ms(start)
+        end_ms = None if end is None else to_epoch_ms(end)
+        if resolution == "auto":
+            resolution = self.resolution_for(start_ms, end_ms, max_points)
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"resolution must be auto or one of {', '.join(RESOLUTIONS)}")
+
+        with self._lock:
+            device = self._codes["devices"].get(device_id) if device_id is not None else None
+            if device_id is not None and device is None:
+                rows = np.empty(0, dtype=ROW_DTYPE)
+            else:
+                rows = self._tier_rows(resolution, start_ms, end_ms, device)
+            devices, labels = list(self.devices), list(self.labels)
+        return self._frame(rows, devices, labels)
+
+    @staticmethod
+    def _frame(rows, devices, labels):
+        columns = ["device_id", "timestamp", "label", "share", "confidence", "count"]
+        if len(rows) == 0:
+            return pd.DataFrame(columns=columns)
+        df = pd.DataFrame(rows)
+        totals = df.groupby(["device", "bucket"], sort=False)[["count", "confidence_sum"]].sum()
+        dominant = (df.sort_values(["device", "bucket", "count", "confidence_sum"], ascending=[True, True, False, False])
+                    .drop_duplicates(["device", "bucket"]).set_index(["device", "bucket"]))
+        totals = totals.loc[dominant.index]
+        out = pd.DataFrame({
+            "device_id": pd.Categorical.from_codes(dominant.index.get_level_values("device"), categories=devices),
+            "timestamp": pd.to_datetime(dominant.index.get_level_values("bucket"), unit="ms", utc=True),
+            "label": pd.Categorical.from_codes(dominant["label"].to_numpy(), categories=labels),
+            "share": (dominant["count"] / totals["count"]).to_numpy(),
+            "confidence": (totals["confidence_sum"] / totals["count"]).to_numpy(),
+            "count": totals["count"].to_numpy(),
+        })
+        return out[columns].reset_index(drop=True)
+
+    def recent(self, n=5, device_id=None):
+        """The newest n raw predictions as a DataFrame, oldest first."""
+        entries = self.recent_entries()
+        if device_id is not None:
+            entries = entries[entries["device"] == self._codes["devices"].get(device_id, -1)]
+        entries = entries[-n:] if n else entries
+        return pd.DataFrame({
+            "device_id": [self.devices[d] for d in entries["device"]],
+            "timestamp": pd.to_datetime(entries["timestamp"], unit="ms", utc=True),
+            "label": [self.labels[label] for label in entries["label"]],
+            "confidence": entries["confidence"].astype(float),
+        })
+
+    def summary(self, start=None, end=None, device_id=None):
+        """Predictions, most common label and mean confidence over [start, end]."""
+        start_ms = None if start is None else to_epoch_ms(start)
+        entries = self.recent_entries()
+        # Exact from the ring when it reaches back far enough, else from minute buckets
+        exact = start_ms is not None and len(entries) and entries["timestamp"][0] <= start_ms
+        timeline = self.query(device_id, start, end, resolution="raw" if exact else "minute")
+        if timeline.empty:
+            return {"predictions": 0, "label": None, "confidence": None}
+        counts = timeline.groupby("label", observed=True)["count"].sum()
+        return {
+            "predictions": int(timeline["count"].sum()),
+            "label": str(counts.idxmax()),
+            "confidence": float((timeline["confidence"] * timeline["count"]).sum() / timeline["count"].sum()),
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect a prediction timeline")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    info_parser = sub.add_parser("info", help="Summarise a timeline")
+    info_parser.add_argument("path", nargs="?", default=default_timeline_dir("predict_live"))
+
+    query_parser = sub.add_parser("query", help="Print a device's timeline over a time range")
+    query_parser.add_argument("path", nargs="?", default=default_timeline_dir("predict_live"))
+    query_parser.add_argument("--device", default=None)
+    query_parser.add_argument("--start", default=None, help="ISO timestamp")
+    query_parser.add_argument("--end", default=None, help="ISO timestamp")
+    query_parser.add_argument("--resolution", default="auto", choices=["auto"] + RESOLUTIONS)
+
+    args = parser.parse_args()
+    timeline = PredictionTimeline(args.path)
+
+    if args.command == "info":
+        print(f"Prediction timeline: {timeline.path}")
+        print(f"  Predictions: {len(timeline)} ({len(timeline.recent_entries())} in the ring)")
+        print(f"  Devices:     {', '.join(timeline.devices) or '-'}")
+        print(f"  Labels:      {', '.join(timeline.labels) or '-'}")
+        for tier in TIERS:
+            segments = timeline._segments(tier)
+            size = sum(os.path.getsize(path) for _, _, path in segments)
+            rolled = pd.Timestamp(timeline.rolled[tier], unit="ms", tz="UTC") if timeline.rolled[tier] else "-"
+            print(f"  {tier:<7} {len(segments):>4} segments, {size // ROW_DTYPE.itemsize:>9} rows, rolled up to {rolled}")
+    else:
+        print(timeline.query(args.device, args.start, args.end, args.resolution).to_string(index=False))
@@ -1,60 +1,379 @@
+import argparse
+import io
+import json
 import torch
 import os
+import sys
+import time
+import joblib
 import numpy as np
-from torch.utils.data import DataLoader
-from dataset import EnergyDataset
-from model import EnergyFingerprintNet
-from utils import load_and_preprocess
+import pandas as pd
+from torch.nn.parallel import DistributedDataParallel
+from torch.utils.data import ConcatDataset, DataLoader
+from torch.utils.data.distributed import DistributedSampler
+from dataset import EnergyDataset, SequenceChunks
+from model import MODEL_ARCHS, MODEL_FILES, build_model, grow_output_layer, load_model, training_state_path
+from reading_log import to_epoch_ms
+from distill import distillation_loss, compare_models, print_report
+from feature_store import FeatureStore
+from inference import sliding_windows
+from sklearn.preprocessing import LabelEncoder
+from utils import split_incremental
+import checkpoint
+import distributed
+import metrics
+import rolling
 
 # Set paths relative to project root
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 data_path = os.path.join(project_root, "data", "spectrawatt.energy_data.csv")
 
-X, y, classes = load_and_preprocess(data_path)
+parser = argparse.ArgumentParser(description="Train the energy fingerprinting model")
+parser.add_argument("--data", default=data_path, help="energy_data CSV export or binary reading log (.log)")
+parser.add_argument("--student", choices=[a for a in MODEL_ARCHS if a != "lstm"], default=None,
+                    help="Distill a small student from the trained LSTM teacher instead of training the teacher")
+parser.add_argument("--temperature", type=float, default=4.0, help="Distillation softmax temperature")
+parser.add_argument("--alpha", type=float, default=0.7, help="Weight of the teacher (soft) loss vs the label loss")
+parser.add_argument("--incremental", action="store_true",
+                    help="Fine-tune the saved model on readings newer than its training watermark")
+parser.add_argument("--since", default=None,
+                    help="Override the watermark (ISO timestamp), e.g. for a model trained before state was saved")
+parser.add_argument("--replay-ratio", type=float, default=0.5,
+                    help="Rows of older data replayed per new row when fine-tuning")
+parser.add_argument("--replay-block", type=int, default=50, help="Length of each contiguous replay block")
+parser.add_argument("--epochs", type=int, default=None, help="Maximum epochs (default 300, or 30 when fine-tuning)")
+parser.add_argument("--seed", type=int, default=0, help="Seed for replay block selection")
+parser.add_argument("--rebuild-features", action="store_true",
+                    help="Re-parse the data instead of using the cached feature store (refits the scaler)")
+parser.add_argument("--patience", type=int, default=None,
+                    help="Epochs without improvement before stopping (default 25, or 5 when fine-tuning)")
+parser.add_argument("--workers", type=int, default=1,
+                    help="Data-parallel training processes on this host (gloo); use torchrun for several hosts")
+parser.add_argument("--threads", type=int, default=None,
+                    help="Intra-op threads per process (default: this host's cores / local workers)")
+parser.add_argument("--models-dir", default=os.path.join(project_root, "models"),
+                    help="Where models, preprocessors and training state are read and written")
+parser.add_argument("--report", default=None, help="Write per-epoch losses and timings as JSON")
+parser.add_argument("--checkpoint-every", type=int, default=1,
+                    help="Epochs between periodic checkpoints (written in the background; 0 disables them)")
+parser.add_argument("--keep-checkpoints", type=int, default=3, help="Periodic checkpoints kept besides the best")
+parser.add_argument("--resume", action="store_true",
+                    help="Continue from the newest checkpoint (weights, optimizer, epoch, best loss)")
+parser.add_argument("--sequence", action="store_true",
+                    help="Train the single-direction lstm-seq model statefully over whole device timelines "
+                         "(truncated BPTT, a loss at every reading) instead of on overlapping windows")
+parser.add_argument("--chunk", type=int, default=50, help="Readings per truncated-BPTT step with --sequence")
+parser.add_argument("--lanes", type=int, default=16, help="Timelines trained side by side with --sequence")
+parser.add_argument("--reset-prob", type=float, default=0.25,
+                    help="Chance of restarting a lane from a zero state at each chunk with --sequence, so the "
+                         "model also learns to classify short windows (how the prediction scripts serve it)")
+parser.add_argument("--rolling", choices=rolling.CLASSIFIERS, default=None,
+                    help="Fit the rolling-statistics classifier (decision tree or logistic regression) instead of a network")
+args = parser.parse_args()
+if args.incremental and args.student:
+    parser.error("--incremental fine-tunes the teacher; re-run --student afterwards to refresh a student")
+if args.rolling and (args.incremental or args.student or args.workers > 1):
+    parser.error("--rolling fits in one pass; it does not combine with --incremental, --student or --workers")
+if args.sequence and (args.incremental or args.student or args.rolling or args.workers > 1):
+    parser.error("--sequence trains lstm-seq from scratch in one process; "
+                 "it does not combine with --incremental, --student, --rolling or --workers")
 
-dataset = EnergyDataset(X, y, window_size=10)
-loader = DataLoader(dataset, batch_size=32, shuffle=True)
+# --workers N re-runs this script as N torchrun processes; each one lands below with WORLD_SIZE set
+if args.workers > 1 and "WORLD_SIZE" not in os.environ:
+    raise SystemExit(distributed.launch(args.workers, sys.argv[1:]))
+rank, world_size = distributed.init(args.threads)
+if rank != 0:
+    # Rank 0 reports progress and writes every artifact
+    sys.stdout = open(os.devnull, "w")
+
+models_dir = args.models_dir
+arch = "lstm-seq" if args.sequence else args.student or "lstm"
+model_path = os.path.join(models_dir, MODEL_FILES[arch])
+state_path = training_state_path(models_dir, arch)
+
+if rank == 0:
+    metrics.init("train")
 
 device = torch.device("cpu")
-model = EnergyFingerprintNet(input_size=4, num_classes=len(classes)).to(device)
+teacher = None
+optimizer_state = None
+store = FeatureStore()
+
+if args.incremental:
+    state = torch.load(state_path) if os.path.exists(state_path) else None
+    if args.since:
+        since = to_epoch_ms(args.since)
+    elif state is not None:
+        since = state["watermark_ms"]
+    else:
+        parser.error(f"{os.path.basename(state_path)} not found - run a full training first or pass --since")
+
+    # Keep the scaler the model was trained with; the store caches features per scaler
+    with metrics.timed("load"):
+        scaler = joblib.load(os.path.join(models_dir, "scaler.pkl"))
+        # Rank 0 builds or extends the cached features; the other ranks then read them
+        features = distributed.main_first(
+            lambda: store.load(args.data, scaler=scaler, rebuild=args.rebuild_features and rank == 0))
+    print(f"Features: {features.status} ({len(features)} rows)")
+    watermark = int(features.timestamps.max())
+
+    segments = split_incremental(features.timestamps, since, args.replay_ratio, args.replay_block, args.seed)
+    if not segments:
+        print(f"No readings newer than {pd.Timestamp(since, unit='ms', tz='UTC')} - nothing to fine-tune")
+        raise SystemExit(0)
+
+    # Classes stay sorted (LabelEncoder order); devices not seen before are inserted
+    old_classes = joblib.load(os.path.join(models_dir, "label_encoder.pkl")).classes_
+    classes = np.array(sorted(set(old_classes) | set(features.classes)), dtype=object)
+    new_classes = [c for c in classes if c not in set(old_classes)]
+    X = features.X
+    y = np.searchsorted(classes, features.classes)[features.y]
+    trainable = [rows for rows in segments if len(rows) > 10]
+    if not trainable:
+        print(f"Too few readings newer than {pd.Timestamp(since, unit='ms', tz='UTC')} for a window "
+              f"- nothing to fine-tune")
+        raise SystemExit(0)
+    dataset = ConcatDataset([EnergyDataset(X[rows], y[rows], window_size=10) for rows in trainable])
+    print(f"Fine-tuning on {len(segments[0])} new readings + {sum(len(r) for r in segments[1:])} replayed "
+          f"(watermark {pd.Timestamp(since, unit='ms', tz='UTC')})")
+
+    model = build_model(arch, input_size=4, num_classes=len(old_classes))
+    model.load_state_dict(torch.load(model_path))
+    optimizer_state = state["optimizer"] if state is not None else None
+    if new_classes:
+        print(f"New classes: {', '.join(new_classes)} - growing output layer to {len(classes)}")
+        grow_output_layer(model, np.searchsorted(classes, old_classes), len(classes), optimizer_state)
+    model = model.to(device)
+    y_train = np.concatenate([y[rows] for rows in segments])
+else:
+    # scaler.pkl and label_encoder.pkl belong to the deployed teacher LSTM. Students and lstm-seq are
+    # trained against them (the teacher's logits depend on them); the rolling classifier stores its own.
+    scaler_path = os.path.join(models_dir, "scaler.pkl")
+    shared_preprocessors = (args.student or args.sequence) and os.path.exists(scaler_path)
+    save_preprocessors = not (args.rolling or shared_preprocessors)
+    with metrics.timed("load"):
+        scaler = joblib.load(scaler_path) if shared_preprocessors else None
+        features = distributed.main_first(
+            lambda: store.load(args.data, scaler=scaler, rebuild=args.rebuild_features and rank == 0))
+    print(f"Features: {features.status} ({len(features)} rows)")
+    if shared_preprocessors:
+        deployed_classes = joblib.load(os.path.join(models_dir, "label_encoder.pkl")).classes_
+        if list(features.classes) != list(deployed_classes):
+            parser.error(f"The data's classes {list(features.classes)} differ from the deployed model's "
+                         f"{list(deployed_classes)} - retrain the LSTM (or --incremental) first")
+    if args.rolling:
+        # Rolling statistics are computed on the readings in their own units, not the standardised X
+        with metrics.timed("fit"):
+            artifact, report = rolling.fit(features.raw(), features.y, features.classes, args.rolling)
+        path = rolling.save(artifact, models_dir)
+        print(f"✅ Rolling {args.rolling} classifier saved to {path}")
+        print(f"{report['features']} features on {report['rows']} windows | "
+              f"holdout accuracy: {report.get('holdout_accuracy', float('nan')):.4f} | "
+              f"train accuracy: {report['train_accuracy']:.4f}")
+        if args.report:
+            with open(args.report, "w") as f:
+                json.dump(report, f, indent=2)
+        if metrics.enabled:
+            print(metrics.summary())
+        raise SystemExit(0)
+    watermark = int(features.timestamps.max())
+    X, y, classes = features.X, features.y, features.classes
+    dataset = EnergyDataset(X, y, window_size=10)
+    model = build_model(arch, input_size=4, num_classes=len(classes)).to(device)
+    y_train = y
+
+# Stateful mode: every reading goes through the LSTM once per epoch instead of once per window it is in
+sequences = SequenceChunks(X, y, features.timestamps, args.chunk, args.lanes) if args.sequence else None
+if sequences is not None:
+    print(f"Sequence training: {len(sequences.segments)} timeline segments in {sequences.rows.shape[0]} lanes, "
+          f"{len(sequences)} chunks of {args.chunk} readings per epoch")
+
+# Each worker trains on its own shard of the windows with batches of 32 (global batch 32 x workers)
+sampler = DistributedSampler(dataset, shuffle=True, seed=args.seed) if world_size > 1 else None
+loader = DataLoader(dataset, batch_size=32, shuffle=sampler is None, sampler=sampler)
+core_model = model
+if world_size > 1:
+    model = DistributedDataParallel(model)
+    print(f"Data-parallel training on {world_size} workers ({torch.get_num_threads()} threads each)")
+
+if args.student:
+    teacher = load_model(models_dir, num_classes=len(classes), arch="lstm").to(device)
+    print(f"Distilling {arch} student from {MODEL_FILES['lstm']} (T={args.temperature}, alpha={args.alpha})")
 
-# Calculate class weights to handle imbalance
-class_counts = np.bincount(y)
-class_weights = len(y) / (len(classes) * class_counts)
+# Calculate class weights to handle imbalance (classes absent from the training rows count once)
+class_counts = np.maximum(np.bincount(y_train, minlength=len(classes)), 1)
+class_weights = len(y_train) / (len(classes) * class_counts)
 class_weights = torch.tensor(class_weights, dtype=torch.float32).to(device)
 
 criterion = torch.nn.CrossEntropyLoss(weight=class_weights)
 optimizer = torch.optim.Adam(model.parameters(), lr=0.001)
+if optimizer_state is not None:
+    optimizer.load_state_dict(optimizer_state)
 
 best_loss = float('inf')
-patience = 25
+patience = args.patience or (5 if args.incremental else 25)
 patience_counter = 0
+epochs = args.epochs or (30 if args.incremental else 300)
+history = {"losses": [], "epoch_seconds": []}
+start_epoch = 0
 
-for epoch in range(300):
+if args.resume:
+    resumed = checkpoint.latest(models_dir, arch)
+    if resumed is None:
+        parser.error(f"No checkpoints in {checkpoint.checkpoint_dir(models_dir, arch)} to resume from")
+    if list(resumed["classes"]) != list(classes):
+        parser.error("The newest checkpoint was trained on other classes - train without --resume")
+    # Every rank loads the same weights, so the replicas stay identical
+    core_model.load_state_dict(resumed["model"])
+    optimizer.load_state_dict(resumed["optimizer"])
+    start_epoch, best_loss, patience_counter = resumed["epoch"], resumed["best_loss"], resumed["patience_counter"]
+    print(f"Resuming after epoch {start_epoch} (best loss {best_loss:.4f})")
+
+# Rank 0 snapshots tensors at checkpoints; a background thread serializes and writes them atomically
+# Weights grown for new classes are only published at the end, together with the label encoder
+publish = not (args.incremental and new_classes)
+writer = None
+if rank == 0:
+    writer = checkpoint.CheckpointWriter(models_dir, arch, keep=args.keep_checkpoints, publish=publish)
+
+for epoch in range(start_epoch, epochs):
     total_loss = 0
-    for xb, yb in loader:
-        xb, yb = xb.to(device), yb.to(device)
-        optimizer.zero_grad()
-        preds = model(xb)
-        loss = criterion(preds, yb)
-        loss.backward()
-        optimizer.step()
-        total_loss += loss.item()
-
-    avg_loss = total_loss / len(loader)
+    if sampler is not None:
+        sampler.set_epoch(epoch)
+    epoch_start = time.perf_counter()
+    with metrics.timed("epoch"):
+        if sequences is not None:
+            sequences.shuffle(args.seed + epoch)
+            rng = torch.Generator().manual_seed(args.seed + epoch)
+            state = None
+            for xb, yb, mask, reset in sequences:
+                with metrics.timed("batch"):
+                    if state is not None:
+                        # Lanes starting a new segment (or drawn for a reset) begin from a zero state
+                        reset = reset | (torch.rand(len(reset), generator=rng) < args.reset_prob)
+                        keep = (~reset).float()[None, :, None]
+                        state = tuple(s * keep for s in state)
+                    optimizer.zero_grad()
+                    logits, state = model.forward_sequence(xb, state)
+                    loss = criterion(logits[mask], yb[mask])
+                    loss.backward()
+                    optimizer.step()
+                    # Truncated BPTT: the next chunk starts from this state but does not backpropagate into it
+                    state = tuple(s.detach() for s in state)
+                    total_loss += loss.item()
+        else:
+            for xb, yb in loader:
+                with metrics.timed("batch"):
+                    xb, yb = xb.to(device), yb.to(device)
+                    optimizer.zero_grad()
+                    preds = model(xb)
+                    if teacher is not None:
+                        with torch.no_grad():
+                            teacher_logits = teacher(xb)
+                        loss = distillation_loss(preds, teacher_logits, yb, criterion, args.temperature, args.alpha)
+                    else:
+                        loss = criterion(preds, yb)
+                    loss.backward()
+                    optimizer.step()
+                    total_loss += loss.item()
+
+    # Mean batch loss over every worker's batches, so all ranks see the same value
+    avg_loss = distributed.all_mean(total_loss, len(loader) if sequences is None else len(sequences))
+    history["losses"].append(avg_loss)
+    history["epoch_seconds"].append(time.perf_counter() - epoch_start)
     print(f"Epoch {epoch+1} | Loss: {avg_loss:.4f}")
     
     # Early stopping
-    if avg_loss < best_loss:
+    improved = avg_loss < best_loss
+    if improved:
         best_loss = avg_loss
         patience_counter = 0
-        torch.save(model.state_dict(), os.path.join(project_root, "models", "energy_model.pt"))
     else:
         patience_counter += 1
-        if patience_counter >= patience:
-            print(f"Early stopping at epoch {epoch+1}")
-            break
+    periodic = args.checkpoint_every > 0 and args.keep_checkpoints > 0 and (epoch + 1) % args.checkpoint_every == 0
+    if writer is not None:
+        with metrics.timed("checkpoint"):
+            writer.submit(epoch + 1, core_model, optimizer, avg_loss, best_loss, periodic=periodic, best=improved,
+                          classes=list(classes), patience_counter=patience_counter)
+    # Rank 0 decides, so every worker leaves the loop after the same epoch
+    if distributed.agree(patience_counter >= patience):
+        print(f"Early stopping at epoch {epoch+1}")
+        break
 
-model_path = os.path.join(project_root, "models", "energy_model.pt")
+if rank != 0:
+    distributed.shutdown()
+    raise SystemExit(0)
+
+writer.close()
 print("✅ Model saved (best checkpoint)")
+if not args.incremental and save_preprocessors:
+    # Only now that the model they belong to is saved
+    features.save_preprocessors(models_dir)
 print(f"Best loss achieved: {best_loss:.4f}")
+
+if args.report:
+    samples = len(dataset) if sequences is None else sequences.timesteps
+    epoch_s = float(np.median(history["epoch_seconds"]))
+    with open(args.report, "w") as f:
+        json.dump({
+            "workers": world_size,
+            "threads": torch.get_num_threads(),
+            # Training examples per epoch: windows, or readings in --sequence mode (one loss each)
+            "windows": samples,
+            "epoch_s": epoch_s,
+            "windows_per_s": samples / epoch_s,
+            "best_loss": best_loss,
+            **history,
+        }, f, indent=2)
+
+print(f"Checkpoints: {writer.written} written in {writer.write_seconds:.2f}s off the training thread, "
+      f"{writer.skipped} superseded before writing ({checkpoint.checkpoint_dir(models_dir, arch)})")
+
+# Optimizer state and the newest reading trained on, for the next --incremental run
+best = checkpoint.load_best(models_dir, arch)
+checkpoint.atomic_save({
+    "arch": arch,
+    "classes": list(classes),
+    "watermark_ms": watermark,
+    "optimizer": best["optimizer"] if best is not None else None,
+}, state_path)
+print(f"Training watermark: {pd.Timestamp(watermark, unit='ms', tz='UTC')}")
+if args.incremental and new_classes:
+    label_encoder = LabelEncoder()
+    label_encoder.classes_ = classes
+    buffer = io.BytesIO()
+    joblib.dump(label_encoder, buffer)
+    checkpoint.atomic_write(buffer.getvalue(), os.path.join(models_dir, "label_encoder.pkl"))
+    checkpoint.atomic_save(best["model"], model_path)
+    print(f"✅ Published {os.path.basename(model_path)} with the grown label encoder")
+    print("⚠️  Label set changed - re-run train.py --student for any distilled students")
+
+if teacher is not None:
+    student = load_model(models_dir, num_classes=len(classes), arch=arch)
+    report = compare_models(teacher, student, X, y, window_size=dataset.window_size)
+    print_report(report, arch)
+    report_path = os.path.join(models_dir, f"distill_report_{arch}.json")
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {report_path}")
+
+if sequences is not None:
+    # The prediction scripts classify 10-reading windows from a zero state; score both ways
+    seq_model = load_model(models_dir, num_classes=len(classes), arch=arch)
+    correct = 0
+    with torch.no_grad():
+        sequences.shuffle(None)
+        state = None
+        for xb, yb, mask, reset in sequences:
+            if state is not None:
+                state = tuple(s * (~reset).float()[None, :, None] for s in state)
+            logits, state = seq_model.forward_sequence(xb, state)
+            correct += int((logits.argmax(dim=2)[mask] == yb[mask]).sum())
+        windows = torch.from_numpy(np.ascontiguousarray(sliding_windows(X, dataset.window_size)))
+        windowed = (seq_model(windows).argmax(dim=1).numpy() == np.asarray(y[dataset.window_size:])).mean()
+    print(f"lstm-seq accuracy: {correct / sequences.timesteps * 100:.1f}% stateful over whole timelines, "
+          f"{windowed * 100:.1f}% on {dataset.window_size}-reading windows (as served with MODEL_ARCH=lstm-seq)")
+
+if metrics.enabled:
+    print(metrics.summary())
+distributed.shutdown()
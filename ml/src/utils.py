@@ -1,21 +1,35 @@
-import pandas as pd
 from sklearn.preprocessing import LabelEncoder, StandardScaler
 import joblib
 import os
 import numpy as np
+from ingest import parse_timestamps, read_readings
 
-def load_and_preprocess(csv_path):
-    df = pd.read_csv(csv_path)
-    
-    # Filter out Sonnet and Chitrita-PC - only keep Bulb-100w, Bulb-60w, Soldering-Iron
-    df = df[~df['device_id'].isin(['Sonnet', 'Chitrita-PC'])].reset_index(drop=True)
+def load_readings(path, keep_ids=False):
+    """Load typed readings (int64 epoch-ms timestamps) from a CSV/JSON export or a binary reading log."""
+    return read_readings(path, keep_ids=keep_ids)
+
+# Devices left out of training - only keep Bulb-100w, Bulb-60w, Soldering-Iron
+EXCLUDED_DEVICES = ['Sonnet', 'Chitrita-PC']
+FEATURES = ["vrms", "irms", "apparent_power", "wh"]
+
+# Amplify irms (column index 1) since it's more distinctive per device
+IRMS_WEIGHT = 3.0
+
+def load_training_frame(path):
+    """Load readings and drop devices that are not trained on."""
+    df = load_readings(path)
+    return df[~df['device_id'].isin(EXCLUDED_DEVICES)].reset_index(drop=True)
+
+def timestamps_ms(df):
+    """Reading timestamps as int64 epoch milliseconds."""
+    return parse_timestamps(df["timestamp"])
 
-    features = ["vrms", "irms", "apparent_power", "wh"]
-    X = df[features].values
+def fit_preprocess(df, models_dir):
+    """Fit the scaler and label encoder on df and save them (with the irms weight) to models_dir."""
+    X = df[FEATURES].to_numpy(dtype=np.float64, copy=True)
 
-    # Amplify irms (column index 1) since it's more distinctive per device
     # Multiply irms by 3 to give it more weight in the model
-    irms_weight = 3.0
+    irms_weight = IRMS_WEIGHT
     X[:, 1] = X[:, 1] * irms_weight
 
     scaler = StandardScaler()
@@ -24,13 +38,39 @@ def load_and_preprocess(csv_path):
     label_encoder = LabelEncoder()
     y = label_encoder.fit_transform(df["device_id"])
 
-    # Get project root from csv path
-    project_root = os.path.dirname(os.path.dirname(os.path.abspath(csv_path)))
-    models_dir = os.path.join(project_root, "models")
     os.makedirs(models_dir, exist_ok=True)
-    
     joblib.dump(scaler, os.path.join(models_dir, "scaler.pkl"))
     joblib.dump(label_encoder, os.path.join(models_dir, "label_encoder.pkl"))
     joblib.dump(irms_weight, os.path.join(models_dir, "irms_weight.pkl"))
     return X, y, label_encoder.classes_
 
+def load_and_preprocess(csv_path):
+    df = load_training_frame(csv_path)
+
+    # Get project root from csv path
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(csv_path)))
+    models_dir = os.path.join(project_root, "models")
+    return fit_preprocess(df, models_dir)
+
+def split_incremental(timestamps, watermark_ms, replay_ratio=0.5, replay_block=50, seed=0):
+    """
+    Pick the rows to fine-tune on after a previous run trained up to watermark_ms.
+
+    timestamps are the epoch-ms times of the training rows, in row order.
+
+    Returns a list of row-index arrays: first every reading newer than the
+    watermark, then randomly chosen blocks of replay_block older readings adding
+    up to roughly replay_ratio times as many rows. Each array is a contiguous
+    stretch of readings, so windows never straddle unrelated data.
+    """
+    ts = np.asarray(timestamps)
+    new_rows = np.flatnonzero(ts > watermark_ms)
+    if len(new_rows) == 0:
+        return []
+    old_rows = np.flatnonzero(ts <= watermark_ms)
+
+    n_blocks = len(old_rows) // replay_block
+    wanted = min(n_blocks, int(np.ceil(len(new_rows) * replay_ratio / replay_block)))
+    rng = np.random.default_rng(seed)
+    blocks = np.sort(rng.choice(n_blocks, size=wanted, replace=False))
+    return [new_rows] + [old_rows[b * replay_block:(b + 1) * replay_block] for b in blocks]
@@ -0,0 +1,118 @@
+"""
+Test suite for out-of-core batch scoring
+Run with: pytest tests/ -v
+"""
+import importlib.util
+import sys
+import os
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import pytest
+import numpy as np
+import pandas as pd
+from batch_score import WindowBuilder, score
+from inference import get_predictor, sliding_windows
+from reading_log import import_csv
+
+DATA_CSV = os.path.join(os.path.dirname(__file__), '..', 'data', 'spectrawatt.energy_data.csv')
+
+
+def _readings(n=60, devices=("a", "b", "c"), seed=0):
+    rng = np.random.default_rng(seed)
+    device_ids = rng.choice(np.array(devices), n)
+    return device_ids, rng.normal(size=(n, 4)).astype(np.float32)
+
+
+class TestWindowBuilder:
+    """Test cases for per-meter windows across chunk boundaries."""
+
+    def test_matches_sliding_windows_per_device(self):
+        """Test that each reading is scored by the window of earlier readings on its meter."""
+        device_ids, X = _readings()
+        windows, rows = WindowBuilder(5).build(device_ids, X)
+        for device in "abc":
+            idx = np.flatnonzero(device_ids == device)
+            expected = sliding_windows(X[idx], 5)
+            mine = np.isin(rows, idx)
+            np.testing.assert_array_equal(rows[mine], idx[5:])
+            np.testing.assert_array_equal(windows[mine], expected)
+
+    @pytest.mark.parametrize("chunk", [1, 4, 7, 60])
+    def test_chunking_does_not_change_windows(self, chunk):
+        """Test that chunked building yields the same windows as one pass."""
+        device_ids, X = _readings()
+        whole, whole_rows = WindowBuilder(5).build(device_ids, X)
+        order = np.argsort(whole_rows)
+
+        builder = WindowBuilder(5)
+        parts, part_rows = [], []
+        for start in range(0, len(X), chunk):
+            windows, rows = builder.build(device_ids[start:start + chunk], X[start:start + chunk])
+            parts.append(windows)
+            part_rows.append(rows + start)
+        windows, rows = np.concatenate(parts), np.concatenate(part_rows)
+
+        np.testing.assert_array_equal(np.sort(rows), whole_rows[order])
+        np.testing.assert_array_equal(windows[np.argsort(rows)], whole[order])
+
+
+@pytest.mark.skipif(importlib.util.find_spec("pyarrow") is None, reason="pyarrow not installed")
+class TestScore:
+    """Test cases for end-to-end scoring to Parquet."""
+
+    def test_chunked_parallel_matches_predictor(self, tmp_path):
+        """Test that chunked pool output equals the shared predictor on each meter's readings."""
+        out = str(tmp_path / "scores.parquet")
+        stats = score(DATA_CSV, out, workers=2, chunk_rows=50, batch_size=16)
+        result = pd.read_parquet(out)
+
+        df = pd.read_csv(DATA_CSV)
+        assert stats["rows"] == len(result) == len(df)
+        assert stats["chunks"] == -(-len(df) // 50)
+        assert result["row"].tolist() == list(range(len(df)))
+
+        predictor = get_predictor()
+        for device, group in df.groupby("device_id"):
+            X = group[["vrms", "irms", "apparent_power", "wh"]].to_numpy(dtype=np.float32)
+            scored = result.loc[group.index]
+            assert scored["predicted"].iloc[:10].isna().all()
+            if len(group) <= 10:
+                continue
+            labels, confidences, _ = predictor.predict_many(sliding_windows(X, 10))
+            assert (scored["predicted"].iloc[10:].astype(str).to_numpy() == labels).all()
+            np.testing.assert_allclose(scored["confidence"].iloc[10:], confidences, atol=1e-5)
+
+    def test_reading_log_matches_csv(self, tmp_path):
+        """Test that a reading log scores the same as the CSV it was imported from."""
+        log_path = str(tmp_path / "readings.log")
+        import_csv(DATA_CSV, log_path)
+        score(DATA_CSV, str(tmp_path / "csv.parquet"), workers=1)
+        score(log_path, str(tmp_path / "log.parquet"), workers=1, chunk_rows=64)
+
+        from_csv = pd.read_parquet(tmp_path / "csv.parquet")
+        from_log = pd.read_parquet(tmp_path / "log.parquet")
+        assert from_log["predicted"].astype(str).equals(from_csv["predicted"].astype(str))
+        np.testing.assert_allclose(from_log["confidence"], from_csv["confidence"], atol=1e-4)
+
+    def test_rolling_classes_come_from_its_artifact(self, tmp_path, monkeypatch):
+        """Test that --arch rolling names columns after the classifier's classes, with no label_encoder.pkl."""
+        import inference
+        import rolling
+
+        df = pd.read_csv(DATA_CSV)
+        X = df[["vrms", "irms", "apparent_power", "wh"]].to_numpy()
+        artifact, _ = rolling.fit(X, (X[:, 2] > 100).astype(int), ["low", "high"], "tree")
+        rolling.save(artifact, str(tmp_path))
+        monkeypatch.setattr(inference, "models_dir", str(tmp_path))
+
+        out = str(tmp_path / "scores.parquet")
+        score(DATA_CSV, out, workers=1, arch="rolling")
+        result = pd.read_parquet(out)
+        assert [c for c in result.columns if c.startswith("prob_")] == ["prob_low", "prob_high"]
+        assert set(result["predicted"].dropna().astype(str)) <= {"low", "high"}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
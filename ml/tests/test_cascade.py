@@ -0,0 +1,110 @@
+"""
+Test suite for the KNN -> LSTM cascade
+Run with: pytest tests/ -v
+"""
+import sys
+import os
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import pytest
+import numpy as np
+from cascade import CascadePredictor, build_classifier, _nilm_classifier
+
+
+class FakePredictor:
+    """Stands in for the LSTM and records how many windows reached it."""
+
+    window_size = 10
+
+    def __init__(self, label="Bulb-60w"):
+        self.label = label
+        self.calls = 0
+
+    def predict_many(self, windows):
+        self.calls += len(windows)
+        n = len(windows)
+        return np.array([self.label] * n, dtype=object), np.full(n, 0.9), np.zeros((n, 3))
+
+
+def _window(power, jitter=0.0, seed=0):
+    rng = np.random.default_rng(seed)
+    p = power * (1 + jitter * rng.standard_normal(10))
+    return np.column_stack([np.full(10, 230.0), p / 230.0, p, np.full(10, 1.0)])
+
+
+@pytest.fixture(scope="module")
+def classifier():
+    return build_classifier()
+
+
+class TestNeighborVotes:
+    """Test cases for the vectorised 1-D neighbour search."""
+
+    def test_matches_sklearn(self):
+        """Test that distances match KNeighborsClassifier and unanimous votes agree with it."""
+        KNNTrainer, _ = _nilm_classifier()
+        rng = np.random.default_rng(0)
+        levels = np.concatenate([rng.normal(80, 3, 50), rng.normal(325, 5, 50), rng.normal(8, 2, 50)])
+        trainer = KNNTrainer()
+        trainer.fit_levels(levels, ["a"] * 50 + ["b"] * 50 + ["c"] * 50)
+
+        query = np.concatenate([rng.uniform(0, 500, 500), [0.0, 1000.0]])
+        names, shares, distances = trainer.neighbor_votes(query)
+        sk_distances, _ = trainer.model.kneighbors(query.reshape(-1, 1))
+        np.testing.assert_allclose(distances, sk_distances.max(axis=1))
+
+        sk_names = np.array([trainer.label_map[c] for c in trainer.model.predict(query.reshape(-1, 1))])
+        unanimous = shares == 1.0
+        np.testing.assert_array_equal(np.array(names)[unanimous], sk_names[unanimous])
+
+
+class TestCascade:
+    """Test cases for tier selection and statistics."""
+
+    def test_steady_window_skips_lstm(self, classifier):
+        """Test that a steady, known load is answered by the KNN alone."""
+        lstm = FakePredictor()
+        cascade = CascadePredictor(classifier, predictor=lstm)
+        label, confidence, tier = cascade.predict(_window(325.0, jitter=0.01))
+        assert (label, tier) == ("Bulb-100w", "knn")
+        assert confidence == 1.0
+        assert lstm.calls == 0
+
+    def test_unsteady_window_falls_back(self, classifier):
+        """Test that a window spanning a transition goes to the LSTM."""
+        lstm = FakePredictor("Soldering-Iron")
+        cascade = CascadePredictor(classifier, predictor=lstm)
+        window = _window(325.0)
+        window[5:, 2] = 8.0
+        label, confidence, tier = cascade.predict(window)
+        assert (label, tier) == ("Soldering-Iron", "lstm")
+        assert confidence == pytest.approx(0.9)
+        assert cascade.stats()["unsteady"] == 1
+
+    def test_far_level_falls_back(self, classifier):
+        """Test that a level far from every training load goes to the LSTM."""
+        lstm = FakePredictor()
+        cascade = CascadePredictor(classifier, predictor=lstm, max_distance=15.0)
+        assert cascade.predict(_window(2000.0))[2] == "lstm"
+        assert cascade.stats()["far"] == 1
+
+    def test_stats_and_audit(self, classifier):
+        """Test tier counts and audited agreement over a batch."""
+        lstm = FakePredictor("Bulb-100w")
+        cascade = CascadePredictor(classifier, predictor=lstm, audit_rate=1.0)
+        windows = np.stack([_window(325.0, 0.01, seed=i) for i in range(4)] + [_window(2000.0)])
+        labels, _, tiers = cascade.predict_many(windows)
+
+        assert list(tiers) == ["knn"] * 4 + ["lstm"]
+        stats = cascade.stats()
+        assert stats["windows"] == 5 and stats["knn"] == 4 and stats["lstm"] == 1
+        assert stats["knn_rate"] == pytest.approx(0.8)
+        assert stats["audited"] == 4
+        assert stats["audit_agreement"] == 1.0
+        assert lstm.calls == 5
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,148 @@
+"""
+Test suite for background, atomic training checkpoints
+Run with: pytest tests/ -v
+"""
+import subprocess
+import threading
+import time
+import sys
+import os
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import pytest
+import torch
+import checkpoint
+from checkpoint import CheckpointWriter
+from model import build_model
+
+SRC_DIR = os.path.join(os.path.dirname(__file__), '..', 'src')
+
+
+def _step(model, optimizer):
+    optimizer.zero_grad()
+    model(torch.randn(4, 10, 4)).sum().backward()
+    optimizer.step()
+
+
+@pytest.fixture
+def trained():
+    model = build_model("lstm", num_classes=3)
+    optimizer = torch.optim.Adam(model.parameters(), lr=0.01)
+    _step(model, optimizer)
+    return model, optimizer
+
+
+class TestWriter:
+    """Test cases for the background checkpoint writer."""
+
+    def test_snapshots_and_pruning(self, tmp_path, trained):
+        """Test that checkpoints hold the state at submit time, the last K are kept and no temp files remain."""
+        model, optimizer = trained
+        writer = CheckpointWriter(str(tmp_path), keep=2)
+        expected = {}
+        for epoch in range(1, 6):
+            writer.submit(epoch, model, optimizer, loss=1.0 / epoch, best_loss=1.0 / epoch, best=epoch == 3)
+            expected[epoch] = {k: v.clone() for k, v in model.state_dict().items()}
+            _step(model, optimizer)  # changes the live tensors right after submit
+            writer.flush()  # so no periodic snapshot is superseded before it is written
+        writer.close()
+
+        ckpt_dir = checkpoint.checkpoint_dir(str(tmp_path))
+        assert sorted(os.listdir(ckpt_dir)) == ["best.pt", "epoch_0004.pt", "epoch_0005.pt"]
+        assert not [f for f in os.listdir(tmp_path) if f.endswith(".tmp")]
+        best = checkpoint.load_best(str(tmp_path))
+        assert best["epoch"] == 3 and set(best["optimizer"]) == {"state", "param_groups"}
+        weights = torch.load(os.path.join(tmp_path, "energy_model.pt"))
+        assert all(torch.equal(weights[k], expected[3][k]) for k in weights)
+        assert checkpoint.latest(str(tmp_path))["epoch"] == 5
+
+    def test_unpublished_best_stays_in_checkpoints(self, tmp_path, trained):
+        """Test that with publish=False a new best goes to best.pt but not to the weights file predictors load."""
+        model, optimizer = trained
+        writer = CheckpointWriter(str(tmp_path), publish=False)
+        writer.submit(1, model, optimizer, loss=1.0, best_loss=1.0, best=True)
+        writer.close()
+        assert checkpoint.load_best(str(tmp_path))["epoch"] == 1
+        assert not os.path.exists(os.path.join(tmp_path, "energy_model.pt"))
+
+    def test_slow_disk_does_not_block(self, tmp_path, trained, monkeypatch):
+        """Test that submit returns at once while writes are slow, superseding unwritten snapshots."""
+        model, optimizer = trained
+        write = checkpoint.atomic_write
+
+        def slow_write(data, path):
+            time.sleep(0.2)
+            write(data, path)
+
+        monkeypatch.setattr(checkpoint, "atomic_write", slow_write)
+        writer = CheckpointWriter(str(tmp_path), keep=3)
+        start = time.perf_counter()
+        for epoch in range(1, 11):
+            writer.submit(epoch, model, optimizer, loss=1.0, best_loss=1.0)
+        assert time.perf_counter() - start < 0.5
+        writer.close()
+        assert writer.skipped > 0
+        assert checkpoint.latest(str(tmp_path))["epoch"] == 10
+
+    def test_readers_never_see_partial_files(self, tmp_path, trained):
+        """Test that a predictor loading the weights while they are rewritten always gets a whole file."""
+        model, optimizer = trained
+        writer = CheckpointWriter(str(tmp_path), keep=1)
+        writer.submit(1, model, optimizer, loss=1.0, best_loss=1.0, best=True)
+        writer.flush()
+        errors, loads = [], [0]
+        done = threading.Event()
+
+        def read():
+            while not done.is_set():
+                try:
+                    torch.load(os.path.join(tmp_path, "energy_model.pt"))
+                    loads[0] += 1
+                except Exception as e:
+                    errors.append(e)
+
+        reader = threading.Thread(target=read)
+        reader.start()
+        for epoch in range(2, 40):
+            writer.submit(epoch, model, optimizer, loss=1.0 / epoch, best_loss=1.0 / epoch, best=True)
+            writer.flush()
+        done.set()
+        reader.join()
+        writer.close()
+        assert not errors and loads[0] > 0
+
+    def test_write_errors_surface(self, tmp_path, trained, monkeypatch):
+        """Test that a failed background write is raised on the training thread."""
+        model, optimizer = trained
+
+        def failing_write(data, path):
+            raise OSError("disk full")
+
+        monkeypatch.setattr(checkpoint, "atomic_write", failing_write)
+        writer = CheckpointWriter(str(tmp_path))
+        writer.submit(1, model, optimizer, loss=1.0, best_loss=1.0)
+        with pytest.raises(RuntimeError, match="disk full"):
+            writer.close()
+
+
+class TestResume:
+    """Test cases for resuming train.py from its checkpoints."""
+
+    def test_resume_continues(self, tmp_path):
+        """Test that --resume picks up after the last checkpointed epoch."""
+        models_dir = str(tmp_path / "models")
+        base = [sys.executable, os.path.join(SRC_DIR, "train.py"), "--models-dir", models_dir, "--patience", "10"]
+        first = subprocess.run(base + ["--epochs", "2"], capture_output=True, text=True, timeout=300)
+        assert first.returncode == 0, first.stderr[-2000:]
+
+        second = subprocess.run(base + ["--epochs", "3", "--resume"], capture_output=True, text=True, timeout=300)
+        assert second.returncode == 0, second.stderr[-2000:]
+        assert "Resuming after epoch 2" in second.stdout
+        assert "Epoch 3 |" in second.stdout and "Epoch 1 |" not in second.stdout
+        assert checkpoint.latest(models_dir)["epoch"] == 3
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,63 @@
+"""
+Test suite for the NILM event clustering
+Run with: pytest tests/ -v
+"""
+import sys
+import os
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import pytest
+import numpy as np
+from sklearn.cluster import DBSCAN
+from cascade import NILM_DIR
+
+if str(NILM_DIR) not in sys.path:
+    sys.path.append(str(NILM_DIR))
+
+from src.clustering import cluster_events, dbscan_1d
+
+
+def _sklearn(values, eps, min_samples):
+    return DBSCAN(eps=eps, min_samples=min_samples).fit_predict(np.asarray(values, dtype=np.float64).reshape(-1, 1))
+
+
+class TestDbscan1d:
+    """Test cases for the one-dimensional DBSCAN used on |ΔP| step sizes."""
+
+    @pytest.mark.parametrize("seed", range(20))
+    @pytest.mark.parametrize("min_samples", [1, 2, 3, 5])
+    def test_matches_sklearn_on_step_sizes(self, seed, min_samples):
+        """Test that labels equal sklearn's on clustered, spread-out and noisy step sizes."""
+        rng = np.random.default_rng(seed)
+        centres = rng.choice([40.0, 60.0, 100.0, 150.0, 1200.0, 2000.0], rng.integers(1, 5))
+        values = np.concatenate([rng.normal(c, rng.uniform(1, 25), rng.integers(1, 60)) for c in centres]
+                                + [rng.uniform(0, 2500, rng.integers(0, 30))])
+        rng.shuffle(values)
+        np.testing.assert_array_equal(dbscan_1d(values, 30.0, min_samples), _sklearn(values, 30.0, min_samples))
+
+    @pytest.mark.parametrize("seed", range(20))
+    def test_matches_sklearn_on_ties(self, seed):
+        """Test distances of exactly eps, duplicates and border points between two clusters on an exact grid."""
+        values = np.random.default_rng(seed).integers(0, 40, 60) * 0.5
+        for min_samples in (2, 3, 4, 6):
+            np.testing.assert_array_equal(dbscan_1d(values, 1.0, min_samples), _sklearn(values, 1.0, min_samples))
+
+    def test_border_joins_lowest_cluster(self):
+        """Test that a border point within eps of two clusters takes the lower-numbered one, as sklearn does."""
+        a, b = [1.0, 2.0, 3.0, 4.0, 5.0], [15.0, 16.0, 17.0, 18.0, 19.0]
+        expected = [0] * 6 + [1] * 5
+        for values in ([10.0] + a + b, [10.0] + b + a):
+            assert dbscan_1d(values, 5.0, 5).tolist() == _sklearn(values, 5.0, 5).tolist() == expected
+
+    def test_edge_cases(self):
+        """Test empty input, all-noise input and cluster_events on event dictionaries."""
+        assert len(dbscan_1d([], 30.0, 3)) == 0
+        assert dbscan_1d([0.0, 100.0, 200.0], 30.0, 2).tolist() == [-1, -1, -1]
+        events = [{"abs_delta_p": v} for v in (60.0, 61.0, 59.0, 1200.0)]
+        assert cluster_events(events) == [0, 0, 0, -1]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
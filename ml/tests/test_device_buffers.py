@@ -0,0 +1,124 @@
+"""
+Test suite for pushed-reading validation and per-device buffers
+Run with: pytest tests/ -v
+"""
+import json
+import sys
+import os
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import pytest
+import numpy as np
+from device_buffers import MAX_BATCH_ITEMS, DeviceBuffers, PayloadError, parse_payload
+
+
+def _reading(device_id="Bulb-60w", i=0, **fields):
+    reading = {
+        "device_id": device_id,
+        "timestamp": f"2026-01-21T00:00:{i:02d}.000Z",
+        "vrms": 230.0 + i, "irms": 0.26, "apparent_power": 60.0, "wh": 1.0,
+    }
+    reading.update(fields)
+    return reading
+
+
+def _body(payload):
+    return json.dumps(payload).encode()
+
+
+class TestParsePayload:
+    """Test cases mirroring the Go API's PostDataHandler validation."""
+
+    def test_single_and_batch(self):
+        """Test that a single object and a batch array are both accepted."""
+        assert len(parse_payload(_body(_reading()))) == 1
+        readings = parse_payload(_body([_reading(i=i) for i in range(3)]))
+        assert [r[0] for r in readings] == ["Bulb-60w"] * 3
+        assert readings[0][1] == 1768953600000
+
+    @pytest.mark.parametrize("timestamp, expected", [
+        ("2026-01-21T00:00:00Z", 1768953600000),
+        ("2026-01-21T00:00:00.123456789Z", 1768953600123),
+        ("2026-01-21T01:30:00+01:30", 1768953600000),
+        ("2026-01-20T23:00:00.5-01:00", 1768953600500),
+    ])
+    def test_rfc3339_timestamps(self, timestamp, expected):
+        """Test that RFC 3339 timestamps with fractions and offsets are accepted."""
+        ((_, ts, _),) = parse_payload(_body(_reading(timestamp=timestamp)))
+        assert ts == expected
+
+    def test_defaults(self):
+        """Test that apparent_power defaults to vrms * irms and wh to 0."""
+        ((_, ts, values),) = parse_payload(_body({"device_id": " x ", "vrms": 200, "irms": 0.5}))
+        assert values == [200.0, 0.5, 100.0, 0.0]
+        assert ts > 0
+
+    @pytest.mark.parametrize("body, message, status", [
+        (b"", "Request body is empty", 400),
+        (b"{", "Malformed JSON", 400),
+        (b"[]", "Batch is empty", 400),
+        (_body([_reading()] * (MAX_BATCH_ITEMS + 1)), f"Batch too large (max {MAX_BATCH_ITEMS})", 400),
+        (_body({"vrms": 1, "irms": 1}), "device_id is required", 400),
+        (_body({"device_id": "x", "irms": 1}), "vrms is required", 400),
+        (_body([_reading(), _reading(vrms=True)]), "item 1: Invalid type for vrms", 400),
+        (_body(_reading(irms="abc")), "invalid irms", 400),
+        (_body(_reading(timestamp="yesterday")), "invalid timestamp", 400),
+        (_body(_reading(timestamp="2026-01-21 00:00:00")), "invalid timestamp", 400),
+        (_body(_reading(timestamp="2026-01-21T00:00:00")), "invalid timestamp", 400),
+        (_body(_reading(timestamp="2026-01-21")), "invalid timestamp", 400),
+        (_body(_reading(timestamp=1768953600000.5)), "Invalid type for timestamp", 400),
+        (_body(_reading(timestamp=1768953600000)), "Invalid type for timestamp", 400),
+        (_body(_reading(timestamp=["2026-01-21T00:00:00Z"])), "Invalid type for timestamp", 400),
+        (_body(_reading(timestamp={"t": 1})), "Invalid type for timestamp", 400),
+        (_body(_reading(device_id=7)), "Invalid type for device_id", 400),
+        (_body(_reading(device_id=["x"])), "Invalid type for device_id", 400),
+        (_body(_reading(device_id={"id": "x"})), "Invalid type for device_id", 400),
+        (_body(_reading(device_id=True)), "Invalid type for device_id", 400),
+        (_body(_reading(extra=1)), "Invalid JSON", 400),
+        (b" " * (1 << 20) + b"{}", "Payload too large", 413),
+    ])
+    def test_rejections(self, body, message, status):
+        """Test the messages and status codes of rejected payloads."""
+        with pytest.raises(PayloadError) as e:
+            parse_payload(body)
+        assert str(e.value).startswith(message)
+        assert e.value.status == status
+
+
+class TestDeviceBuffers:
+    """Test cases for the per-device rings."""
+
+    def test_window_ready_after_window_size(self):
+        """Test that a device's window is only handed back once it is full."""
+        buffers = DeviceBuffers(window_size=4)
+        readings = parse_payload(_body([_reading(i=i) for i in range(3)]))
+        assert buffers.push(readings) == {}
+        assert buffers.window("Bulb-60w") is None
+
+        ready = buffers.push(parse_payload(_body(_reading(i=3))))
+        window, ts, count = ready["Bulb-60w"]
+        np.testing.assert_array_equal(window[:, 0], [230, 231, 232, 233])
+        assert count == 4
+
+    def test_ring_keeps_newest_in_order(self):
+        """Test wrap-around, batches larger than the ring and out-of-order batch items."""
+        buffers = DeviceBuffers(window_size=4)
+        buffers.push(parse_payload(_body([_reading(i=i) for i in range(6)])))
+        ready = buffers.push(parse_payload(_body([_reading(i=9), _reading(i=7), _reading(i=8)])))
+        np.testing.assert_array_equal(ready["Bulb-60w"][0][:, 0], [235, 237, 238, 239])
+        assert ready["Bulb-60w"][2] == 9
+        np.testing.assert_array_equal(buffers.window("Bulb-60w"), ready["Bulb-60w"][0])
+
+    def test_devices_are_separate(self):
+        """Test that interleaved devices fill their own buffers."""
+        buffers = DeviceBuffers(window_size=2)
+        ready = buffers.push(parse_payload(_body([_reading("a", 0), _reading("b", 1), _reading("a", 2)])))
+        assert list(ready) == ["a"]
+        np.testing.assert_array_equal(ready["a"][0][:, 0], [230, 232])
+        assert buffers.devices()["b"]["readings"] == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
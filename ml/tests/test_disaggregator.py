@@ -0,0 +1,103 @@
+"""
+Test suite for the NILM combination-table disaggregator
+Run with: pytest tests/ -v
+"""
+import itertools
+import sys
+import os
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import pytest
+import numpy as np
+from cascade import NILM_DIR
+from synthetic import SyntheticLoad
+
+if str(NILM_DIR) not in sys.path:
+    sys.path.append(str(NILM_DIR))
+
+from src.disaggregator import UNKNOWN, CombinationTable, load_appliances
+
+
+def _brute_force(appliances, max_active, readings):
+    """Every combination's total, then the nearest one per reading (fewest appliances on breaks ties)."""
+    names = list(appliances)
+    combos = []
+    for k in range(max_active + 1):
+        for on in itertools.combinations(range(len(names)), k):
+            for levels in itertools.product(*[appliances[names[a]] for a in on]):
+                combos.append((sum(levels), k, "+".join(sorted(names[a] for a in on))))
+    return [min(combos, key=lambda c: (abs(r - c[0]), c[0] > r, c[1]))[2] for r in readings]
+
+
+class TestTable:
+    """Test cases for building and searching the combination table."""
+
+    def test_matches_brute_force(self):
+        """Test that decoding gives the nearest combination, as an exhaustive search does."""
+        rng = np.random.default_rng(0)
+        appliances = {f"a{i}": list(rng.uniform(20, 1500, rng.integers(1, 3))) for i in range(7)}
+        table = CombinationTable(appliances, max_active=3)
+        readings = rng.uniform(-10, 3000, 2000)
+        combos, error = table.decode(readings, tolerance=np.inf)
+        assert table.labels(combos).tolist() == _brute_force(appliances, 3, readings)
+        np.testing.assert_allclose(error, readings - table.sums[combos])
+
+    def test_pruning_and_cap(self):
+        """Test that max_power and max_active prune the table and the cap keeps the sparsest combinations."""
+        appliances = {f"a{i}": [100.0 * (i + 1)] for i in range(12)}
+        full = CombinationTable(appliances, max_active=12)
+        assert len(full) == 2 ** 12 and not full.truncated
+        pruned = CombinationTable(appliances, max_power=1000.0, max_active=3)
+        assert pruned.sums.max() <= 1000.0 and pruned.active.max() <= 3
+        capped = CombinationTable(appliances, max_active=12, max_combinations=79)
+        assert capped.truncated and len(capped) == 79 and capped.active.max() == 2  # 1 + 12 + 66
+
+    def test_unknown_and_states(self):
+        """Test readings beyond tolerance, per-appliance states and power."""
+        table = CombinationTable({"bulb": [60.0], "iron": [160.0], "heater": [1000.0, 2000.0]})
+        combos, _ = table.decode([0.0, 62.0, 225.0, 2160.0, 500.0], tolerance=20.0)
+        assert table.labels(combos).tolist() == ["", "bulb", "bulb+iron", "heater+iron", UNKNOWN]
+        assert table.states(combos).tolist()[3] == [False, True, True]
+        np.testing.assert_allclose(table.appliance_power(combos)[3], [0.0, 160.0, 2000.0])
+        assert not table.states(combos)[4].any()
+
+
+class TestClusters:
+    """Test cases for reading appliances from the clustering outputs."""
+
+    def test_load_appliances(self, tmp_path):
+        """Test that labeled clusters become appliance levels and noise is skipped."""
+        stats = tmp_path / "cluster_stats.json"
+        stats.write_text('{"0": {"avg_power_change": 80.0}, "1": {"avg_power_change": 1000.0}, '
+                         '"2": {"avg_power_change": 2000.0}, "-1": {"avg_power_change": 500.0}, '
+                         '"3": {"avg_power_change": 300.0}}')
+        labels = tmp_path / "cluster_labels.yaml"
+        labels.write_text("cluster_0: Bulb\ncluster_1: Heater\ncluster_2: Heater\n")
+        assert load_appliances(str(stats), str(labels)) == {"Bulb": [80.0], "Heater": [1000.0, 2000.0]}
+        assert load_appliances(str(stats), str(labels), include_unlabeled=True)["cluster_3"] == [300.0]
+
+
+class TestSynthetic:
+    """Test cases against synthetic meters with known overlapping appliances."""
+
+    def test_recovers_overlapping_loads(self):
+        """Test that noiseless meters decode to the appliances actually running."""
+        load = SyntheticLoad(6, 3, 12 * 3600, seed=4, noise=0, drift=0)
+        correct = overlapping = total = 0
+        for m in range(load.meters):
+            frame, truth = load.meter_frame(m)
+            meter = load._meters[m]
+            table = CombinationTable({a["name"]: [a["power"]] for a in meter["appliances"]})
+            combos, _ = table.decode(frame["apparent_power"].to_numpy(), base_load=meter["standby"], tolerance=10.0)
+            decoded = table.labels(combos)
+            correct += int((decoded == truth).sum())
+            overlapping += int(sum("+" in label for label in truth))
+            total += len(truth)
+        assert overlapping > 0.2 * total
+        assert correct / total > 0.97
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,67 @@
+"""
+Test suite for student models and distillation
+Run with: pytest tests/ -v
+"""
+import sys
+import os
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import pytest
+import torch
+import numpy as np
+from model import MODEL_ARCHS, build_model
+from distill import distillation_loss, compare_models
+
+
+class TestStudentModels:
+    """Test cases for the lightweight student architectures."""
+
+    @pytest.mark.parametrize("arch", sorted(MODEL_ARCHS))
+    def test_forward_shape(self, arch):
+        """Test that every architecture maps windows to class logits."""
+        model = build_model(arch, num_classes=3)
+        for batch_size in [1, 8]:
+            output = model(torch.randn(batch_size, 10, 4))
+            assert output.shape == (batch_size, 3)
+
+    @pytest.mark.parametrize("arch", ["tcn", "gru"])
+    def test_student_is_smaller_than_teacher(self, arch):
+        """Test that students have a fraction of the teacher's parameters."""
+        teacher_params = sum(p.numel() for p in build_model("lstm").parameters())
+        student_params = sum(p.numel() for p in build_model(arch).parameters())
+        assert student_params * 5 < teacher_params
+
+    def test_unknown_arch(self):
+        """Test that an unknown architecture is rejected."""
+        with pytest.raises(ValueError):
+            build_model("transformer")
+
+
+class TestDistillation:
+    """Test cases for the distillation loss and comparison report."""
+
+    def test_loss_matches_teacher_at_zero(self):
+        """Test that the soft term vanishes when student equals teacher."""
+        logits = torch.randn(4, 3)
+        targets = torch.tensor([0, 1, 2, 0])
+        criterion = torch.nn.CrossEntropyLoss()
+        loss = distillation_loss(logits, logits, targets, criterion, alpha=1.0)
+        assert loss.item() == pytest.approx(0.0, abs=1e-6)
+
+    def test_compare_models_report(self):
+        """Test that the report covers accuracy, agreement and latency."""
+        X = np.random.randn(40, 4).astype(np.float32)
+        y = np.random.randint(0, 3, size=40)
+        teacher, student = build_model("lstm"), build_model("tcn")
+        report = compare_models(teacher, student, X, y, window_size=10, repeats=5)
+
+        assert report["windows"] == 30
+        assert 0.0 <= report["agreement"] <= 1.0
+        for name in ("teacher", "student"):
+            assert set(report[name]) == {"params", "accuracy", "latency_ms"}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,57 @@
+"""
+Test suite for data-parallel training
+Run with: pytest tests/ -v
+"""
+import json
+import subprocess
+import sys
+import os
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import pytest
+import distributed
+from model import load_model
+
+SRC_DIR = os.path.join(os.path.dirname(__file__), '..', 'src')
+
+
+class TestSingleProcess:
+    """Test cases for the helpers outside a process group."""
+
+    def test_helpers_are_local(self):
+        """Test that without torchrun the helpers reduce to plain single-process behaviour."""
+        assert distributed.init() == (0, 1)
+        assert distributed.is_main()
+        assert distributed.all_mean(6.0, 4) == 1.5
+        assert distributed.agree(True) and not distributed.agree(0)
+        assert distributed.main_first(lambda: 42) == 42
+
+
+class TestGlooTraining:
+    """Test cases for train.py with several local gloo workers."""
+
+    def test_two_workers(self, tmp_path):
+        """Test that two workers train, stop together and leave one loadable checkpoint from rank 0."""
+        report_path = tmp_path / "report.json"
+        models_dir = tmp_path / "models"
+        result = subprocess.run(
+            [sys.executable, os.path.join(SRC_DIR, "train.py"), "--workers", "2", "--epochs", "4",
+             "--patience", "1", "--models-dir", str(models_dir), "--report", str(report_path)],
+            capture_output=True, text=True, timeout=600,
+        )
+        assert result.returncode == 0, result.stderr[-2000:]
+        assert result.stdout.count("Best loss achieved") == 1  # only rank 0 reports
+
+        report = json.loads(report_path.read_text())
+        assert report["workers"] == 2
+        assert 1 <= len(report["losses"]) <= 4
+        assert report["best_loss"] == min(report["losses"])
+        assert sorted(os.listdir(models_dir)) == ["checkpoints", "energy_model.pt", "energy_model.state.pt",
+                                                  "irms_weight.pkl", "label_encoder.pkl", "scaler.pkl"]
+        load_model(str(models_dir), num_classes=3)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,117 @@
+"""
+Test suite for the preprocessed feature store
+Run with: pytest tests/ -v
+"""
+import sys
+import os
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import pytest
+import numpy as np
+import pandas as pd
+from feature_store import FeatureStore
+from reading_log import import_csv
+
+DATA_CSV = os.path.join(os.path.dirname(__file__), '..', 'data', 'spectrawatt.energy_data.csv')
+
+
+def _append_rows(path, device_id, n, start):
+    timestamps = pd.date_range(start, periods=n, freq="5s")
+    rows = pd.DataFrame({
+        "_id": [f"t{i}" for i in range(n)],
+        "device_id": device_id,
+        "timestamp": timestamps.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+        "vrms": 230.0, "irms": 0.2, "apparent_power": 46.0, "wh": 1.0,
+    })
+    with open(path, "a") as f:
+        rows.to_csv(f, header=False, index=False)
+
+
+class TestFeatureStore:
+    """Test cases for building, reusing and extending cached features."""
+
+    @pytest.fixture
+    def source(self, tmp_path):
+        path = tmp_path / "energy.csv"
+        path.write_bytes(open(DATA_CSV, "rb").read())
+        return str(path)
+
+    @pytest.fixture
+    def store(self, tmp_path):
+        return FeatureStore(str(tmp_path / "store"))
+
+    def test_build_then_hit(self, store, source):
+        """Test that a second load reuses the cached memory maps."""
+        built = store.load(source)
+        assert built.status == "built"
+        assert built.X.dtype == np.float32 and built.y.dtype == np.int32
+        assert list(built.classes) == ["Bulb-100w", "Bulb-60w", "Soldering-Iron"]
+
+        hit = store.load(source)
+        assert hit.status == "hit"
+        assert isinstance(hit.X, np.memmap)
+        np.testing.assert_array_equal(hit.X, built.X)
+
+    def test_standardised_like_training(self, store, source):
+        """Test that cached features are standardised with irms weighted."""
+        features = store.load(source)
+        np.testing.assert_allclose(np.asarray(features.X).mean(axis=0), 0, atol=1e-5)
+        raw = pd.read_csv(source)
+        raw = raw[raw["device_id"].isin(features.classes)]
+        assert features.scaler.mean_[1] == pytest.approx(raw["irms"].mean() * 3.0)
+
+    def test_append_extends_in_place(self, store, source, tmp_path):
+        """Test that appended rows are transformed with the cached scaler and match a fresh build."""
+        first = store.load(source)
+        _append_rows(source, "Bulb-60w", 20, "2026-02-01T00:00:00Z")
+
+        extended = store.load(source)
+        assert extended.status == "extended"
+        assert extended.path == first.path
+        assert len(extended) == len(first) + 20
+
+        fresh = FeatureStore(str(tmp_path / "fresh")).load(source, scaler=first.scaler)
+        np.testing.assert_allclose(extended.X, fresh.X, atol=1e-6)
+        np.testing.assert_array_equal(extended.y, fresh.y)
+        np.testing.assert_array_equal(extended.timestamps, fresh.timestamps)
+
+    def test_new_class_remaps_cached_labels(self, store, source):
+        """Test that a new device keeps classes sorted and relabels cached rows."""
+        first = store.load(source)
+        labels = first.classes[np.asarray(first.y)]
+        _append_rows(source, "Bulb-40w", 15, "2026-02-01T00:00:00Z")
+
+        extended = store.load(source)
+        assert list(extended.classes) == ["Bulb-100w", "Bulb-40w", "Bulb-60w", "Soldering-Iron"]
+        np.testing.assert_array_equal(extended.classes[np.asarray(extended.y[:len(first)])], labels)
+        assert set(extended.classes[np.asarray(extended.y[len(first):])]) == {"Bulb-40w"}
+
+    def test_rewritten_source_rebuilds(self, store, source):
+        """Test that changed (not appended) content is rebuilt and the stale entry removed."""
+        store.load(source)
+        df = pd.read_csv(source)
+        df.loc[0, "vrms"] += 1.0
+        df.to_csv(source, index=False)
+
+        rebuilt = store.load(source)
+        assert rebuilt.status == "built"
+        assert len(list(store.entries())) == 1
+
+    def test_reading_log_source(self, store, source, tmp_path):
+        """Test that a reading log matches the CSV it was imported from and extends by records."""
+        log_path = str(tmp_path / "readings.log")
+        import_csv(source, log_path)
+        from_csv = store.load(source)
+        from_log = store.load(log_path)
+        np.testing.assert_allclose(from_log.X, from_csv.X, atol=1e-4)
+        np.testing.assert_array_equal(from_log.timestamps, from_csv.timestamps)
+
+        _append_rows(source, "Bulb-60w", 10, "2026-02-01T00:00:00Z")
+        import_csv(source, log_path)
+        assert store.load(log_path).status == "extended"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
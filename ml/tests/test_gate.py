@@ -0,0 +1,188 @@
+"""
+Test suite for the change-point gate
+Run with: pytest tests/ -v
+"""
+import sys
+import os
+from datetime import datetime
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import pytest
+import numpy as np
+import pandas as pd
+from gate import ChangeGate
+from inference import FEATURES, sliding_windows
+from synthetic import SyntheticLoad
+
+
+class FakePredictor:
+    """Stands in for the LSTM, labelling each window by its newest power level."""
+
+    window_size = 10
+
+    def __init__(self):
+        self.calls = 0
+
+    def predict_many(self, windows):
+        self.calls += len(windows)
+        power = np.asarray(windows)[:, -1, 2]
+        n = len(windows)
+        return np.array([f"{round(p, -2):.0f}W" for p in power], dtype=object), np.full(n, 0.9), np.zeros((n, 3))
+
+
+def _readings(levels, jitter=0.0, seed=0):
+    """Readings at the given apparent power levels, one per level entry."""
+    rng = np.random.default_rng(seed)
+    p = np.asarray(levels, dtype=np.float64) * (1 + jitter * rng.standard_normal(len(levels)))
+    return np.column_stack([np.full(len(p), 230.0), p / 230.0, p, np.arange(len(p)) * 0.01])
+
+
+def _api_payload(start="2026-01-21T00:00:00"):
+    """/api/data for meters 'a' (100 W, then 400 W) and 'b' (1200 W), each meter's readings newest first."""
+    payload = []
+    for offset, (device_id, levels) in enumerate((("a", [100.0] * 10 + [400.0] * 10), ("b", [1200.0] * 20))):
+        times = pd.Timestamp(start) + pd.to_timedelta(np.arange(len(levels)) * 2.5 + offset, unit="s")
+        data = [{"timestamp": t.isoformat().replace(".500000", ".5") + "Z", **dict(zip(FEATURES, r))}
+                for t, r in zip(times, _readings(levels).tolist())]
+        payload.append({"device_id": device_id, "data": data[::-1]})
+    return payload
+
+
+class _Response:
+    """Stands in for the /api/data response."""
+
+    status_code = 200
+
+    def __init__(self, payload):
+        self.payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return [{**entry, "data": [dict(r) for r in entry["data"]]} for entry in self.payload]
+
+
+def _assert_newest_recorded(timeline):
+    """Each meter's predictions carry its newest window's label and its newest reading's timestamp."""
+    for device_id, label in (("a", "400W"), ("b", "1200W")):
+        recent = timeline.recent(device_id=device_id)
+        newest = pd.Timestamp(_api_payload()[device_id == "b"]["data"][0]["timestamp"])
+        assert recent["label"].tolist() == [label, label]
+        assert (recent["timestamp"] == newest).all()
+
+
+class TestGating:
+    """Test cases for when the gate reuses the last answer."""
+
+    def test_steady_load_is_gated(self):
+        """Test that a steady meter is classified once, then reused until max_age."""
+        fake = FakePredictor()
+        gate = ChangeGate(fake, max_age=60.0)
+        windows = sliding_windows(_readings([300.0] * 40, jitter=0.01), 10)
+        executed = [gate.predict("m", w, now=5.0 * i)[3] for i, w in enumerate(windows)]
+        assert executed[0] and not any(executed[1:12])
+        assert executed[12]  # 60 s after the first answer
+        assert fake.calls == gate.stats()["executed"] == sum(executed)
+        assert gate.stats()["expired"] == sum(executed) - 1
+
+    def test_step_reruns_until_settled(self):
+        """Test that a switching event triggers inference until the window is past the change point."""
+        fake = FakePredictor()
+        gate = ChangeGate(fake, max_age=1e9)
+        windows = sliding_windows(_readings([100.0] * 20 + [400.0] * 20), 10)
+        results = [gate.predict("m", w, now=float(i)) for i, w in enumerate(windows)]
+        executed = np.flatnonzero([r[3] for r in results])
+        # Window 11 is the first to hold the step; the median of its newest readings moves one window later
+        assert executed[0] == 0 and executed[1] == 12
+        # ...and keeps running until the oldest readings are past it too
+        assert executed.tolist() == [0] + list(range(12, 20))
+        assert results[-1][0] == "400W"
+        stats = gate.stats()
+        assert stats["changed"] == 1 and stats["settling"] >= 1
+
+    def test_noisy_load_uses_noise_threshold(self):
+        """Test that a noisy steady load above the fixed threshold is still gated."""
+        fake = FakePredictor()
+        gate = ChangeGate(fake, threshold=30.0, sensitivity=4.0, max_age=1e9)
+        windows = sliding_windows(_readings([1090.0] * 200, jitter=0.07, seed=1), 10)
+        for i, w in enumerate(windows):
+            gate.predict("pc", w, now=float(i))
+        assert gate.stats()["gated_rate"] > 0.9
+
+    def test_meters_are_independent(self):
+        """Test that each key keeps its own reference and a batch only classifies changed meters."""
+        fake = FakePredictor()
+        gate = ChangeGate(fake, max_age=1e9)
+        steady = _readings([200.0] * 10)
+        gate.predict_many(["a", "b"], np.stack([steady, steady]), now=0.0)
+        switched = _readings([200.0] * 7 + [900.0] * 3)
+        labels, _, _, executed = gate.predict_many(["a", "b"], np.stack([steady, switched]), now=1.0)
+        assert executed.tolist() == [False, True]
+        assert labels.tolist() == ["200W", "900W"]
+        gate.forget("a")
+        assert gate.predict("a", steady, now=2.0)[3]
+
+    def test_live_poll_gates_each_meter_window(self, tmp_path, monkeypatch):
+        """Test that predict_live gates and records each meter's newest window when the API interleaves meters."""
+        import predict_live
+        from timeline import PredictionTimeline
+
+        fake = FakePredictor()
+        gate = ChangeGate(fake, max_age=1e9)
+        monkeypatch.setattr(predict_live, "gate", gate)
+        monkeypatch.setattr(predict_live, "cascade_predictor", None)
+        monkeypatch.setattr(predict_live.requests, "get", lambda url: _Response(_api_payload()))
+        timeline = PredictionTimeline(str(tmp_path))
+
+        assert predict_live.poll_once("http://api/data", timeline)
+        assert predict_live.poll_once("http://api/data", timeline)
+        assert gate.stats()["windows"] == 4 and fake.calls == 2
+        _assert_newest_recorded(timeline)
+
+    def test_current_device_poll_gates_each_meter_window(self, tmp_path, monkeypatch, capsys):
+        """Test that current_device_live gates and records each meter's newest window under its own key."""
+        import current_device_live
+        from timeline import PredictionTimeline
+
+        fake = FakePredictor()
+        gate = ChangeGate(fake, max_age=1e9)
+        monkeypatch.setattr(current_device_live, "gate", gate)
+        monkeypatch.setattr(current_device_live, "cascade_predictor", None)
+        monkeypatch.setattr(current_device_live.requests, "get", lambda url, timeout: _Response(_api_payload()))
+        now = datetime(2026, 1, 21, 0, 1)
+        timeline = PredictionTimeline(str(tmp_path))
+
+        current_device_live.poll_once(1, now, timeline)
+        current_device_live.poll_once(2, now, timeline)
+        assert gate.stats()["windows"] == 4 and fake.calls == 2
+        out = capsys.readouterr().out
+        assert "📟 a: 🔌 400W" in out and "📟 b: 🔌 1200W" in out
+        _assert_newest_recorded(timeline)
+
+
+class TestActivity:
+    """Test cases for inference cost following switching activity."""
+
+    def test_inferences_follow_events(self):
+        """Test that on synthetic meters inference runs scale with switching events, not polls."""
+        load = SyntheticLoad(4, 3, 6 * 3600, seed=9, noise=0.5)
+        events = load.events()
+        fake = FakePredictor()
+        gate = ChangeGate(fake, max_age=1e9)
+        windows_total = 0
+        for m in range(4):
+            frame, _ = load.meter_frame(m)
+            windows = sliding_windows(frame[FEATURES].to_numpy(dtype=np.float64), 10)
+            for i, w in enumerate(windows):
+                gate.predict(m, w, now=float(i))
+            windows_total += len(windows)
+        # A few inferences per switching event, far fewer than one per window
+        assert fake.calls < 0.15 * windows_total
+        assert fake.calls <= 15 * len(events) + 4
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,142 @@
+"""
+Test suite for incremental fine-tuning helpers
+Run with: pytest tests/ -v
+"""
+import shutil
+import subprocess
+import sys
+import os
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import pytest
+import torch
+import numpy as np
+import pandas as pd
+import joblib
+from model import MODEL_ARCHS, build_model, grow_output_layer, load_model, output_layer
+from utils import split_incremental, timestamps_ms
+
+SRC_DIR = os.path.join(os.path.dirname(__file__), '..', 'src')
+DATA = os.path.join(os.path.dirname(__file__), '..', 'data', 'spectrawatt.energy_data.csv')
+
+
+def _frame(n=300, start="2026-01-20T23:00:00Z"):
+    timestamps = pd.date_range(start, periods=n, freq="5s")
+    return pd.DataFrame({
+        "device_id": "Bulb-60w",
+        "timestamp": timestamps.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+        "vrms": 230.0, "irms": 0.26, "apparent_power": 60.0, "wh": 1.0,
+    })
+
+
+class TestSplitIncremental:
+    """Test cases for choosing new and replayed rows."""
+
+    def test_new_rows_and_replay_blocks(self):
+        """Test that new rows come first and replay blocks are contiguous older rows."""
+        df = _frame()
+        watermark = int(pd.Timestamp(df["timestamp"][199]).value // 10**6)
+        segments = split_incremental(timestamps_ms(df), watermark, replay_ratio=0.5, replay_block=20, seed=0)
+
+        np.testing.assert_array_equal(segments[0], np.arange(200, 300))
+        replayed = segments[1:]
+        assert sum(len(r) for r in replayed) == 60
+        for rows in replayed:
+            assert rows.max() < 200
+            np.testing.assert_array_equal(np.diff(rows), 1)
+
+    def test_nothing_new(self):
+        """Test that a watermark at the newest reading leaves nothing to do."""
+        df = _frame()
+        watermark = int(pd.Timestamp(df["timestamp"].iloc[-1]).value // 10**6)
+        assert split_incremental(timestamps_ms(df), watermark) == []
+
+
+class TestGrowOutputLayer:
+    """Test cases for adding classes to a trained model."""
+
+    @pytest.mark.parametrize("arch", sorted(MODEL_ARCHS))
+    def test_existing_logits_are_kept(self, arch):
+        """Test that old classes keep their logits at their new indices."""
+        torch.manual_seed(0)
+        model = build_model(arch, num_classes=3).eval()
+        x = torch.randn(4, 10, 4)
+        with torch.no_grad():
+            before = model(x)
+
+        # Old classes 0, 1, 2 move to 0, 1, 3; index 2 is the new class
+        grow_output_layer(model, [0, 1, 3], 4)
+        with torch.no_grad():
+            after = model(x)
+        assert after.shape == (4, 4)
+        torch.testing.assert_close(after[:, [0, 1, 3]], before)
+
+    def test_optimizer_state_is_remapped(self):
+        """Test that Adam moments follow their rows and the optimizer keeps stepping."""
+        model = build_model("gru", num_classes=3)
+        optimizer = torch.optim.Adam(model.parameters())
+        model(torch.randn(2, 10, 4)).sum().backward()
+        optimizer.step()
+        state = optimizer.state_dict()
+        old_moment = optimizer.state[output_layer(model).weight]["exp_avg"].clone()
+
+        grow_output_layer(model, [0, 2, 3], 4, state)
+        grown = torch.optim.Adam(model.parameters())
+        grown.load_state_dict(state)
+        moment = grown.state[output_layer(model).weight]["exp_avg"]
+        torch.testing.assert_close(moment[[0, 2, 3]], old_moment)
+        assert moment[1].abs().sum() == 0
+
+        model(torch.randn(2, 10, 4)).sum().backward()
+        grown.step()
+
+
+@pytest.fixture(scope="module")
+def base_models(tmp_path_factory):
+    """A models dir trained (briefly) on the bundled readings."""
+    models_dir = str(tmp_path_factory.mktemp("base") / "models")
+    result = subprocess.run([sys.executable, os.path.join(SRC_DIR, "train.py"), "--epochs", "1",
+                             "--models-dir", models_dir], capture_output=True, text=True, timeout=300)
+    assert result.returncode == 0, result.stderr[-2000:]
+    return models_dir
+
+
+def _fine_tune(base_models, tmp_path, device_id, n, *flags):
+    """Append n readings of device_id after the bundled ones and run train.py --incremental on them."""
+    models_dir = str(tmp_path / "models")
+    shutil.copytree(base_models, models_dir)
+    df = pd.read_csv(DATA)
+    new = _frame(n, start=pd.Timestamp(df["timestamp"].max()) + pd.Timedelta(seconds=5))
+    new["device_id"] = device_id
+    data = str(tmp_path / "readings.csv")
+    pd.concat([df, new], ignore_index=True).to_csv(data, index=False)
+    result = subprocess.run([sys.executable, os.path.join(SRC_DIR, "train.py"), "--incremental", "--data", data,
+                             "--models-dir", models_dir, *flags], capture_output=True, text=True, timeout=300)
+    return models_dir, result
+
+
+class TestFineTune:
+    """Test cases for train.py --incremental."""
+
+    def test_too_few_readings_for_a_window(self, base_models, tmp_path):
+        """Test that fewer new readings than a window (and no replay) exit cleanly."""
+        _, result = _fine_tune(base_models, tmp_path, "Bulb-60w", 5, "--replay-ratio", "0")
+        assert result.returncode == 0, result.stderr[-2000:]
+        assert "nothing to fine-tune" in result.stdout
+
+    def test_new_class_publishes_weights_with_encoder(self, base_models, tmp_path):
+        """Test that weights grown for a new device are published with a label encoder that lists it."""
+        models_dir, result = _fine_tune(base_models, tmp_path, "Kettle", 40, "--epochs", "2")
+        assert result.returncode == 0, result.stderr[-2000:]
+        assert "New classes: Kettle" in result.stdout and "Published energy_model.pt" in result.stdout
+        before = joblib.load(os.path.join(base_models, "label_encoder.pkl")).classes_
+        classes = joblib.load(os.path.join(models_dir, "label_encoder.pkl")).classes_
+        assert list(classes) == sorted([*before, "Kettle"])
+        model = load_model(models_dir, num_classes=len(classes))
+        assert model(torch.randn(1, 10, 4)).shape == (1, len(classes))
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
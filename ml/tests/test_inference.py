@@ -0,0 +1,104 @@
+"""
+Test suite for the shared inference core
+Run with: pytest tests/ -v
+"""
+import sys
+import os
+import subprocess
+import threading
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import pytest
+import numpy as np
+import inference
+from inference import get_predictor, sliding_windows
+
+SRC_DIR = os.path.join(os.path.dirname(__file__), '..', 'src')
+
+
+def _windows(n=6, window_size=10):
+    rng = np.random.default_rng(0)
+    base = np.array([230.0, 0.4, 92.0, 1.5])
+    return base * (1 + 0.05 * rng.standard_normal((n, window_size, 4)))
+
+
+class TestSlidingWindows:
+    """Test cases for window extraction."""
+
+    def test_matches_dataset_indexing(self):
+        """Test that window i is X[i:i+window_size] for every labelled index."""
+        X = np.arange(15 * 4, dtype=float).reshape(15, 4)
+        windows = sliding_windows(X, 10)
+        assert windows.shape == (5, 10, 4)
+        for i in range(5):
+            np.testing.assert_array_equal(windows[i], X[i:i + 10])
+
+    def test_too_short(self):
+        """Test that inputs no longer than a window yield no windows."""
+        assert sliding_windows(np.zeros((10, 4)), 10).shape == (0, 10, 4)
+
+
+class TestPredictor:
+    """Test cases for the lazily loaded predictor."""
+
+    def test_import_is_lazy(self):
+        """Test that importing the scripts does not pull in torch or load the model."""
+        code = (
+            "import sys; sys.path.insert(0, %r)\n"
+            "import predict_live, current_device_live, predict_api, current_device\n"
+            "import inference\n"
+            "assert 'torch' not in sys.modules\n"
+            "assert inference._predictor is None\n"
+        ) % os.path.abspath(SRC_DIR)
+        subprocess.run([sys.executable, "-c", code], check=True)
+
+    def test_singleton_across_threads(self):
+        """Test that concurrent first calls share one predictor."""
+        inference._predictor = None
+        seen = []
+        threads = [threading.Thread(target=lambda: seen.append(get_predictor())) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert len(seen) == 8
+        assert all(p is seen[0] for p in seen)
+
+    def test_predict_many_matches_predict(self):
+        """Test that batched and single-window predictions agree."""
+        predictor = get_predictor()
+        windows = _windows()
+        labels, confidences, probs = predictor.predict_many(windows)
+        assert probs.shape == (len(windows), len(predictor.classes))
+        np.testing.assert_allclose(probs.sum(axis=1), 1.0, rtol=1e-5)
+        for i, window in enumerate(windows):
+            label, confidence, single = predictor.predict(window)
+            assert label == labels[i]
+            assert confidence == pytest.approx(confidences[i], abs=1e-5)
+            np.testing.assert_allclose(single, probs[i], atol=1e-5)
+
+    def test_matches_reference_preprocessing(self):
+        """Test that the folded scaling equals irms weighting followed by the scaler."""
+        import joblib
+        import torch
+
+        predictor = get_predictor()
+        scaler = joblib.load(os.path.join(inference.models_dir, "scaler.pkl"))
+        window = _windows(1)[0]
+        scaled = window.copy()
+        scaled[:, 1] *= predictor.irms_weight
+        scaled = torch.tensor(scaler.transform(scaled), dtype=torch.float32).unsqueeze(0)
+        with torch.no_grad():
+            expected = torch.softmax(predictor.model(scaled), dim=1).numpy()[0]
+        np.testing.assert_allclose(predictor.predict(window)[2], expected, atol=1e-5)
+
+    def test_bad_shape(self):
+        """Test that windows with the wrong feature count are rejected."""
+        with pytest.raises(ValueError):
+            get_predictor().predict_many(np.zeros((2, 10, 3)))
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,101 @@
+"""
+Test suite for typed ingestion
+Run with: pytest tests/ -v
+"""
+import io
+import sys
+import os
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import pytest
+import numpy as np
+import pandas as pd
+import ingest
+from reading_log import ReadingLog, import_csv
+
+DATA_CSV = os.path.join(os.path.dirname(__file__), '..', 'data', 'spectrawatt.energy_data.csv')
+
+
+def _expected_ms(values):
+    return pd.to_datetime(pd.Series(values), utc=True).dt.as_unit("ms").astype("int64").to_numpy()
+
+
+class TestParseTimestamps:
+    """Test cases for fixed-format timestamp decoding."""
+
+    def test_fixed_format_matches_pandas(self):
+        """Test byte decoding across leap years, month ends and centuries."""
+        stamps = pd.date_range("1899-12-31", "2101-03-01", periods=5000, tz="UTC").floor("ms")
+        values = stamps.strftime("%Y-%m-%dT%H:%M:%S.%f").str[:-3] + "Z"
+        np.testing.assert_array_equal(ingest.parse_timestamps(values), _expected_ms(values))
+
+    def test_other_formats_fall_back(self):
+        """Test that timestamps outside the fixed format still parse as ISO 8601."""
+        values = ["2026-01-20T23:49:34Z", "2026-01-20T23:49:34.5+01:00", "2026-01-20 23:49:34.854Z"]
+        expected = [pd.Timestamp(v).value // 10**6 for v in values]
+        np.testing.assert_array_equal(ingest.parse_timestamps(values), expected)
+
+    def test_epoch_and_datetime_inputs(self):
+        """Test that epoch ms and datetime columns pass through as epoch ms."""
+        ms = np.array([1768952974854, 1768952979183])
+        np.testing.assert_array_equal(ingest.parse_timestamps(pd.Series(ms)), ms)
+        np.testing.assert_array_equal(ingest.parse_timestamps(pd.to_datetime(pd.Series(ms), unit="ms", utc=True)), ms)
+
+
+class TestReadReadings:
+    """Test cases for the ingestion schema."""
+
+    def test_schema(self):
+        """Test dtypes, dropped columns and the ingest report."""
+        df = ingest.read_readings(DATA_CSV)
+        assert list(df.columns) == ["device_id", "timestamp", "vrms", "irms", "apparent_power", "wh"]
+        assert isinstance(df["device_id"].dtype, pd.CategoricalDtype)
+        assert df["timestamp"].dtype == np.int64
+        assert all(df[c].dtype == np.float32 for c in ["vrms", "irms", "apparent_power", "wh"])
+        assert df.attrs["ingest"]["rows"] == len(df)
+        assert df.attrs["ingest"]["memory_bytes"] == df.memory_usage(deep=True).sum()
+
+        raw = pd.read_csv(DATA_CSV)
+        np.testing.assert_array_equal(df["timestamp"], _expected_ms(raw["timestamp"]))
+        np.testing.assert_allclose(df["vrms"], raw["vrms"], rtol=1e-6)
+        assert df["device_id"].astype(str).tolist() == raw["device_id"].tolist()
+
+    def test_keep_ids(self):
+        """Test that _id is only kept on request."""
+        assert "_id" in ingest.read_readings(DATA_CSV, keep_ids=True).columns
+
+    def test_sources_agree(self, tmp_path):
+        """Test that buffers, chunks, JSON and reading logs produce the same frame."""
+        whole = ingest.read_readings(DATA_CSV)
+        with open(DATA_CSV, "rb") as f:
+            buffered = ingest.read_csv(io.BytesIO(f.read()))
+        chunked = pd.concat(ingest.read_csv(DATA_CSV, chunksize=50), ignore_index=True)
+
+        json_path = str(tmp_path / "readings.json")
+        pd.read_csv(DATA_CSV).to_json(json_path, orient="records")
+        log_path = str(tmp_path / "readings.log")
+        import_csv(DATA_CSV, log_path)
+
+        for other in (buffered, chunked, ingest.read_readings(json_path), ingest.read_readings(log_path)):
+            assert other["device_id"].astype(str).tolist() == whole["device_id"].astype(str).tolist()
+            np.testing.assert_array_equal(other["timestamp"], whole["timestamp"])
+            # to_json keeps 10 decimals, so the JSON copy is only close
+            np.testing.assert_allclose(other[["vrms", "irms", "apparent_power", "wh"]],
+                                       whole[["vrms", "irms", "apparent_power", "wh"]], rtol=1e-6, atol=1e-9)
+
+        # The log's two readers share one conversion and differ only in the timestamp type
+        frame = ReadingLog(log_path).to_frame()
+        typed = ingest.read_log(log_path)
+        pd.testing.assert_frame_equal(typed.drop(columns="timestamp"), frame.drop(columns="timestamp"))
+        np.testing.assert_array_equal(pd.to_datetime(typed["timestamp"], unit="ms", utc=True), frame["timestamp"])
+
+    def test_smaller_than_default_parsing(self):
+        """Test that the typed frame takes well under half the memory of pandas' defaults."""
+        report = ingest.compare(DATA_CSV)
+        assert report["memory_reduction"] > 2.5
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
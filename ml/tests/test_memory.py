@@ -0,0 +1,291 @@
+"""
+Test suite for peak-memory budgets of each pipeline stage
+Run with: pytest tests/ -v
+
+Every stage runs at a fixed synthetic size (synthetic.py) under tracemalloc,
+and its traced peak above the starting point must stay within BUDGETS_MIB.
+Stages whose memory is mostly native (torch tensors, sklearn internals) also
+get an RSS budget, sampled from /proc. A failure re-runs the stage and lists
+the allocation sites of the snapshot taken closest to the peak.
+"""
+import gc
+import itertools
+import linecache
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+import urllib.request
+from datetime import datetime
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import pytest
+import numpy as np
+import torch
+from torch.utils.data import DataLoader
+from cascade import NILM_DIR
+from dataset import EnergyDataset
+from inference import FEATURES
+from model import build_model
+from synthetic import SyntheticLoad, write_csv
+
+if str(NILM_DIR) not in sys.path:
+    sys.path.append(str(NILM_DIR))
+
+SRC_DIR = os.path.join(os.path.dirname(__file__), '..', 'src')
+
+# Single-meter NILM series, live-poll payload and training set sizes
+NILM_READINGS = 50_000
+LIVE_METERS, LIVE_HOURS = 20, 1.0
+TRAIN_READINGS = 8_000
+
+# Traced peak (MiB) above the stage's starting point; roughly 2x the measured peak
+BUDGETS_MIB = {
+    "load_power_data": 5,
+    "compute_delta_power": 4,
+    "detect_events": 5,
+    "create_event_table": 15,
+    "cluster_events": 8,
+    "detect_events_by_meter": 16,
+    "energy_dataset_epoch": 4,
+    "predict_live_poll": 28,
+    "current_device_live_poll": 28,
+    "nilm_live_poll": 28,
+}
+# RSS growth (MiB) of stages whose memory is mostly outside Python's allocator:
+# torch tensors, and native neighbour lists (sklearn's DBSCAN took gigabytes here)
+RSS_BUDGETS_MIB = {
+    "cluster_events": 64,
+    "energy_dataset_epoch": 128,
+}
+TRACE_FRAMES = 10
+TOP_SITES = 10
+
+
+def _rss_bytes():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+class _Sampler(threading.Thread):
+    """Samples the process RSS, and optionally keeps the tracemalloc snapshot taken nearest the traced peak."""
+
+    def __init__(self, snapshots=False, interval=0.005):
+        super().__init__(daemon=True)
+        self.snapshots = snapshots
+        self.interval = interval
+        self.snapshot = None
+        self.snapshot_size = 0
+        self.rss_start = self.rss_peak = _rss_bytes() if os.path.exists("/proc/self/statm") else None
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        if self.rss_peak is not None:
+            self.rss_peak = max(self.rss_peak, _rss_bytes())
+        current = tracemalloc.get_traced_memory()[0]
+        # Only re-snapshot on real growth; snapshots of large traces are slow
+        if self.snapshots and current > self.snapshot_size * 1.05:
+            self.snapshot, self.snapshot_size = tracemalloc.take_snapshot(), current
+
+    def stop(self):
+        self._done.set()
+        self.join()
+        self.sample()
+
+
+def _traced(fn, args, kwargs, snapshots):
+    gc.collect()
+    tracemalloc.start(TRACE_FRAMES)
+    try:
+        before = tracemalloc.take_snapshot() if snapshots else None
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        sampler = _Sampler(snapshots)
+        sampler.start()
+        try:
+            result = fn(*args, **kwargs)
+        finally:
+            sampler.stop()
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+    return result, peak, sampler, before
+
+
+def measure(fn, *args, **kwargs):
+    """Run fn under tracemalloc; returns (result, traced peak bytes, RSS growth bytes or None)."""
+    result, peak, sampler, _ = _traced(fn, args, kwargs, snapshots=False)
+    rss = sampler.rss_peak - sampler.rss_start if sampler.rss_peak is not None else None
+    return result, peak, rss
+
+
+def peak_sites(fn, *args, **kwargs):
+    """
+    Run fn again, snapshotting as traced memory grows, and format the top
+    allocation sites of the snapshot nearest the peak. Snapshots inflate the
+    peak itself, which is why budgets are measured without them.
+    """
+    _, _, sampler, before = _traced(fn, args, kwargs, snapshots=True)
+    if sampler.snapshot is None:
+        return "  (no snapshot taken)"
+    stats = sampler.snapshot.filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, threading.__file__),
+    ]).compare_to(before, "traceback")
+    lines = []
+    for stat in stats[:TOP_SITES]:
+        lines.append(f"  {stat.size_diff / 2**20:+8.2f} MiB in {stat.count_diff:+d} blocks")
+        # Most recent first, down to where the stage was called from this file
+        frames = list(itertools.takewhile(lambda f: f.filename != __file__, reversed(list(stat.traceback))))
+        for frame in frames[:3]:
+            lines.append(f'      File "{frame.filename}", line {frame.lineno}')
+            lines.append(f"        {linecache.getline(frame.filename, frame.lineno).strip()}")
+    return "\n".join(lines)
+
+
+def within_budget(stage, fn, *args, **kwargs):
+    """Run one stage and assert its traced peak (and RSS growth, where budgeted) is within budget."""
+    result, peak, rss = measure(fn, *args, **kwargs)
+    if peak > BUDGETS_MIB[stage] * 2**20:
+        pytest.fail(f"{stage}: traced peak {peak / 2**20:.1f} MiB exceeds its {BUDGETS_MIB[stage]} MiB budget\n"
+                    f"Top allocation sites near the peak:\n{peak_sites(fn, *args, **kwargs)}")
+    if stage in RSS_BUDGETS_MIB and rss is not None and rss > RSS_BUDGETS_MIB[stage] * 2**20:
+        pytest.fail(f"{stage}: RSS grew {rss / 2**20:.1f} MiB, over its {RSS_BUDGETS_MIB[stage]} MiB budget\n"
+                    f"Top traced allocation sites near the peak:\n{peak_sites(fn, *args, **kwargs)}")
+    return result
+
+
+@pytest.fixture(scope="module")
+def nilm_csv(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("memory") / "meter.csv")
+    write_csv(SyntheticLoad(1, 5, NILM_READINGS * 5.0, seed=11), path)
+    return path
+
+
+@pytest.fixture(scope="module")
+def stand_in(tmp_path_factory):
+    """Replay stand-in in its own process, with every reading already released."""
+    path = str(tmp_path_factory.mktemp("memory") / "live.csv")
+    write_csv(SyntheticLoad(LIVE_METERS, 3, LIVE_HOURS * 3600, seed=12), path)
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    proc = subprocess.Popen([sys.executable, os.path.join(SRC_DIR, "replay_server.py"), "--data", path,
+                             "--speed", "1e9", "--port", str(port)],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(300):
+            try:
+                urllib.request.urlopen(f"{url}/health", timeout=1).read()
+                break
+            except OSError:
+                time.sleep(0.1)
+        else:
+            pytest.fail("replay stand-in did not start")
+        yield url
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+class TestNilmStages:
+    """Test cases for the clustering pipeline, stage by stage, on one meter."""
+
+    def test_stage_budgets(self, nilm_csv):
+        """Test load_power_data through cluster_events at NILM_READINGS readings."""
+        from src.clustering import cluster_events
+        from src.data_loader import load_power_data
+        from src.delta_power import compute_delta_power
+        from src.event_detector import detect_events
+        from src.event_table import create_event_table
+
+        df = within_budget("load_power_data", load_power_data, nilm_csv)
+        assert len(df) == NILM_READINGS
+        delta_p = within_budget("compute_delta_power", compute_delta_power, df["power"].tolist())
+        events = within_budget("detect_events", detect_events, df["timestamp"].tolist(), delta_p, 30.0)
+        table = within_budget("create_event_table", create_event_table, events)
+        labels = within_budget("cluster_events", cluster_events, table)
+        assert len(labels) == len(table) > 0
+
+    def test_by_meter_detection_budget(self, nilm_csv):
+        """Test the vectorized per-meter detector at the same size."""
+        from src.data_loader import load_power_data
+        from src.meters import detect_events_by_meter
+
+        df = load_power_data(nilm_csv)
+        assert len(within_budget("detect_events_by_meter", detect_events_by_meter, df, 30.0)) > 0
+
+
+class TestTraining:
+    """Test cases for the dataset and one training epoch."""
+
+    def test_epoch_budget(self):
+        """Test EnergyDataset plus one epoch of the train.py loop at TRAIN_READINGS readings."""
+        load = SyntheticLoad(4, 3, TRAIN_READINGS / 4 * 5.0, seed=13)
+        X = np.concatenate([frame[FEATURES].to_numpy(np.float32) for frame, _ in load.blocks()])
+        X = (X - X.mean(axis=0)) / X.std(axis=0)
+        y = np.arange(len(X)) % 4
+        torch.manual_seed(0)
+        model = build_model("lstm", input_size=4, num_classes=4)
+        criterion = torch.nn.CrossEntropyLoss()
+        optimizer = torch.optim.Adam(model.parameters(), lr=0.001)
+
+        def epoch():
+            loader = DataLoader(EnergyDataset(X, y, window_size=10), batch_size=32, shuffle=True)
+            total = 0.0
+            for xb, yb in loader:
+                optimizer.zero_grad()
+                loss = criterion(model(xb), yb)
+                loss.backward()
+                optimizer.step()
+                total += loss.item()
+            return total / len(loader)
+
+        assert np.isfinite(within_budget("energy_dataset_epoch", epoch))
+
+
+class TestLivePolls:
+    """Test cases for one poll cycle of each live script against the replay stand-in."""
+
+    def test_predict_live(self, stand_in, tmp_path):
+        """Test a predict_live cycle over LIVE_METERS meters x LIVE_HOURS of readings."""
+        import predict_live
+        from timeline import PredictionTimeline
+
+        timeline = PredictionTimeline(str(tmp_path / "timeline"))
+        api_url = f"{stand_in}/api/data"
+        assert predict_live.poll_once(api_url, timeline)  # warm up the predictor
+        assert within_budget("predict_live_poll", predict_live.poll_once, api_url, timeline)
+        assert len(timeline) == 2 * LIVE_METERS  # one prediction per meter and poll
+        assert predict_live.poll_once(api_url, None)  # TIMELINE_DIR=""
+
+    def test_current_device_live(self, stand_in, monkeypatch):
+        """Test a current_device_live cycle over the same payload."""
+        import current_device_live
+
+        monkeypatch.setattr(current_device_live, "api_base_url", stand_in)
+        current_device_live.poll_once(1, datetime.utcnow())
+        within_budget("current_device_live_poll", current_device_live.poll_once, 2, datetime.utcnow())
+
+    def test_nilm_live(self, stand_in):
+        """Test a NILM run_live cycle, which handles every reading on its first poll."""
+        import run_live
+        from src.state_tracker import StateTracker
+
+        n_events = within_budget("nilm_live_poll", run_live.poll_once, f"{stand_in}/api/data", None,
+                                 StateTracker(), {}, {}, 30.0)
+        assert n_events > 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,130 @@
+"""
+Test suite for the NILM per-meter event detection and clustering
+Run with: pytest tests/ -v
+"""
+import subprocess
+import sys
+import os
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import pytest
+import numpy as np
+import pandas as pd
+from cascade import NILM_DIR
+
+if str(NILM_DIR) not in sys.path:
+    sys.path.append(str(NILM_DIR))
+
+from src.clustering import cluster_events
+from src.delta_power import compute_delta_power
+from src.event_detector import detect_events
+from src.meters import cluster_events_by_meter, detect_events_by_meter, meter_dirname
+
+
+def _interleaved(meters=4, n=400, seed=0):
+    """Step-load readings of several meters, interleaved in time order as a shared export delivers them."""
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp("2026-01-21", tz="UTC")
+    frames = []
+    for m in range(meters):
+        levels = rng.choice([0.0, 60.0, 100.0, 1200.0 + 300 * m], n // 20 + 1)
+        power = np.repeat(levels, 20)[:n] + rng.normal(0, 1, n)
+        frames.append(pd.DataFrame({
+            "device_id": f"meter-{m}",
+            "timestamp": start + pd.to_timedelta(np.arange(n) * 2000 + 97 * m, unit="ms"),
+            "power": power,
+        }))
+    return pd.concat(frames).sort_values("timestamp", kind="stable").reset_index(drop=True)
+
+
+def _reference_events(meter):
+    """Events of one meter alone, through the single-series pipeline."""
+    delta_p = compute_delta_power(meter["power"].tolist())
+    return detect_events(meter["timestamp"].tolist(), delta_p, 30.0)
+
+
+class TestDetect:
+    """Test cases for vectorized per-meter event detection."""
+
+    def test_no_deltas_across_meters(self):
+        """Test that an interleaved frame gives exactly each meter's own events, never a jump between meters."""
+        df = _interleaved()
+        events = detect_events_by_meter(df, 30.0)
+        for device_id, meter in df.groupby("device_id"):
+            got = events[events["device_id"] == device_id]
+            expected = _reference_events(meter)
+            assert list(got["timestamp"]) == [t for t, _ in expected]
+            np.testing.assert_allclose(got["delta_p"], [dp for _, dp in expected])
+
+        # Differencing the interleaved frame as one series would add jumps between meters
+        assert len(_reference_events(df)) > 2 * len(events)
+
+    def test_requires_device_id(self):
+        """Test that a frame without meters is refused."""
+        with pytest.raises(ValueError):
+            detect_events_by_meter(pd.DataFrame({"timestamp": [], "power": []}), 30.0)
+
+
+class TestCluster:
+    """Test cases for clustering each meter's events on its own."""
+
+    def test_labels_match_single_meter_runs(self):
+        """Test that each meter's labels equal cluster_events run on that meter alone."""
+        events = detect_events_by_meter(_interleaved(), 30.0)
+        labels = cluster_events_by_meter(events, eps=30.0, min_samples=3, n_jobs=1)
+        for device_id in events["device_id"].unique():
+            rows = np.flatnonzero(events["device_id"] == device_id)
+            expected = cluster_events([{"abs_delta_p": v} for v in events["abs_delta_p"].to_numpy()[rows]], 30.0, 3)
+            assert labels[rows].tolist() == expected
+
+    def test_worker_processes_match_in_process(self):
+        """Test that spreading meters over worker processes gives the same labels as one process."""
+        events = detect_events_by_meter(_interleaved(meters=7), 30.0)
+        serial = cluster_events_by_meter(events, n_jobs=1)
+        parallel = cluster_events_by_meter(events, n_jobs=3)
+        assert parallel.tolist() == serial.tolist()
+        assert len(cluster_events_by_meter(events.iloc[:0], n_jobs=3)) == 0
+
+
+class TestMeterDirs:
+    """Test cases for per-meter output directories."""
+
+    @pytest.mark.parametrize("device_id", ["../x", "a/b", "..", ".", "a\\b", "/etc", "%2F"])
+    def test_ids_stay_inside_output_dir(self, device_id, tmp_path):
+        """Test that ids with separators or dots name one directory directly inside the output dir."""
+        name = meter_dirname(device_id)
+        assert "/" not in name and "\\" not in name and name.strip(".") != ""
+        assert (tmp_path / name).resolve().parent == tmp_path.resolve()
+
+    def test_names_are_distinct_and_plain_ids_unchanged(self):
+        """Test that encoding keeps distinct ids distinct and leaves ordinary ids as they are."""
+        ids = ["meter-0001", "a/b", "a%2Fb", "..", "%2E%2E", "Bulb_60w.v2"]
+        assert len({meter_dirname(i) for i in ids}) == len(ids)
+        assert meter_dirname("meter-0001") == "meter-0001" and meter_dirname("Bulb_60w.v2") == "Bulb_60w.v2"
+        with pytest.raises(ValueError):
+            meter_dirname("")
+
+    def test_pipeline_writes_inside_output_dir(self, tmp_path):
+        """Test that run_clustering.py --by-meter keeps a '../' meter id inside --output-dir."""
+        df = _interleaved(meters=2)
+        df["device_id"] = df["device_id"].map({"meter-0": "../escape", "meter-1": "ok"})
+        df = df.rename(columns={"power": "apparent_power"})
+        df["timestamp"] = df["timestamp"].dt.strftime("%Y-%m-%dT%H:%M:%S.%f").str[:-3] + "Z"
+        for column in ("vrms", "irms", "wh"):
+            df[column] = 1.0
+        data = tmp_path / "readings.csv"
+        df.to_csv(data, index=False)
+        out = tmp_path / "work" / "meters"
+
+        result = subprocess.run([sys.executable, "run_clustering.py", "--input", str(data), "--by-meter",
+                                 "--jobs", "1", "--output-dir", str(out)],
+                                cwd=str(NILM_DIR), capture_output=True, text=True, timeout=300)
+        assert result.returncode == 0, result.stderr[-2000:]
+        assert sorted(os.listdir(out)) == ["..%2Fescape", "ok"]
+        assert not (tmp_path / "work" / "escape").exists()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,56 @@
+"""
+Test suite for hot-path metrics
+Run with: pytest tests/ -v
+"""
+import sys
+import os
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import pytest
+import metrics
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    metrics.reset()
+    yield
+    metrics.enabled = False
+    metrics.reset()
+
+
+class TestMetrics:
+    """Test cases for recording and rendering metrics."""
+
+    def test_disabled_records_nothing(self):
+        """Test that timers and counters are no-ops while disabled."""
+        metrics.enabled = False
+        with metrics.timed("forward"):
+            pass
+        metrics.inc("predictions")
+        assert "forward" not in metrics.render()
+        assert "predictions" not in metrics.render()
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Test Prometheus histogram exposition for a stage."""
+        metrics.enabled = True
+        metrics.observe("fetch", 0.0001)
+        metrics.observe("fetch", 0.3)
+        text = metrics.render()
+
+        assert 'stage="fetch",le="0.0005"} 1' in text
+        assert 'stage="fetch",le="0.5"} 2' in text
+        assert 'stage="fetch",le="+Inf"} 2' in text
+        assert 'spectrawatt_stage_seconds_count{entrypoint="unknown",stage="fetch"} 2' in text
+
+    def test_counters(self):
+        """Test that counters accumulate amounts."""
+        metrics.enabled = True
+        metrics.inc("readings", 10)
+        metrics.inc("readings", 5)
+        assert 'event="readings"} 15' in metrics.render()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
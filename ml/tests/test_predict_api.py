@@ -0,0 +1,116 @@
+"""
+Test suite for the push ingestion endpoint
+Run with: pytest tests/ -v
+"""
+import json
+import socket
+import subprocess
+import sys
+import os
+import time
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import pytest
+import numpy as np
+import pandas as pd
+import requests
+import predict_api
+from device_buffers import DeviceBuffers
+from inference import FEATURES, get_predictor
+
+DATA_CSV = os.path.join(os.path.dirname(__file__), '..', 'data', 'spectrawatt.energy_data.csv')
+PROJECT_DIR = os.path.join(os.path.dirname(__file__), '..')
+
+
+@pytest.fixture
+def readings(monkeypatch):
+    monkeypatch.setattr(predict_api, "buffers", DeviceBuffers(predict_api.WINDOW_SIZE))
+    predict_api.recent_predictions.clear()
+    df = pd.read_csv(DATA_CSV)
+    return df[df["device_id"] == "Soldering-Iron"].drop(columns="_id").head(15).to_dict("records")
+
+
+class TestPush:
+    """Test cases for buffering pushed readings and classifying them immediately."""
+
+    def test_predicts_once_window_is_full(self, readings):
+        """Test that the push completing a window returns the predictor's answer for it."""
+        status, response = predict_api.handle_push(json.dumps(readings[:9]).encode())
+        assert status == 200 and response["received"] == 9
+        assert response["predictions"] == []
+
+        status, response = predict_api.handle_push(json.dumps(readings[9]).encode())
+        (prediction,) = response["predictions"]
+        window = np.array([[r[f] for f in FEATURES] for r in readings[:10]])
+        label, confidence, _ = get_predictor().predict(window)
+        assert prediction["device_id"] == "Soldering-Iron"
+        assert prediction["predicted"] == label
+        assert prediction["confidence"] == pytest.approx(confidence)
+        assert prediction["readings"] == 10
+
+    def test_every_later_push_predicts(self, readings):
+        """Test that each reading after the first window triggers a prediction and is kept in history."""
+        predict_api.handle_push(json.dumps(readings[:10]).encode())
+        for reading in readings[10:]:
+            _, response = predict_api.handle_push(json.dumps(reading).encode())
+            assert len(response["predictions"]) == 1
+        assert len(predict_api.predictions(device_id="Soldering-Iron")) == 6
+
+    def test_pushes_recorded_in_timeline(self, readings, tmp_path, monkeypatch):
+        """Test that push predictions land in the timeline and come back from /timeline."""
+        from timeline import PredictionTimeline
+
+        monkeypatch.setattr(predict_api, "timeline", PredictionTimeline(str(tmp_path)))
+        for reading in readings:
+            predict_api.handle_push(json.dumps(reading).encode())
+        pushed = predict_api.predictions(device_id="Soldering-Iron")
+
+        raw = predict_api.prediction_timeline_range(device_id="Soldering-Iron", resolution="raw")
+        assert [p["label"] for p in raw] == [p["predicted"] for p in pushed]
+        assert [p["timestamp"] for p in raw] == [p["timestamp"] for p in pushed]
+        minutes = predict_api.prediction_timeline_range(resolution="minute")
+        assert [m["timestamp"] for m in minutes] == ["2026-01-21T00:06:00+00:00", "2026-01-21T00:07:00+00:00"]
+        assert sum(m["count"] for m in minutes) == len(pushed) == 6
+
+    def test_rejected_payload(self, readings):
+        """Test that invalid payloads are rejected like the Go API does."""
+        assert predict_api.handle_push(b"[]") == (400, "Batch is empty")
+
+
+class TestServer:
+    """Test cases for starting the app under uvicorn."""
+
+    def test_starts_with_metrics_port_on_its_own_port(self, tmp_path):
+        """Test that METRICS_PORT set to the app's port (as in the image) does not stop uvicorn binding it."""
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            port = s.getsockname()[1]
+        env = {**os.environ, "METRICS_PORT": str(port), "TIMELINE_DIR": str(tmp_path)}
+        proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "src.predict_api:app", "--host", "127.0.0.1",
+                                 "--port", str(port)], cwd=PROJECT_DIR, env=env,
+                                stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        try:
+            # /predictions is only served by the app, not by a metrics side server on the same port
+            response = None
+            deadline = time.time() + 120
+            while time.time() < deadline and proc.poll() is None:
+                try:
+                    response = requests.get(f"http://127.0.0.1:{port}/predictions", timeout=1)
+                    if response.status_code == 200:
+                        break
+                except requests.ConnectionError:
+                    pass
+                time.sleep(0.5)
+            assert proc.poll() is None, proc.stdout.read()[-2000:]
+            assert response is not None and response.status_code == 200 and response.json() == []
+            assert requests.get(f"http://127.0.0.1:{port}/health", timeout=5).status_code == 200
+            assert "predict_api" in requests.get(f"http://127.0.0.1:{port}/metrics", timeout=5).text
+        finally:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,123 @@
+"""
+Test suite for the NILM pipeline stage profiler
+Run with: pytest tests/ -v
+"""
+import json
+import pstats
+import subprocess
+import sys
+import os
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import pytest
+import numpy as np
+import pandas as pd
+from cascade import NILM_DIR
+
+if str(NILM_DIR) not in sys.path:
+    sys.path.append(str(NILM_DIR))
+
+from src.profiling import StageProfiler
+
+
+def _busy(n):
+    return sum(i * i for i in range(n))
+
+
+def _allocate(size):
+    return bytearray(size)
+
+
+def _functions(path):
+    """Function name -> call count in a .prof file."""
+    return {func[2]: stat[1] for func, stat in pstats.Stats(path).stats.items()}
+
+
+class TestStageProfiler:
+    """Test cases for per-stage wall time, CPU time, peak memory and cProfile dumps."""
+
+    def test_repeated_stages_accumulate(self, tmp_path):
+        """Test that calls of one stage add up in one record and one .prof file."""
+        profiler = StageProfiler(enabled=True, cprofile_dir=str(tmp_path))
+        walls = []
+        for size in (1 << 20, 4 << 20, 2 << 20):
+            with profiler.stage('load') as stage:
+                _allocate(size)
+                _busy(20000)
+                stage['rows'] = 10
+            walls.append(profiler.stages[0]['wall_s'])
+        with profiler.stage('cluster'):
+            _busy(1000)
+
+        assert [s['stage'] for s in profiler.stages] == ['load', 'cluster']
+        load = profiler.stages[0]
+        assert load['calls'] == 3 and load['rows'] == 30
+        assert walls[0] < walls[1] < walls[2] and load['cpu_s'] > 0
+        assert 4 << 20 <= load['peak_mem_bytes'] < 6 << 20
+        assert profiler.stages[1]['rows'] is None
+
+        assert sorted(os.listdir(tmp_path)) == ['01_load.prof', '02_cluster.prof']
+        assert _functions(load['cprofile'])['_busy'] == 3
+        assert _functions(profiler.stages[1]['cprofile'])['_busy'] == 1
+
+    def test_nested_stages(self, tmp_path):
+        """Test that a parent's times and peak include its child, and each profile holds its own calls."""
+        profiler = StageProfiler(enabled=True, cprofile_dir=str(tmp_path))
+        with profiler.stage('stats'):
+            _allocate(8 << 20)
+            with profiler.stage('sketch') as stage:
+                _busy(20000)
+                stage['rows'] = 5
+            _allocate(1 << 20)
+
+        outer, inner = profiler.stages
+        assert (outer['stage'], outer['depth'], inner['stage'], inner['depth']) == ('stats', 0, 'sketch', 1)
+        assert outer['wall_s'] >= inner['wall_s'] and outer['cpu_s'] >= inner['cpu_s']
+        # The 8 MiB buffer was freed before the child started, so only the parent saw it
+        assert outer['peak_mem_bytes'] >= 8 << 20 > inner['peak_mem_bytes']
+
+        assert sorted(os.listdir(tmp_path)) == ['01_stats.prof', '02_sketch.prof']
+        outer_calls, inner_calls = _functions(outer['cprofile']), _functions(inner['cprofile'])
+        assert outer_calls['_allocate'] == 2 and '_busy' not in outer_calls
+        assert inner_calls['_busy'] == 1 and '_allocate' not in inner_calls
+
+        # Only top-level stages count towards the total
+        total = profiler.summary().splitlines()[-1].split()
+        assert float(total[1]) == pytest.approx(outer['wall_s'], abs=1e-4)
+
+    def test_disabled_records_nothing(self, tmp_path):
+        """Test that a disabled profiler yields a scratch record and writes nothing."""
+        profiler = StageProfiler(enabled=False, cprofile_dir=str(tmp_path / 'prof'))
+        with profiler.stage('load') as stage:
+            stage['rows'] = 3
+        assert profiler.stages == [] and not (tmp_path / 'prof').exists()
+
+    def test_cprofile_dir_cli(self, tmp_path):
+        """Test that run_clustering.py --cprofile-dir writes one .prof file per stage."""
+        rng = np.random.default_rng(0)
+        n = 400
+        power = np.repeat(rng.choice([0.0, 60.0, 1200.0], n // 20), 20) + rng.normal(0, 1, n)
+        pd.DataFrame({
+            'device_id': 'meter-0',
+            'timestamp': pd.date_range('2026-01-21', periods=n, freq='2s', tz='UTC').strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'apparent_power': power, 'vrms': 230.0, 'irms': power / 230.0, 'wh': 1.0,
+        }).to_csv(tmp_path / 'readings.csv', index=False)
+
+        result = subprocess.run([sys.executable, 'run_clustering.py', '--input', str(tmp_path / 'readings.csv'),
+                                 '--by-meter', '--jobs', '1', '--output-dir', str(tmp_path / 'meters'),
+                                 '--profile', '--profile-output', str(tmp_path / 'profile.json'),
+                                 '--cprofile-dir', str(tmp_path / 'prof')],
+                                cwd=str(NILM_DIR), capture_output=True, text=True, timeout=300)
+        assert result.returncode == 0, result.stderr[-2000:]
+
+        with open(tmp_path / 'profile.json') as f:
+            stages = json.load(f)['stages']
+        names = [s['stage'] for s in stages]
+        assert sorted(os.listdir(tmp_path / 'prof')) == [f"{i:02d}_{name}.prof" for i, name in enumerate(names, 1)]
+        assert all(s['calls'] == 1 and os.path.exists(s['cprofile']) for s in stages)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,98 @@
+"""
+Test suite for the binary reading log
+Run with: pytest tests/ -v
+"""
+import sys
+import os
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import pytest
+import numpy as np
+import pandas as pd
+from reading_log import ReadingLog, RECORD_DTYPE, import_csv, to_epoch_ms
+
+DATA_CSV = os.path.join(os.path.dirname(__file__), '..', 'data', 'spectrawatt.energy_data.csv')
+
+
+class TestReadingLog:
+    """Test cases for appending to and querying the reading log."""
+
+    @pytest.fixture
+    def log_path(self, tmp_path):
+        return str(tmp_path / "readings.log")
+
+    def test_append_and_memmap(self, log_path):
+        """Test that appended records are readable through the memory map."""
+        log = ReadingLog(log_path)
+        log.append("Bulb-60w", "2026-01-20T23:49:34.854Z", 230.0, 0.26, 60.0, 1.5)
+        log.append("Bulb-100w", "2026-01-20T23:49:39.183Z", 231.0, 0.43, 100.0, 2.5)
+
+        records = log.records()
+        assert isinstance(records, np.memmap)
+        assert len(records) == 2
+        assert os.path.getsize(log_path) == 2 * RECORD_DTYPE.itemsize
+        assert records["timestamp"][0] == to_epoch_ms("2026-01-20T23:49:34.854Z")
+        assert log.devices == ["Bulb-60w", "Bulb-100w"]
+
+    def test_reopen_keeps_index(self, log_path):
+        """Test that device table and index survive reopening the log."""
+        log = ReadingLog(log_path, block_size=2)
+        for i in range(5):
+            log.append("Bulb-60w", 1000 + i, 230.0, 0.26, 60.0, float(i))
+
+        reopened = ReadingLog(log_path)
+        assert len(reopened) == 5
+        assert len(reopened.blocks) == 3
+        assert reopened.last_timestamp["Bulb-60w"] == 1004
+
+    def test_query_by_device_and_time(self, log_path):
+        """Test device and time-range filtering."""
+        log = ReadingLog(log_path, block_size=4)
+        for i in range(10):
+            device = "Bulb-60w" if i % 2 else "Soldering-Iron"
+            log.append(device, 1000 + i, 230.0, 0.1 * i, 10.0 * i, float(i))
+
+        bulb = log.query(device_id="Bulb-60w")
+        assert len(bulb) == 5
+        window = log.query(device_id="Bulb-60w", start=1003, end=1007)
+        assert window["timestamp"].tolist() == [1003, 1005, 1007]
+        assert len(log.query(device_id="Unknown")) == 0
+
+    def test_append_readings_skips_seen(self, log_path):
+        """Test that re-sending the same API readings does not duplicate them."""
+        readings = [
+            {"device_id": "Bulb-60w", "timestamp": "2026-01-20T23:49:34.854Z",
+             "vrms": 230.0, "irms": 0.26, "apparent_power": 60.0, "wh": 1.0},
+            {"device_id": "Bulb-60w", "timestamp": "2026-01-20T23:49:39.183Z",
+             "vrms": 231.0, "irms": 0.27, "apparent_power": 61.0, "wh": 1.1},
+        ]
+        log = ReadingLog(log_path)
+        assert log.append_readings(readings) == 2
+        assert log.append_readings(readings) == 0
+        assert len(log) == 2
+
+    def test_torn_tail_is_dropped(self, log_path):
+        """Test that a partially written record is discarded on open."""
+        log = ReadingLog(log_path)
+        log.append("Bulb-60w", 1000, 230.0, 0.26, 60.0, 1.0)
+        with open(log_path, "ab") as f:
+            f.write(b"\x00" * 5)
+
+        assert len(ReadingLog(log_path)) == 1
+
+    def test_import_csv_matches_source(self, log_path):
+        """Test that a CSV import round-trips through to_frame."""
+        count = import_csv(DATA_CSV, log_path)
+        source = pd.read_csv(DATA_CSV)
+        assert count == len(source)
+
+        df = ReadingLog(log_path).to_frame()
+        assert df["device_id"].astype(str).tolist() == source["device_id"].tolist()
+        assert df["timestamp"].iloc[0] == pd.Timestamp(source["timestamp"].iloc[0])
+        np.testing.assert_allclose(df["irms"], source["irms"], rtol=1e-6)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
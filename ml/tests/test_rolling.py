@@ -0,0 +1,128 @@
+"""
+Test suite for the rolling-statistics features and classifier
+Run with: pytest tests/ -v
+"""
+import subprocess
+import sys
+import os
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import joblib
+import pytest
+import numpy as np
+import rolling
+from feature_store import FeatureStore
+from inference import sliding_windows
+from rolling import (RollingFeatures, RollingPredictor, build_classifier, compile_classifier, CompiledClassifier,
+                     feature_names, rolling_features, window_features)
+
+SRC_DIR = os.path.join(os.path.dirname(__file__), '..', 'src')
+
+
+def _series(n, seed=0):
+    """Noisy readings with steps and a rising wh counter, like a meter switching loads."""
+    rng = np.random.default_rng(seed)
+    power = np.repeat(rng.choice([0.0, 60.0, 100.0, 40.0], n // 50 + 1), 50)[:n] + rng.normal(0, 2, n)
+    vrms = 230 + rng.normal(0, 1, n)
+    return np.column_stack([vrms, power / vrms, power, np.cumsum(power) / 3600])
+
+
+class TestFeatures:
+    """Test cases for the batch, per-window and streaming feature computations."""
+
+    def test_three_paths_agree(self):
+        """Test that O(n) batch, per-window and O(1) streaming features match a direct computation."""
+        X = _series(9000)
+        batch = rolling_features(X)
+        assert batch.shape == (len(X), len(feature_names()))
+        assert np.isnan(batch[:9]).any(axis=1).all() and not np.isnan(batch[9:]).any()
+
+        windows = sliding_windows(X, 10)
+        np.testing.assert_allclose(batch[9:-1], window_features(windows), rtol=1e-7, atol=1e-5)
+
+        stream = RollingFeatures()
+        streamed = np.array([stream.update(x) for x in X])  # crosses RESYNC and BLOCK boundaries
+        np.testing.assert_allclose(streamed, batch, rtol=1e-7, atol=1e-5)
+
+        # Spot check against the definitions
+        seg = X[100:105, 2]
+        row = dict(zip(feature_names(), batch[104]))
+        assert row["apparent_power_mean_5"] == pytest.approx(seg.mean())
+        assert row["apparent_power_std_5"] == pytest.approx(seg.std())
+        assert row["apparent_power_min_5"] == seg.min() and row["apparent_power_max_5"] == seg.max()
+        assert row["apparent_power_slope_5"] == pytest.approx(np.polyfit(np.arange(5), seg, 1)[0])
+        assert row["apparent_power_crest_5"] == pytest.approx(np.abs(seg).max() / np.sqrt((seg ** 2).mean()))
+
+    def test_short_windows(self):
+        """Test that too-short windows are refused and too-short series stay NaN."""
+        with pytest.raises(ValueError):
+            window_features(np.zeros((1, 5, 4)))
+        assert np.isnan(rolling_features(np.ones((2, 4)))).all()
+
+
+class TestClassifier:
+    """Test cases for the compiled classifiers and the predictor."""
+
+    @pytest.mark.parametrize("kind", rolling.CLASSIFIERS)
+    def test_compiled_matches_sklearn(self, kind):
+        """Test that the numpy-only classifier gives sklearn's probabilities, in batches and one row at a time."""
+        X = _series(3000)
+        F, labels = rolling.training_rows(X, (X[:, 2] > 50).astype(int) + (X[:, 2] > 80))
+        model = build_classifier(kind).fit(F, labels)
+        compiled = CompiledClassifier(kind, compile_classifier(model, kind))
+        np.testing.assert_allclose(compiled.predict_proba(F), model.predict_proba(F), atol=1e-9)
+        np.testing.assert_allclose(compiled.predict_proba(F[[7]]), model.predict_proba(F[[7]]), atol=1e-9)
+
+    def test_train_and_predict(self, tmp_path):
+        """Test that train.py --rolling saves a classifier whose window, batch and stream predictions agree."""
+        models_dir = tmp_path / "models"
+        result = subprocess.run([sys.executable, os.path.join(SRC_DIR, "train.py"), "--rolling", "tree",
+                                 "--models-dir", str(models_dir)], capture_output=True, text=True, timeout=300)
+        assert result.returncode == 0, result.stderr[-2000:]
+        assert "holdout accuracy" in result.stdout
+
+        predictor = RollingPredictor(str(models_dir))
+        X = _series(200, seed=3)
+        windows = sliding_windows(X, predictor.window_size)
+        labels, confidences, probs = predictor.predict_many(windows)
+        assert set(labels) <= set(predictor.classes)
+        np.testing.assert_allclose(probs.sum(axis=1), 1.0)
+        assert predictor.predict(windows[5])[0] == labels[5]
+
+        # Streaming: reading i + window_size - 1 ends window i
+        streamed = [predictor.update("meter", x) for x in X]
+        assert all(s is None for s in streamed[:predictor.window_size - 1])
+        assert [s[0] for s in streamed[predictor.window_size - 1:-1]] == list(labels)
+
+    def test_other_modes_keep_lstm_preprocessors(self, tmp_path):
+        """Test that --rolling and --sequence leave the deployed LSTM's scaler and label encoder untouched."""
+        models_dir = tmp_path / "models"
+        models_dir.mkdir()
+        features = FeatureStore(str(tmp_path / "store")).load(os.path.join(SRC_DIR, "..", "data", "spectrawatt.energy_data.csv"))
+        features.save_preprocessors(str(models_dir))
+        # Stand-in for a scaler fit on other data, so a refit would change the file
+        scaler = joblib.load(models_dir / "scaler.pkl")
+        scaler.mean_ = scaler.mean_ + 1.0
+        joblib.dump(scaler, models_dir / "scaler.pkl")
+        before = {name: (models_dir / name).read_bytes() for name in ("scaler.pkl", "label_encoder.pkl")}
+
+        for mode in (["--rolling", "tree"], ["--sequence", "--epochs", "1"]):
+            result = subprocess.run([sys.executable, os.path.join(SRC_DIR, "train.py"), *mode,
+                                     "--models-dir", str(models_dir)], capture_output=True, text=True, timeout=300)
+            assert result.returncode == 0, result.stderr[-2000:]
+        assert {name: (models_dir / name).read_bytes() for name in before} == before
+        assert (models_dir / rolling.MODEL_FILE).exists() and (models_dir / "energy_model_seq.pt").exists()
+
+        # A student or lstm-seq can't be trained against an encoder with other classes
+        encoder = joblib.load(models_dir / "label_encoder.pkl")
+        encoder.classes_ = encoder.classes_[:-1]
+        joblib.dump(encoder, models_dir / "label_encoder.pkl")
+        result = subprocess.run([sys.executable, os.path.join(SRC_DIR, "train.py"), "--sequence", "--epochs", "1",
+                                 "--models-dir", str(models_dir)], capture_output=True, text=True, timeout=300)
+        assert result.returncode != 0 and "retrain the LSTM" in result.stderr
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
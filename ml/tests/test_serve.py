@@ -0,0 +1,55 @@
+"""
+Test suite for the pre-fork API server and memory-mapped weights
+Run with: pytest tests/ -v
+"""
+import socket
+import sys
+import os
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import pytest
+import torch
+import serve
+from model import load_model
+
+MODELS_DIR = os.path.join(os.path.dirname(__file__), '..', 'models')
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class TestSharedWeights:
+    """Test cases for loading weights as a shared mapping."""
+
+    def test_mmap_matches_copy(self):
+        """Test that memory-mapped weights give the same outputs as weights loaded onto the heap."""
+        copied = load_model(MODELS_DIR, num_classes=3)
+        mapped = load_model(MODELS_DIR, num_classes=3, mmap=True)
+        x = torch.randn(8, 10, 4)
+        with torch.no_grad():
+            assert torch.equal(copied(x), mapped(x))
+
+    def test_threads_split_cores(self):
+        """Test that workers x threads never exceeds the cores and each worker has at least one thread."""
+        assert serve.threads_per_worker(4, cores=8) == 2
+        assert serve.threads_per_worker(3, cores=8) == 2
+        assert serve.threads_per_worker(16, cores=8) == 1
+        assert 1 <= serve.available_cores() <= (os.cpu_count() or 1)
+
+
+class TestPreFork:
+    """Test cases for serving from several forked workers."""
+
+    def test_extra_worker_is_cheap(self):
+        """Test that a second worker serves requests and adds a small fraction of the first one's memory."""
+        one, two = serve.memory([1, 2], port=_free_port())
+        assert two["extra_worker_mb"] < 0.25 * one["pss_mb"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,161 @@
+"""
+Test suite for the NILM streaming statistics sketches
+Run with: pytest tests/ -v
+"""
+import json
+import sys
+import os
+from datetime import datetime, timedelta
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import pytest
+import numpy as np
+import pandas as pd
+from cascade import NILM_DIR
+
+if str(NILM_DIR) not in sys.path:
+    sys.path.append(str(NILM_DIR))
+
+from src.clustering import cluster_summaries, summarize_clusters
+from src.energy_calc import DeviceMetrics, EnergyCalculator
+from src.meters import cluster_stats_by_meter
+from src.sketches import QuantileSketch, StreamSummary, load_summaries, merge_summaries, save_summaries
+from src.state_tracker import StateTracker
+
+
+def _values(n=20000, seed=0):
+    """Step sizes spanning several decades, with some zeros and negatives."""
+    rng = np.random.default_rng(seed)
+    values = rng.lognormal(4, 1.5, n)
+    values[::50] = 0.0
+    values[::7] *= -1
+    return values
+
+
+class TestStreamSummary:
+    """Test cases for the mergeable moments and quantile sketch."""
+
+    def test_matches_numpy(self):
+        """Test that one-by-one and batch updates give numpy's moments and quantiles within the error bound."""
+        values = _values()
+        one, batch = StreamSummary(), StreamSummary()
+        for v in values[:2000]:
+            one.update(v)
+        batch.update_many(values[:2000])
+        assert one.count == batch.count == 2000
+        assert one.mean == pytest.approx(batch.mean) and one.m2 == pytest.approx(batch.m2)
+        assert one.quantiles.to_dict() == batch.quantiles.to_dict()
+
+        batch.update_many(values[2000:])
+        assert batch.mean == pytest.approx(values.mean())
+        assert batch.std == pytest.approx(values.std())
+        assert (batch.min, batch.max) == (values.min(), values.max())
+        for p in (1, 10, 50, 95, 99):
+            true = np.sort(values)[int(p / 100 * (len(values) - 1))]
+            assert abs(batch.percentile(p) - true) <= 0.01 * abs(true) + 1e-9
+
+    def test_merged_shards_equal_whole(self):
+        """Test that summaries of shards merge into the summary of all values, in any order."""
+        values = _values()
+        whole = StreamSummary()
+        whole.update_many(values)
+        shards = []
+        for part in np.array_split(values, 7):
+            shard = StreamSummary()
+            shard.update_many(part)
+            shards.append(shard)
+
+        merged = StreamSummary()
+        for shard in reversed(shards):
+            merged.merge(shard)
+        assert merged.count == whole.count
+        assert merged.mean == pytest.approx(whole.mean) and merged.std == pytest.approx(whole.std)
+        assert merged.quantiles.to_dict() == whole.quantiles.to_dict()
+        assert merged.summary() == pytest.approx(whole.summary())
+        assert merged.merge(StreamSummary()).count == whole.count
+
+        with pytest.raises(ValueError):
+            QuantileSketch(0.01).merge(QuantileSketch(0.02))
+
+    def test_serialization_and_bounded_memory(self, tmp_path):
+        """Test that summaries survive a JSON round trip and the sketch never exceeds max_bins per sign."""
+        summaries = {"0": StreamSummary(), "1": StreamSummary(), "empty": StreamSummary()}
+        summaries["0"].update_many(_values(seed=1))
+        summaries["1"].update(42.0)
+        path = str(tmp_path / "sketches.json")
+        save_summaries(summaries, path)
+        loaded = load_summaries(path)
+        assert {k: s.to_dict() for k, s in loaded.items()} == {k: s.to_dict() for k, s in summaries.items()}
+        assert loaded["empty"].summary()["p50"] is None
+
+        doubled = merge_summaries([loaded, summaries])
+        assert doubled["0"].count == 2 * summaries["0"].count and loaded["0"].count == summaries["0"].count
+
+        sketch = QuantileSketch(0.01, max_bins=64)
+        sketch.update_many(np.logspace(-6, 9, 100000))
+        assert len(sketch.positive) <= 64 and sketch.count == 100000
+        assert sketch.quantile(0.99) == pytest.approx(np.logspace(-6, 9, 100000)[98999], rel=0.01)
+        assert len(json.dumps(sketch.to_dict())) < 2000
+        with pytest.raises(ValueError):
+            sketch.update(float("nan"))
+
+
+class TestPipelineStats:
+    """Test cases for cluster statistics and energy metrics built on the summaries."""
+
+    def test_cluster_stats(self):
+        """Test that per-cluster and per-meter stats keep count/avg/min/max and add std and percentiles."""
+        rng = np.random.default_rng(0)
+        events = pd.DataFrame({
+            "device_id": pd.Categorical(rng.choice(["m1", "m2"], 500)),
+            "cluster_id": rng.integers(-1, 3, 500),
+            "abs_delta_p": rng.uniform(20, 2000, 500),
+        })
+        by_meter = cluster_stats_by_meter(events)
+        grouped = events.groupby(["device_id", "cluster_id"], observed=True)["abs_delta_p"]
+        for (device_id, cluster_id), group in grouped:
+            stats = by_meter[device_id][str(cluster_id)]
+            assert stats["count"] == len(group)
+            assert stats["avg_power_change"] == pytest.approx(group.mean())
+            assert stats["std_power_change"] == pytest.approx(group.std(ddof=0))
+            assert (stats["min_power_change"], stats["max_power_change"]) == (group.min(), group.max())
+            assert stats["min_power_change"] <= stats["p50_power_change"] <= stats["p99_power_change"]
+
+        stats = summarize_clusters(cluster_summaries(events["cluster_id"], events["abs_delta_p"]))
+        assert sum(s["count"] for s in stats.values()) == len(events)
+        assert summarize_clusters(cluster_summaries([], [])) == {}
+
+    def test_streaming_energy_matches_batch(self):
+        """Test that recording usages as they end gives the batch metrics without keeping the usage list."""
+        calculator = EnergyCalculator({"kettle": 2000.0, "lamp": 60.0})
+        streaming = StateTracker(on_usage=calculator.record, keep_events=False)
+        batch = StateTracker()
+        t = datetime(2026, 1, 1)
+        rng = np.random.default_rng(0)
+        for _ in range(300):
+            device = rng.choice(["kettle", "lamp", "heater"])
+            end = t + timedelta(seconds=float(rng.integers(10, 600)))
+            for tracker in (streaming, batch):
+                tracker.update_state(device, 1.0, t)
+                tracker.update_state(device, -1.0, end)
+            t += timedelta(hours=1)
+
+        assert all(not usages for usages in streaming.get_usage_stats().values())
+        expected = calculator.calculate_metrics(batch.get_usage_stats())
+        assert set(calculator.totals) == set(expected) == {"kettle", "lamp"}
+        for device, metrics in expected.items():
+            totals = calculator.totals[device]
+            assert totals.usage_count == metrics.usage_count
+            assert totals.total_energy == pytest.approx(metrics.total_energy)
+            assert totals.avg_duration == pytest.approx(metrics.avg_duration)
+            assert totals.durations.summary() == pytest.approx(metrics.durations.summary())
+
+        combined = DeviceMetrics().merge(expected["kettle"]).merge(expected["lamp"])
+        assert combined.usage_count == expected["kettle"].usage_count + expected["lamp"].usage_count
+        assert combined.durations.count == combined.usage_count
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,112 @@
+"""
+Test suite for the synthetic load generator
+Run with: pytest tests/ -v
+"""
+import sys
+import os
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import pytest
+import numpy as np
+import pandas as pd
+import ingest
+from cascade import NILM_DIR
+from synthetic import CSV_COLUMNS, SyntheticLoad, write_csv, write_json
+
+DATA_CSV = os.path.join(os.path.dirname(__file__), '..', 'data', 'spectrawatt.energy_data.csv')
+
+
+def _readings(load):
+    return pd.concat([frame for frame, _ in load.blocks()], ignore_index=True)
+
+
+class TestDeterminism:
+    """Test cases for seeding and streaming."""
+
+    def test_same_seed_same_readings(self):
+        """Test that a seed reproduces readings and events exactly and another seed does not."""
+        a, b = SyntheticLoad(4, 3, 3600, seed=7), SyntheticLoad(4, 3, 3600, seed=7)
+        pd.testing.assert_frame_equal(_readings(a), _readings(b))
+        pd.testing.assert_frame_equal(a.events(), b.events())
+        assert not _readings(SyntheticLoad(4, 3, 3600, seed=8))["apparent_power"].equals(_readings(a)["apparent_power"])
+
+    def test_meter_independent_of_layout(self):
+        """Test that a meter's readings don't depend on the other meters or on per-meter generation."""
+        load = SyntheticLoad(5, 3, 7200, seed=1, dropout=0.05)
+        streamed = _readings(load)
+        frame, _ = load.meter_frame(2)
+        pd.testing.assert_frame_equal(streamed[streamed["device_id"] == "meter-0002"].reset_index(drop=True), frame)
+
+        fewer = _readings(SyntheticLoad(3, 3, 7200, seed=1, dropout=0.05))
+        pd.testing.assert_frame_equal(fewer[fewer["device_id"] == "meter-0002"].reset_index(drop=True), frame)
+
+
+class TestSchema:
+    """Test cases for the energy_data export format."""
+
+    def test_matches_export(self, tmp_path):
+        """Test columns, ordering, ids and the physical relations between fields."""
+        load = SyntheticLoad(6, 4, 3600, seed=2)
+        path = str(tmp_path / "synthetic.csv")
+        assert write_csv(load, path) == len(load)
+        assert list(pd.read_csv(path, nrows=0).columns) == list(pd.read_csv(DATA_CSV, nrows=0).columns) == CSV_COLUMNS
+
+        df = ingest.read_readings(path, keep_ids=True)
+        assert np.all(np.diff(df["timestamp"]) >= 0)
+        assert df["_id"].str.len().eq(24).all() and df["_id"].is_unique
+        np.testing.assert_allclose(df["vrms"] * df["irms"], df["apparent_power"], rtol=1e-3)
+        assert (df.groupby("device_id", observed=True)["wh"].diff().dropna() >= 0).all()
+
+    def test_json_matches_csv(self, tmp_path):
+        """Test that the grouped raw_readings.json output ingests to the same readings as the CSV."""
+        load = SyntheticLoad(3, 2, 1800, seed=4)
+        write_csv(load, str(tmp_path / "s.csv"))
+        write_json(load, str(tmp_path / "s.json"))
+        key = ["device_id", "timestamp"]
+        csv = ingest.read_readings(str(tmp_path / "s.csv")).astype({"device_id": str}).sort_values(key)
+        grouped = ingest.read_readings(str(tmp_path / "s.json")).astype({"device_id": str}).sort_values(key)
+        pd.testing.assert_frame_equal(csv.reset_index(drop=True), grouped.reset_index(drop=True))
+
+
+class TestGroundTruth:
+    """Test cases for the events and per-reading labels."""
+
+    def test_labels_follow_events(self):
+        """Test that an appliance is labelled running exactly between its on and off events."""
+        load = SyntheticLoad(3, 3, 4 * 3600, seed=5)
+        events = load.events()
+        frame, labels = load.meter_frame(0)
+        times = ingest.parse_timestamps(frame["timestamp"])
+        for appliance, switches in events[events["device_id"] == "meter-0000"].groupby("appliance"):
+            running = np.array([appliance in label.split("+") for label in labels])
+            flips = np.flatnonzero(running[1:] != running[:-1]) + 1
+            # Each flip in the labels is the first reading after a switching event
+            np.testing.assert_array_equal(times[flips], [times[times > t][0] for t in switches["timestamp"]])
+            assert list(running[flips]) == list(switches["state"] == "on")
+
+    def test_nilm_detection_recovers_events(self):
+        """Test that the NILM per-meter detector finds the ground-truth steps on noiseless readings."""
+        if str(NILM_DIR) not in sys.path:
+            sys.path.append(str(NILM_DIR))
+        from src.meters import detect_events_by_meter
+
+        load = SyntheticLoad(10, 3, 6 * 3600, seed=6, noise=0)
+        df = _readings(load).rename(columns={"apparent_power": "power"})
+        detected = detect_events_by_meter(df.assign(timestamp=ingest.parse_timestamps(df["timestamp"])), 30)
+        truth = load.events()
+
+        matched = 0
+        for device_id, steps in truth.groupby("device_id"):
+            found = detected[detected["device_id"] == device_id]
+            for ts, delta in zip(steps["timestamp"], steps["delta_p"]):
+                # The first reading after a switch is at most an interval plus jitter later
+                near = found[(found["timestamp"] >= ts) & (found["timestamp"] <= ts + 1200 * load.interval_s)]
+                matched += bool(len(near)) and abs(near["delta_p"].sum() - delta) < 0.05 * abs(delta) + 5
+        assert matched / len(truth) > 0.95
+        assert len(detected) <= len(truth)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,167 @@
+"""
+Test suite for the prediction timeline store
+Run with: pytest tests/ -v
+"""
+import sys
+import os
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import pytest
+import numpy as np
+import pandas as pd
+from timeline import RETENTION_DAYS, TIERS, PredictionTimeline, from_env
+
+START_MS = 1_768_953_600_000  # 2026-01-21T00:00:00Z
+LABELS = ["Bulb-60w", "Soldering-Iron", "Chitrita-PC"]
+
+
+def _predictions(n, seed=0, step_ms=5_000, devices=("meter-0000", "meter-0001")):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "device_id": rng.choice(list(devices), n),
+        "timestamp": START_MS + np.arange(n) * step_ms + rng.integers(0, step_ms, n),
+        "label": rng.choice(LABELS, n, p=[0.6, 0.3, 0.1]),
+        "confidence": rng.uniform(0.3, 1.0, n).astype(np.float32),
+    })
+
+
+def _fill(timeline, df, batch=97):
+    for i in range(0, len(df), batch):
+        part = df.iloc[i:i + batch]
+        timeline.extend(part["device_id"].tolist(), part["timestamp"].tolist(),
+                        part["label"].tolist(), part["confidence"].tolist())
+
+
+def _expected(df, width):
+    """Brute-force buckets: dominant label by count then confidence sum, mean confidence."""
+    df = df.assign(bucket=df["timestamp"] - df["timestamp"] % width)
+    rows = []
+    for (device, bucket), group in df.groupby(["device_id", "bucket"]):
+        per_label = group.groupby("label")["confidence"].agg(["count", "sum"])
+        best = per_label.sort_values(["count", "sum"], ascending=False).index[0]
+        rows.append((device, bucket, best, len(group), group["confidence"].astype(float).mean()))
+    return pd.DataFrame(rows, columns=["device_id", "bucket", "label", "count", "confidence"])
+
+
+def _compare(result, expected):
+    result = result.assign(device_id=result["device_id"].astype(str), label=result["label"].astype(str),
+                           bucket=(result["timestamp"] - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(milliseconds=1))
+    result = result.sort_values(["device_id", "bucket"]).reset_index(drop=True)
+    expected = expected.sort_values(["device_id", "bucket"]).reset_index(drop=True)
+    assert result["bucket"].tolist() == expected["bucket"].tolist()
+    assert result["device_id"].tolist() == expected["device_id"].tolist()
+    assert result["label"].tolist() == expected["label"].tolist()
+    assert result["count"].tolist() == expected["count"].tolist()
+    np.testing.assert_allclose(result["confidence"], expected["confidence"], rtol=1e-6)
+
+
+class TestRollups:
+    """Test cases for the minute, hour and day tiers."""
+
+    def test_tiers_match_brute_force(self, tmp_path):
+        """Test that every tier gives each bucket's exact dominant label, count and mean confidence."""
+        df = _predictions(40_000, seed=1)  # about 2.3 days at one prediction every 5 s
+        timeline = PredictionTimeline(str(tmp_path), ring_capacity=1024)
+        _fill(timeline, df)
+        for tier, width in TIERS.items():
+            _compare(timeline.query(resolution=tier), _expected(df, width))
+
+    def test_late_predictions_are_merged(self, tmp_path):
+        """Test that predictions arriving after their buckets were rolled up still count."""
+        df = _predictions(20_000, seed=2)
+        late = df.sample(frac=0.1, random_state=0)
+        timeline = PredictionTimeline(str(tmp_path), ring_capacity=1024)
+        _fill(timeline, df.drop(late.index))
+        _fill(timeline, late)
+        for tier, width in TIERS.items():
+            _compare(timeline.query(resolution=tier), _expected(df, width))
+
+    def test_segments_are_partitioned(self, tmp_path):
+        """Test that minute rows are stored in one segment per day."""
+        timeline = PredictionTimeline(str(tmp_path))
+        _fill(timeline, _predictions(40_000, seed=3))
+        assert sorted(os.listdir(tmp_path / "minute")) == ["2026-01-21.seg", "2026-01-22.seg", "2026-01-23.seg"]
+        assert os.listdir(tmp_path / "hour") == ["2026-01.seg"]
+
+
+class TestQueries:
+    """Test cases for range queries, recent predictions and summaries."""
+
+    def test_range_and_device(self, tmp_path):
+        """Test that a query returns exactly the buckets of one device in the range."""
+        df = _predictions(30_000, seed=4)
+        timeline = PredictionTimeline(str(tmp_path), ring_capacity=1024)
+        _fill(timeline, df)
+        start, end = START_MS + 13 * 3_600_000, START_MS + 30 * 3_600_000 - 1
+        result = timeline.query("meter-0001", pd.Timestamp(start, unit="ms", tz="UTC").isoformat(), end,
+                                resolution="minute")
+        inside = df[(df["device_id"] == "meter-0001") & (df["timestamp"] >= start) & (df["timestamp"] <= end)]
+        _compare(result, _expected(inside, TIERS["minute"]))
+        assert timeline.query("meter-9999").empty
+
+    def test_auto_resolution(self, tmp_path):
+        """Test that auto picks raw predictions for short ranges and coarser tiers for long ones."""
+        timeline = PredictionTimeline(str(tmp_path))
+        _fill(timeline, _predictions(40_000, seed=5))
+        assert timeline.resolution_for(timeline.latest - 60_000, None) == "raw"
+        assert timeline.resolution_for(timeline.latest - 12 * 3_600_000, None) == "minute"
+        assert timeline.resolution_for(START_MS, None, max_points=100) == "hour"
+        assert timeline.resolution_for(START_MS, None, max_points=10) == "day"
+        assert len(timeline.query(start=START_MS, max_points=100)) <= 2 * 100
+
+    def test_recent_and_summary(self, tmp_path):
+        """Test the newest raw predictions and a summary over them."""
+        df = _predictions(500, seed=6)
+        timeline = PredictionTimeline(str(tmp_path))
+        _fill(timeline, df)
+        recent = timeline.recent(5)
+        assert recent["label"].tolist() == df["label"].tail(5).tolist()
+        np.testing.assert_allclose(recent["confidence"], df["confidence"].tail(5), rtol=1e-6)
+
+        summary = timeline.summary(start=START_MS)
+        assert summary["predictions"] == 500
+        assert summary["label"] == df["label"].mode()[0]
+        assert summary["confidence"] == pytest.approx(df["confidence"].astype(float).mean(), rel=1e-5)
+
+
+class TestPersistence:
+    """Test cases for reopening and retention."""
+
+    def test_reopen_recovers_pending(self, tmp_path):
+        """Test that a reopened timeline gives the same answers, including buckets not yet rolled up."""
+        df = _predictions(5_000, seed=7)
+        timeline = PredictionTimeline(str(tmp_path))
+        _fill(timeline, df.iloc[:3_000])
+        before = timeline.query(resolution="minute")
+
+        reopened = PredictionTimeline(str(tmp_path))
+        pd.testing.assert_frame_equal(reopened.query(resolution="minute"), before)
+        _fill(reopened, df.iloc[3_000:])
+        assert len(reopened) == 5_000
+        _compare(reopened.query(resolution="hour"), _expected(df, TIERS["hour"]))
+
+    def test_retention_prunes_minutes(self, tmp_path):
+        """Test that minute segments past retention are deleted while hours and days keep the range."""
+        days = RETENTION_DAYS["minute"] + 5
+        df = _predictions(days * 24, seed=8, step_ms=3_600_000, devices=("meter-0000",))
+        timeline = PredictionTimeline(str(tmp_path))
+        _fill(timeline, df)
+        assert len(os.listdir(tmp_path / "minute")) <= RETENTION_DAYS["minute"] + 1
+        assert timeline.query(start=START_MS, end=START_MS + 86_400_000 - 1, resolution="minute").empty
+        _compare(timeline.query(resolution="day"), _expected(df, TIERS["day"]))
+
+    def test_from_env(self, tmp_path, monkeypatch):
+        """Test the TIMELINE_DIR contract the live scripts and the API share: a path, the default, or off."""
+        monkeypatch.setenv("TIMELINE_DIR", str(tmp_path))
+        assert from_env("predict_live").path == str(tmp_path)
+        monkeypatch.setenv("TIMELINE_DIR", "")
+        assert from_env("predict_live") is None
+        monkeypatch.delenv("TIMELINE_DIR")
+        monkeypatch.setattr("timeline.default_timeline_dir", lambda entrypoint: str(tmp_path / entrypoint))
+        assert from_env("predict_live").path == str(tmp_path / "predict_live")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])